@@ -1,9 +1,9 @@
 """
 AI Routes - REST API per IntelliChat (New Module)
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Optional, Union
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -11,6 +11,7 @@ from app.core.database import get_db
 from app.routes.auth import get_current_user_profile as get_current_user
 from app.models.users import User
 from app.modules.ai.chat_service import chat_service
+from app.core.streaming import stream_format, streaming_response
 
 router = APIRouter(prefix="/ai-new", tags=["AI Services New"])
 
@@ -18,6 +19,7 @@ class ChatMessageRequest(BaseModel):
     message: str
     conversation_id: Optional[str] = None
     company_id: Optional[int] = None
+    stream: Optional[Union[bool, str]] = None  # true/"sse" o "ndjson"
 
 class ChatResponse(BaseModel):
     response: str
@@ -28,11 +30,25 @@ class ChatResponse(BaseModel):
 @router.post("/chat", response_model=ChatResponse)
 async def send_chat_message(
     request: ChatMessageRequest,
+    http_request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Endpoint principale per chat con IntelliChat (New Module)"""
     
+    fmt = stream_format(http_request, request.stream)
+    if fmt:
+        return streaming_response(
+            chat_service.stream_message(
+                message=request.message,
+                user_id=current_user.id,
+                db=db,
+                company_id=request.company_id,
+                request=http_request
+            ),
+            fmt
+        )
+    
     try:
         result = await chat_service.process_message(
             message=request.message,
@@ -0,0 +1,258 @@
+"""
+Client condivisi - IntelligenceHUB
+Un solo QdrantClient e un solo client OpenAI (sync + async) per processo, creati
+al primo uso: nessuna connessione all'import dei moduli, pool keep-alive condivisi
+da tutti i servizi, ricreazione dei client quando il controllo di salute fallisce.
+
+    from app.core.clients import get_clients
+    get_clients().qdrant().search(...)
+    await get_clients().async_openai().chat.completions.create(...)
+
+Le chiamate LLM dei servizi passano da app/core/llm_gateway.py (concorrenza,
+rate limit, deadline e retry sopra il client async condiviso).
+
+Sviluppo / test senza servizi esterni: VECTOR_STORE=numpy (vector store NumPy locale
+con la stessa API, app/modules/rag_engine/vector_store.py) ed EMBEDDING_PROVIDER=local
+(embedding deterministici, app/modules/rag_engine/local_embeddings.py).
+VECTOR_STORE=pgvector: vettori in PostgreSQL (app/modules/rag_engine/pgvector_store.py).
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+VECTOR_STORES = ("qdrant", "numpy", "pgvector")
+
+
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class ClientRegistry:
+    """
+    Registro dei client esterni del processo
+
+    - Qdrant: gRPC (QDRANT_GRPC_PORT) se disponibile e QDRANT_PREFER_GRPC, altrimenti REST;
+      con `vector_store` "numpy" lo store locale in `local_store_path`, con "pgvector"
+      lo store PostgreSQL (PGVECTOR_DSN)
+    - OpenAI: httpx con pool keep-alive limitato, HTTP/2 se il pacchetto h2 è installato
+    - embeddings: client OpenAI async o, con `embedding_provider` "local", embedding locali
+    - il client async è legato al primo event loop che lo usa: se quel loop viene
+      chiuso (es. script con più asyncio.run) ne viene creato uno nuovo
+    - `check_health()` verifica Qdrant e ricrea il client se non risponde;
+      `start()` lo esegue periodicamente (CLIENT_HEALTH_INTERVAL)
+    """
+
+    def __init__(
+        self,
+        qdrant_host: str = os.getenv("QDRANT_HOST", "localhost"),
+        qdrant_port: int = int(os.getenv("QDRANT_PORT", "6333")),
+        qdrant_grpc_port: int = int(os.getenv("QDRANT_GRPC_PORT", "6334")),
+        prefer_grpc: bool = os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true",
+        qdrant_timeout: int = int(os.getenv("QDRANT_TIMEOUT", "30")),
+        openai_timeout: float = float(os.getenv("OPENAI_TIMEOUT", "60")),
+        openai_max_connections: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20")),
+        openai_max_keepalive: int = int(os.getenv("OPENAI_MAX_KEEPALIVE", "10")),
+        health_interval: float = float(os.getenv("CLIENT_HEALTH_INTERVAL", "30")),
+        vector_store: str = os.getenv("VECTOR_STORE", "qdrant"),
+        local_store_path: Optional[str] = os.getenv("LOCAL_VECTOR_STORE_PATH"),
+        embedding_provider: str = os.getenv("EMBEDDING_PROVIDER", "openai"),
+    ):
+        if vector_store not in VECTOR_STORES:
+            raise ValueError(f"VECTOR_STORE non supportato: {vector_store} ({', '.join(VECTOR_STORES)})")
+        if embedding_provider not in ("openai", "local"):
+            raise ValueError(f"EMBEDDING_PROVIDER non supportato: {embedding_provider} (openai, local)")
+        self.qdrant_host = qdrant_host
+        self.qdrant_port = qdrant_port
+        self.qdrant_grpc_port = qdrant_grpc_port
+        self.prefer_grpc = prefer_grpc and _module_available("grpc")
+        self.qdrant_timeout = qdrant_timeout
+        self.openai_timeout = openai_timeout
+        self.openai_limits = httpx.Limits(
+            max_connections=max(1, openai_max_connections),
+            max_keepalive_connections=max(0, openai_max_keepalive),
+            keepalive_expiry=60.0
+        )
+        self.http2 = _module_available("h2")
+        self.health_interval = health_interval
+        self.vector_store = vector_store
+        self.local_store_path = local_store_path
+        self.embedding_provider = embedding_provider
+
+        self._lock = threading.Lock()
+        self._qdrant = None
+        self._openai = None
+        self._async_openai = None
+        self._async_loop = None
+        self._local_embeddings = None
+        self._health: Dict[str, Any] = {"qdrant": None, "checked_at": None, "reconnects": 0}
+        self._monitor: Optional[asyncio.Task] = None
+
+    # ===== QDRANT =====
+
+    def _build_qdrant(self):
+        if self.vector_store == "numpy":
+            from app.modules.rag_engine.vector_store import NumpyVectorStore
+            store = NumpyVectorStore(**({"path": self.local_store_path} if self.local_store_path is not None else {}))
+            logger.info(f"✅ Local NumPy vector store ({store.path or 'in memoria'})")
+            return store
+        if self.vector_store == "pgvector":
+            from app.modules.rag_engine.pgvector_store import PgVectorStore
+            return PgVectorStore()
+        from qdrant_client import QdrantClient
+        client = QdrantClient(
+            host=self.qdrant_host,
+            port=self.qdrant_port,
+            grpc_port=self.qdrant_grpc_port,
+            prefer_grpc=self.prefer_grpc,
+            timeout=self.qdrant_timeout
+        )
+        logger.info(
+            f"✅ Qdrant client {self.qdrant_host}:"
+            f"{self.qdrant_grpc_port if self.prefer_grpc else self.qdrant_port} "
+            f"({'gRPC' if self.prefer_grpc else 'REST'})"
+        )
+        return client
+
+    def qdrant(self):
+        if self._qdrant is None:
+            with self._lock:
+                if self._qdrant is None:
+                    self._qdrant = self._build_qdrant()
+        return self._qdrant
+
+    # ===== OPENAI =====
+
+    def openai(self):
+        if self._openai is None:
+            with self._lock:
+                if self._openai is None:
+                    from openai import OpenAI
+                    self._openai = OpenAI(
+                        api_key=os.getenv("OPENAI_API_KEY"),
+                        timeout=self.openai_timeout,
+                        http_client=httpx.Client(
+                            http2=self.http2, limits=self.openai_limits, timeout=self.openai_timeout
+                        )
+                    )
+        return self._openai
+
+    def async_openai(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        with self._lock:
+            if self._async_openai is None or (self._async_loop is not None and self._async_loop.is_closed()):
+                from openai import AsyncOpenAI
+                # Il pool del loop precedente (chiuso) non è riusabile: nuovo client
+                self._async_openai = AsyncOpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    timeout=self.openai_timeout,
+                    http_client=httpx.AsyncClient(
+                        http2=self.http2, limits=self.openai_limits, timeout=self.openai_timeout
+                    )
+                )
+                self._async_loop = loop
+            elif self._async_loop is None:
+                self._async_loop = loop
+            return self._async_openai
+
+    def embeddings(self):
+        """Client per embeddings.create: OpenAI async o embedding locali (EMBEDDING_PROVIDER)"""
+        if self.embedding_provider == "local":
+            if self._local_embeddings is None:
+                from app.modules.rag_engine.local_embeddings import LocalEmbeddingClient
+                self._local_embeddings = LocalEmbeddingClient()
+            return self._local_embeddings
+        return self.async_openai()
+
+    # ===== HEALTH =====
+
+    def reset(self, name: str):
+        """Chiude e scarta un client ('qdrant' | 'openai'): ricreato al prossimo uso"""
+        with self._lock:
+            if name == "qdrant":
+                client, self._qdrant = self._qdrant, None
+            elif name == "openai":
+                client, self._openai = self._openai, None
+            else:
+                raise ValueError(f"Client sconosciuto: {name}")
+        if client is not None:
+            try:
+                client.close()
+            except Exception as e:
+                logger.debug(f"Closing {name} client failed: {e}")
+
+    def check_health(self) -> Dict[str, Any]:
+        """Ping di Qdrant; se fallisce il client viene ricreato e ritestato una volta"""
+        healthy = False
+        for attempt in range(2):
+            try:
+                self.qdrant().get_collections()
+                healthy = True
+                break
+            except Exception as e:
+                logger.warning(f"Qdrant health check failed ({attempt + 1}/2): {e}")
+                self.reset("qdrant")
+                self._health["reconnects"] += 1
+        self._health.update({"qdrant": healthy, "checked_at": time.time()})
+        return self.get_stats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._health,
+            "vector_store": self.vector_store,
+            "embedding_provider": self.embedding_provider,
+            "qdrant_transport": "grpc" if self.prefer_grpc else "rest",
+            "openai_http2": self.http2,
+            "qdrant_connected": self._qdrant is not None,
+            "openai_connected": self._openai is not None or self._async_openai is not None,
+        }
+
+    async def _monitor_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.to_thread(self.check_health)
+
+    async def start(self):
+        """Controllo di salute periodico (lifespan dell'API)"""
+        if self._monitor is None and self.health_interval > 0:
+            self._monitor = asyncio.create_task(self._monitor_loop())
+
+    async def stop(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        async_client, self._async_openai = self._async_openai, None
+        if async_client is not None:
+            try:
+                await async_client.close()
+            except Exception as e:
+                logger.debug(f"Closing async OpenAI client failed: {e}")
+        self.reset("openai")
+        self.reset("qdrant")
+
+
+_clients: Optional[ClientRegistry] = None
+_clients_lock = threading.Lock()
+
+
+def get_clients() -> ClientRegistry:
+    """Registro client del processo"""
+    global _clients
+    if _clients is None:
+        with _clients_lock:
+            if _clients is None:
+                _clients = ClientRegistry()
+    return _clients
@@ -0,0 +1,256 @@
+"""
+Cache risultati LLM - IntelligenceHUB
+Riuso delle risposte per prompt deterministici (temperatura bassa): chiave =
+sha256 di (modello, temperatura, messaggi normalizzati, parametri). Opt-in per
+call site, ognuno con il proprio TTL:
+
+    from app.core.llm_cache import cached_completion
+    text = await cached_completion(route="intellichat-insights", ttl=900,
+                                   model=model, messages=messages, temperature=0.3)
+
+- tier 1: LRU in-process con TTL (`memory_items` voci)
+- tier 2 opzionale: Redis (LLM_CACHE_REDIS_URL), condiviso tra worker
+- stampede protection: richieste identiche concorrenti condividono una sola chiamata
+- temperatura > LLM_CACHE_MAX_TEMPERATURE: nessuna cache (output non deterministico)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.llm_gateway import get_llm_gateway
+
+logger = logging.getLogger(__name__)
+
+REDIS_PREFIX = "llmcache:"
+
+
+def normalize_prompt(text: str) -> str:
+    """NFC + whitespace compattato (stessa normalizzazione della cache embeddings)"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def prompt_key(model: str, temperature: float, messages: List[Dict[str, Any]], **params) -> str:
+    """Chiave della cache: whitespace e forma Unicode dei messaggi non contano"""
+    payload = {
+        "model": model,
+        "temperature": round(float(temperature), 3),
+        "messages": [
+            [m.get("role"), normalize_prompt(m["content"]) if isinstance(m.get("content"), str) else m.get("content")]
+            for m in messages
+        ],
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class LLMResultCache:
+    """
+    Cache dei testi generati, a due livelli
+
+    - `get_or_compute(key, compute, ttl)`: lookup memoria → Redis → calcolo; il valore
+      deve essere serializzabile in JSON
+    - le chiamate concorrenti con la stessa chiave attendono lo stesso task
+    - gli errori non vengono messi in cache
+    """
+
+    def __init__(
+        self,
+        memory_items: int = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "1000")),
+        redis_url: Optional[str] = os.getenv("LLM_CACHE_REDIS_URL") or None,
+        max_temperature: float = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3")),
+    ):
+        self.memory_items = max(0, memory_items)
+        self.redis_url = redis_url
+        self.max_temperature = max_temperature
+
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+
+        self.stats = {
+            "memory_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "coalesced": 0,  # richieste servite da una chiamata già in corso
+            "bypassed": 0,   # temperatura troppo alta
+            "stores": 0,
+            "expirations": 0,
+            "evictions": 0,
+            "errors": 0,
+            "redis_errors": 0,
+        }
+
+    # ===== TIERS =====
+
+    def _redis_client(self):
+        """Client redis.asyncio lazy; None se non configurato o non installato"""
+        if self._redis is None and self.redis_url:
+            try:
+                import redis.asyncio as redis_asyncio
+                self._redis = redis_asyncio.from_url(self.redis_url, socket_timeout=1.0)
+            except Exception as e:
+                logger.warning(f"LLM cache: Redis not available ({e}), using memory only")
+                self.redis_url = None
+        return self._redis
+
+    def _memory_get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if time.time() >= expires_at:
+                del self._memory[key]
+                self.stats["expirations"] += 1
+                return False, None
+            self._memory.move_to_end(key)
+            return True, value
+
+    def _memory_put(self, key: str, value: Any, ttl: float):
+        if not self.memory_items:
+            return
+        with self._lock:
+            self._memory[key] = (time.time() + ttl, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    async def _redis_get(self, key: str) -> Tuple[bool, Any]:
+        client = self._redis_client()
+        if client is None:
+            return False, None
+        try:
+            raw = await client.get(REDIS_PREFIX + key)
+            if raw is None:
+                return False, None
+            return True, json.loads(raw)
+        except Exception as e:
+            self.stats["redis_errors"] += 1
+            logger.warning(f"LLM cache: Redis read failed: {e}")
+            return False, None
+
+    async def _redis_put(self, key: str, value: Any, ttl: float):
+        client = self._redis_client()
+        if client is None:
+            return
+        try:
+            await client.set(REDIS_PREFIX + key, json.dumps(value), ex=max(1, int(ttl)))
+        except Exception as e:
+            self.stats["redis_errors"] += 1
+            logger.warning(f"LLM cache: Redis write failed: {e}")
+
+    async def _compute_and_store(self, key: str, compute: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        value = await compute()
+        self._memory_put(key, value, ttl)
+        await self._redis_put(key, value, ttl)
+        self.stats["stores"] += 1
+        return value
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # exception() evita il warning "never retrieved" se tutti i chiamanti sono stati cancellati
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors"] += 1
+
+    # ===== API =====
+
+    def cacheable(self, temperature: float) -> bool:
+        return temperature <= self.max_temperature
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        found, value = self._memory_get(key)
+        if found:
+            self.stats["memory_hits"] += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        found, value = await self._redis_get(key)
+        if found:
+            self.stats["redis_hits"] += 1
+            self._memory_put(key, value, ttl)
+            return value
+
+        # Ricontrollo dopo l'await su Redis: un'altra richiesta può essere partita nel frattempo
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        self.stats["misses"] += 1
+        task = asyncio.ensure_future(self._compute_and_store(key, compute, ttl))
+        task.add_done_callback(lambda t: self._finished(key, t))
+        self._inflight[key] = task
+        # shield: se il primo chiamante viene cancellato, gli altri ricevono comunque il risultato
+        return await asyncio.shield(task)
+
+    async def chat_text(self, *, route: str, ttl: float, model: str, messages: List[Dict[str, Any]],
+                        temperature: float = 0.0, **params) -> str:
+        """Contenuto del primo choice di una chat completion, dalla cache se possibile"""
+        async def compute() -> str:
+            response = await get_llm_gateway().chat(
+                route=route, model=model, messages=messages, temperature=temperature, **params
+            )
+            return response.choices[0].message.content
+
+        if not self.cacheable(temperature):
+            self.stats["bypassed"] += 1
+            return await compute()
+        return await self.get_or_compute(prompt_key(model, temperature, messages, **params), compute, ttl)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["redis_hits"] + self.stats["coalesced"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "in_flight": len(self._inflight),
+            "redis": bool(self.redis_url),
+            "max_temperature": self.max_temperature,
+        }
+
+
+_cache: Optional[LLMResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResultCache]:
+    """Cache di processo; disabilitabile con LLM_CACHE_ENABLED=false"""
+    global _cache
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResultCache()
+    return _cache
+
+
+async def cached_completion(*, route: str, ttl: float, model: str, messages: List[Dict[str, Any]],
+                            temperature: float = 0.0, **params) -> str:
+    """Testo della risposta; senza cache (LLM_CACHE_ENABLED=false) chiama direttamente il gateway"""
+    cache = get_llm_cache()
+    if cache is not None:
+        return await cache.chat_text(route=route, ttl=ttl, model=model, messages=messages,
+                                     temperature=temperature, **params)
+    response = await get_llm_gateway().chat(
+        route=route, model=model, messages=messages, temperature=temperature, **params
+    )
+    return response.choices[0].message.content
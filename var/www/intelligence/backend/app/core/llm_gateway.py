@@ -0,0 +1,463 @@
+"""
+LLM Gateway - IntelligenceHUB
+Unico punto di passaggio per le chiamate OpenAI (chat, streaming, embeddings,
+trascrizioni), sul client AsyncOpenAI condiviso di app.core.clients:
+
+- concorrenza limitata: globale (LLM_MAX_CONCURRENCY) e per route (LLM_ROUTE_CONCURRENCY)
+- coda RPM/TPM per modello (LLM_RATE_LIMITS): le richieste attendono il proprio turno
+  invece di ricevere 429 da OpenAI
+- deadline per chiamata (coda e retry compresi): LLMDeadlineExceeded se superata
+- retry con backoff esponenziale e jitter su 429, 5xx, timeout ed errori di connessione
+- usage uniforme per route e modello: token, costo stimato, latenza, attesa in coda;
+  ogni chiamata è registrata anche in app.core.llm_telemetry (Prometheus, per utente)
+
+    from app.core.llm_gateway import get_llm_gateway
+    response = await get_llm_gateway().chat(route="rag-chat", model="gpt-4o", messages=[...])
+
+Formato delle variabili: LLM_ROUTE_CONCURRENCY="rag-chat=16,intellivoice=4",
+LLM_RATE_LIMITS="gpt-4o=500/30000,text-embedding-3=3000/1000000" (richieste/token al minuto,
+prefisso del modello; 0 = nessun limite).
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.clients import get_clients
+from app.core.llm_pricing import cached_tokens
+from app.core.llm_telemetry import get_llm_telemetry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUTE = "default"
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """La chiamata non è stata completata entro la sua deadline (coda compresa)"""
+
+
+def parse_limits(spec: str) -> Dict[str, str]:
+    """"a=1,b=2" → {"a": "1", "b": "2"}"""
+    limits = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            limits[name.strip()] = value.strip()
+    return limits
+
+
+def estimate_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Stima dei token del prompt (≈4 caratteri per token + overhead per messaggio)"""
+    total = 0
+    for message in messages:
+        content = message.get("content") or ""
+        if not isinstance(content, str):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        total += len(content) // 4 + 4
+    return total
+
+
+def estimate_input_tokens(inputs: Any) -> int:
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    return sum(len(text) // 4 + 1 for text in inputs if isinstance(text, str))
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Attesa suggerita per un errore transitorio (0 = backoff normale), None se non ritentabile"""
+    if isinstance(error, LLMDeadlineExceeded):
+        return None
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError)):
+        return 0.0
+    # openai: APITimeoutError / APIConnectionError senza status, APIStatusError con status_code
+    if type(error).__name__ in ("APITimeoutError", "APIConnectionError"):
+        return 0.0
+    status = getattr(error, "status_code", None)
+    if status is None or not (status in (408, 409, 429) or status >= 500):
+        return None
+    response = getattr(error, "response", None)
+    header = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(0.0, float(header)) if header else 0.0
+    except ValueError:
+        return 0.0
+
+
+class _RateLimiter:
+    """Token bucket richieste/minuto e token/minuto di un modello; attese in ordine di arrivo"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = float(rpm)
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+        self.lock: Optional[asyncio.Lock] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        if self.rpm:
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    def _wait(self, tokens: int) -> float:
+        wait = 0.0
+        if self.rpm and self.requests < 1:
+            wait = (1 - self.requests) * 60 / self.rpm
+        if self.tpm:
+            needed = min(tokens, self.tpm)
+            if self.tokens < needed:
+                wait = max(wait, (needed - self.tokens) * 60 / self.tpm)
+        return wait
+
+    async def acquire(self, tokens: int, deadline: float):
+        async with self.lock:
+            while True:
+                self._refill()
+                wait = self._wait(tokens)
+                if wait <= 0:
+                    if self.rpm:
+                        self.requests -= 1
+                    if self.tpm:
+                        self.tokens -= min(tokens, self.tpm)
+                    return
+                if time.monotonic() + wait > deadline:
+                    raise LLMDeadlineExceeded(f"Rate limit: attesa di {wait:.1f}s oltre la deadline")
+                await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual: int):
+        """Corregge il bucket TPM con i token effettivi della risposta"""
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + min(estimated, self.tpm) - actual)
+
+
+class LLMGateway:
+    """
+    Gateway async delle chiamate OpenAI del processo
+
+    - `route` identifica il chiamante (limite di concorrenza e statistiche dedicate)
+    - `deadline` in secondi per chiamata (default `deadline`, LLM_DEADLINE_SECONDS)
+    - le primitive asyncio sono legate all'event loop in uso: ricreate se cambia
+      (script con più asyncio.run), come il client async di ClientRegistry
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+        route_concurrency: str = os.getenv("LLM_ROUTE_CONCURRENCY", ""),
+        rate_limits: str = os.getenv("LLM_RATE_LIMITS", ""),
+        deadline: float = float(os.getenv("LLM_DEADLINE_SECONDS", "60")),
+        max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "3")),
+        backoff_base: float = float(os.getenv("LLM_BACKOFF_SECONDS", "0.5")),
+        backoff_max: float = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20")),
+        default_completion_tokens: int = int(os.getenv("LLM_DEFAULT_COMPLETION_TOKENS", "512")),
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.route_limits = {route: max(1, int(value)) for route, value in parse_limits(route_concurrency).items()}
+        self.rate_limits: Dict[str, Tuple[int, int]] = {}
+        for model, value in parse_limits(rate_limits).items():
+            rpm, _, tpm = value.partition("/")
+            self.rate_limits[model] = (int(rpm or 0), int(tpm or 0))
+        self.deadline = deadline
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.default_completion_tokens = default_completion_tokens
+
+        self._loop = None
+        self._global: Optional[asyncio.Semaphore] = None
+        self._routes: Dict[str, asyncio.Semaphore] = {}
+        self._limiters: Dict[str, _RateLimiter] = {}
+        self.in_flight = 0
+        self.queued = 0
+        self._stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    # ===== INTERNAL =====
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._global = asyncio.Semaphore(self.max_concurrency)
+            self._routes = {}
+            for limiter in self._limiters.values():
+                limiter.lock = asyncio.Lock()
+
+    def _route_semaphore(self, route: str) -> Optional[asyncio.Semaphore]:
+        limit = self.route_limits.get(route)
+        if limit is None:
+            return None
+        if route not in self._routes:
+            self._routes[route] = asyncio.Semaphore(limit)
+        return self._routes[route]
+
+    def _limiter(self, model: str) -> Optional[_RateLimiter]:
+        matches = [prefix for prefix in self.rate_limits if model.startswith(prefix)]
+        if not matches:
+            return None
+        prefix = max(matches, key=len)
+        if prefix not in self._limiters:
+            limiter = self._limiters[prefix] = _RateLimiter(*self.rate_limits[prefix])
+            limiter.lock = asyncio.Lock()
+        return self._limiters[prefix]
+
+    def _entry(self, route: str, model: str) -> Dict[str, Any]:
+        key = (route, model)
+        if key not in self._stats:
+            self._stats[key] = {
+                "calls": 0, "errors": 0, "retries": 0, "deadline_exceeded": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "cost": 0.0,
+                "latency_s": 0.0, "queue_s": 0.0,
+            }
+        return self._stats[key]
+
+    @staticmethod
+    def _remaining(deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded("Deadline superata")
+        return remaining
+
+    @asynccontextmanager
+    async def _admitted(self, route: str, model: str, deadline: float):
+        """Slot di concorrenza della route e globale, entro la deadline"""
+        self._bind_loop()
+        semaphores = [s for s in (self._route_semaphore(route), self._global) if s is not None]
+        acquired = []
+        started = time.monotonic()
+        self.queued += 1
+        try:
+            for semaphore in semaphores:
+                try:
+                    await asyncio.wait_for(semaphore.acquire(), self._remaining(deadline))
+                except asyncio.TimeoutError:
+                    raise LLMDeadlineExceeded(f"Nessuno slot libero per {route} entro la deadline")
+                acquired.append(semaphore)
+        except BaseException:
+            self.queued -= 1
+            for semaphore in acquired:
+                semaphore.release()
+            raise
+        self.queued -= 1
+        self.in_flight += 1
+        self._entry(route, model)["queue_s"] += time.monotonic() - started
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            for semaphore in acquired:
+                semaphore.release()
+
+    def _client(self, client=None):
+        return client or get_clients().async_openai()
+
+    async def _attempts(
+        self,
+        route: str,
+        model: str,
+        tokens: int,
+        deadline: float,
+        call: Callable[[float], Awaitable[Any]],
+        max_retries: Optional[int] = None,
+        state: Optional[Dict[str, int]] = None,
+    ):
+        """Esegue `call(timeout)` con coda RPM/TPM e retry; ritorna la risposta (retry contati in `state`)"""
+        entry = self._entry(route, model)
+        limiter = self._limiter(model)
+        retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            if limiter is not None:
+                await limiter.acquire(tokens, deadline)
+            try:
+                timeout = self._remaining(deadline)
+                return await asyncio.wait_for(call(timeout), timeout)
+            except Exception as e:
+                delay = retry_after(e)
+                if delay is None or attempt >= retries:
+                    if isinstance(e, asyncio.TimeoutError) and time.monotonic() >= deadline:
+                        raise LLMDeadlineExceeded(f"{route}/{model}: deadline superata") from e
+                    raise
+                attempt += 1
+                entry["retries"] += 1
+                if state is not None:
+                    state["retries"] = attempt
+                # Full jitter; il Retry-After del server è un minimo
+                delay = max(delay, random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+                if time.monotonic() + delay >= deadline:
+                    raise LLMDeadlineExceeded(f"{route}/{model}: nessun tempo per il retry ({e})") from e
+                logger.warning(f"LLM {route}/{model} failed ({e}), retry {attempt}/{retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _record(self, route: str, model: str, kind: str, usage, started: float, estimated: int, retries: int):
+        entry = self._entry(route, model)
+        prompt_tokens = (getattr(usage, "prompt_tokens", 0) or 0) if usage else 0
+        completion_tokens = (getattr(usage, "completion_tokens", 0) or 0) if usage else 0
+        cached = cached_tokens(usage)
+        latency = time.monotonic() - started
+        cost = get_llm_telemetry().record(
+            route=route, model=model, kind=kind, latency_s=latency, prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens, cached=cached, retries=retries
+        )
+        entry["calls"] += 1
+        entry["prompt_tokens"] += prompt_tokens
+        entry["completion_tokens"] += completion_tokens
+        entry["cached_tokens"] += cached
+        entry["cost"] = round(entry["cost"] + cost, 6)
+        entry["latency_s"] += latency
+        limiter = self._limiter(model)
+        if limiter is not None and usage:
+            limiter.settle(estimated, prompt_tokens + completion_tokens)
+
+    def _failed(self, route: str, model: str, kind: str, error: Exception, started: float, retries: int):
+        entry = self._entry(route, model)
+        entry["errors"] += 1
+        if isinstance(error, LLMDeadlineExceeded):
+            entry["deadline_exceeded"] += 1
+        get_llm_telemetry().record(
+            route=route, model=model, kind=kind, latency_s=time.monotonic() - started, retries=retries, error=error
+        )
+
+    async def _run(self, route: str, model: str, kind: str, tokens: int, deadline: Optional[float],
+                   call: Callable[[float], Awaitable[Any]], max_retries: Optional[int] = None):
+        deadline_at = time.monotonic() + (self.deadline if deadline is None else deadline)
+        started = time.monotonic()
+        state = {"retries": 0}
+        try:
+            async with self._admitted(route, model, deadline_at):
+                response = await self._attempts(route, model, tokens, deadline_at, call, max_retries, state)
+        except Exception as e:
+            self._failed(route, model, kind, e, started, state["retries"])
+            raise
+        self._record(route, model, kind, getattr(response, "usage", None), started, tokens, state["retries"])
+        return response
+
+    # ===== API =====
+
+    async def chat(self, *, model: str, messages: List[Dict[str, Any]], route: str = DEFAULT_ROUTE,
+                   deadline: Optional[float] = None, max_retries: Optional[int] = None, client=None, **params):
+        """chat.completions.create (non streaming)"""
+        tokens = estimate_message_tokens(messages) + (params.get("max_tokens") or self.default_completion_tokens)
+        openai_client = self._client(client)
+        return await self._run(
+            route, model, "chat", tokens, deadline,
+            lambda timeout: openai_client.with_options(timeout=timeout, max_retries=0).chat.completions.create(
+                model=model, messages=messages, **params
+            ),
+            max_retries
+        )
+
+    async def stream_chat(self, *, model: str, messages: List[Dict[str, Any]], route: str = DEFAULT_ROUTE,
+                          deadline: Optional[float] = None, client=None, **params) -> AsyncIterator[Any]:
+        """
+        chat.completions.create in streaming: chunk OpenAI così come arrivano.
+        Lo slot resta occupato fino alla chiusura del generatore; la deadline vale
+        fino all'apertura dello stream. Usage registrato dall'ultimo chunk; la chiamata
+        viene registrata anche se il client si disconnette a metà (GeneratorExit).
+        """
+        tokens = estimate_message_tokens(messages) + (params.get("max_tokens") or self.default_completion_tokens)
+        openai_client = self._client(client)
+        deadline_at = time.monotonic() + (self.deadline if deadline is None else deadline)
+        started = time.monotonic()
+        usage = None
+        state = {"retries": 0}
+        opened = failed = False
+        try:
+            async with self._admitted(route, model, deadline_at):
+                stream = await self._attempts(
+                    route, model, tokens, deadline_at,
+                    lambda timeout: openai_client.with_options(timeout=timeout, max_retries=0).chat.completions.create(
+                        model=model, messages=messages, stream=True, stream_options={"include_usage": True}, **params
+                    ),
+                    state=state
+                )
+                opened = True
+                try:
+                    async for chunk in stream:
+                        if getattr(chunk, "usage", None):
+                            usage = chunk.usage
+                        yield chunk
+                finally:
+                    await stream.close()
+        except Exception as e:
+            failed = True
+            self._failed(route, model, "chat_stream", e, started, state["retries"])
+            raise
+        finally:
+            # Senza l'ultimo chunk (disconnessione) usage è None: latenza e chiamata registrate comunque
+            if opened and not failed:
+                self._record(route, model, "chat_stream", usage, started, tokens, state["retries"])
+
+    async def embeddings(self, *, model: str, input: Any, route: str = "embeddings",
+                         deadline: Optional[float] = None, max_retries: Optional[int] = None, client=None, **params):
+        """embeddings.create; `client` di default = get_clients().embeddings() (anche embedding locali)"""
+        embeddings_client = client or get_clients().embeddings()
+
+        def call(timeout: float):
+            if hasattr(embeddings_client, "with_options"):
+                return embeddings_client.with_options(timeout=timeout, max_retries=0).embeddings.create(
+                    model=model, input=input, **params
+                )
+            return embeddings_client.embeddings.create(model=model, input=input, **params)
+
+        return await self._run(route, model, "embeddings", estimate_input_tokens(input), deadline, call, max_retries)
+
+    async def transcribe(self, *, file, model: str = "whisper-1", route: str = "transcription",
+                         deadline: Optional[float] = None, client=None, **params):
+        """audio.transcriptions.create; il file viene riavvolto a ogni tentativo"""
+        openai_client = self._client(client)
+
+        def call(timeout: float):
+            if hasattr(file, "seek"):
+                file.seek(0)
+            return openai_client.with_options(timeout=timeout, max_retries=0).audio.transcriptions.create(
+                model=model, file=file, **params
+            )
+
+        return await self._run(route, model, "transcription", 0, deadline, call)
+
+    def get_stats(self) -> Dict[str, Any]:
+        routes: Dict[str, Dict[str, Any]] = {}
+        totals = {"calls": 0, "errors": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                  "cached_tokens": 0, "cost": 0.0}
+        for (route, model), entry in self._stats.items():
+            calls = entry["calls"]
+            routes.setdefault(route, {})[model] = {
+                **entry,
+                "avg_latency_s": round(entry["latency_s"] / calls, 3) if calls else 0.0,
+                "avg_queue_s": round(entry["queue_s"] / (calls + entry["errors"]), 3) if calls + entry["errors"] else 0.0,
+            }
+            for key in totals:
+                totals[key] += entry[key]
+        totals["cost"] = round(totals["cost"], 6)
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "route_limits": self.route_limits,
+            "rate_limits": {model: {"rpm": rpm, "tpm": tpm} for model, (rpm, tpm) in self.rate_limits.items()},
+            "totals": totals,
+            "routes": routes,
+        }
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Gateway LLM del processo"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
@@ -0,0 +1,103 @@
+"""
+Listino prezzi LLM - IntelligenceHUB
+Tabella USD per 1M token (input, input in cache, output) per prefisso di modello:
+default nel codice, sovrascrivibili con un file JSON (LLM_PRICING_FILE)
+
+    {"gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10.0},
+     "my-finetune": {"input": 3.0, "output": 12.0}}
+
+Il prefisso più lungo che corrisponde al modello vince ("gpt-4o-mini" prima di "gpt-4o").
+"""
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M token
+DEFAULT_PRICING: Dict[str, Dict[str, float]] = {
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.6},
+    "gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10.0},
+    "gpt-4-turbo": {"input": 10.0, "output": 30.0},
+    "gpt-4": {"input": 30.0, "output": 60.0},
+    "gpt-3.5-turbo": {"input": 0.5, "output": 1.5},
+    "text-embedding-3-small": {"input": 0.02},
+    "text-embedding-3-large": {"input": 0.13},
+    "text-embedding-ada-002": {"input": 0.1},
+}
+
+
+def cached_tokens(usage) -> int:
+    """Token del prompt serviti dalla prompt cache OpenAI (usage.prompt_tokens_details)"""
+    details = getattr(usage, "prompt_tokens_details", None) if usage else None
+    if isinstance(details, dict):
+        return details.get("cached_tokens") or 0
+    return (getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+
+class PricingTable:
+    """Prezzi per prefisso di modello; `reload()` rilegge il file senza riavvio"""
+
+    def __init__(self, path: Optional[str] = os.getenv("LLM_PRICING_FILE") or None):
+        self.path = path
+        self.prices: Dict[str, Dict[str, float]] = {}
+        self._prefixes = []
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> Dict[str, Dict[str, float]]:
+        prices = {model: dict(rates) for model, rates in DEFAULT_PRICING.items()}
+        if self.path:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    overrides = json.load(f)
+                for model, rates in overrides.items():
+                    prices[model] = {key: float(value) for key, value in rates.items()}
+            except Exception as e:
+                logger.warning(f"LLM pricing file not loaded ({self.path}): {e}, using defaults")
+        with self._lock:
+            self.prices = prices
+            self._prefixes = sorted(prices, key=len, reverse=True)
+        return prices
+
+    def rates(self, model: str) -> Optional[Dict[str, float]]:
+        for prefix in self._prefixes:
+            if model.startswith(prefix):
+                return self.prices[prefix]
+        return None
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int, cached: int = 0) -> float:
+        rates = self.rates(model)
+        if rates is None:
+            return 0.0
+        input_rate = rates.get("input", 0.0)
+        cached = min(cached, prompt_tokens)
+        total = (
+            (prompt_tokens - cached) * input_rate
+            + cached * rates.get("cached_input", input_rate)
+            + completion_tokens * rates.get("output", 0.0)
+        )
+        return round(total / 1_000_000, 6)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"unit": "USD per 1M tokens", "file": self.path, "models": self.prices}
+
+
+_pricing: Optional[PricingTable] = None
+_pricing_lock = threading.Lock()
+
+
+def get_pricing() -> PricingTable:
+    global _pricing
+    if _pricing is None:
+        with _pricing_lock:
+            if _pricing is None:
+                _pricing = PricingTable()
+    return _pricing
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached: int = 0) -> float:
+    """Costo stimato di una chiamata secondo il listino corrente"""
+    return get_pricing().cost(model, prompt_tokens, completion_tokens, cached)
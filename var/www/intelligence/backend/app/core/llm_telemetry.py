@@ -0,0 +1,241 @@
+"""
+Telemetria LLM - IntelligenceHUB
+Ogni chiamata del gateway (chat, streaming, embeddings, trascrizioni) registra
+route, modello, utente, token prompt/completion/in cache, costo (app.core.llm_pricing),
+latenza, retry ed esito:
+
+- aggregati in memoria a bucket di un minuto (LLM_TELEMETRY_RETENTION_HOURS, default 24h)
+  interrogabili per finestra e per route / utente / modello (GET /api/v1/admin/llm-usage)
+- metriche Prometheus (prometheus_client, opzionale) esposte su GET /metrics;
+  l'utente non è una label Prometheus (cardinalità), solo negli aggregati
+
+L'utente è letto da un ContextVar impostato dal middleware HTTP (sub del JWT);
+script e job di background possono usare `with llm_user("ingestion"):`.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.core.llm_pricing import estimate_cost
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS = "anonymous"
+GROUP_BY = ("route", "model", "kind", "user")  # stesso ordine della chiave dei bucket
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+_current_user: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_user", default=None)
+
+
+def set_llm_user(user: Optional[Any]):
+    """Utente a cui attribuire le chiamate LLM del contesto corrente (richiesta HTTP)"""
+    return _current_user.set(str(user) if user is not None else None)
+
+
+@contextmanager
+def llm_user(user: Optional[Any]) -> Iterator[None]:
+    token = set_llm_user(user)
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+
+def current_llm_user() -> str:
+    return _current_user.get() or ANONYMOUS
+
+
+def parse_window(window: str) -> int:
+    """"15m" / "1h" / "7d" / "900" → secondi"""
+    window = window.strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if window and window[-1] in units:
+        return int(float(window[:-1]) * units[window[-1]])
+    return int(window)
+
+
+def _new_counters() -> Dict[str, float]:
+    return {
+        "calls": 0, "errors": 0, "retries": 0,
+        "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+        "cost": 0.0, "latency_s": 0.0, "max_latency_s": 0.0,
+    }
+
+
+class _PrometheusMetrics:
+    """Collector Prometheus del processo (registry di default di prometheus_client)"""
+
+    def __init__(self):
+        from prometheus_client import Counter, Histogram
+
+        self.requests = Counter("llm_requests_total", "LLM calls", ["route", "model", "kind", "status"])
+        self.tokens = Counter("llm_tokens_total", "LLM tokens", ["route", "model", "type"])
+        self.cost = Counter("llm_cost_usd_total", "Estimated LLM cost in USD", ["route", "model"])
+        self.retries = Counter("llm_retries_total", "LLM call retries", ["route", "model"])
+        self.latency = Histogram(
+            "llm_request_duration_seconds", "LLM call latency (queue and retries included)",
+            ["route", "model", "kind"], buckets=LATENCY_BUCKETS
+        )
+
+    def observe(self, route: str, model: str, kind: str, status: str, prompt_tokens: int,
+                completion_tokens: int, cached: int, cost: float, latency_s: float, retries: int):
+        self.requests.labels(route, model, kind, status).inc()
+        self.latency.labels(route, model, kind).observe(latency_s)
+        if retries:
+            self.retries.labels(route, model).inc(retries)
+        for token_type, count in (("prompt", prompt_tokens), ("completion", completion_tokens), ("cached", cached)):
+            if count:
+                self.tokens.labels(route, model, token_type).inc(count)
+        if cost:
+            self.cost.labels(route, model).inc(cost)
+
+
+class LLMTelemetry:
+    """
+    Registro delle chiamate LLM del processo
+
+    - `record(...)`: una chiamata conclusa (anche fallita)
+    - `aggregate(window_seconds, group_by)`: totali dell'ultima finestra per gruppo
+    - aggregati a bucket di `bucket_seconds`, conservati per `retention_seconds`
+    """
+
+    def __init__(
+        self,
+        bucket_seconds: int = 60,
+        retention_seconds: int = int(float(os.getenv("LLM_TELEMETRY_RETENTION_HOURS", "24")) * 3600),
+        prometheus: bool = os.getenv("LLM_TELEMETRY_PROMETHEUS", "true").lower() not in ("0", "false", "no"),
+    ):
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.retention_seconds = max(self.bucket_seconds, retention_seconds)
+        # bucket_start -> (route, model, kind, user) -> contatori
+        self._buckets: "OrderedDict[int, Dict[Tuple[str, str, str, str], Dict[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+        self.prometheus: Optional[_PrometheusMetrics] = None
+        if prometheus:
+            try:
+                self.prometheus = _PrometheusMetrics()
+            except ImportError:
+                logger.info("prometheus_client not installed: LLM metrics only on the admin endpoint")
+
+    # ===== INTERNAL =====
+
+    def _prune(self, now: float):
+        oldest = now - self.retention_seconds
+        while self._buckets and next(iter(self._buckets)) + self.bucket_seconds <= oldest:
+            self._buckets.popitem(last=False)
+
+    # ===== API =====
+
+    def record(
+        self,
+        *,
+        route: str,
+        model: str,
+        kind: str,
+        latency_s: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached: int = 0,
+        retries: int = 0,
+        error: Optional[Exception] = None,
+        user: Optional[str] = None,
+    ) -> float:
+        """Registra una chiamata; ritorna il costo stimato"""
+        cost = 0.0 if error is not None else estimate_cost(model, prompt_tokens, completion_tokens, cached)
+        user = user or current_llm_user()
+        now = time.time()
+        bucket = int(now // self.bucket_seconds) * self.bucket_seconds
+
+        with self._lock:
+            counters = self._buckets.setdefault(bucket, {}).setdefault((route, model, kind, user), _new_counters())
+            counters["calls"] += 1
+            counters["errors"] += error is not None
+            counters["retries"] += retries
+            counters["prompt_tokens"] += prompt_tokens
+            counters["completion_tokens"] += completion_tokens
+            counters["cached_tokens"] += cached
+            counters["cost"] += cost
+            counters["latency_s"] += latency_s
+            counters["max_latency_s"] = max(counters["max_latency_s"], latency_s)
+            self._prune(now)
+
+        if self.prometheus is not None:
+            status = "ok" if error is None else type(error).__name__
+            self.prometheus.observe(route, model, kind, status, prompt_tokens, completion_tokens,
+                                    cached, cost, latency_s, retries)
+        return cost
+
+    def aggregate(self, window_seconds: int, group_by: str = "route") -> Dict[str, Any]:
+        """Totali dell'ultima finestra, per gruppo (route, model, kind o user), ordinati per costo"""
+        if group_by not in GROUP_BY:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+        position = GROUP_BY.index(group_by)
+        since = time.time() - window_seconds
+
+        groups: Dict[str, Dict[str, float]] = {}
+        totals = _new_counters()
+        with self._lock:
+            for bucket, entries in self._buckets.items():
+                if bucket + self.bucket_seconds <= since:
+                    continue
+                for key, counters in entries.items():
+                    name = key[position]
+                    group = groups.setdefault(name, _new_counters())
+                    for target in (group, totals):
+                        for field, value in counters.items():
+                            if field == "max_latency_s":
+                                target[field] = max(target[field], value)
+                            else:
+                                target[field] += value
+
+        def finish(counters: Dict[str, float]) -> Dict[str, Any]:
+            calls = counters["calls"]
+            return {
+                **{field: int(value) if field.endswith(("tokens", "calls", "errors", "retries")) else value
+                   for field, value in counters.items()},
+                "cost": round(counters["cost"], 6),
+                "latency_s": round(counters["latency_s"], 3),
+                "max_latency_s": round(counters["max_latency_s"], 3),
+                "avg_latency_s": round(counters["latency_s"] / calls, 3) if calls else 0.0,
+                "error_rate": round(counters["errors"] / calls, 4) if calls else 0.0,
+            }
+
+        return {
+            "window_seconds": window_seconds,
+            "group_by": group_by,
+            # finestra effettivamente coperta (il processo può essere partito dopo)
+            "covered_seconds": int(min(window_seconds, time.time() - self.started_at)),
+            "totals": finish(totals),
+            "groups": [
+                {group_by: name, **finish(counters)}
+                for name, counters in sorted(groups.items(), key=lambda item: -item[1]["cost"])
+            ],
+        }
+
+    def render_prometheus(self) -> Optional[Tuple[bytes, str]]:
+        """(payload, content type) per /metrics; None se prometheus_client non è installato"""
+        if self.prometheus is None:
+            return None
+        from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+        return generate_latest(), CONTENT_TYPE_LATEST
+
+
+_telemetry: Optional[LLMTelemetry] = None
+_telemetry_lock = threading.Lock()
+
+
+def get_llm_telemetry() -> LLMTelemetry:
+    """Telemetria LLM del processo"""
+    global _telemetry
+    if _telemetry is None:
+        with _telemetry_lock:
+            if _telemetry is None:
+                _telemetry = LLMTelemetry()
+    return _telemetry
@@ -0,0 +1,120 @@
+"""
+Streaming delle risposte chat - IntelligenceHUB
+Token OpenAI inoltrati al client come Server-Sent Events o NDJSON.
+
+Frame emessi (stesso schema per SSE e NDJSON):
+    {"type": "sources", "sources": [...], ...}   prima dei token, se presenti
+    {"type": "token", "content": "..."}          uno per delta del modello
+    {"type": "done", "usage": {...}, "cost": float, ...}
+    {"type": "error", "error": "..."}            in caso di errore a stream aperto
+"""
+import json
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from app.core.llm_gateway import get_llm_gateway
+from app.core.llm_pricing import cached_tokens, estimate_cost
+
+logger = logging.getLogger(__name__)
+
+SSE_MEDIA_TYPE = "text/event-stream"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def stream_format(request: Request, stream: Any = None) -> Optional[str]:
+    """
+    Formato di streaming richiesto dal client, None = risposta JSON classica.
+    Opt-in con `stream: true|"sse"|"ndjson"` nel body oppure header Accept.
+    """
+    if isinstance(stream, str) and stream.lower() in ("sse", "ndjson"):
+        return stream.lower()
+    accept = request.headers.get("accept", "")
+    if NDJSON_MEDIA_TYPE in accept:
+        return "ndjson"
+    if stream is True or SSE_MEDIA_TYPE in accept:
+        return "sse"
+    return None
+
+
+def encode_frame(frame: Dict[str, Any], fmt: str) -> str:
+    data = json.dumps(frame, ensure_ascii=False, default=str)
+    if fmt == "ndjson":
+        return data + "\n"
+    return f"event: {frame.get('type', 'message')}\ndata: {data}\n\n"
+
+
+async def stream_chat_completion(
+    route: str,
+    request: Optional[Request],
+    *,
+    model: str,
+    messages: List[Dict[str, str]],
+    sources: Optional[List[Any]] = None,
+    extra: Optional[Dict[str, Any]] = None,
+    **params,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Chat completion in streaming tramite il gateway LLM (`route`: limiti e statistiche).
+
+    Le sorgenti vengono emesse prima della chiamata al modello; il frame finale
+    contiene usage, costo stimato, testo completo e i campi di `extra`.
+    Se il client si disconnette lo stream OpenAI viene chiuso subito.
+    """
+    if sources is not None:
+        yield {"type": "sources", "sources": sources}
+
+    parts: List[str] = []
+    usage = None
+    async with aclosing(get_llm_gateway().stream_chat(route=route, model=model, messages=messages, **params)) as stream:
+        async for chunk in stream:
+            if request is not None and await request.is_disconnected():
+                logger.info("Client disconnected, aborting completion stream")
+                return
+            if chunk.usage:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                token = chunk.choices[0].delta.content
+                parts.append(token)
+                yield {"type": "token", "content": token}
+
+    prompt_tokens = usage.prompt_tokens if usage else 0
+    completion_tokens = usage.completion_tokens if usage else 0
+    yield {
+        "type": "done",
+        "response": "".join(parts),
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "cached_tokens": cached_tokens(usage),
+        },
+        "cost": estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens(usage)),
+        **(extra or {}),
+    }
+
+
+def streaming_response(frames: AsyncIterator[Dict[str, Any]], fmt: str) -> StreamingResponse:
+    """StreamingResponse SSE/NDJSON; gli errori a stream aperto diventano un frame 'error'"""
+
+    async def body():
+        try:
+            async for frame in frames:
+                yield encode_frame(frame, fmt)
+        except Exception as e:
+            logger.error(f"Streaming error: {e}")
+            yield encode_frame({"type": "error", "error": str(e)}, fmt)
+        finally:
+            # Disconnessione: chiude subito la generazione a monte
+            await frames.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type=SSE_MEDIA_TYPE if fmt == "sse" else NDJSON_MEDIA_TYPE,
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # nginx: niente buffering della risposta
+        },
+    )
@@ -24,6 +24,10 @@ from app.routes import wiki
 from app.routes import rag_routes
 from app.routes import intellivoice_record
 
+from app.core.clients import get_clients
+from app.core.llm_telemetry import set_llm_user
+from jose import jwt, JWTError
+
 # Database
 from app.database import create_tables
 # Rate limiting storage (in-memory, non invasivo)
@@ -37,9 +41,15 @@ async def lifespan(app: FastAPI):
     print("🚀 Starting Intelligence Platform API...")
     create_tables()
     print("✅ Database tables initialized")
+    await rag_routes.ingestion_jobs.start()
+    print("✅ RAG ingestion jobs started")
+    await get_clients().start()
     yield
     # Shutdown
     print("🛑 Shutting down Intelligence Platform API...")
+    await rag_routes.ingestion_jobs.stop()
+    rag_routes.hybrid_retriever.close()
+    await get_clients().stop()
 
 # FastAPI app
 app = FastAPI(
@@ -151,6 +161,20 @@ async def security_middleware(request: Request, call_next):
     response = await call_next(request)
     return response
 
+
+# Telemetria LLM: attribuisce le chiamate della richiesta all'utente del JWT (solo decodifica, nessuna query)
+@app.middleware("http")
+async def llm_user_middleware(request: Request, call_next):
+    user = None
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            user = jwt.decode(authorization[7:], auth.SECRET_KEY, algorithms=[auth.ALGORITHM]).get("sub")
+        except JWTError:
+            pass
+    set_llm_user(user)
+    return await call_next(request)
+
 # Include routers con prefix che match frontend
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["authentication"])
 app.include_router(ai_routes.router, prefix="/api/v1/ai", tags=["ai"])
@@ -331,6 +355,8 @@ app.include_router(workflow_management.router)
 
 from app.routes.admin import milestone_templates
 app.include_router(milestone_templates.router)
+from app.routes.admin import llm_usage
+app.include_router(llm_usage.router)
 app.include_router(wiki.router, prefix="/api/v1", tags=["wiki"])
 app.include_router(rag_routes.router, prefix="/api/v1", tags=["rag"])
 
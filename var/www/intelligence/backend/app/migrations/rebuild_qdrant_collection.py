@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Migration: ricostruzione di intelligence_knowledge con una nuova CollectionConfig
+(named vector per modello, quantizzazione scalar/binary, vettori e payload su disco,
+dimensioni ridotte)
+
+- copia di sicurezza in <collection>_backup_<timestamp> (vettori + payload);
+  eliminata al termine solo se nessun punto è stato saltato e senza --keep-backup;
+  gli id dei punti saltati sono scritti in <backup>_skipped_ids.txt
+- collection ricreata con la nuova configurazione e ripopolata dalla copia
+- ogni vettore nello slot del suo modello (payload embedding_model); dimensioni
+  ridotte: vettori text-embedding-3 troncati e rinormalizzati (nessuna chiamata
+  OpenAI); i vettori senza slot compatibile vengono saltati e vanno ri-vettorizzati
+- payload indexes ricreati, conteggi verificati
+- solo per la collection storica: dietro alias si usa il re-index blue/green
+  (app/scripts/reindex.py build --mode copy), senza downtime
+
+Uso:
+    python rebuild_qdrant_collection.py --quantization scalar [--dimensions 768]
+        [--on-disk-vectors] [--on-disk-payload] [--dry-run] [--keep-backup] [--batch-size 256]
+"""
+
+import argparse
+import sys
+import time
+sys.path.append('/var/www/intelligence/backend')
+
+from qdrant_client.models import PointStruct
+
+from app.core.clients import get_clients
+from app.modules.rag_engine.collection_config import (
+    QUANTIZATION_MODES, CollectionConfig, point_model, point_vectors
+)
+from app.modules.rag_engine.vector_service import COLLECTION_ALIAS, ensure_payload_indexes, resolve_collection
+
+COLLECTION_NAME = COLLECTION_ALIAS
+# Id dei punti saltati mostrati a video; l'elenco completo va in <backup>_skipped_ids.txt
+SKIPPED_IDS_PREVIEW = 20
+
+
+def copy_points(client, source: str, target: str, batch_size: int, config: CollectionConfig):
+    """Copia punti source → target nel layout di `config` (vettori ridotti se serve)"""
+    stats = {"read": 0, "written": 0, "skipped": 0, "skipped_ids": []}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        batch = []
+        for point in points:
+            stats["read"] += 1
+            payload = point.payload or {}
+            vector = config.point_vector(point_vectors(point.vector, payload))
+            if vector is None:
+                stats["skipped"] += 1
+                stats["skipped_ids"].append(point.id)
+                continue
+            payload = {**payload, "embedding_model": point_model(payload)}
+            batch.append(PointStruct(id=point.id, vector=vector, payload=payload))
+
+        if batch:
+            client.upsert(collection_name=target, points=batch, wait=True)
+            stats["written"] += len(batch)
+        print(f"✅ {source} → {target}: {stats['written']}/{stats['read']} punti")
+        if offset is None:
+            break
+    return stats
+
+
+def run_migration(config: CollectionConfig, dry_run: bool = False, keep_backup: bool = False, batch_size: int = 256):
+    client = get_clients().qdrant()
+    if resolve_collection(client, COLLECTION_NAME) != COLLECTION_NAME:
+        # Collection dietro alias: ricostruzione senza downtime con il re-index blue/green
+        print(f"❌ {COLLECTION_NAME} è un alias: usare app/scripts/reindex.py build --mode copy")
+        return False
+    info = client.get_collection(COLLECTION_NAME)
+    points = info.points_count or 0
+    old_config = CollectionConfig.from_collection_info(info)
+
+    diffs = config.differences(info)
+    print(f"📋 {COLLECTION_NAME}: {points} punti")
+    print(f"📋 Configurazione attuale: {old_config.describe()}")
+    print(f"📋 Nuova configurazione:   {config.describe()}")
+    for label, cfg in (("attuale", old_config), ("nuova", config)):
+        memory = cfg.estimate_memory(points)
+        print(f"📊 Memoria vettori {label}: RAM {memory['ram_bytes'] / 1024 ** 2:.1f} MB, "
+              f"disco {memory['disk_bytes'] / 1024 ** 2:.1f} MB")
+
+    if not diffs:
+        print("✅ Collection già conforme: nessuna ricostruzione necessaria")
+        return True
+    print(f"🔧 Modifiche: {'; '.join(diffs)}")
+
+    if dry_run:
+        print("🔎 Dry-run: nessuna modifica scritta")
+        print("🎉 Migration completed!")
+        return True
+
+    # 1. Copia di sicurezza con la configurazione attuale
+    backup_name = f"{COLLECTION_NAME}_backup_{int(time.time())}"
+    client.create_collection(collection_name=backup_name, **old_config.create_kwargs())
+    copied = copy_points(client, COLLECTION_NAME, backup_name, batch_size, old_config)
+    if client.count(collection_name=backup_name, exact=True).count != copied["written"]:
+        print(f"❌ Copia di sicurezza incompleta: {COLLECTION_NAME} non modificata ({backup_name} da verificare)")
+        return False
+
+    # 2. Collection ricreata e ripopolata
+    client.delete_collection(collection_name=COLLECTION_NAME)
+    client.create_collection(collection_name=COLLECTION_NAME, **config.create_kwargs())
+    restored = copy_points(client, backup_name, COLLECTION_NAME, batch_size, config)
+
+    created = ensure_payload_indexes(client, COLLECTION_NAME)
+    print(f"✅ Payload indexes: {', '.join(created) if created else 'già presenti'}")
+
+    count = client.count(collection_name=COLLECTION_NAME, exact=True).count
+    if count != restored["written"]:
+        print(f"❌ {count} punti in {COLLECTION_NAME}, attesi {restored['written']}: ripristinare da {backup_name}")
+        return False
+    if restored["skipped"]:
+        # La copia di sicurezza è l'unica che contiene ancora questi punti: mai eliminarla
+        print(f"⚠️ {restored['skipped']} punti senza vettore compatibile saltati: ri-vettorizzare "
+              f"(modelli {', '.join(config.models)})")
+        skipped_ids = [str(point_id) for point_id in restored["skipped_ids"]]
+        skipped_file = f"{backup_name}_skipped_ids.txt"
+        with open(skipped_file, "w") as f:
+            f.write("\n".join(skipped_ids) + "\n")
+        more = f" e altri {len(skipped_ids) - SKIPPED_IDS_PREVIEW}" if len(skipped_ids) > SKIPPED_IDS_PREVIEW else ""
+        print(f"⚠️ Punti saltati: {', '.join(skipped_ids[:SKIPPED_IDS_PREVIEW])}{more}")
+        print(f"📄 Elenco completo: {skipped_file}")
+        print(f"💾 Copia di sicurezza conservata: {backup_name} (unica copia dei punti saltati)")
+    elif keep_backup:
+        print(f"💾 Copia di sicurezza conservata: {backup_name}")
+    else:
+        client.delete_collection(collection_name=backup_name)
+        print(f"🗑️ Copia di sicurezza eliminata: {backup_name}")
+
+    print("🎉 Migration completed!")
+    return True
+
+
+if __name__ == "__main__":
+    defaults = CollectionConfig()
+    parser = argparse.ArgumentParser(description="Rebuild the Qdrant collection with quantization / on-disk / reduced dimensions")
+    parser.add_argument("--quantization", choices=QUANTIZATION_MODES, default=defaults.quantization)
+    parser.add_argument("--dimensions", type=int, default=defaults.dimensions)
+    parser.add_argument("--single-vector", action="store_true", help="Layout storico a vettore unico")
+    parser.add_argument("--on-disk-vectors", action="store_true", default=defaults.on_disk_vectors)
+    parser.add_argument("--on-disk-payload", action="store_true", default=defaults.on_disk_payload)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--keep-backup", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    target = CollectionConfig(
+        dimensions=args.dimensions,
+        named_vectors=not args.single_vector,
+        quantization=args.quantization,
+        on_disk_vectors=args.on_disk_vectors,
+        on_disk_payload=args.on_disk_payload,
+    )
+    success = run_migration(target, args.dry_run, args.keep_backup, args.batch_size)
+    sys.exit(0 if success else 1)
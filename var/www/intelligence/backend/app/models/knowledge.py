@@ -2,8 +2,15 @@ from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 #from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+import os
 import uuid
 
+# Colonna vector solo dopo app/migrations/add_pgvector_store.py (che indica di abilitarlo):
+# su un database non migrato embedding_vector è ancora JSON
+PGVECTOR_ENABLED = os.getenv("PGVECTOR_ENABLED", "false").lower() in ("1", "true", "yes")
+if PGVECTOR_ENABLED:
+    from pgvector.sqlalchemy import Vector
+
 from app.core.database import Base
 
 class KnowledgeDocument(Base):
@@ -34,7 +41,10 @@ class DocumentChunk(Base):
     content = Column(Text, nullable=False)
     page_number = Column(Integer, nullable=True)
     chunk_tokens = Column(Integer, nullable=True)
-    embedding_vector = Column(JSON, nullable=True)
+    # vector(EMBEDDING_DIMENSIONS) dopo app/migrations/add_pgvector_store.py + PGVECTOR_ENABLED=true
+    embedding_vector = Column(
+        Vector(int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))) if PGVECTOR_ENABLED else JSON, nullable=True
+    )
     created_at = Column(DateTime, default=func.now())
     
     # Relationship
@@ -1,19 +1,19 @@
 """
 IntelliChat Service - Core AI Chat Engine
 """
-from openai import AsyncOpenAI
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
 import json
 import logging
 from datetime import datetime
 from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.core.llm_gateway import get_llm_gateway
+from app.core.streaming import stream_chat_completion
 
 logger = logging.getLogger(__name__)
 
 class IntelliChatService:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = settings.OPENAI_MODEL
         
         self.system_prompt = """
@@ -44,7 +44,8 @@ class IntelliChatService:
             ]
             
             # Chiamata OpenAI
-            response = await self.client.chat.completions.create(
+            response = await get_llm_gateway().chat(
+                route="ai-chat",
                 model=self.model,
                 messages=messages,
                 max_tokens=2000,
@@ -72,5 +73,30 @@ class IntelliChatService:
                 "timestamp": datetime.utcnow().isoformat()
             }
 
+    async def stream_message(self,
+                             message: str,
+                             user_id: int,
+                             db: Session,
+                             company_id: Optional[int] = None,
+                             request=None) -> AsyncIterator[Dict[str, Any]]:
+        """Come process_message, ma emette i frame token per token (vedi app.core.streaming)"""
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": message}
+        ]
+        async for frame in stream_chat_completion(
+            "ai-chat",
+            request,
+            model=self.model,
+            messages=messages,
+            extra={
+                "conversation_id": f"conv_{user_id}_{int(datetime.utcnow().timestamp())}",
+                "timestamp": datetime.utcnow().isoformat()
+            },
+            max_tokens=2000,
+            temperature=0.7
+        ):
+            yield frame
+
 # Instance globale del servizio
 chat_service = IntelliChatService()
@@ -5,10 +5,9 @@ Core AI functionality for chat, task generation, and insights
 import json
 import os
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Union
+from typing import AsyncIterator, Dict, List, Optional, Any, Union
 from uuid import UUID, uuid4
 
-from openai import OpenAI
 from sqlalchemy.orm import Session
 from sqlalchemy import text, func
 
@@ -18,6 +17,14 @@ from app.models.company import Company
 from app.models.users import User
 from app.models.activity import Activity
 from app.modules.ticketing.services import TicketingService
+from app.core.llm_cache import cached_completion
+from app.core.llm_gateway import get_llm_gateway
+from app.core.llm_pricing import cached_tokens, estimate_cost
+from app.core.streaming import stream_chat_completion
+from .session_store import ConversationSession, get_session_store
+
+# The insights prompt embeds the KPI values, so unchanged KPIs reuse the cached answer
+INSIGHTS_CACHE_TTL = float(os.getenv("INTELLICHAT_INSIGHTS_CACHE_TTL", "900"))
 
 
 class IntelliChatService:
@@ -25,16 +32,16 @@ class IntelliChatService:
     
     def __init__(self, db: Session):
         self.db = db
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Calls go through the process-wide LLM gateway (shared pool, limits, deadlines)
         self.model = os.getenv("OPENAI_MODEL", "gpt-4-turbo")
         self.ticketing_service = TicketingService(db)
         
-        # Session context for conversation memory
-        self.session_context = {}
+        # Conversation memory shared across instances and workers (bounded, summarized)
+        self.sessions = get_session_store()
     
     # ===== CHAT FUNCTIONALITY =====
     
-    def process_chat_message(
+    async def process_chat_message(
         self, 
         session_id: Union[str, UUID], 
         message: str,
@@ -43,18 +50,15 @@ class IntelliChatService:
         """Process chat message with AI and return structured response"""
         
         # Get or create session context
-        session_key = str(session_id)
-        if session_key not in self.session_context:
-            self.session_context[session_key] = {"history": [], "last_df": None}
-        
-        session = self.session_context[session_key]
+        session = await self.sessions.get(str(session_id))
         
         # Build prompt with business context
-        full_prompt = self._build_business_prompt(message, context, session["history"])
+        full_prompt = self._build_business_prompt(message, context, session)
         
         try:
             # Call OpenAI API
-            response = self.client.chat.completions.create(
+            response = await get_llm_gateway().chat(
+                route="intellichat",
                 model=self.model,
                 messages=[
                     {"role": "system", "content": self._get_system_prompt()},
@@ -73,12 +77,8 @@ class IntelliChatService:
                 executed_actions = self._execute_ai_actions(parsed_response["actions"])
                 parsed_response["executed_actions"] = executed_actions
             
-            # Update session history
-            session["history"].append({
-                "question": message,
-                "answer": reply,
-                "timestamp": datetime.utcnow().isoformat()
-            })
+            # Update session history (older turns get summarized past the token budget)
+            await self.sessions.append_turn(session, message, reply)
             
             # Add usage information
             parsed_response["usage"] = {
@@ -96,6 +96,48 @@ class IntelliChatService:
                 "error_details": str(e)
             }
     
+    async def stream_chat_message(
+        self,
+        session_id: Union[str, UUID],
+        message: str,
+        context: Optional[Dict] = None,
+        request=None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of process_chat_message: yields token frames as they
+        arrive, then a final 'done' frame with parsed actions, usage and cost
+        """
+        session = await self.sessions.get(str(session_id))
+        full_prompt = self._build_business_prompt(message, context, session)
+        
+        async for frame in stream_chat_completion(
+            "intellichat",
+            request,
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self._get_system_prompt()},
+                {"role": "user", "content": full_prompt}
+            ],
+            temperature=0.2
+        ):
+            if frame["type"] != "done":
+                yield frame
+                continue
+            
+            reply = frame["response"].strip()
+            parsed_response = self._parse_ai_response(reply)
+            
+            if parsed_response.get("actions") and context and context.get("auto_execute"):
+                parsed_response["executed_actions"] = self._execute_ai_actions(parsed_response["actions"])
+            
+            await self.sessions.append_turn(session, message, reply)
+            
+            parsed_response["usage"] = {
+                "tokens": frame["usage"]["total_tokens"],
+                "cost": frame["cost"]
+            }
+            yield {**parsed_response, "type": "done"}
+    
     def _get_system_prompt(self) -> str:
         """Get the system prompt for AI context"""
         return """
@@ -131,16 +173,18 @@ Per task/ticket, includi sempre:
         self, 
         message: str, 
         context: Optional[Dict], 
-        history: List[Dict]
+        session: ConversationSession
     ) -> str:
         """Build comprehensive prompt with business context"""
         
         prompt_parts = []
         
-        # Add conversation history
-        if history:
+        # Add conversation history: running summary + recent raw turns (bounded by the store)
+        if session.summary:
+            prompt_parts.append(f"Riassunto della conversazione: {session.summary}")
+        if session.turns:
             prompt_parts.append("Conversazione precedente:")
-            for item in history[-3:]:  # Last 3 exchanges
+            for item in session.turns:
                 prompt_parts.append(f"Utente: {item['question']}")
                 prompt_parts.append(f"Assistente: {item['answer']}")
         
@@ -333,70 +377,6 @@ Per task/ticket, includi sempre:
                 "database_name": "error",
                 "last_update": datetime.utcnow().isoformat()
             }
-
-        """Generate AI-powered business insights"""
-        try:
-            # Get data for analysis
-            dashboard_data = self.get_kpi_dashboard()
-            
-            # Use AI to generate insights
-            insight_prompt = f"""
-Analizza questi dati aziendali e fornisci 3-5 insight utili:
-
-Dati KPI:
-- Task totali: {dashboard_data['total_tasks']}
-- Task completati: {dashboard_data['completed_tasks']}
-- Task aperti: {dashboard_data['open_tasks']}
-- Tasso completamento: {dashboard_data['completion_rate']}%
-- Ticket aperti: {dashboard_data['open_tickets']}
-- Utenti attivi: {dashboard_data['active_users']}
-- Aziende: {dashboard_data['companies_count']}
-
-Fornisci insights in formato JSON:
-{{
-  "insights": [
-    {{
-      "title": "Titolo insight",
-      "description": "Descrizione dettagliata",
-      "type": "positive|warning|neutral",
-      "priority": "high|medium|low",
-      "suggested_action": "Azione suggerita"
-    }}
-  ]
-}}
-"""
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Sei un consulente business che analizza KPI aziendali."},
-                    {"role": "user", "content": insight_prompt}
-                ],
-                temperature=0.3
-            )
-            
-            # Parse AI response
-            ai_response = response.choices[0].message.content.strip()
-            try:
-                insights_data = json.loads(ai_response)
-                return insights_data.get("insights", [])
-            except json.JSONDecodeError:
-                return [{
-                    "title": "Analisi AI",
-                    "description": ai_response,
-                    "type": "neutral",
-                    "priority": "medium",
-                    "suggested_action": "Continua il monitoraggio"
-                }]
-                
-        except Exception as e:
-            return [{
-                "title": "Errore Analisi",
-                "description": f"Impossibile generare insights: {str(e)}",
-                "type": "warning",
-                "priority": "low",
-                "suggested_action": "Verifica configurazione AI"
-            }]
     
     # ===== UTILITY METHODS =====
     
@@ -415,19 +395,14 @@ Fornisci insights in formato JSON:
         if not usage:
             return 0.0
         
-        # GPT-4 pricing (approximate)
-        cost_per_1k_tokens = 0.06 if "gpt-4" in self.model else 0.002
-        return (usage.total_tokens / 1000) * cost_per_1k_tokens
+        # Configurable pricing table (LLM_PRICING_FILE), cached prompt tokens at their own rate
+        return estimate_cost(self.model, usage.prompt_tokens, usage.completion_tokens, cached_tokens(usage))
     
-    def clear_session_context(self, session_id: Union[str, UUID]) -> bool:
+    async def clear_session_context(self, session_id: Union[str, UUID]) -> bool:
         """Clear session conversation history"""
-        session_key = str(session_id)
-        if session_key in self.session_context:
-            del self.session_context[session_key]
-            return True
-        return False
+        return await self.sessions.delete(str(session_id))
 
-    def generate_ai_insights(self, timeframe: str = "last_30_days") -> List[Dict]:
+    async def generate_ai_insights(self, timeframe: str = "last_30_days") -> List[Dict]:
         """Generate AI-powered business insights"""
         try:
             # Get data for analysis
@@ -460,7 +435,9 @@ Fornisci insights in formato JSON:
 }}
 """
             
-            response = self.client.chat.completions.create(
+            ai_response = await cached_completion(
+                route="intellichat-insights",
+                ttl=INSIGHTS_CACHE_TTL,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "Sei un consulente business che analizza KPI aziendali."},
@@ -470,7 +447,7 @@ Fornisci insights in formato JSON:
             )
             
             # Parse AI response
-            ai_response = response.choices[0].message.content.strip()
+            ai_response = ai_response.strip()
             try:
                 insights_data = json.loads(ai_response)
                 return insights_data.get("insights", [])
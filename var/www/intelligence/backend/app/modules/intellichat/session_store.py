@@ -0,0 +1,267 @@
+"""
+Intelligence AI Chat Module - Conversation Session Store
+Bounded, shared conversation memory for IntelliChat:
+
+- in-process LRU + TTL tier (INTELLICHAT_SESSION_MAX_SESSIONS, INTELLICHAT_SESSION_TTL_SECONDS)
+- optional Redis backend (INTELLICHAT_SESSION_REDIS_URL): the Redis copy is authoritative,
+  so a conversation continues on any uvicorn worker; the memory tier keeps serving
+  if Redis is unreachable
+- once summary + raw turns exceed INTELLICHAT_HISTORY_TOKENS, the oldest turns are
+  folded into a running summary by the LLM, so the prompt size stays roughly constant
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.llm_gateway import estimate_message_tokens, get_llm_gateway
+
+logger = logging.getLogger(__name__)
+
+REDIS_PREFIX = "intellichat:session:"
+
+SUMMARY_PROMPT = """Aggiorna il riassunto di una conversazione tra un utente e l'assistente aziendale.
+Mantieni fatti, decisioni, nomi di aziende, task e ticket citati, richieste ancora aperte.
+Scrivi in italiano, in forma compatta, al massimo {max_tokens} token.
+
+Riassunto attuale:
+{summary}
+
+Nuovi scambi da integrare:
+{turns}
+
+Riassunto aggiornato:"""
+
+
+@dataclass
+class ConversationSession:
+    """Running summary of older turns plus the most recent raw turns"""
+    session_id: str
+    summary: str = ""
+    turns: List[Dict[str, str]] = field(default_factory=list)
+    summarized_turns: int = 0
+    updated_at: float = field(default_factory=time.time)
+
+    def add_turn(self, question: str, answer: str):
+        self.turns.append({
+            "question": question,
+            "answer": answer,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        self.updated_at = time.time()
+
+    def history_tokens(self) -> int:
+        return estimate_message_tokens(
+            [{"content": self.summary}]
+            + [{"content": f"{t['question']}\n{t['answer']}"} for t in self.turns]
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ConversationSession":
+        return cls(**{key: data[key] for key in cls.__dataclass_fields__ if key in data})
+
+
+class SessionStore:
+    """
+    Conversation sessions keyed by session id
+
+    - `get` / `save` / `delete` are async (Redis round trip when configured)
+    - `append_turn` records a Q/A pair, compacts the history if needed and saves
+    - memory is bounded: at most `max_sessions` sessions, each with a history
+      capped at `history_tokens` (plus at most `max_turns` raw turns as a hard limit)
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = os.getenv("INTELLICHAT_SESSION_REDIS_URL") or None,
+        max_sessions: int = int(os.getenv("INTELLICHAT_SESSION_MAX_SESSIONS", "1000")),
+        ttl: float = float(os.getenv("INTELLICHAT_SESSION_TTL_SECONDS", "86400")),
+        history_tokens: int = int(os.getenv("INTELLICHAT_HISTORY_TOKENS", "1500")),
+        keep_turns: int = int(os.getenv("INTELLICHAT_HISTORY_KEEP_TURNS", "2")),
+        max_turns: int = int(os.getenv("INTELLICHAT_HISTORY_MAX_TURNS", "20")),
+        summary_model: str = os.getenv("INTELLICHAT_SUMMARY_MODEL", "gpt-4o-mini"),
+        summary_tokens: int = int(os.getenv("INTELLICHAT_SUMMARY_TOKENS", "300")),
+    ):
+        self.redis_url = redis_url
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self.history_tokens = history_tokens
+        self.keep_turns = max(0, keep_turns)
+        self.max_turns = max(self.keep_turns + 1, max_turns)
+        self.summary_model = summary_model
+        self.summary_tokens = summary_tokens
+
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+
+        self.stats = {
+            "memory_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "saves": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "summaries": 0,
+            "summary_errors": 0,
+            "redis_errors": 0,
+        }
+
+    # ===== TIERS =====
+
+    def _redis_client(self):
+        """Lazy redis.asyncio client; None when not configured or not installed"""
+        if self._redis is None and self.redis_url:
+            try:
+                import redis.asyncio as redis_asyncio
+                self._redis = redis_asyncio.from_url(self.redis_url, socket_timeout=1.0)
+            except Exception as e:
+                logger.warning(f"Session store: Redis not available ({e}), using memory only")
+                self.redis_url = None
+        return self._redis
+
+    def _memory_get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(session_id)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if time.time() >= expires_at:
+                del self._memory[session_id]
+                self.stats["expirations"] += 1
+                return None
+            self._memory.move_to_end(session_id)
+            return data
+
+    def _memory_put(self, session_id: str, data: Dict[str, Any]):
+        with self._lock:
+            self._memory[session_id] = (time.time() + self.ttl, data)
+            self._memory.move_to_end(session_id)
+            while len(self._memory) > self.max_sessions:
+                self._memory.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    # ===== SUMMARIZATION =====
+
+    async def _summarize(self, summary: str, turns: List[Dict[str, str]]) -> str:
+        formatted = "\n".join(f"Utente: {t['question']}\nAssistente: {t['answer']}" for t in turns)
+        response = await get_llm_gateway().chat(
+            route="intellichat-summary",
+            model=self.summary_model,
+            messages=[{"role": "user", "content": SUMMARY_PROMPT.format(
+                max_tokens=self.summary_tokens, summary=summary or "(nessuno)", turns=formatted
+            )}],
+            temperature=0,
+            max_tokens=self.summary_tokens
+        )
+        return response.choices[0].message.content.strip()
+
+    async def compact(self, session: ConversationSession) -> bool:
+        """Fold all but the last `keep_turns` turns into the summary once over budget"""
+        if session.history_tokens() <= self.history_tokens or len(session.turns) <= self.keep_turns:
+            return False
+        split = len(session.turns) - self.keep_turns
+        old_turns = session.turns[:split]
+        try:
+            session.summary = await self._summarize(session.summary, old_turns)
+        except Exception as e:
+            # Keep the raw turns; the hard cap below still bounds memory and prompt size
+            self.stats["summary_errors"] += 1
+            logger.warning(f"Session {session.session_id}: history summary failed: {e}")
+            if len(session.turns) > self.max_turns:
+                session.turns = session.turns[-self.max_turns:]
+            return False
+        session.turns = session.turns[split:]
+        session.summarized_turns += len(old_turns)
+        self.stats["summaries"] += 1
+        return True
+
+    # ===== API =====
+
+    async def get(self, session_id: str) -> ConversationSession:
+        """Existing session or a new empty one"""
+        client = self._redis_client()
+        if client is not None:
+            try:
+                raw = await client.get(REDIS_PREFIX + session_id)
+                if raw is not None:
+                    self.stats["redis_hits"] += 1
+                    data = json.loads(raw)
+                    self._memory_put(session_id, data)
+                    return ConversationSession.from_dict(data)
+            except Exception as e:
+                self.stats["redis_errors"] += 1
+                logger.warning(f"Session store: Redis read failed, using memory tier: {e}")
+            else:
+                # Redis is authoritative: a missing key means expired or deleted elsewhere
+                self.stats["misses"] += 1
+                return ConversationSession(session_id=session_id)
+
+        data = self._memory_get(session_id)
+        if data is not None:
+            self.stats["memory_hits"] += 1
+            return ConversationSession.from_dict(data)
+        self.stats["misses"] += 1
+        return ConversationSession(session_id=session_id)
+
+    async def save(self, session: ConversationSession):
+        data = session.to_dict()
+        self._memory_put(session.session_id, data)
+        self.stats["saves"] += 1
+        client = self._redis_client()
+        if client is None:
+            return
+        try:
+            await client.set(REDIS_PREFIX + session.session_id, json.dumps(data), ex=max(1, int(self.ttl)))
+        except Exception as e:
+            self.stats["redis_errors"] += 1
+            logger.warning(f"Session store: Redis write failed: {e}")
+
+    async def append_turn(self, session: ConversationSession, question: str, answer: str):
+        session.add_turn(question, answer)
+        await self.compact(session)
+        await self.save(session)
+
+    async def delete(self, session_id: str) -> bool:
+        with self._lock:
+            existed = self._memory.pop(session_id, None) is not None
+        client = self._redis_client()
+        if client is not None:
+            try:
+                existed = bool(await client.delete(REDIS_PREFIX + session_id)) or existed
+            except Exception as e:
+                self.stats["redis_errors"] += 1
+                logger.warning(f"Session store: Redis delete failed: {e}")
+        return existed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "memory_sessions": len(self._memory),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "history_tokens": self.history_tokens,
+            "redis": bool(self.redis_url),
+        }
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide session store shared by every IntelliChatService instance"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore()
+    return _store
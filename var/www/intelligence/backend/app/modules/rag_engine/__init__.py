@@ -3,12 +3,13 @@ RAG Engine Module for Intelligence Platform
 Enterprise Knowledge Management System
 """
 
-from .vector_service import VectorRAGService
+from .vector_service import VectorRAGService, get_vector_service
 from .document_processor import DocumentProcessor
 from .knowledge_manager import KnowledgeManager
 
 __all__ = [
     'VectorRAGService',
+    'get_vector_service',
     'DocumentProcessor', 
     'KnowledgeManager'
 ]
@@ -0,0 +1,215 @@
+"""
+Semantic Answer Cache per RAG Engine
+Riuso delle risposte LLM per domande quasi identiche: chiave = embedding della
+query (similarità coseno ≥ soglia) + insieme dei chunk recuperati invariato
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set
+
+import numpy as np
+
+from .embedding_cache import text_hash
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_keys(results: Iterable[Dict[str, Any]]) -> FrozenSet[str]:
+    """
+    Identità dei chunk usati come contesto: hash del contenuto, così un documento
+    re-ingerito con testo diverso (anche con gli stessi point id) non fa più match
+    """
+    return frozenset(text_hash(r.get("content", "")) for r in results)
+
+
+@dataclass
+class _Entry:
+    scope: str
+    vector: np.ndarray
+    chunks: FrozenSet[str]
+    document_ids: Set[str]
+    answer: Dict[str, Any]
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticAnswerCache:
+    """
+    Cache in memoria delle risposte RAG
+
+    - lookup per scope (endpoint + modello): coseno tra embedding della query ≥ `threshold`
+      e stesso insieme di chunk recuperati
+    - TTL (`ttl` secondi) e limite `max_entries` con eviction LRU
+    - invalidazione per document_id quando un documento usato viene re-ingerito o cancellato
+    """
+
+    def __init__(
+        self,
+        threshold: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+        ttl: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400")),
+        max_entries: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000")),
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_document: Dict[str, Set[int]] = {}
+        self._matrices: Dict[str, tuple] = {}  # scope -> (entry_ids, matrice normalizzata)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale_context": 0,  # query simile ma chunk recuperati diversi
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    # ===== INTERNAL =====
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        self._matrices.pop(entry.scope, None)
+        for document_id in entry.document_ids:
+            ids = self._by_document.get(document_id)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._by_document[document_id]
+
+    def _matrix(self, scope: str):
+        cached = self._matrices.get(scope)
+        if cached is None:
+            ids = [i for i, e in self._entries.items() if e.scope == scope]
+            matrix = np.stack([self._entries[i].vector for i in ids]) if ids else None
+            cached = self._matrices[scope] = (ids, matrix)
+        return cached
+
+    # ===== API =====
+
+    def lookup(
+        self,
+        scope: str,
+        query_vector: List[float],
+        chunks: FrozenSet[str],
+    ) -> Optional[Dict[str, Any]]:
+        """Risposta in cache o None"""
+        with self._lock:
+            ids, matrix = self._matrix(scope)
+            if matrix is None:
+                self.stats["misses"] += 1
+                return None
+
+            similarities = matrix @ self._normalize(query_vector)
+            now = time.time()
+            stale_context = False
+            for position in np.argsort(-similarities):
+                if similarities[position] < self.threshold:
+                    break
+                entry_id = ids[position]
+                entry = self._entries.get(entry_id)
+                if entry is None:
+                    continue
+                if now - entry.created_at > self.ttl:
+                    self._remove(entry_id)
+                    self.stats["expirations"] += 1
+                    continue
+                if entry.chunks != chunks:
+                    stale_context = True
+                    continue
+                self._entries.move_to_end(entry_id)
+                self.stats["hits"] += 1
+                return {**entry.answer, "cache_similarity": round(float(similarities[position]), 4)}
+
+            self.stats["misses"] += 1
+            if stale_context:
+                self.stats["stale_context"] += 1
+            return None
+
+    def store(
+        self,
+        scope: str,
+        query_vector: List[float],
+        chunks: FrozenSet[str],
+        document_ids: Iterable[Any],
+        answer: Dict[str, Any],
+    ):
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            entry = _Entry(
+                scope=scope,
+                vector=self._normalize(query_vector),
+                chunks=chunks,
+                document_ids={str(d) for d in document_ids if d is not None},
+                answer=answer,
+            )
+            self._entries[entry_id] = entry
+            self._matrices.pop(scope, None)
+            for document_id in entry.document_ids:
+                self._by_document.setdefault(document_id, set()).add(entry_id)
+            self.stats["stores"] += 1
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def invalidate_documents(self, document_ids: Iterable[Any]) -> int:
+        """Rimuove le risposte costruite sui documenti indicati; ritorna le voci rimosse"""
+        removed = 0
+        with self._lock:
+            for document_id in {str(d) for d in document_ids}:
+                for entry_id in list(self._by_document.get(document_id, ())):
+                    self._remove(entry_id)
+                    removed += 1
+            self.stats["invalidations"] += removed
+        if removed:
+            logger.info(f"Answer cache: invalidated {removed} entries")
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_document.clear()
+            self._matrices.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl,
+            "max_entries": self.max_entries,
+        }
+
+
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """Cache di processo; disabilitabile con ANSWER_CACHE_ENABLED=false"""
+    global _cache
+    if os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticAnswerCache()
+    return _cache
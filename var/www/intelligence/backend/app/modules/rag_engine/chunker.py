@@ -0,0 +1,286 @@
+"""
+Chunker per RAG Engine
+Unico chunking per tutti i percorsi di ingestion (upload, vectorize, wiki, scraping):
+confini di frase/riga/titolo, dimensione in token con limiti min/max e overlap
+a frasi intere, produzione lazy dei chunk (anche da testo in streaming).
+"""
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+# Unità minime: frase (punteggiatura finale + spazio) oppure riga; il testo
+# originale è preservato carattere per carattere (spazi e a capo inclusi)
+_UNIT_RE = re.compile(r'[^\n]*?[.!?…]+["\'»”)\]]*[ \t]+|[^\n]*\n+|[^\n]+')
+_HEADING_RE = re.compile(r'\s*#{1,6}\s')
+_WORD_CHAR_RE = re.compile(r'\w')
+
+# Streaming: oltre questa soglia senza a capo si taglia sull'ultimo spazio
+_MAX_PENDING_CHARS = 64 * 1024
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Tokenizer tiktoken (cl100k_base, come text-embedding-3-*), se disponibile"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Token del testo con tiktoken; senza tiktoken ≈4 caratteri per token arrotondato per
+    eccesso, così la somma dei token delle unità non sottostima mai quella del chunk
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return -(-len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@dataclass
+class Chunk:
+    text: str
+    tokens: int
+    start: int  # offset nel testo sorgente (span prima dello strip)
+    end: int
+
+
+@dataclass
+class _Unit:
+    text: str
+    tokens: int
+    start: int
+    heading: bool = False
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+
+def iter_units(text: str, offset: int = 0) -> Iterator[Tuple[str, int]]:
+    """(testo, offset) di frasi e righe, nell'ordine del testo"""
+    for match in _UNIT_RE.finditer(text):
+        if match.group():
+            yield match.group(), offset + match.start()
+
+
+class _Packer:
+    """Accumula unità fino a max_tokens; tiene l'ultimo chunk in attesa per fondere una coda corta"""
+
+    def __init__(self, chunker: "TextChunker"):
+        self.chunker = chunker
+        self.units: List[_Unit] = []
+        self.tokens = 0
+        self.new_start = 0  # indice della prima unità non in overlap
+        self.carried_tokens = 0  # token delle unità in overlap
+        self.pending: Optional[Chunk] = None
+        self.pending_trailing = ""
+
+    @property
+    def new_tokens(self) -> int:
+        return self.tokens - self.carried_tokens
+
+    def _make_chunk(self, units: List[_Unit]) -> Chunk:
+        return Chunk(
+            text="".join(u.text for u in units).strip(),
+            tokens=sum(u.tokens for u in units),
+            start=units[0].start,
+            end=units[-1].end,
+        )
+
+    def _flush(self, carry: bool) -> List[Chunk]:
+        out = [self.pending] if self.pending is not None and _WORD_CHAR_RE.search(self.pending.text) else []
+        self.pending = self._make_chunk(self.units)
+        last = self.units[-1].text
+        self.pending_trailing = last[len(last.rstrip()):]
+        kept: List[_Unit] = []
+        if carry and self.chunker.overlap_tokens > 0:
+            budget = self.chunker.overlap_tokens
+            for unit in reversed(self.units):
+                if unit.tokens > budget or unit.heading:
+                    break
+                kept.insert(0, unit)
+                budget -= unit.tokens
+        self.units = kept
+        self.tokens = self.carried_tokens = sum(u.tokens for u in kept)
+        self.new_start = len(kept)
+        return out
+
+    def add(self, unit: _Unit) -> List[Chunk]:
+        out: List[Chunk] = []
+        chunker = self.chunker
+
+        if unit.heading and self.new_tokens > 0 and self.new_tokens >= chunker.min_tokens:
+            # Nuova sezione: chunk nuovo, senza overlap dalla sezione precedente
+            # (solo se la sezione corrente ha contenuto proprio: anche con min_tokens=0)
+            out += self._flush(carry=False)
+
+        if self.tokens + unit.tokens > chunker.max_tokens:
+            if self.new_tokens > 0:
+                out += self._flush(carry=True)
+            # Overlap che non lascia spazio all'unità: si scarta
+            while self.new_start and self.tokens + unit.tokens > chunker.max_tokens:
+                dropped = self.units.pop(0).tokens
+                self.tokens -= dropped
+                self.carried_tokens -= dropped
+                self.new_start -= 1
+
+        self.units.append(unit)
+        self.tokens += unit.tokens
+        return out
+
+    def finish(self) -> List[Chunk]:
+        out: List[Chunk] = []
+        new_units = self.units[self.new_start:]
+        tail = self._make_chunk(self.units) if new_units else None
+
+        if tail is not None and self.pending is not None:
+            extra = self._make_chunk(new_units)
+            if extra.tokens < self.chunker.min_tokens and self.pending.tokens + extra.tokens <= self.chunker.max_tokens:
+                # Coda troppo corta: fusa nel chunk precedente (che contiene già l'overlap)
+                separator = "\n" if "\n" in self.pending_trailing else " "
+                self.pending = Chunk(
+                    text=self.pending.text + separator + extra.text,
+                    tokens=self.pending.tokens + extra.tokens,
+                    start=self.pending.start,
+                    end=extra.end,
+                )
+                tail = None
+
+        if self.pending is not None:
+            out.append(self.pending)
+        if tail is not None:
+            out.append(tail)
+
+        self.units = []
+        self.tokens = self.carried_tokens = 0
+        self.new_start = 0
+        self.pending = None
+        return [chunk for chunk in out if _WORD_CHAR_RE.search(chunk.text)]
+
+
+class TextChunker:
+    """
+    Chunking strutturale con budget di token
+
+    - confini: titoli markdown (nuova sezione = nuovo chunk), frasi, righe;
+      una frase/riga oltre `max_tokens` viene divisa su spazi
+    - `min_tokens`: code corte fuse nel chunk precedente, niente chunk quasi vuoti
+    - `overlap_tokens`: frasi intere finali ripetute all'inizio del chunk successivo
+    - configurabile con CHUNK_MAX_TOKENS / CHUNK_MIN_TOKENS / CHUNK_OVERLAP_TOKENS
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = int(os.getenv("CHUNK_MAX_TOKENS", "300")),
+        min_tokens: int = int(os.getenv("CHUNK_MIN_TOKENS", "40")),
+        overlap_tokens: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50")),
+    ):
+        self.max_tokens = max(1, max_tokens)
+        self.min_tokens = max(0, min(min_tokens, self.max_tokens))
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+
+    def _units(self, text: str, offset: int = 0) -> Iterator[_Unit]:
+        for unit_text, start in iter_units(text, offset):
+            tokens = count_tokens(unit_text)
+            heading = bool(_HEADING_RE.match(unit_text))
+            if tokens <= self.max_tokens:
+                yield _Unit(unit_text, tokens, start, heading)
+                continue
+            # Frase/riga troppo lunga: pezzi di dimensione proporzionale, tagliati su spazio
+            size = max(1, len(unit_text) * self.max_tokens // tokens)
+            position = 0
+            while position < len(unit_text):
+                end = min(len(unit_text), position + size)
+                if end < len(unit_text):
+                    space = unit_text.rfind(" ", position + size // 2, end)
+                    if space > position:
+                        end = space + 1
+                piece = unit_text[position:end]
+                piece_tokens = count_tokens(piece)
+                if piece_tokens > self.max_tokens and end - position > 1:
+                    size = max(1, size * self.max_tokens // piece_tokens)
+                    continue
+                yield _Unit(piece, piece_tokens, start + position, heading and position == 0)
+                position = end
+
+    def iter_chunks(self, text: str) -> Iterator[Chunk]:
+        """Chunk prodotti in modo lazy"""
+        packer = _Packer(self)
+        for unit in self._units(text):
+            yield from packer.add(unit)
+        yield from packer.finish()
+
+    def chunk(self, text: str) -> List[str]:
+        return [c.text for c in self.iter_chunks(text)]
+
+    def stream(self) -> "StreamingChunker":
+        return StreamingChunker(self)
+
+
+class StreamingChunker:
+    """
+    Chunking di un testo che arriva a segmenti (pagine, righe XLSX...):
+    `feed()` ritorna i chunk già completi, `flush()` quelli finali.
+    Stesso risultato di TextChunker.iter_chunks sul testo concatenato
+    (salvo righe senza a capo oltre 64KB, tagliate sull'ultimo spazio).
+    """
+
+    def __init__(self, chunker: Optional[TextChunker] = None):
+        self.chunker = chunker or get_chunker()
+        self._packer = _Packer(self.chunker)
+        self._buffer = ""
+        self._offset = 0
+
+    def _consume(self, text: str) -> List[Chunk]:
+        out: List[Chunk] = []
+        for unit in self.chunker._units(text, self._offset):
+            out += self._packer.add(unit)
+        self._offset += len(text)
+        return out
+
+    def feed(self, segment: str) -> List[Chunk]:
+        self._buffer += segment
+        # Le unità finiscono sempre a fine riga: si processa fino all'ultima riga completa
+        # (gli a capo finali restano nel buffer, il segmento dopo può continuarli)
+        cut = self._buffer.rstrip("\n").rfind("\n") + 1
+        if cut == 0 and len(self._buffer) > _MAX_PENDING_CHARS:
+            cut = self._buffer.rfind(" ") + 1 or len(self._buffer)
+        if cut == 0:
+            return []
+        ready, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return self._consume(ready)
+
+    def flush(self) -> List[Chunk]:
+        out = self._consume(self._buffer) if self._buffer else []
+        self._buffer = ""
+        return out + self._packer.finish()
+
+
+_chunker: Optional[TextChunker] = None
+
+
+def get_chunker() -> TextChunker:
+    """Chunker con la configurazione di default (variabili d'ambiente)"""
+    global _chunker
+    if _chunker is None:
+        _chunker = TextChunker()
+    return _chunker
+
+
+def chunk_text(text: str) -> List[str]:
+    """Chunk di un testo con il chunker di default"""
+    return get_chunker().chunk(text)
@@ -0,0 +1,253 @@
+"""
+Collection Config per RAG Engine
+Configurazione fisica della collection Qdrant: un named vector per modello di
+embedding (modello corrente + modelli legacy in migrazione), quantizzazione
+(scalar int8 / binary) con rescoring, vettori e payload su disco, dimensioni
+ridotte per text-embedding-3.
+La stessa configurazione serve a creare la collection, a cercare (search_params)
+e a stimare la memoria; app/scripts/reindex.py la applica a una nuova versione.
+"""
+import math
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from qdrant_client.models import (
+    BinaryQuantization, BinaryQuantizationConfig, Distance, QuantizationSearchParams,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, SearchParams, VectorParams
+)
+
+from .embedding_pipeline import DEFAULT_EMBEDDING_MODEL, MODEL_DIMENSIONS
+
+QUANTIZATION_MODES = ("none", "scalar", "binary")
+
+# Modello dei punti scritti prima che il payload registrasse embedding_model
+SOURCE_MODELS = {"web_scraping_v2": "text-embedding-ada-002"}
+
+# Stima grafo HNSW: m=16 link per nodo al livello 0 (×2) da 4 byte
+HNSW_BYTES_PER_POINT = 16 * 2 * 4
+
+
+def _env_bool(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def _env_models(name: str, default: str) -> Tuple[str, ...]:
+    return tuple(m.strip() for m in os.getenv(name, default).split(",") if m.strip())
+
+
+@dataclass
+class CollectionConfig:
+    """
+    - `model`: modello di embedding corrente (EMBEDDING_MODEL); con `named_vectors`
+      ogni punto registra i vettori per modello e `legacy_models` (EMBEDDING_LEGACY_MODELS)
+      restano interrogabili finché app/scripts/migrate_embeddings.py non li ha migrati
+    - `quantization`: none | scalar (int8, ~4× meno RAM) | binary (1 bit, ~32×, adatto
+      a vettori ≥1024 dimensioni); i vettori quantizzati restano sempre in RAM
+    - `rescore`: i candidati (limit × `oversampling`) vengono riordinati con i vettori originali
+    - `on_disk_vectors` / `on_disk_payload`: originali e payload (content, chunk_text) su disco
+    - `dimensions`: embedding text-embedding-3 ridotti (Matryoshka), es. 512 o 768
+    - default da QDRANT_QUANTIZATION, QDRANT_VECTORS_ON_DISK, QDRANT_PAYLOAD_ON_DISK,
+      QDRANT_QUANTIZATION_RESCORE, QDRANT_QUANTIZATION_OVERSAMPLING, EMBEDDING_DIMENSIONS
+    """
+    model: str = os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+    dimensions: int = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+    named_vectors: bool = _env_bool("QDRANT_NAMED_VECTORS", "true")
+    legacy_models: Tuple[str, ...] = _env_models("EMBEDDING_LEGACY_MODELS", "text-embedding-ada-002")
+    quantization: str = os.getenv("QDRANT_QUANTIZATION", "none")
+    on_disk_vectors: bool = _env_bool("QDRANT_VECTORS_ON_DISK")
+    on_disk_payload: bool = _env_bool("QDRANT_PAYLOAD_ON_DISK")
+    rescore: bool = _env_bool("QDRANT_QUANTIZATION_RESCORE", "true")
+    oversampling: float = float(os.getenv("QDRANT_QUANTIZATION_OVERSAMPLING", "2.0"))
+    scalar_quantile: float = 0.99
+
+    def __post_init__(self):
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Quantizzazione non supportata: {self.quantization} ({', '.join(QUANTIZATION_MODES)})")
+        if self.dimensions < 1:
+            raise ValueError(f"Dimensioni non valide: {self.dimensions}")
+        for model in (self.model, *self.legacy_models):
+            if model not in MODEL_DIMENSIONS:
+                raise ValueError(f"Modello di embedding sconosciuto: {model}")
+        self.legacy_models = tuple(m for m in dict.fromkeys(self.legacy_models) if m != self.model)
+
+    @property
+    def models(self) -> Tuple[str, ...]:
+        """Modelli con un vettore nella collection (il corrente per primo)"""
+        return (self.model, *self.legacy_models) if self.named_vectors else (self.model,)
+
+    def dimensions_for(self, model: str) -> int:
+        return self.dimensions if model == self.model else MODEL_DIMENSIONS[model]
+
+    def vector_name(self, model: Optional[str] = None) -> Optional[str]:
+        """Nome del vettore di `model` (None nel layout storico a vettore unico)"""
+        return (model or self.model) if self.named_vectors else None
+
+    @classmethod
+    def from_collection_info(cls, info, model: Optional[str] = None) -> "CollectionConfig":
+        """
+        Configurazione equivalente a una collection esistente (get_collection);
+        `model` è il modello corrente atteso (default EMBEDDING_MODEL)
+        """
+        params = info.config.params
+        model = model or cls.model
+        vectors = params.vectors
+        named = isinstance(vectors, dict)
+        if named:
+            if model not in vectors:
+                model = next(iter(vectors))
+            legacy_models = tuple(name for name in vectors if name != model)
+            vectors = vectors[model]
+        else:
+            legacy_models = ()
+        return cls(
+            model=model,
+            dimensions=vectors.size,
+            named_vectors=named,
+            legacy_models=legacy_models,
+            quantization=quantization_mode(getattr(info.config, "quantization_config", None)),
+            on_disk_vectors=bool(getattr(vectors, "on_disk", False)),
+            on_disk_payload=bool(getattr(params, "on_disk_payload", False)),
+        )
+
+    # ===== QDRANT =====
+
+    def vectors_config(self) -> Union[VectorParams, Dict[str, VectorParams]]:
+        if not self.named_vectors:
+            return VectorParams(size=self.dimensions, distance=Distance.COSINE, on_disk=self.on_disk_vectors)
+        return {
+            model: VectorParams(size=self.dimensions_for(model), distance=Distance.COSINE, on_disk=self.on_disk_vectors)
+            for model in self.models
+        }
+
+    def quantization_config(self):
+        if self.quantization == "scalar":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=self.scalar_quantile, always_ram=True
+            ))
+        if self.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def create_kwargs(self) -> Dict[str, Any]:
+        """Argomenti per QdrantClient.create_collection / recreate_collection"""
+        return {
+            "vectors_config": self.vectors_config(),
+            "quantization_config": self.quantization_config(),
+            "on_disk_payload": self.on_disk_payload,
+        }
+
+    def search_params(self) -> Optional[SearchParams]:
+        if self.quantization == "none":
+            return None
+        return SearchParams(quantization=QuantizationSearchParams(
+            ignore=False, rescore=self.rescore, oversampling=self.oversampling
+        ))
+
+    # ===== CONFRONTO / STIME =====
+
+    def differences(self, info) -> List[str]:
+        """Differenze tra la collection esistente (get_collection) e questa configurazione"""
+        current = CollectionConfig.from_collection_info(info, self.model)
+        diffs = []
+        for name in ("named_vectors", "model", "dimensions", "quantization", "on_disk_vectors", "on_disk_payload"):
+            if getattr(current, name) != getattr(self, name):
+                diffs.append(f"{name} {getattr(current, name)} → {getattr(self, name)}")
+        if self.named_vectors and current.named_vectors and set(current.legacy_models) != set(self.legacy_models):
+            diffs.append(f"legacy_models {list(current.legacy_models)} → {list(self.legacy_models)}")
+        return diffs
+
+    def point_vector(self, vectors: Dict[str, List[float]]):
+        """
+        Vettori di un punto ({modello: vettore}, vedi point_vectors) nel layout di questa
+        collection, ridotti se serve; None se nessun vettore è compatibile
+        """
+        if self.named_vectors:
+            fitted = {}
+            for model, vector in vectors.items():
+                if model in self.models:
+                    vector = fit_vector(vector, self.dimensions_for(model), model)
+                    if vector is not None:
+                        fitted[model] = vector
+            return fitted or None
+        if self.model in vectors:
+            return fit_vector(vectors[self.model], self.dimensions, self.model)
+        if len(vectors) == 1:
+            model, vector = next(iter(vectors.items()))
+            return fit_vector(vector, self.dimensions, model)
+        return None
+
+    def query_vector(self, vectors: Dict[str, List[float]]):
+        """Argomento query_vector per cercare con i vettori di un punto (modello corrente se presente)"""
+        if not vectors:
+            return None
+        model = self.model if self.model in vectors else next(iter(vectors))
+        return (model, vectors[model]) if self.named_vectors else vectors[model]
+
+    def estimate_memory(self, points: int) -> Dict[str, int]:
+        """
+        Byte stimati dei vettori (RAM / disco) per `points` punti, payload esclusi;
+        solo il vettore del modello corrente (i legacy si svuotano con la migrazione)
+        """
+        full = points * self.dimensions * 4
+        quantized = {
+            "none": 0,
+            "scalar": points * self.dimensions,
+            "binary": points * math.ceil(self.dimensions / 8),
+        }[self.quantization]
+        return {
+            "ram_bytes": (0 if self.on_disk_vectors else full) + quantized + points * HNSW_BYTES_PER_POINT,
+            "disk_bytes": full if self.on_disk_vectors else 0,
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def quantization_mode(quantization_config) -> str:
+    """'none' | 'scalar' | 'binary' da una quantization_config Qdrant"""
+    if quantization_config is None:
+        return "none"
+    if getattr(quantization_config, "scalar", None) is not None:
+        return "scalar"
+    if getattr(quantization_config, "binary", None) is not None:
+        return "binary"
+    return "none"
+
+
+def truncate_vector(vector: List[float], dimensions: int) -> List[float]:
+    """
+    Embedding text-embedding-3 ridotto senza ricalcolo: primi `dimensions` valori
+    rinormalizzati (equivalente al parametro `dimensions` dell'API)
+    """
+    head = vector[:dimensions]
+    norm = math.sqrt(sum(v * v for v in head)) or 1.0
+    return [v / norm for v in head]
+
+
+def fit_vector(vector: List[float], dimensions: int, model: str) -> Optional[List[float]]:
+    """
+    Vettore adattato a `dimensions` per copiarlo in un'altra collection;
+    None se non riducibile (modello non text-embedding-3 o vettore più corto)
+    """
+    if len(vector) == dimensions:
+        return vector
+    if not model.startswith("text-embedding-3") or len(vector) < dimensions:
+        return None
+    return truncate_vector(vector, dimensions)
+
+
+def point_model(payload: Dict[str, Any]) -> str:
+    """Modello che ha prodotto il vettore principale del punto"""
+    return (
+        payload.get("embedding_model")
+        or SOURCE_MODELS.get(payload.get("source"))
+        or DEFAULT_EMBEDDING_MODEL
+    )
+
+
+def point_vectors(vector, payload: Optional[Dict[str, Any]]) -> Dict[str, List[float]]:
+    """{modello: vettore} di un punto letto con with_vectors (layout named o storico)"""
+    if isinstance(vector, dict):
+        return dict(vector)
+    return {point_model(payload or {}): vector} if vector is not None else {}
@@ -0,0 +1,354 @@
+"""
+Context Packer per RAG Engine
+Assemblaggio del contesto per il prompt: chunk quasi identici eliminati (MinHash),
+righe di boilerplate già presenti (header/footer delle pagine scrappate) tolte,
+chunk adiacenti dello stesso documento uniti senza overlap, blocchi ordinati per
+score e impacchettati entro il budget di token del modello (tokenizer tiktoken)
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .chunker import count_tokens
+from .embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Encoding tiktoken per famiglia di modelli (prefisso più lungo vince)
+MODEL_ENCODINGS = {
+    "gpt-4o": "o200k_base",
+    "o1": "o200k_base",
+    "o3": "o200k_base",
+    "gpt-4": "cl100k_base",
+    "gpt-3.5": "cl100k_base",
+    "text-embedding-3": "cl100k_base",
+}
+
+# Token di contesto per modello; RAG_CHAT_CONTEXT_TOKENS li sovrascrive tutti
+MODEL_CONTEXT_BUDGETS = {
+    "gpt-4o": 6000,
+    "gpt-4-turbo": 6000,
+    "gpt-4": 3000,
+    "gpt-3.5-turbo": 2500,
+}
+DEFAULT_CONTEXT_BUDGET = 6000
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_END_RE = re.compile(r"[.!?…\n][\"'»”)\]]*\s")
+
+# Un blocco che non entra viene troncato solo se resta almeno questo spazio
+MIN_PARTIAL_TOKENS = 64
+# Righe più corte (titoli, "Home", date) non sono considerate boilerplate
+MIN_BOILERPLATE_CHARS = 30
+# MinHash: coefficienti fissi, le firme sono confrontabili tra richieste
+MINHASH_PERMUTATIONS = 128
+_minhash_rng = np.random.default_rng(0x5EED)
+_MINHASH_A = _minhash_rng.integers(1, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_MINHASH_B = _minhash_rng.integers(0, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+# Overlap massimo cercato tra chunk adiacenti (il chunker sovrappone frasi intere)
+MAX_OVERLAP_CHARS = 4000
+MIN_OVERLAP_CHARS = 16
+
+
+def _prefix_match(model: str, table: Dict[str, Any]):
+    matches = [prefix for prefix in table if model.startswith(prefix)]
+    return table[max(matches, key=len)] if matches else None
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    """Encoding tiktoken del modello; None senza tiktoken o encoding sconosciuto"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    for name in (_prefix_match(model, MODEL_ENCODINGS), "cl100k_base"):
+        if name:
+            try:
+                return tiktoken.get_encoding(name)
+            except Exception:
+                continue
+    return None
+
+
+def model_tokens(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return count_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, tokens: int, model: str) -> str:
+    """Primi `tokens` token del testo, tagliati all'ultima fine frase se possibile"""
+    encoding = _encoding(model)
+    if encoding is None:
+        head = text[:tokens * 4]
+    else:
+        head = encoding.decode(encoding.encode(text, disallowed_special=())[:tokens])
+    ends = [m.end() for m in _SENTENCE_END_RE.finditer(head)]
+    if ends and ends[-1] > len(head) // 2:
+        head = head[:ends[-1]]
+    return head.rstrip()
+
+
+def context_budget(model: str) -> int:
+    configured = os.getenv("RAG_CHAT_CONTEXT_TOKENS")
+    if configured:
+        return int(configured)
+    return _prefix_match(model, MODEL_CONTEXT_BUDGETS) or DEFAULT_CONTEXT_BUDGET
+
+
+def shingles(text: str, size: int = 3) -> np.ndarray:
+    """Hash a 64 bit degli shingle di parole del testo normalizzato"""
+    words = _WORD_RE.findall(normalize_text(text).lower())
+    size = min(size, len(words))
+    features = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)} if words else set()
+    digests = b"".join(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest() for f in features)
+    return np.frombuffer(digests, dtype=np.uint64)
+
+
+def minhash(text: str) -> np.ndarray:
+    """Firma MinHash (MINHASH_PERMUTATIONS hash multiply-add modulo 2^64)"""
+    features = shingles(text)
+    if not len(features):
+        return np.zeros(MINHASH_PERMUTATIONS, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        return (_MINHASH_A[:, None] * features[None, :] + _MINHASH_B[:, None]).min(axis=1)
+
+
+def jaccard_estimate(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+def merge_overlap(first: str, second: str) -> str:
+    """Concatena due chunk consecutivi togliendo il testo che il secondo ripete del primo"""
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) == MIN_OVERLAP_CHARS:
+        start = max(0, len(first) - MAX_OVERLAP_CHARS)
+        position = first.find(probe, start)
+        while position != -1:
+            if second.startswith(first[position:]):
+                return first[:position] + second
+            position = first.find(probe, position + 1)
+    return first.rstrip() + "\n" + second.lstrip()
+
+
+def result_score(result: Dict[str, Any]) -> float:
+    return float(result.get("rrf_score", result.get("score", 0.0)) or 0.0)
+
+
+def render_block(filename: str, content: str) -> str:
+    return f"Documento: {filename}\nContenuto: {content}"
+
+
+@dataclass
+class _Block:
+    filename: str
+    key: Optional[str]
+    score: float
+    chunks: List[Dict[str, Any]]
+    text: str
+
+    @property
+    def last_index(self) -> Optional[int]:
+        return self.chunks[-1].get("chunk_index")
+
+
+@dataclass
+class PackedContext:
+    context: str
+    sources: List[str]
+    results: List[Dict[str, Any]]  # chunk finiti (anche in parte) nel contesto
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+
+class ContextPacker:
+    """
+    Contesto dei prompt RAG entro un budget di token
+
+    - dedup: testo normalizzato identico o Jaccard stimato (MinHash sugli shingle di 3
+      parole) ≥ `similarity`; si tiene il chunk con score più alto
+    - righe di boilerplate (≥ MIN_BOILERPLATE_CHARS caratteri) già presenti nel contesto tolte
+    - chunk consecutivi (chunk_index) dello stesso documento uniti in un blocco
+    - blocchi in ordine di score, aggiunti finché c'è budget; l'ultimo eventualmente troncato
+    - stats per richiesta (token del contesto verbatim vs impacchettato) e cumulative
+    """
+
+    def __init__(self, similarity: float = float(os.getenv("RAG_CONTEXT_DEDUP_SIMILARITY", "0.8"))):
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "chunks_in": 0,
+            "duplicates": 0,
+            "merged": 0,
+            "dropped": 0,
+            "tokens_in": 0,
+            "tokens_out": 0,
+            "tokens_saved": 0,
+        }
+
+    # ===== INTERNAL =====
+
+    def _dedupe(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        kept, exact, signatures = [], set(), []
+        for result in results:
+            normalized = normalize_text(result.get("content", ""))
+            if not normalized or normalized in exact:
+                continue
+            signature = minhash(normalized)
+            if any(jaccard_estimate(signature, other) >= self.similarity for other in signatures):
+                continue
+            exact.add(normalized)
+            signatures.append(signature)
+            kept.append(result)
+        return kept
+
+    @staticmethod
+    def _blocks(results: List[Dict[str, Any]]) -> List[_Block]:
+        """Chunk adiacenti dello stesso documento in un blocco, in ordine di chunk_index"""
+        def document_key(result):
+            key = result.get("document_id") or result.get("filename")
+            return str(key) if key is not None and result.get("chunk_index") is not None else None
+
+        ordered = sorted(
+            results,
+            key=lambda r: (document_key(r) is None, document_key(r) or "", r.get("chunk_index") or 0)
+        )
+        blocks: List[_Block] = []
+        for result in ordered:
+            key = document_key(result)
+            previous = blocks[-1] if blocks else None
+            if key is not None and previous is not None and previous.key == key \
+                    and result["chunk_index"] == previous.last_index + 1:
+                previous.text = merge_overlap(previous.text, result.get("content", ""))
+                previous.chunks.append(result)
+                previous.score = max(previous.score, result_score(result))
+                continue
+            blocks.append(_Block(
+                filename=result.get("filename", "unknown"),
+                key=key,
+                score=result_score(result),
+                chunks=[result],
+                text=result.get("content", "")
+            ))
+        return sorted(blocks, key=lambda b: b.score, reverse=True)
+
+    @staticmethod
+    def _line_keys(text: str) -> set:
+        """Righe abbastanza lunghe da contare come header/footer ripetuti, normalizzate"""
+        return {
+            normalize_text(line.strip()) for line in text.splitlines()
+            if len(line.strip()) >= MIN_BOILERPLATE_CHARS
+        }
+
+    @staticmethod
+    def _strip_boilerplate(text: str, seen_lines: set) -> Tuple[str, int]:
+        """
+        Righe già presenti nel contesto (o ripetute nel blocco) rimosse; `seen_lines`
+        non viene modificato: si aggiorna solo con i blocchi effettivamente inseriti
+        """
+        lines, removed, block_lines = [], 0, set()
+        for line in text.splitlines():
+            stripped = line.strip()
+            if len(stripped) >= MIN_BOILERPLATE_CHARS:
+                normalized = normalize_text(stripped)
+                if normalized in seen_lines or normalized in block_lines:
+                    removed += 1
+                    continue
+                block_lines.add(normalized)
+            lines.append(line)
+        return "\n".join(lines).strip(), removed
+
+    # ===== API =====
+
+    def pack(self, results: List[Dict[str, Any]], model: str, token_budget: Optional[int] = None) -> PackedContext:
+        """Contesto per `model` dai risultati del retrieval (schema di search_similar_chunks)"""
+        budget = token_budget if token_budget is not None else context_budget(model)
+        results = [r for r in results if (r.get("content") or "").strip()]
+        # Costo di riferimento: i chunk concatenati verbatim come prima del packer
+        tokens_in = model_tokens(
+            "\n\n".join(render_block(r.get("filename", "unknown"), r["content"]) for r in results), model
+        ) if results else 0
+
+        unique = self._dedupe(sorted(results, key=result_score, reverse=True))
+        blocks = self._blocks(unique)
+
+        parts, used_chunks, sources, seen_lines = [], [], [], set()
+        used, boilerplate, dropped, truncated = 0, 0, 0, False
+        separator = model_tokens("\n\n", model)
+        for block in blocks:
+            text, removed = self._strip_boilerplate(block.text, seen_lines)
+            if not text:
+                boilerplate += removed
+                dropped += len(block.chunks)
+                continue
+            rendered = render_block(block.filename, text)
+            tokens = model_tokens(rendered, model) + (separator if parts else 0)
+            if used + tokens > budget:
+                remaining = budget - used - (separator if parts else 0) - model_tokens(render_block(block.filename, ""), model)
+                if remaining < MIN_PARTIAL_TOKENS:
+                    dropped += len(block.chunks)
+                    continue
+                text = truncate_tokens(text, remaining, model)
+                rendered = render_block(block.filename, text)
+                tokens = model_tokens(rendered, model) + (separator if parts else 0)
+                truncated = True
+            boilerplate += removed
+            parts.append(rendered)
+            # Solo le righe finite nel contesto contano come già viste
+            seen_lines |= self._line_keys(text)
+            used_chunks.extend(block.chunks)
+            if block.filename not in sources:
+                sources.append(block.filename)
+            used += tokens
+
+        context = "\n\n".join(parts)
+        tokens_out = model_tokens(context, model) if parts else 0
+        stats = {
+            "model": model,
+            "token_budget": budget,
+            "chunks_in": len(results),
+            "duplicates": len(results) - len(unique),
+            "merged": len(unique) - len(blocks),
+            "boilerplate_lines": boilerplate,
+            "dropped": dropped,
+            "truncated": truncated,
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_saved": max(0, tokens_in - tokens_out),
+        }
+        with self._lock:
+            self.stats["requests"] += 1
+            for key in ("chunks_in", "duplicates", "merged", "dropped", "tokens_in", "tokens_out", "tokens_saved"):
+                self.stats[key] += stats[key]
+        logger.info(
+            f"Context {model}: {tokens_out}/{tokens_in} token ({stats['tokens_saved']} risparmiati, "
+            f"{stats['duplicates']} duplicati, {stats['merged']} uniti, {dropped} fuori budget)"
+        )
+        return PackedContext(context=context, sources=sources, results=used_chunks, stats=stats)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["saved_ratio"] = round(stats["tokens_saved"] / stats["tokens_in"], 4) if stats["tokens_in"] else 0.0
+        return stats
+
+
+_packer: Optional[ContextPacker] = None
+_packer_lock = threading.Lock()
+
+
+def get_context_packer() -> ContextPacker:
+    global _packer
+    with _packer_lock:
+        if _packer is None:
+            _packer = ContextPacker()
+    return _packer
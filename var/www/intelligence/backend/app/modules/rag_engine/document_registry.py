@@ -0,0 +1,288 @@
+"""
+Document Registry per RAG Engine
+Registro PostgreSQL dei documenti caricati (id, sha256, path, size, mime, company_id,
+point id, stato) e store content-addressed dei file: elenco, lookup e cancellazione
+per indice invece di glob + stat di UPLOAD_DIR
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = "/var/www/intelligence/backend/uploads/store"
+STREAM_BLOCK_SIZE = 1024 * 1024
+
+# stored → indexing → indexed | failed
+STATUSES = ('stored', 'indexing', 'indexed', 'failed')
+
+SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS rag_documents (
+        id VARCHAR(255) PRIMARY KEY,
+        sha256 CHAR(64) NOT NULL,
+        path TEXT NOT NULL,
+        filename VARCHAR(500) NOT NULL,
+        size BIGINT NOT NULL,
+        mime VARCHAR(255),
+        company_id INTEGER,
+        description TEXT,
+        status VARCHAR(20) NOT NULL DEFAULT 'stored',
+        chunks INTEGER NOT NULL DEFAULT 0,
+        point_ids JSONB NOT NULL DEFAULT '[]',
+        error TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_rag_documents_sha256 ON rag_documents(sha256, company_id)",
+    "CREATE INDEX IF NOT EXISTS idx_rag_documents_company ON rag_documents(company_id, created_at DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_rag_documents_filename ON rag_documents(filename)",
+    "CREATE INDEX IF NOT EXISTS idx_rag_documents_path ON rag_documents(path)",
+    "CREATE INDEX IF NOT EXISTS idx_rag_documents_status ON rag_documents(status)",
+]
+
+DOCUMENT_COLUMNS = (
+    "id, sha256, path, filename, size, mime, company_id, description, status, chunks, "
+    "error, created_at, updated_at"
+)
+
+
+class DocumentRegistry:
+    """
+    Registro dei documenti caricati
+
+    - file salvati per contenuto (<store>/<sha256[:2]>/<sha256><ext>) mentre vengono
+      ricevuti e hashati: contenuti identici occupano un solo file
+    - stesso contenuto per la stessa azienda: l'upload restituisce il documento esistente
+    - point id Qdrant e stato di indicizzazione aggiornati dai job di ingestion
+    - i file caricati prima del registro vengono registrati sul posto
+      (app/migrations/add_document_registry.py)
+    """
+
+    def __init__(self, db_connect: Callable[[], Any], store_dir: Optional[str] = None):
+        self.db_connect = db_connect
+        self.store_dir = Path(store_dir or os.getenv("RAG_DOCUMENT_STORE", DEFAULT_STORE_DIR))
+        self._schema_ready = False
+
+    # ===== STORAGE =====
+
+    def _query(self, sql: str, params=(), fetch: bool = True) -> List[tuple]:
+        conn = self.db_connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            rows = cur.fetchall() if fetch and cur.description else []
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    def _ensure_schema(self):
+        if self._schema_ready:
+            return
+        conn = self.db_connect()
+        try:
+            cur = conn.cursor()
+            for statement in SCHEMA_SQL:
+                cur.execute(statement)
+            conn.commit()
+            self._schema_ready = True
+        finally:
+            conn.close()
+
+    def _execute(self, sql: str, params=(), fetch: bool = True) -> List[tuple]:
+        self._ensure_schema()
+        return self._query(sql, params, fetch)
+
+    @staticmethod
+    def _row_to_document(row: tuple) -> Dict[str, Any]:
+        document = dict(zip([c.strip() for c in DOCUMENT_COLUMNS.split(",")], row))
+        for key in ('created_at', 'updated_at'):
+            if document[key] is not None:
+                document[key] = document[key].isoformat()
+        document['format'] = Path(document['path']).suffix.lower()
+        return document
+
+    def blob_path(self, sha256: str, suffix: str) -> Path:
+        """Percorso content-addressed; l'estensione resta per il parser"""
+        return self.store_dir / sha256[:2] / f"{sha256}{suffix.lower()}"
+
+    async def store_upload(self, upload, suffix: str) -> Tuple[str, int, Path]:
+        """
+        Salva un UploadFile nello store calcolando sha256 durante la lettura a blocchi;
+        ritorna (sha256, size, path). Un contenuto già presente non viene riscritto.
+        """
+        tmp_dir = self.store_dir / "tmp"
+        await asyncio.to_thread(tmp_dir.mkdir, parents=True, exist_ok=True)
+        tmp_path = tmp_dir / uuid.uuid4().hex
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as buffer:
+                while True:
+                    block = await upload.read(STREAM_BLOCK_SIZE)
+                    if not block:
+                        break
+                    digest.update(block)
+                    size += len(block)
+                    await asyncio.to_thread(buffer.write, block)
+            sha256 = digest.hexdigest()
+            path = self.blob_path(sha256, suffix)
+            if path.exists():
+                tmp_path.unlink()
+            else:
+                await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+                os.replace(tmp_path, path)
+            return sha256, size, path
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    # ===== API =====
+
+    async def register(
+        self,
+        document_id: str,
+        sha256: str,
+        path: Path,
+        filename: str,
+        size: int,
+        mime: Optional[str] = None,
+        company_id: Optional[int] = None,
+        description: Optional[str] = None,
+        status: str = 'stored',
+        point_ids: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        mime = mime or mimetypes.guess_type(filename)[0]
+        point_ids = point_ids or []
+        rows = await asyncio.to_thread(
+            self._execute,
+            f"INSERT INTO rag_documents (id, sha256, path, filename, size, mime, company_id, description, "
+            f"status, chunks, point_ids) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb) "
+            f"RETURNING {DOCUMENT_COLUMNS}",
+            (document_id, sha256, str(path), filename, size, mime, company_id, description,
+             status, len(point_ids), json.dumps(point_ids))
+        )
+        return self._row_to_document(rows[0])
+
+    async def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        rows = await asyncio.to_thread(
+            self._execute,
+            f"SELECT {DOCUMENT_COLUMNS} FROM rag_documents WHERE id = %s",
+            (document_id,)
+        )
+        return self._row_to_document(rows[0]) if rows else None
+
+    async def resolve(self, key: str) -> Optional[Dict[str, Any]]:
+        """Documento per id o, in mancanza, per filename (il più recente)"""
+        document = await self.get(key)
+        if document is not None:
+            return document
+        rows = await asyncio.to_thread(
+            self._execute,
+            f"SELECT {DOCUMENT_COLUMNS} FROM rag_documents WHERE filename = %s ORDER BY created_at DESC LIMIT 1",
+            (key,)
+        )
+        return self._row_to_document(rows[0]) if rows else None
+
+    async def find_duplicate(self, sha256: str, company_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Documento con lo stesso contenuto per la stessa azienda (esclusi i falliti)"""
+        rows = await asyncio.to_thread(
+            self._execute,
+            f"SELECT {DOCUMENT_COLUMNS} FROM rag_documents "
+            f"WHERE sha256 = %s AND company_id IS NOT DISTINCT FROM %s AND status <> 'failed' "
+            f"ORDER BY created_at LIMIT 1",
+            (sha256, company_id)
+        )
+        return self._row_to_document(rows[0]) if rows else None
+
+    async def list_documents(
+        self,
+        company_id: Optional[int] = None,
+        status: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Pagina di documenti (più recenti per primi) e totale"""
+        conditions, params = [], []
+        if company_id is not None:
+            conditions.append("company_id = %s")
+            params.append(company_id)
+        if status:
+            conditions.append("status = %s")
+            params.append(status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = await asyncio.to_thread(
+            self._execute,
+            f"SELECT {DOCUMENT_COLUMNS}, COUNT(*) OVER () FROM rag_documents {where} "
+            f"ORDER BY created_at DESC LIMIT %s OFFSET %s",
+            (*params, limit, offset)
+        )
+        total = rows[0][-1] if rows else 0
+        return [self._row_to_document(row[:-1]) for row in rows], total
+
+    def all_documents(self) -> List[Dict[str, Any]]:
+        """Tutti i documenti (CLI vectorize / re-index)"""
+        rows = self._execute(f"SELECT {DOCUMENT_COLUMNS} FROM rag_documents ORDER BY created_at")
+        return [self._row_to_document(row) for row in rows]
+
+    async def mark(
+        self,
+        document_id: str,
+        status: str,
+        point_ids: Optional[List[str]] = None,
+        error: Optional[str] = None,
+    ):
+        """Stato di indicizzazione; con `point_ids` aggiorna anche chunks"""
+        if status not in STATUSES:
+            raise ValueError(f"Stato non valido: {status}")
+        assignments = ["status = %s", "error = %s", "updated_at = NOW()"]
+        params: List[Any] = [status, error]
+        if point_ids is not None:
+            assignments += ["chunks = %s", "point_ids = %s::jsonb"]
+            params += [len(point_ids), json.dumps(point_ids)]
+        params.append(document_id)
+        await asyncio.to_thread(
+            self._execute,
+            f"UPDATE rag_documents SET {', '.join(assignments)} WHERE id = %s",
+            tuple(params),
+            False
+        )
+
+    async def delete(self, document_id: str) -> Optional[Path]:
+        """
+        Rimuove il documento dal registro e il file se nessun altro documento lo usa;
+        ritorna il file eliminato
+        """
+        rows = await asyncio.to_thread(
+            self._execute, "DELETE FROM rag_documents WHERE id = %s RETURNING path", (document_id,)
+        )
+        if not rows:
+            return None
+        path = rows[0][0]
+        shared = await asyncio.to_thread(
+            self._execute, "SELECT 1 FROM rag_documents WHERE path = %s LIMIT 1", (path,)
+        )
+        if shared:
+            return None
+        path = Path(path)
+        await asyncio.to_thread(path.unlink, missing_ok=True)
+        return path
+
+    async def get_stats(self) -> Dict[str, Any]:
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT status, COUNT(*), COALESCE(SUM(size), 0) FROM rag_documents GROUP BY status"
+        )
+        return {
+            "store_directory": str(self.store_dir),
+            "documents": {status: count for status, count, _ in rows},
+            "bytes": sum(int(size) for _, _, size in rows),
+        }
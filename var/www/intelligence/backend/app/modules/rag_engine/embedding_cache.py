@@ -0,0 +1,212 @@
+"""
+Embedding Cache per RAG Engine
+Cache content-addressed (model, sha256 testo normalizzato) a due livelli:
+LRU in-process + store persistente su disco (SQLite) condiviso tra worker
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "/var/www/intelligence/data/embedding_cache.sqlite3"
+
+
+def normalize_text(text: str) -> str:
+    """Normalizzazione usata per la chiave: NFC + whitespace compattato"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache embeddings condivisa da tutti i percorsi di vettorizzazione
+
+    - tier 1: OrderedDict LRU in memoria (`memory_items` voci)
+    - tier 2: SQLite su disco in WAL mode (`max_entries` voci, eviction per ultimo uso)
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        memory_items: int = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000")),
+        max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000")),
+    ):
+        self.path = path or os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.memory_items = max(0, memory_items)
+        self.max_entries = max(1, max_entries)
+
+        self._memory: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes_since_evict = 0
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+        }
+
+    # ===== STORAGE =====
+
+    def _get_conn(self) -> Optional[sqlite3.Connection]:
+        """Connessione lazy; se il disco non è disponibile resta solo il tier in memoria"""
+        if self._conn is None:
+            try:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS embeddings (
+                        model TEXT NOT NULL,
+                        text_hash TEXT NOT NULL,
+                        dims INTEGER NOT NULL,
+                        vector BLOB NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_used_at REAL NOT NULL,
+                        PRIMARY KEY (model, text_hash)
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used_at)")
+                conn.commit()
+                self._conn = conn
+            except Exception as e:
+                logger.warning(f"Embedding cache on disk not available ({self.path}): {e}")
+                self._conn = None
+        return self._conn
+
+    def _remember(self, key: Tuple[str, str], vector: List[float]):
+        if not self.memory_items:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_if_needed(self, conn: sqlite3.Connection):
+        """Eviction ogni 1000 scritture: elimina le voci usate meno di recente"""
+        self._writes_since_evict = 0
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used_at LIMIT ?)",
+                (excess,)
+            )
+            self.stats["evictions"] += excess
+
+    # ===== API =====
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Lookup batch; ritorna una lista allineata a `texts` (None = miss)"""
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        keys = [(model, text_hash(t)) for t in texts]
+
+        with self._lock:
+            pending: Dict[str, List[int]] = {}
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.stats["memory_hits"] += 1
+                else:
+                    pending.setdefault(key[1], []).append(i)
+
+            conn = self._get_conn() if pending else None
+            if conn is not None:
+                hashes = list(pending)
+                found = []
+                # SQLite: max 999 parametri per query
+                for start in range(0, len(hashes), 900):
+                    part = hashes[start:start + 900]
+                    placeholders = ",".join("?" * len(part))
+                    found.extend(conn.execute(
+                        f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                        (model, *part)
+                    ).fetchall())
+                if found:
+                    now = time.time()
+                    conn.executemany(
+                        "UPDATE embeddings SET last_used_at = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model, h) for h, _ in found]
+                    )
+                    conn.commit()
+                for h, blob in found:
+                    vector = array("f", blob).tolist()
+                    self._remember((model, h), vector)
+                    for i in pending.pop(h):
+                        results[i] = vector
+                        self.stats["disk_hits"] += 1
+
+            self.stats["misses"] += sum(len(v) for v in pending.values())
+
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Optional[List[float]]]):
+        """Salva gli embeddings calcolati (le voci None vengono ignorate)"""
+        rows = []
+        now = time.time()
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                if vector is None:
+                    continue
+                h = text_hash(text)
+                self._remember((model, h), vector)
+                rows.append((model, h, len(vector), array("f", vector).tobytes(), now, now))
+
+            conn = self._get_conn() if rows else None
+            if conn is None:
+                return
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings "
+                    "(model, text_hash, dims, vector, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self.stats["writes"] += len(rows)
+                self._writes_since_evict += len(rows)
+                if self._writes_since_evict >= 1000:
+                    self._evict_if_needed(conn)
+                conn.commit()
+            except Exception as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+
+    def get_stats(self) -> Dict[str, object]:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        stats: Dict[str, object] = dict(self.stats)
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        stats["memory_entries"] = len(self._memory)
+        stats["path"] = self.path
+        return stats
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Cache di processo; disabilitabile con EMBEDDING_CACHE_ENABLED=false"""
+    global _cache
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+    return _cache
@@ -0,0 +1,332 @@
+"""
+Embedding Pipeline per RAG Engine
+Batch di chunk per richiesta, concorrenza limitata, upsert Qdrant a blocchi
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from openai import AsyncOpenAI
+from qdrant_client.models import PointStruct
+
+from app.core.clients import get_clients
+from app.core.llm_gateway import get_llm_gateway, retry_after
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Dimensioni native dei modelli di embedding
+MODEL_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+# Limiti OpenAI: max 2048 input per richiesta, ~300k token per richiesta
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 250_000
+
+
+def estimate_tokens(text: str) -> int:
+    """Stima grossolana dei token (≈4 caratteri per token)"""
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class PipelineMetrics:
+    """Metriche di throughput di una esecuzione della pipeline"""
+    chunks: int = 0
+    cache_hits: int = 0
+    tokens: int = 0
+    batches: int = 0
+    retries: int = 0
+    failed_batches: int = 0
+    failed_chunks: int = 0
+    failed_upserts: int = 0
+    upserted_points: int = 0
+    failed_point_ids: List[Any] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    def finish(self) -> "PipelineMetrics":
+        self.finished_at = time.perf_counter()
+        return self
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at or time.perf_counter()
+        return max(end - self.started_at, 1e-9)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "chunks": self.chunks,
+            "cache_hits": self.cache_hits,
+            "tokens": self.tokens,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed_batches": self.failed_batches,
+            "failed_chunks": self.failed_chunks,
+            "failed_upserts": self.failed_upserts,
+            "upserted_points": self.upserted_points,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "chunks_per_second": round(self.chunks / self.elapsed, 2),
+            "tokens_per_second": round(self.tokens / self.elapsed, 2),
+        }
+
+
+class EmbeddingPipeline:
+    """
+    Pipeline di embedding condivisa da tutti i percorsi di vettorizzazione
+
+    - più chunk per singola richiesta embeddings
+    - al massimo `max_concurrency` batch in volo sul client async
+    - retry per batch con backoff esponenziale + jitter, solo per errori transitori
+      (rate limit, timeout, connessione, 5xx): un 400 fallisce subito
+    - punti inviati a Qdrant in blocchi di `upsert_batch_size`; un blocco fallito
+      finisce in failed_point_ids senza interrompere gli altri
+    - testi già visti serviti dalla cache embeddings (nessuna chiamata OpenAI)
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_EMBEDDING_MODEL,
+        openai_client: Optional[AsyncOpenAI] = None,
+        batch_size: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "96")),
+        max_concurrency: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4")),
+        max_retries: int = int(os.getenv("EMBEDDING_MAX_RETRIES", "3")),
+        upsert_batch_size: int = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "128")),
+        cache: Optional[EmbeddingCache] = None,
+        dimensions: Optional[int] = None,
+    ):
+        self.model = model
+        # Dimensioni ridotte: solo i modelli text-embedding-3 supportano `dimensions`
+        native = MODEL_DIMENSIONS.get(model)
+        reducible = model.startswith("text-embedding-3") and (native is None or (dimensions or native) < native)
+        self.dimensions = dimensions if dimensions and reducible else None
+        self._openai_client = openai_client
+        self.cache = cache if cache is not None else get_embedding_cache()
+        self.batch_size = max(1, min(batch_size, MAX_INPUTS_PER_REQUEST))
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.upsert_batch_size = max(1, upsert_batch_size)
+
+    @property
+    def openai_client(self) -> AsyncOpenAI:
+        # Senza client esplicito: quello condiviso del processo (pool keep-alive,
+        # embedding locali con EMBEDDING_PROVIDER=local)
+        return self._openai_client or get_clients().embeddings()
+
+    @property
+    def cache_model(self) -> str:
+        """
+        Chiave modello nella cache: vettori di dimensioni diverse non si mescolano,
+        né quelli locali con quelli OpenAI
+        """
+        model = f"{self.model}@{self.dimensions}" if self.dimensions else self.model
+        if self._openai_client is None and get_clients().embedding_provider == "local":
+            return f"local:{model}"
+        return model
+
+    # ===== BATCHING =====
+
+    def _make_batches(self, texts: Sequence[str], indices: Optional[Iterable[int]] = None) -> List[List[int]]:
+        """Raggruppa gli indici dei testi non vuoti rispettando i limiti per richiesta"""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+
+        for i in (range(len(texts)) if indices is None else indices):
+            text = texts[i]
+            if not text or not text.strip():
+                continue
+            tokens = estimate_tokens(text)
+            if current and (len(current) >= self.batch_size or current_tokens + tokens > MAX_TOKENS_PER_REQUEST):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _lookup_cache(self, texts: Sequence[str], metrics: PipelineMetrics) -> List[Optional[List[float]]]:
+        if self.cache is None:
+            return [None] * len(texts)
+        try:
+            cached = await asyncio.to_thread(self.cache.get_many, self.cache_model, texts)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return [None] * len(texts)
+        metrics.cache_hits += sum(1 for v in cached if v is not None)
+        return cached
+
+    async def _store_cache(self, texts: List[str], vectors: List[List[float]]):
+        if self.cache is None:
+            return
+        try:
+            await asyncio.to_thread(self.cache.put_many, self.cache_model, texts, vectors)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    async def _embed_batch(self, inputs: List[str], metrics: PipelineMetrics) -> List[List[float]]:
+        """Singola richiesta embeddings con retry degli errori transitori"""
+        attempt = 0
+        while True:
+            try:
+                options = {"dimensions": self.dimensions} if self.dimensions else {}
+                # Il retry resta qui (metriche della pipeline): il gateway fa un solo tentativo
+                response = await get_llm_gateway().embeddings(
+                    model=self.model, input=inputs, client=self.openai_client, max_retries=0, **options
+                )
+                if response.usage:
+                    metrics.tokens += response.usage.total_tokens
+                # L'API garantisce l'ordine tramite `index`
+                ordered = sorted(response.data, key=lambda d: d.index)
+                return [d.embedding for d in ordered]
+            except Exception as e:
+                # None = non ritentabile (input non valido, context length, auth...)
+                hint = retry_after(e)
+                if hint is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                metrics.retries += 1
+                delay = max(hint, min(2 ** attempt, 30) * (0.5 + random.random()))
+                logger.warning(f"Embedding batch failed ({e}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def embed_texts(
+        self,
+        texts: Sequence[str],
+        metrics: Optional[PipelineMetrics] = None,
+    ) -> List[Optional[List[float]]]:
+        """
+        Genera embeddings per una lista di testi.
+        Ritorna una lista allineata a `texts`; None per testi vuoti o batch falliti.
+        """
+        metrics = metrics or PipelineMetrics()
+        results = await self._lookup_cache(texts, metrics)
+        missing = [i for i, v in enumerate(results) if v is None]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(indices: List[int]):
+            async with semaphore:
+                inputs = [texts[i] for i in indices]
+                try:
+                    vectors = await self._embed_batch(inputs, metrics)
+                except Exception as e:
+                    metrics.failed_batches += 1
+                    metrics.failed_chunks += len(indices)
+                    logger.error(f"Embedding batch of {len(indices)} chunks failed: {e}")
+                    return
+                for i, vector in zip(indices, vectors):
+                    results[i] = vector
+                metrics.batches += 1
+                metrics.chunks += len(indices)
+            await self._store_cache(inputs, vectors)
+
+        await asyncio.gather(*(run(batch) for batch in self._make_batches(texts, missing)))
+        return results
+
+    # ===== QDRANT =====
+
+    async def embed_and_upsert(
+        self,
+        qdrant_client,
+        collection_name: str,
+        items: Iterable[Tuple[Any, str, Dict[str, Any]]],
+        on_progress: Optional[Callable[[PipelineMetrics], None]] = None,
+        vector_name: Optional[str] = None,
+    ) -> PipelineMetrics:
+        """
+        Embedding + upsert in streaming.
+
+        `items` sono tuple (point_id, testo, payload). I batch di embedding vengono
+        avviati in parallelo (limitati dal semaforo) e i punti pronti vengono
+        scritti su Qdrant a blocchi fissi, senza attendere la fine dell'intero documento.
+        `on_progress` riceve le metriche dopo ogni batch e ogni upsert.
+        `vector_name`: named vector della collection (None nel layout a vettore unico);
+        il payload registra sempre il modello in `embedding_model`.
+        """
+        metrics = PipelineMetrics()
+        items = [item for item in items if item[1] and item[1].strip()]
+        if not items:
+            return metrics.finish()
+
+        texts = [text for _, text, _ in items]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        buffer: List[PointStruct] = []
+        buffer_lock = asyncio.Lock()
+
+        async def flush(points: List[PointStruct]):
+            try:
+                await asyncio.to_thread(
+                    qdrant_client.upsert,
+                    collection_name=collection_name,
+                    points=points,
+                )
+            except Exception as e:
+                # Il blocco fallito non interrompe gli altri: i chiamanti ritentano i failed_point_ids
+                metrics.failed_upserts += 1
+                metrics.failed_chunks += len(points)
+                metrics.failed_point_ids.extend(point.id for point in points)
+                logger.error(f"Qdrant upsert of {len(points)} points failed: {e}")
+                return
+            metrics.upserted_points += len(points)
+            if on_progress:
+                on_progress(metrics)
+
+        async def emit(indices: List[int], vectors: List[List[float]]):
+            ready: List[List[PointStruct]] = []
+            async with buffer_lock:
+                for i, vector in zip(indices, vectors):
+                    point_id, _, payload = items[i]
+                    buffer.append(PointStruct(
+                        id=point_id,
+                        vector={vector_name: vector} if vector_name else vector,
+                        payload={**payload, "embedding_model": self.model}
+                    ))
+                while len(buffer) >= self.upsert_batch_size:
+                    ready.append(buffer[:self.upsert_batch_size])
+                    del buffer[:self.upsert_batch_size]
+            for points in ready:
+                await flush(points)
+
+        async def run(indices: List[int]):
+            async with semaphore:
+                inputs = [texts[i] for i in indices]
+                try:
+                    vectors = await self._embed_batch(inputs, metrics)
+                except Exception as e:
+                    metrics.failed_batches += 1
+                    metrics.failed_chunks += len(indices)
+                    metrics.failed_point_ids.extend(items[i][0] for i in indices)
+                    logger.error(f"Embedding batch of {len(indices)} chunks failed: {e}")
+                    return
+                metrics.batches += 1
+                metrics.chunks += len(indices)
+            if on_progress:
+                on_progress(metrics)
+            await self._store_cache(inputs, vectors)
+            await emit(indices, vectors)
+
+        # Chunk già in cache: direttamente nel buffer di upsert
+        cached = await self._lookup_cache(texts, metrics)
+        hit_indices = [i for i, v in enumerate(cached) if v is not None]
+        missing = [i for i, v in enumerate(cached) if v is None]
+        if hit_indices:
+            await emit(hit_indices, [cached[i] for i in hit_indices])
+
+        await asyncio.gather(*(run(batch) for batch in self._make_batches(texts, missing)))
+        if buffer:
+            await flush(list(buffer))
+
+        metrics.finish()
+        logger.info(f"Embedding pipeline: {metrics.to_dict()}")
+        return metrics
@@ -0,0 +1,368 @@
+"""
+Extraction Pool per RAG Engine
+Parsing PDF/DOCX/XLSX/TXT in un process pool limitato: il testo arriva come
+stream di segmenti (pagine, blocchi di paragrafi, batch di righe) così il
+chunking parte prima della fine del parsing e l'event loop non si blocca.
+Al posto del vecchio limite di 10 pagine c'è un budget per file (tempo + memoria).
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.xlsx', '.txt', '.md')
+
+DOCX_PARAGRAPH_BATCH = 200
+XLSX_ROW_BATCH = 500
+TEXT_BLOCK_SIZE = 1024 * 1024
+
+
+class ExtractionBudgetExceeded(Exception):
+    """Budget di tempo/memoria del file superato: il testo già estratto viene tenuto"""
+
+
+@dataclass
+class ExtractionBudget:
+    """Limiti per singolo file, verificati tra un segmento e l'altro"""
+    max_seconds: float = float(os.getenv("RAG_EXTRACT_MAX_SECONDS", "300"))
+    max_memory_mb: float = float(os.getenv("RAG_EXTRACT_MAX_MEMORY_MB", "1024"))
+    started_at: float = field(default_factory=time.monotonic)
+
+    def check(self):
+        elapsed = time.monotonic() - self.started_at
+        if elapsed > self.max_seconds:
+            raise ExtractionBudgetExceeded(f"time budget exceeded ({elapsed:.0f}s > {self.max_seconds:.0f}s)")
+        rss = _rss_mb()
+        if rss > self.max_memory_mb:
+            raise ExtractionBudgetExceeded(f"memory budget exceeded ({rss:.0f}MB > {self.max_memory_mb:.0f}MB)")
+
+
+def _rss_mb() -> float:
+    """RSS corrente del processo (Linux /proc, altrimenti picco da getrusage)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ===== PARSER (eseguiti nei worker) =====
+
+def _pdf_segments(file_path: Path, on_total) -> Iterator[str]:
+    import PyPDF2
+    with open(file_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        on_total(len(reader.pages))
+        for page in reader.pages:
+            yield (page.extract_text() or "") + "\n"
+
+
+def _docx_segments(file_path: Path, on_total) -> Iterator[str]:
+    import docx
+    document = docx.Document(file_path)
+    batch = []
+    for paragraph in document.paragraphs:
+        batch.append(paragraph.text + "\n")
+        if len(batch) >= DOCX_PARAGRAPH_BATCH:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+    # Tabelle dopo i paragrafi, una riga per segmento
+    for table in document.tables:
+        for row in table.rows:
+            yield "".join(cell.text + " " for cell in row.cells) + "\n"
+
+
+def _xlsx_segments(file_path: Path, on_total) -> Iterator[str]:
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet_name in workbook.sheetnames:
+            batch = [f"Sheet: {sheet_name}\n"]
+            for row in workbook[sheet_name].iter_rows(values_only=True):
+                row_text = "\t".join(str(cell) if cell is not None else "" for cell in row)
+                if row_text.strip():
+                    batch.append(row_text + "\n")
+                if len(batch) >= XLSX_ROW_BATCH:
+                    yield "".join(batch)
+                    batch = []
+            batch.append("\n")
+            yield "".join(batch)
+    finally:
+        workbook.close()
+
+
+def _text_segments(file_path: Path, on_total) -> Iterator[str]:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for block in iter(lambda: f.read(TEXT_BLOCK_SIZE), ''):
+            yield block
+
+
+_PARSERS = {
+    '.pdf': _pdf_segments,
+    '.docx': _docx_segments,
+    '.xlsx': _xlsx_segments,
+    '.txt': _text_segments,
+    '.md': _text_segments,
+}
+
+
+def iter_text_segments(file_path, budget: Optional[ExtractionBudget] = None, on_total=None) -> Iterator[str]:
+    """
+    Segmenti di testo del file nell'ordine del documento.
+    `on_total(n)` riceve il numero di segmenti quando noto in anticipo (pagine PDF).
+    Solleva ExtractionBudgetExceeded quando il budget è superato.
+    """
+    file_path = Path(file_path)
+    parser = _PARSERS.get(file_path.suffix.lower())
+    if parser is None:
+        raise ValueError(f"Unsupported format: {file_path.suffix.lower()}")
+    budget = budget or ExtractionBudget()
+    for segment in parser(file_path, on_total or (lambda total: None)):
+        yield segment
+        budget.check()
+
+
+def file_metadata(file_path: Path) -> Dict[str, Any]:
+    return {
+        'filename': file_path.name,
+        'file_size': file_path.stat().st_size,
+        'format': file_path.suffix.lower(),
+        'processed_at': datetime.utcnow().isoformat()
+    }
+
+
+def _produce(file_path: str, out, cancel, max_seconds: float, max_memory_mb: float):
+    """
+    Worker: invia ('pid', pid), ('total', n), ('segment', testo)..., poi ('done', info)
+    o ('error', msg). La coda è limitata: se il consumatore è lento il parsing si ferma
+    (backpressure).
+    """
+
+    def put(message) -> bool:
+        while not cancel.is_set():
+            try:
+                out.put(message, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    put(('pid', os.getpid()))
+    budget = ExtractionBudget(max_seconds=max_seconds, max_memory_mb=max_memory_mb)
+    segments = 0
+    truncated = None
+    try:
+        for segment in iter_text_segments(file_path, budget, on_total=lambda n: put(('total', n))):
+            segments += 1
+            if not put(('segment', segment)):
+                return
+    except ExtractionBudgetExceeded as e:
+        truncated = str(e)
+    except Exception as e:
+        put(('error', str(e)))
+        return
+    put(('done', {'segments': segments, 'truncated': truncated,
+                  'seconds': round(time.monotonic() - budget.started_at, 3)}))
+
+
+class ExtractionPool:
+    """
+    Process pool limitato per l'estrazione testo
+
+    - al massimo `max_workers` file in parsing contemporaneamente (RAG_EXTRACT_WORKERS)
+    - `stream()` restituisce i segmenti man mano che il worker li produce
+    - budget per file: RAG_EXTRACT_MAX_SECONDS / RAG_EXTRACT_MAX_MEMORY_MB; oltre il
+      budget l'estrazione si ferma e il risultato è marcato `truncated`
+    - worker bloccato oltre `hard_timeout`: il suo executor viene sostituito subito e il
+      processo terminato appena gli altri file in corso su quell'executor sono finiti
+    """
+
+    def __init__(
+        self,
+        max_workers: int = int(os.getenv("RAG_EXTRACT_WORKERS", os.getenv("RAG_INGEST_EXTRACT_WORKERS", "2"))),
+        budget: Optional[ExtractionBudget] = None,
+        queue_size: int = int(os.getenv("RAG_EXTRACT_QUEUE_SIZE", "16")),
+    ):
+        self.max_workers = max(1, max_workers)
+        self.budget = budget or ExtractionBudget()
+        self.queue_size = max(1, queue_size)
+        # Il worker controlla il budget tra i segmenti: un singolo segmento patologico
+        # può sforare, oltre questo margine lo stream viene abbandonato
+        self.hard_timeout = self.budget.max_seconds * 1.5 + 10
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Stream in corso per executor; pid bloccati degli executor ritirati
+        self._active: Dict[ProcessPoolExecutor, int] = {}
+        self._stuck: Dict[ProcessPoolExecutor, List[int]] = {}
+        self._manager = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._executor is None:
+                self._manager = multiprocessing.Manager()
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+    def _acquire(self) -> ProcessPoolExecutor:
+        with self._lock:
+            executor = self._executor
+            self._active[executor] = self._active.get(executor, 0) + 1
+            return executor
+
+    def _retire(self, executor: ProcessPoolExecutor, pid: Optional[int]):
+        """Worker bloccato: i file successivi vanno su un executor nuovo"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._stuck.setdefault(executor, [])
+            if pid is not None:
+                self._stuck[executor].append(pid)
+
+    def _release(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            self._active[executor] -= 1
+            if self._active[executor]:
+                return
+            del self._active[executor]
+            pids = self._stuck.pop(executor, None)
+        if pids is not None:
+            # Ultimo stream dell'executor ritirato: ucciderlo non interrompe altri file
+            self._kill(executor, pids)
+
+    @staticmethod
+    def _kill(executor: ProcessPoolExecutor, pids: List[int]):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            stuck, self._stuck = self._stuck, {}
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+        self._semaphore = None
+        for executor, pids in stuck.items():
+            self._kill(executor, pids)
+
+    async def stream(self, file_path, stats: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Segmenti di testo del file. `stats` (se passato) viene aggiornato con
+        segments, total, characters, truncated, seconds.
+        Solleva RuntimeError se il parsing fallisce.
+        """
+        file_path = Path(file_path)
+        if not file_path.is_file():
+            raise FileNotFoundError(f"File not found: {file_path}")
+        if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+            raise ValueError(f"Unsupported format: {file_path.suffix.lower()}")
+
+        stats = stats if stats is not None else {}
+        stats.update({'segments': 0, 'total': 0, 'characters': 0, 'truncated': None})
+        self._ensure_started()
+
+        async with self._semaphore:
+            out = self._manager.Queue(maxsize=self.queue_size)
+            cancel = self._manager.Event()
+            loop = asyncio.get_running_loop()
+            executor = self._acquire()
+            pid = None
+            deadline = time.monotonic() + self.hard_timeout
+            try:
+                future = loop.run_in_executor(
+                    executor, _produce, str(file_path), out, cancel,
+                    self.budget.max_seconds, self.budget.max_memory_mb
+                )
+                while True:
+                    try:
+                        kind, payload = await asyncio.to_thread(out.get, True, 0.5)
+                    except queue.Empty:
+                        if future.done():
+                            future.result()  # eccezione del worker (es. processo terminato)
+                            raise RuntimeError(f"Extraction worker exited without result: {file_path.name}")
+                        if time.monotonic() > deadline:
+                            stats['truncated'] = f"hard timeout after {self.hard_timeout:.0f}s"
+                            logger.warning(f"Extraction of {file_path.name} abandoned: {stats['truncated']}")
+                            # Il worker verrà ucciso: BrokenProcessPool atteso, non da loggare
+                            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                            self._retire(executor, pid)
+                            return
+                        continue
+
+                    if kind == 'pid':
+                        pid = payload
+                    elif kind == 'segment':
+                        stats['segments'] += 1
+                        stats['characters'] += len(payload)
+                        yield payload
+                    elif kind == 'total':
+                        stats['total'] = payload
+                    elif kind == 'error':
+                        raise RuntimeError(payload)
+                    else:
+                        stats['truncated'] = payload['truncated']
+                        stats['seconds'] = payload['seconds']
+                        if stats['truncated']:
+                            logger.warning(f"Extraction of {file_path.name} truncated: {stats['truncated']}")
+                        return
+            finally:
+                # Consumatore chiuso o errore: il worker smette alla prossima put
+                cancel.set()
+                self._release(executor)
+
+    async def extract(self, file_path) -> Dict[str, Any]:
+        """Estrazione completa, stesso formato di extract_text_sync"""
+        file_path = Path(file_path)
+        stats: Dict[str, Any] = {}
+        try:
+            parts = [segment async for segment in self.stream(file_path, stats)]
+            metadata = file_metadata(file_path)
+            metadata.update({'segments': stats['segments'], 'truncated': stats['truncated']})
+            return {'text': "".join(parts), 'metadata': metadata, 'success': True, 'error': None}
+        except Exception as e:
+            return {'text': '', 'metadata': {}, 'success': False, 'error': str(e)}
+
+
+_pool: Optional[ExtractionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_extraction_pool() -> ExtractionPool:
+    """Pool di processo condiviso da upload, job di ingestion e wiki"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExtractionPool()
+    return _pool
+
+
+def shutdown_extraction_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,334 @@
+"""
+Hybrid Retriever per RAG Engine
+Ricerca vettoriale (Qdrant) + full-text PostgreSQL (italiano, unaccent) su
+document_chunks e wiki_pages, fuse con Reciprocal Rank Fusion
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from psycopg2.pool import ThreadedConnectionPool
+
+from .embedding_cache import text_hash
+from .vector_service import filter_values
+
+logger = logging.getLogger(__name__)
+
+# Configurazione creata da app/migrations/add_knowledge_fulltext.py
+TS_CONFIG = "italian_unaccent"
+
+# Token "da cercare alla lettera": P.IVA, codici articolo, TCK-..., kit
+_TERM_RE = re.compile(r"[\w][\w.\-/]*[\w]|\w", re.UNICODE)
+MAX_QUERY_TERMS = 24
+
+# Valori di source/content_type che il canale lessicale può restituire
+CHUNK_SOURCES = {"knowledge_base", "web_scraping", "existing_upload"}
+CHUNK_CONTENT_TYPES = {"document", "web_page"}
+
+# Origine reale di un chunk: metadata del documento (integrazioni web scraping: source o
+# source_type), knowledge_base per i documenti caricati; content_type come DEFAULT_CONTENT_TYPES
+CHUNK_SOURCE_SQL = "COALESCE(kd.metadata->>'source', kd.metadata->>'source_type', 'knowledge_base')"
+CHUNK_CONTENT_TYPE_SQL = (
+    f"COALESCE(kd.metadata->>'content_type', "
+    f"CASE WHEN {CHUNK_SOURCE_SQL} LIKE 'web_scraping%%' THEN 'web_page' ELSE 'document' END)"
+)
+
+
+def query_terms(query: str) -> List[str]:
+    """Termini della query per il tsquery in OR (duplicati e stopword lunghe 1-2 char esclusi)"""
+    terms = []
+    for term in _TERM_RE.findall(query):
+        if len(term) < 3 and not term.isdigit():
+            continue
+        if term.lower() not in (t.lower() for t in terms):
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def fusion_key(result: Dict[str, Any]) -> str:
+    """
+    Identificativo comune ai due canali: le pagine wiki hanno document_id "wiki:<id>"
+    sia nel payload Qdrant sia nel canale lessicale; i chunk dei documenti l'hash del
+    contenuto normalizzato
+    """
+    document_id = str(result.get("document_id") or "")
+    if document_id.startswith("wiki:"):
+        return document_id
+    return text_hash(result.get("content", ""))
+
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, List[Dict[str, Any]]],
+    k: int = 60,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    RRF: score(d) = Σ 1 / (k + rank_leg(d)).
+    Lo stesso risultato trovato da entrambi i canali (fusion_key) viene fuso in uno solo.
+    Se un canale restituisce più chunk della stessa pagina wiki, solo il meglio
+    classificato si fonde con la pagina dell'altro canale; gli altri restano distinti.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for leg, results in rankings.items():
+        leg_keys = set()
+        for rank, result in enumerate(results, start=1):
+            key = fusion_key(result)
+            if key in leg_keys:
+                key = f"{key}#{result.get('chunk_index', rank)}"
+            leg_keys.add(key)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {**result, "rrf_score": 0.0, "retrieval": []}
+            entry["rrf_score"] += 1.0 / (k + rank)
+            entry["retrieval"].append(leg)
+            entry[f"{leg}_rank"] = rank
+            entry[f"{leg}_score"] = result.get("score", 0.0)
+    ordered = sorted(fused.values(), key=lambda r: r["rrf_score"], reverse=True)
+    return ordered[:limit] if limit else ordered
+
+
+class HybridRetriever:
+    """
+    Retriever ibrido per la knowledge base
+
+    - canale vettoriale: VectorRAGService.search_similar_chunks
+    - canale lessicale: tsvector su document_chunks.content e wiki_pages
+      (match esatto di codici/numeri che l'embedding non distingue)
+    - ogni canale ha il proprio timeout: se uno è lento o giù si usa l'altro
+    - il canale lessicale usa un pool di connessioni (al massimo `pool_size` query insieme)
+    """
+
+    def __init__(
+        self,
+        vector_service,
+        vector_timeout: float = float(os.getenv("HYBRID_VECTOR_TIMEOUT", "3.0")),
+        lexical_timeout: float = float(os.getenv("HYBRID_LEXICAL_TIMEOUT", "1.5")),
+        rrf_k: int = int(os.getenv("HYBRID_RRF_K", "60")),
+        include_wiki: bool = True,
+        pool_size: int = int(os.getenv("HYBRID_LEXICAL_POOL_SIZE", "4")),
+    ):
+        self.vector_service = vector_service
+        self.vector_timeout = vector_timeout
+        self.lexical_timeout = lexical_timeout
+        self.rrf_k = rrf_k
+        self.include_wiki = include_wiki
+        self._lexical_available = True
+        self.pool_size = max(1, pool_size)
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadedConnectionPool] = None
+        # ThreadedConnectionPool solleva PoolError se esaurito: i thread in più attendono qui
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+
+    # ===== CONNESSIONI =====
+
+    def _get_pool(self) -> ThreadedConnectionPool:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(1, self.pool_size, **self.vector_service.db_config)
+        return self._pool
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.closeall()
+
+    # ===== LEXICAL =====
+
+    @staticmethod
+    def _allows(filters: Dict[str, List[Any]], key: str, values) -> bool:
+        return key not in filters or bool(set(filters[key]) & set(values))
+
+    def _lexical_search(
+        self,
+        query: str,
+        limit: int,
+        filters: Optional[Dict[str, List[Any]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """`filters` già normalizzati da filter_values (stessi campi del canale vettoriale)"""
+        terms = query_terms(query)
+        if not terms:
+            return []
+        filters = filters or {}
+        search_chunks = (
+            self._allows(filters, "source", CHUNK_SOURCES)
+            and self._allows(filters, "content_type", CHUNK_CONTENT_TYPES)
+        )
+        # Le pagine wiki non appartengono a un'azienda
+        search_wiki = (
+            self.include_wiki
+            and "company_id" not in filters
+            and self._allows(filters, "source", {"wiki"})
+            and self._allows(filters, "content_type", {"wiki"})
+        )
+        if not search_chunks and not search_wiki:
+            return []
+
+        chunk_conditions, chunk_params = [], []
+        for key, column in (("company_id", "kd.company_id"), ("document_id", "dc.document_id::text"),
+                            ("filename", "kd.filename"), ("source", CHUNK_SOURCE_SQL),
+                            ("content_type", CHUNK_CONTENT_TYPE_SQL)):
+            if key in filters:
+                chunk_conditions.append(f"{column} = ANY(%s)")
+                chunk_params.append(filters[key])
+        wiki_conditions, wiki_params = [], []
+        if "document_id" in filters:
+            wiki_conditions.append("'wiki:' || wp.id = ANY(%s)")
+            wiki_params.append(filters["document_id"])
+        if "filename" in filters:
+            wiki_conditions.append("wp.title = ANY(%s)")
+            wiki_params.append(filters["filename"])
+
+        # OR dei plainto_tsquery: ogni termine (anche un codice) basta per il match
+        tsquery = " || ".join([f"plainto_tsquery('{TS_CONFIG}', %s)"] * len(terms))
+        query_sql = f"(SELECT {tsquery} AS q) AS query"
+        timeout_ms = max(100, int(self.lexical_timeout * 1000))
+
+        with self._slots:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            try:
+                cur = conn.cursor()
+                cur.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+                results = []
+                if search_chunks:
+                    cur.execute(f"""
+                        SELECT dc.document_id::text, dc.chunk_index, dc.content, kd.filename,
+                               kd.company_id, {CHUNK_SOURCE_SQL} AS source, ts_rank_cd(dc.search_tsv, q) AS rank
+                        FROM document_chunks dc
+                        LEFT JOIN knowledge_documents kd ON kd.id = dc.document_id,
+                             {query_sql}
+                        WHERE dc.search_tsv @@ q{"".join(" AND " + c for c in chunk_conditions)}
+                        ORDER BY rank DESC
+                        LIMIT %s
+                    """, (*terms, *chunk_params, limit))
+                    results = [
+                        {
+                            "id": None,
+                            "score": float(rank),
+                            "content": content,
+                            "document_id": document_id,
+                            "chunk_index": chunk_index,
+                            "filename": filename or "",
+                            "source": source,
+                            "company_id": company_id,
+                            "metadata": {},
+                        }
+                        for document_id, chunk_index, content, filename, company_id, source, rank in cur.fetchall()
+                    ]
+
+                if search_wiki:
+                    cur.execute(f"""
+                        SELECT wp.id, wp.slug, wp.title,
+                               COALESCE(NULLIF(wp.excerpt, ''), LEFT(wp.content_markdown, 2000)) AS content,
+                               ts_rank_cd(wp.search_tsv, q) AS rank
+                        FROM wiki_pages wp,
+                             {query_sql}
+                        WHERE wp.search_tsv @@ q{"".join(" AND " + c for c in wiki_conditions)}
+                        ORDER BY rank DESC
+                        LIMIT %s
+                    """, (*terms, *wiki_params, limit))
+                    results.extend(
+                        {
+                            "id": None,
+                            "score": float(rank),
+                            "content": content or "",
+                            "document_id": f"wiki:{page_id}",
+                            "chunk_index": 0,
+                            "filename": title,
+                            "source": "wiki",
+                            "metadata": {"wiki_page_id": page_id, "slug": slug},
+                        }
+                        for page_id, slug, title, content, rank in cur.fetchall()
+                    )
+                    results.sort(key=lambda r: r["score"], reverse=True)
+                    results = results[:limit]
+
+                return results
+            finally:
+                if not conn.closed:
+                    conn.rollback()
+                # Connessione caduta (es. restart di PostgreSQL): non torna nel pool
+                pool.putconn(conn, close=bool(conn.closed))
+
+    # ===== LEGS =====
+
+    async def _run_leg(self, name: str, coro, timeout: float) -> List[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(coro, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Hybrid retrieval: {name} leg timed out after {timeout}s")
+        except Exception as e:
+            if name == "lexical" and self._lexical_available:
+                # Tipicamente migrazione full-text non ancora applicata
+                logger.warning(f"Hybrid retrieval: lexical leg unavailable: {e}")
+                self._lexical_available = False
+            elif name != "lexical":
+                logger.error(f"Hybrid retrieval: {name} leg failed: {e}")
+        return []
+
+    async def vector_search(
+        self,
+        query: str,
+        limit: int,
+        score_threshold: float = 0.3,
+        query_vector: Optional[List[float]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        return await self._run_leg(
+            "vector",
+            self.vector_service.search_similar_chunks(
+                query, limit=limit, score_threshold=score_threshold, query_vector=query_vector,
+                filters=filters
+            ),
+            self.vector_timeout
+        )
+
+    async def lexical_search(
+        self,
+        query: str,
+        limit: int,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        results = await self._run_leg(
+            "lexical",
+            asyncio.to_thread(self._lexical_search, query, limit, filter_values(filters)),
+            self.lexical_timeout
+        )
+        if results:
+            self._lexical_available = True
+        return results
+
+    # ===== API =====
+
+    async def search(
+        self,
+        query: str,
+        limit: int = 5,
+        score_threshold: float = 0.3,
+        query_vector: Optional[List[float]] = None,
+        candidates: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top `limit` risultati fusi; ogni canale fornisce `candidates` risultati (default 4×limit).
+        Ogni risultato ha lo stesso schema di search_similar_chunks più
+        `rrf_score` e `retrieval` (canali che lo hanno trovato).
+        `filters` (company_id, source, content_type, document_id, filename) vale per entrambi i canali;
+        ValueError per campi non filtrabili.
+        """
+        candidates = candidates or limit * 4
+        filter_values(filters)
+        vector_hits, lexical_hits = await asyncio.gather(
+            self.vector_search(query, candidates, score_threshold, query_vector, filters),
+            self.lexical_search(query, candidates, filters),
+        )
+        return reciprocal_rank_fusion(
+            {"vector": vector_hits, "lexical": lexical_hits},
+            k=self.rrf_k,
+            limit=limit
+        )
@@ -0,0 +1,423 @@
+"""
+Ingestion Jobs per RAG Engine
+Job persistiti (PostgreSQL) per l'indicizzazione asincrona degli upload:
+extract (process pool, in streaming) → chunk → embed → upsert, con avanzamento per stage
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .extraction_pool import ExtractionPool
+from .upload_index import file_sha256
+from .vector_service import make_point_id
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('extract', 'chunk', 'embed', 'upsert')
+
+SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS rag_ingestion_jobs (
+        id VARCHAR(36) PRIMARY KEY,
+        filename VARCHAR(500) NOT NULL,
+        file_path TEXT NOT NULL,
+        company_id INTEGER,
+        description TEXT,
+        status VARCHAR(20) NOT NULL DEFAULT 'queued',
+        stage VARCHAR(20),
+        progress JSONB NOT NULL DEFAULT '{}',
+        result JSONB,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP,
+        heartbeat_at TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_rag_ingestion_jobs_status ON rag_ingestion_jobs(status, created_at)",
+]
+
+JOB_COLUMNS = (
+    "id, filename, file_path, company_id, description, status, stage, progress, result, "
+    "error, attempts, created_at, updated_at, started_at, finished_at"
+)
+
+
+def upload_company_ids(db_connect: Callable[[], Any]) -> Dict[str, int]:
+    """
+    company_id dei file caricati (file_path → azienda dell'ultimo job completato).
+    Vuoto se la tabella dei job non esiste ancora.
+    """
+    conn = db_connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT DISTINCT ON (file_path) file_path, company_id
+            FROM rag_ingestion_jobs
+            WHERE status = 'completed' AND company_id IS NOT NULL
+            ORDER BY file_path, finished_at DESC NULLS LAST
+        """)
+        return {file_path: company_id for file_path, company_id in cur.fetchall()}
+    except Exception as e:
+        logger.warning(f"Upload company lookup unavailable: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def _empty_progress() -> Dict[str, Dict[str, int]]:
+    return {stage: {'done': 0, 'total': 0} for stage in STAGES}
+
+
+class IngestionJobManager:
+    """
+    Coda di ingestion persistita su PostgreSQL
+
+    - i job sopravvivono ai riavvii: quelli 'running' senza heartbeat recente
+      tornano 'queued' e vengono ripresi, al massimo RAG_INGEST_MAX_ATTEMPTS volte
+      (un documento che fa cadere il worker a ogni tentativo finisce 'failed')
+    - claim con FOR UPDATE SKIP LOCKED: più worker API possono condividere la coda
+    - concorrenza configurabile per stage: parsing sul process pool condiviso
+      (RAG_EXTRACT_WORKERS), embed/upsert (RAG_INGEST_EMBED_CONCURRENCY),
+      job attivi per processo (RAG_INGEST_MAX_JOBS)
+    - il chunking avanza mentre il worker estrae le pagine
+    - con `registry` (DocumentRegistry) stato e point id del documento restano allineati al job
+    """
+
+    def __init__(
+        self,
+        upload_index,
+        db_connect: Callable[[], Any],
+        extraction_pool: ExtractionPool,
+        max_jobs: int = int(os.getenv("RAG_INGEST_MAX_JOBS", "4")),
+        embed_concurrency: int = int(os.getenv("RAG_INGEST_EMBED_CONCURRENCY", "2")),
+        poll_interval: float = float(os.getenv("RAG_INGEST_POLL_SECONDS", "5")),
+        stale_after: float = float(os.getenv("RAG_INGEST_STALE_SECONDS", "300")),
+        max_attempts: int = int(os.getenv("RAG_INGEST_MAX_ATTEMPTS", "3")),
+        registry=None,
+    ):
+        self.upload_index = upload_index
+        self.registry = registry
+        self.db_connect = db_connect
+        self.extraction_pool = extraction_pool
+        self.max_jobs = max(1, max_jobs)
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max(1, max_attempts)
+
+        self._embed_semaphore: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._active: Dict[str, asyncio.Task] = {}
+        self._schema_ready = False
+
+    # ===== STORAGE =====
+
+    def _query(self, sql: str, params=(), fetch: bool = True) -> List[tuple]:
+        conn = self.db_connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            rows = cur.fetchall() if fetch and cur.description else []
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    def _ensure_schema(self):
+        if self._schema_ready:
+            return
+        conn = self.db_connect()
+        try:
+            cur = conn.cursor()
+            for statement in SCHEMA_SQL:
+                cur.execute(statement)
+            conn.commit()
+            self._schema_ready = True
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_job(row: tuple) -> Dict[str, Any]:
+        job = dict(zip([c.strip() for c in JOB_COLUMNS.split(",")], row))
+        for key in ('created_at', 'updated_at', 'started_at', 'finished_at'):
+            if job[key] is not None:
+                job[key] = job[key].isoformat()
+        return job
+
+    def _claim_next(self) -> Optional[Dict[str, Any]]:
+        rows = self._query(f"""
+            UPDATE rag_ingestion_jobs
+            SET status = 'running', stage = 'extract', attempts = attempts + 1,
+                started_at = NOW(), updated_at = NOW(), heartbeat_at = NOW(), error = NULL
+            WHERE id = (
+                SELECT id FROM rag_ingestion_jobs
+                WHERE status = 'queued'
+                ORDER BY created_at
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING {JOB_COLUMNS}
+        """)
+        return self._row_to_job(rows[0]) if rows else None
+
+    def _requeue_stale(self) -> Tuple[int, List[str]]:
+        """
+        Job 'running' senza heartbeat: di nuovo 'queued', oppure 'failed' se hanno già
+        usato max_attempts tentativi (attempts è incrementato a ogni claim).
+        Ritorna (job riaccodati, id dei job falliti)
+        """
+        rows = self._query(
+            """
+            UPDATE rag_ingestion_jobs
+            SET status = CASE WHEN attempts >= %(max_attempts)s THEN 'failed' ELSE 'queued' END,
+                error = CASE WHEN attempts >= %(max_attempts)s
+                             THEN 'Interrupted after ' || attempts || ' attempts (worker crash or restart)'
+                             ELSE error END,
+                finished_at = CASE WHEN attempts >= %(max_attempts)s THEN NOW() ELSE finished_at END,
+                updated_at = NOW()
+            WHERE status = 'running'
+              AND (heartbeat_at IS NULL OR heartbeat_at < NOW() - make_interval(secs => %(stale_after)s))
+            RETURNING id, status
+            """,
+            {"max_attempts": self.max_attempts, "stale_after": self.stale_after}
+        )
+        failed = [job_id for job_id, status in rows if status == 'failed']
+        return len(rows) - len(failed), failed
+
+    def _update(self, job_id: str, **fields):
+        assignments = ["updated_at = NOW()", "heartbeat_at = NOW()"]
+        params: List[Any] = []
+        for key, value in fields.items():
+            if key in ('progress', 'result'):
+                assignments.append(f"{key} = %s::jsonb")
+                params.append(json.dumps(value))
+            elif key == 'finished':
+                assignments.append("finished_at = NOW()")
+                continue
+            else:
+                assignments.append(f"{key} = %s")
+                params.append(value)
+        params.append(job_id)
+        self._query(
+            f"UPDATE rag_ingestion_jobs SET {', '.join(assignments)} WHERE id = %s",
+            tuple(params),
+            fetch=False
+        )
+
+    # ===== API =====
+
+    async def submit(
+        self,
+        file_path: Path,
+        filename: str,
+        company_id: Optional[int] = None,
+        description: Optional[str] = None,
+        job_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Registra un job 'queued' e sveglia il dispatcher"""
+        await asyncio.to_thread(self._ensure_schema)
+        job_id = job_id or str(uuid.uuid4())
+        rows = await asyncio.to_thread(
+            self._query,
+            f"INSERT INTO rag_ingestion_jobs (id, filename, file_path, company_id, description, progress) "
+            f"VALUES (%s, %s, %s, %s, %s, %s::jsonb) RETURNING {JOB_COLUMNS}",
+            (job_id, filename, str(file_path), company_id, description, json.dumps(_empty_progress()))
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return self._row_to_job(rows[0])
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        await asyncio.to_thread(self._ensure_schema)
+        rows = await asyncio.to_thread(
+            self._query,
+            f"SELECT {JOB_COLUMNS} FROM rag_ingestion_jobs WHERE id = %s",
+            (job_id,)
+        )
+        return self._row_to_job(rows[0]) if rows else None
+
+    async def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        await asyncio.to_thread(self._ensure_schema)
+        if status:
+            sql = f"SELECT {JOB_COLUMNS} FROM rag_ingestion_jobs WHERE status = %s ORDER BY created_at DESC LIMIT %s"
+            params = (status, limit)
+        else:
+            sql = f"SELECT {JOB_COLUMNS} FROM rag_ingestion_jobs ORDER BY created_at DESC LIMIT %s"
+            params = (limit,)
+        rows = await asyncio.to_thread(self._query, sql, params)
+        return [self._row_to_job(row) for row in rows]
+
+    # ===== WORKER =====
+
+    async def start(self):
+        """Avvia il dispatcher (da chiamare nel lifespan dell'app)"""
+        if self._dispatcher is not None:
+            return
+        self._embed_semaphore = asyncio.Semaphore(self.embed_concurrency)
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch_loop())
+        logger.info(
+            f"Ingestion jobs started (max_jobs={self.max_jobs}, extract_workers={self.extraction_pool.max_workers}, "
+            f"embed_concurrency={self.embed_concurrency})"
+        )
+
+    async def stop(self):
+        """
+        Ferma dispatcher e job attivi. I job interrotti restano 'running'
+        e vengono ripresi al prossimo avvio (heartbeat scaduto)
+        """
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        for task in list(self._active.values()):
+            task.cancel()
+        await asyncio.gather(*self._active.values(), return_exceptions=True)
+        self._active.clear()
+        self.extraction_pool.shutdown()
+
+    async def _dispatch_loop(self):
+        last_stale_check = 0.0
+        while True:
+            try:
+                await asyncio.to_thread(self._ensure_schema)
+                if time.monotonic() - last_stale_check > self.stale_after / 2:
+                    last_stale_check = time.monotonic()
+                    requeued, failed = await asyncio.to_thread(self._requeue_stale)
+                    if requeued:
+                        logger.info(f"Requeued {requeued} interrupted ingestion jobs")
+                    for job_id in failed:
+                        logger.error(f"Ingestion job {job_id} failed: interrupted {self.max_attempts} times")
+                        if self.registry is not None and await self.registry.get(job_id) is not None:
+                            await self.registry.mark(
+                                job_id, 'failed', error=f"Interrupted after {self.max_attempts} attempts"
+                            )
+
+                while len(self._active) < self.max_jobs:
+                    job = await asyncio.to_thread(self._claim_next)
+                    if job is None:
+                        break
+                    task = asyncio.create_task(self._run_job(job))
+                    self._active[job['id']] = task
+                    task.add_done_callback(lambda _, job_id=job['id']: self._active.pop(job_id, None))
+
+                for job_id in list(self._active):
+                    await asyncio.to_thread(self._update, job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion dispatcher error: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    async def _save_periodically(save, progress: Dict[str, Dict[str, int]]):
+        while True:
+            await asyncio.sleep(1.0)
+            # total 0 = stage non ancora iniziato o totale ignoto (es. paragrafi DOCX)
+            current = next(
+                (s for s in STAGES if progress[s]['total'] == 0 or progress[s]['done'] < progress[s]['total']),
+                'upsert'
+            )
+            await save(current)
+
+    async def _run_job(self, job: Dict[str, Any]):
+        job_id = job['id']
+        file_path = Path(job['file_path'])
+        progress = _empty_progress()
+        last_flush = 0.0
+
+        async def save(stage: str, force: bool = False):
+            nonlocal last_flush
+            if force or time.monotonic() - last_flush >= 1.0:
+                last_flush = time.monotonic()
+                await asyncio.to_thread(self._update, job_id, stage=stage, progress=progress)
+
+        def on_progress(stage: str, done: int, total: int):
+            progress[stage] = {'done': done, 'total': total}
+
+        # Documento del registro (job id = document id); None per i job precedenti al registro
+        document = await self.registry.get(job_id) if self.registry is not None else None
+
+        try:
+            if not file_path.is_file():
+                raise FileNotFoundError(f"File not found: {file_path}")
+            if document is not None:
+                await self.registry.mark(job_id, 'indexing')
+
+            # 1-2. extract (process pool) + chunk, in streaming pagina per pagina
+            sha256 = document['sha256'] if document else await asyncio.to_thread(file_sha256, file_path)
+            await save('extract', force=True)
+            extraction: Dict[str, Any] = {}
+
+            def on_chunk(stage: str, done: int, total: int):
+                progress['extract'] = {'done': extraction['segments'], 'total': extraction['total']}
+                progress['chunk'] = {'done': done, 'total': total}
+
+            saver = asyncio.create_task(self._save_periodically(save, progress))
+            try:
+                chunk_list = await self.upload_index.chunk_stream(
+                    self.extraction_pool.stream(file_path, extraction), on_progress=on_chunk
+                )
+            finally:
+                saver.cancel()
+            progress['extract'] = {'done': extraction['segments'], 'total': extraction['segments']}
+            await save('embed', force=True)
+
+            # 3-4. embed → upsert
+            async with self._embed_semaphore:
+                saver = asyncio.create_task(self._save_periodically(save, progress))
+                try:
+                    chunks = await self.upload_index.ingest_chunks(
+                        file_path, chunk_list, sha256, on_progress=on_progress,
+                        company_id=job.get('company_id'),
+                        document_id=job_id if document else None,
+                        filename=document['filename'] if document else None
+                    )
+                finally:
+                    saver.cancel()
+
+            if document is not None:
+                await self.registry.mark(job_id, 'indexed', [make_point_id(job_id, i) for i in range(chunks)])
+
+            for stage in STAGES[1:]:
+                progress[stage] = {'done': chunks, 'total': chunks}
+            await asyncio.to_thread(
+                self._update, job_id,
+                status='completed', stage=None, progress=progress,
+                result={
+                    'chunks': chunks,
+                    'characters': extraction['characters'],
+                    'segments': extraction['segments'],
+                    'truncated': extraction['truncated'],
+                },
+                finished=True
+            )
+            logger.info(f"Ingestion job {job_id} completed: {file_path.name} ({chunks} chunks)")
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}")
+            try:
+                if document is not None:
+                    await self.registry.mark(job_id, 'failed', error=str(e))
+                await asyncio.to_thread(
+                    self._update, job_id,
+                    status='failed', progress=progress, error=str(e), finished=True
+                )
+            except Exception as db_error:
+                logger.error(f"Could not persist failure of job {job_id}: {db_error}")
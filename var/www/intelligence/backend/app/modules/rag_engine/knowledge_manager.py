@@ -3,7 +3,7 @@ import logging
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 
-from .vector_service import VectorRAGService
+from .vector_service import get_vector_service
 from .document_processor import DocumentProcessor
 
 logger = logging.getLogger(__name__)
@@ -14,7 +14,7 @@ class KnowledgeManager:
     """
     
     def __init__(self):
-        self.vector_service = VectorRAGService()
+        self.vector_service = get_vector_service()
         self.document_processor = DocumentProcessor()
     
     async def get_company_knowledge_stats(self, company_id: int) -> Dict[str, Any]:
@@ -0,0 +1,69 @@
+"""
+Local Embeddings per RAG Engine
+Embedding deterministici calcolati in locale (feature hashing di token e trigrammi
+di caratteri): nessuna chiamata OpenAI per sviluppo, test e CI. Selezionati da
+get_clients().embeddings() con EMBEDDING_PROVIDER=local.
+
+La qualità semantica è quella di un bag-of-words: testi con parole in comune sono
+vicini, sinonimi no. Stesso testo → stesso vettore su ogni macchina e processo.
+"""
+import hashlib
+import re
+from types import SimpleNamespace
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+from .embedding_pipeline import MODEL_DIMENSIONS, estimate_tokens
+
+DEFAULT_DIMENSIONS = 1536
+TRIGRAM_WEIGHT = 0.5
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _bucket(feature: str, dimensions: int):
+    """Indice e segno della feature (blake2b: stabile tra processi, a differenza di hash())"""
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dimensions, 1.0 if (digest >> 63) & 1 else -1.0
+
+
+def embed_text(text: str, dimensions: int = DEFAULT_DIMENSIONS) -> List[float]:
+    """Vettore normalizzato di token e trigrammi (minuscolo); testo vuoto → vettore nullo"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token in _TOKEN_RE.findall(text.lower()):
+        index, sign = _bucket(f"t:{token}", dimensions)
+        vector[index] += sign
+        padded = f"#{token}#"
+        for i in range(len(padded) - 2):
+            index, sign = _bucket(f"c:{padded[i:i + 3]}", dimensions)
+            vector[index] += sign * TRIGRAM_WEIGHT
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+class LocalEmbeddings:
+    """`embeddings.create` con la forma della risposta OpenAI (data[].index/embedding, usage)"""
+
+    def __init__(self, default_dimensions: Optional[int] = None):
+        self.default_dimensions = default_dimensions
+
+    async def create(self, model: str, input: Union[str, Sequence[str]], dimensions: Optional[int] = None, **kwargs):
+        texts = [input] if isinstance(input, str) else list(input)
+        dimensions = dimensions or self.default_dimensions or MODEL_DIMENSIONS.get(model, DEFAULT_DIMENSIONS)
+        tokens = sum(estimate_tokens(text) for text in texts)
+        return SimpleNamespace(
+            model=model,
+            data=[SimpleNamespace(index=i, embedding=embed_text(text, dimensions)) for i, text in enumerate(texts)],
+            usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens),
+        )
+
+
+class LocalEmbeddingClient:
+    """Sostituto di AsyncOpenAI per EmbeddingPipeline (solo embeddings)"""
+
+    def __init__(self, default_dimensions: Optional[int] = None):
+        self.embeddings = LocalEmbeddings(default_dimensions)
+
+    async def close(self):
+        pass
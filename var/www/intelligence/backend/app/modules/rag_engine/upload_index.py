@@ -0,0 +1,319 @@
+"""
+Upload Index per RAG Engine
+Store persistente delle estrazioni dei documenti caricati (registro e UPLOAD_DIR storica)
++ retrieval dei chunk rilevanti (vector search su Qdrant, keyword search FTS5 come secondo canale)
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterable, Callable, Dict, List, Optional
+
+from .chunker import StreamingChunker, TextChunker, get_chunker
+from .embedding_pipeline import estimate_tokens
+from .vector_service import make_point_id
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = "/var/www/intelligence/data/upload_index.sqlite3"
+INDEXED_EXTENSIONS = {'.txt', '.md', '.pdf', '.docx', '.xlsx'}
+UPLOAD_SOURCE = "existing_upload"
+
+
+def extraction_key(file_path: Path, document_id: Optional[str] = None) -> str:
+    """
+    Chiave dello store: il path per i file storici (document_id = nome file), path#id per
+    i documenti del registro, che possono condividere lo stesso file content-addressed
+    """
+    file_path = Path(file_path)
+    if document_id is None or document_id == file_path.stem:
+        return str(file_path)
+    return f"{file_path}#{document_id}"
+
+
+def file_sha256(file_path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class UploadIndex:
+    """
+    Indice dei documenti caricati (registro) e dei file storici di UPLOAD_DIR
+
+    - i documenti del registro vengono indicizzati dai job di ingestion (ingest_chunks)
+    - i file storici di UPLOAD_DIR solo dalla CLI vectorize (record_extraction);
+      /rag/chat non scansiona la directory
+    - lo store evita di ri-estrarre e ri-vettorizzare un file già registrato
+    """
+
+    def __init__(
+        self,
+        vector_service,
+        path: Optional[str] = None,
+        chunker: Optional[TextChunker] = None,
+    ):
+        self.vector_service = vector_service
+        self.chunker = chunker or get_chunker()
+        self.path = path or os.getenv("RAG_UPLOAD_INDEX_PATH", DEFAULT_INDEX_PATH)
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._fts_enabled = True
+
+    # ===== STORAGE =====
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extractions (
+                    path TEXT PRIMARY KEY,
+                    document_id TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    chunks INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_document ON extractions(document_id)")
+            try:
+                conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                        content, path UNINDEXED, filename UNINDEXED, chunk_index UNINDEXED,
+                        tokenize = 'unicode61 remove_diacritics 2'
+                    )
+                """)
+            except sqlite3.OperationalError as e:
+                logger.warning(f"FTS5 not available, keyword retrieval disabled: {e}")
+                self._fts_enabled = False
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params=()) -> List[tuple]:
+        with self._db_lock:
+            conn = self._get_conn()
+            rows = conn.execute(sql, params).fetchall()
+            conn.commit()
+            return rows
+
+    def _write_extraction(self, filename: str, row: tuple, chunks: List[str]):
+        key = row[0]
+        with self._db_lock:
+            conn = self._get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO extractions "
+                "(path, document_id, size, mtime, sha256, chunks, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                row
+            )
+            if self._fts_enabled:
+                conn.execute("DELETE FROM chunks_fts WHERE path = ?", (key,))
+                conn.executemany(
+                    "INSERT INTO chunks_fts (content, path, filename, chunk_index) VALUES (?, ?, ?, ?)",
+                    [(chunk, key, filename, i) for i, chunk in enumerate(chunks)]
+                )
+            conn.commit()
+
+    def _delete_extraction(self, path: str):
+        with self._db_lock:
+            conn = self._get_conn()
+            conn.execute("DELETE FROM extractions WHERE path = ?", (path,))
+            if self._fts_enabled:
+                conn.execute("DELETE FROM chunks_fts WHERE path = ?", (path,))
+            conn.commit()
+
+    # ===== INDEXING =====
+
+    async def _delete_points(self, document_id: str, chunks: int):
+        if not chunks:
+            return
+        point_ids = [make_point_id(document_id, i) for i in range(chunks)]
+        await asyncio.to_thread(
+            self.vector_service.qdrant_client.delete,
+            collection_name=self.vector_service.collection_name,
+            points_selector=point_ids
+        )
+
+    async def get_extraction(self, file_path: Path, document_id: Optional[str] = None) -> Optional[tuple]:
+        """Riga (document_id, size, mtime, sha256, chunks) dello store, se presente"""
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT document_id, size, mtime, sha256, chunks FROM extractions WHERE path = ?",
+            (extraction_key(file_path, document_id),)
+        )
+        return rows[0] if rows else None
+
+    async def chunk_stream(
+        self,
+        segments: AsyncIterable[str],
+        on_progress: Optional[Callable[[str, int, int], None]] = None,
+    ) -> List[str]:
+        """Chunk del testo man mano che l'estrazione produce i segmenti"""
+        chunker = StreamingChunker(self.chunker)
+        chunks: List[str] = []
+        async for segment in segments:
+            chunks.extend(c.text for c in chunker.feed(segment))
+            if on_progress:
+                on_progress('chunk', len(chunks), 0)
+        chunks.extend(c.text for c in chunker.flush())
+        if on_progress:
+            on_progress('chunk', len(chunks), len(chunks))
+        return chunks
+
+    async def ingest_chunks(
+        self,
+        file_path: Path,
+        chunks: List[str],
+        sha256: str,
+        on_progress: Optional[Callable[[str, int, int], None]] = None,
+        company_id: Optional[int] = None,
+        document_id: Optional[str] = None,
+        filename: Optional[str] = None,
+    ) -> int:
+        """
+        Embedding + upsert dei chunk e registrazione nello store.
+        Sostituisce i punti di una precedente versione del file. Ritorna i chunk indicizzati.
+        `on_progress(stage, done, total)` riceve l'avanzamento di embed/upsert.
+        `company_id` finisce nel payload dei punti (ricerca filtrata per azienda).
+        `document_id` / `filename`: documento del registro (default: nome del file storico).
+        """
+        file_path = Path(file_path)
+        stat = file_path.stat()
+        document_id = document_id or file_path.stem
+        filename = filename or file_path.name
+        existing = await self.get_extraction(file_path, document_id)
+
+        if existing:
+            await self._delete_points(existing[0], existing[4])
+
+        def pipeline_progress(metrics):
+            if on_progress:
+                on_progress('embed', metrics.chunks + metrics.cache_hits, len(chunks))
+                on_progress('upsert', metrics.upserted_points, len(chunks))
+
+        metadata = {'filename': filename, 'source': UPLOAD_SOURCE, 'content_type': 'document'}
+        if company_id is not None:
+            metadata['company_id'] = company_id
+        success = await self.vector_service.add_document_chunks(
+            [{'text': chunk, 'metadata': metadata} for chunk in chunks],
+            document_id,
+            on_progress=pipeline_progress
+        )
+        if not success:
+            raise RuntimeError(f"Vectorization incomplete for {file_path.name}")
+
+        await asyncio.to_thread(
+            self._write_extraction,
+            filename,
+            (extraction_key(file_path, document_id), document_id, stat.st_size, stat.st_mtime,
+             sha256, len(chunks), time.time()),
+            chunks
+        )
+        logger.info(f"Indexed upload {filename}: {len(chunks)} chunks")
+        return len(chunks)
+
+    async def record_extraction(self, file_path: Path, document_id: str, sha256: str, chunks: List[str],
+                                filename: Optional[str] = None):
+        """Registra un file già vettorizzato altrove (es. CLI vectorize) per evitarne la ri-indicizzazione"""
+        file_path = Path(file_path)
+        stat = file_path.stat()
+        await asyncio.to_thread(
+            self._write_extraction,
+            filename or file_path.name,
+            (extraction_key(file_path, document_id), document_id, stat.st_size, stat.st_mtime,
+             sha256, len(chunks), time.time()),
+            chunks
+        )
+
+    async def remove_document(self, document_id: str) -> int:
+        """
+        Rimuove dallo store estrazione e chunk FTS di un documento; i punti Qdrant
+        vengono cancellati dal chiamante (filtro document_id). Ritorna i chunk registrati.
+        """
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT path, chunks FROM extractions WHERE document_id = ?", (document_id,)
+        )
+        for path, _ in rows:
+            await asyncio.to_thread(self._delete_extraction, path)
+        return sum(chunks for _, chunks in rows)
+
+    # ===== RETRIEVAL =====
+
+    def _keyword_search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        if not self._fts_enabled:
+            return []
+        terms = [t for t in re.findall(r"\w+", query.lower()) if len(t) >= 3]
+        if not terms:
+            return []
+        match = " OR ".join(f'"{t}"' for t in terms)
+        rows = self._execute(
+            "SELECT f.content, f.filename, f.chunk_index, bm25(chunks_fts), e.document_id "
+            "FROM chunks_fts f LEFT JOIN extractions e ON e.path = f.path "
+            "WHERE chunks_fts MATCH ? ORDER BY bm25(chunks_fts) LIMIT ?",
+            (match, limit)
+        )
+        return [
+            {
+                'content': content,
+                'filename': filename,
+                'document_id': document_id or Path(filename).stem,
+                'chunk_index': int(chunk_index),
+                'score': -rank
+            }
+            for content, filename, chunk_index, rank, document_id in rows
+        ]
+
+    async def retrieve(
+        self,
+        query: str,
+        limit: int = 8,
+        token_budget: int = int(os.getenv("RAG_CHAT_CONTEXT_TOKENS", "6000")),
+        query_vector: Optional[List[float]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top chunk rilevanti tra i documenti caricati, entro `token_budget` token stimati
+        `filters` (es. company_id) restringe la ricerca vettoriale; lo store FTS locale non
+        conosce l'azienda, quindi con filtri il canale keyword non viene usato
+        """
+        # Filtro su source in Qdrant: niente più oversampling e scarto lato client
+        candidates = await self.vector_service.search_similar_chunks(
+            query, limit=limit, score_threshold=0.3, query_vector=query_vector,
+            filters={**(filters or {}), 'source': UPLOAD_SOURCE}
+        )
+
+        keyword_hits = []
+        if not filters:
+            try:
+                keyword_hits = await asyncio.to_thread(self._keyword_search, query, limit)
+            except Exception as e:
+                logger.warning(f"Keyword search failed: {e}")
+
+        seen = {(hit['filename'], hit['chunk_index']) for hit in candidates}
+        for hit in keyword_hits:
+            if len(candidates) >= limit:
+                break
+            key = (hit['filename'], hit['chunk_index'])
+            if key not in seen:
+                seen.add(key)
+                candidates.append(hit)
+
+        selected, used = [], 0
+        for hit in candidates:
+            tokens = estimate_tokens(hit['content'])
+            if used + tokens > token_budget:
+                continue
+            selected.append(hit)
+            used += tokens
+        return selected
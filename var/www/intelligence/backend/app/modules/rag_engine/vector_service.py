@@ -4,20 +4,240 @@ import asyncio
 import hashlib
 import json
 import logging
-from typing import List, Dict, Optional, Any
-from uuid import UUID, uuid4
+from typing import List, Dict, Optional, Any, Iterable, Tuple, Callable
+from uuid import UUID, uuid4, uuid5, NAMESPACE_URL
 from datetime import datetime
 
 import os
-import openai
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from qdrant_client.models import Filter, FieldCondition, MatchValue
+import threading
+import time
+from qdrant_client.models import Filter, FieldCondition, FilterSelector, MatchValue, MatchAny, PayloadSchemaType
+from qdrant_client.models import NamedVector, SearchRequest
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from app.core.clients import get_clients
+from .collection_config import CollectionConfig
+from .embedding_pipeline import EmbeddingPipeline, PipelineMetrics
+from .answer_cache import get_answer_cache
+
 logger = logging.getLogger(__name__)
 
+# Nome usato da tutti i lettori/scrittori: alias verso la collection versionata corrente
+# (intelligence_knowledge_v<timestamp>), oppure la collection storica non ancora migrata
+COLLECTION_ALIAS = "intelligence_knowledge"
+
+
+# Campi payload filtrabili: indicizzati alla creazione della collection
+PAYLOAD_INDEXES = {
+    "company_id": PayloadSchemaType.INTEGER,
+    "source": PayloadSchemaType.KEYWORD,
+    "content_type": PayloadSchemaType.KEYWORD,
+    "document_id": PayloadSchemaType.KEYWORD,
+    "filename": PayloadSchemaType.KEYWORD,
+    "embedding_model": PayloadSchemaType.KEYWORD,
+}
+
+# Soglia di similarità di default per modello (ada-002 ha punteggi coseno più alti)
+DEFAULT_SCORE_THRESHOLDS = {
+    "text-embedding-3-small": 0.3,
+    "text-embedding-3-large": 0.3,
+    "text-embedding-ada-002": 0.7,
+}
+
+# Layout reale della collection dietro l'alias e punti legacy ancora da migrare,
+# riletti periodicamente: dopo un flip o una migrazione i processi si adeguano da soli
+LAYOUT_TTL_SECONDS = 60
+
+# content_type di default per sorgente (punti scritti prima dei filtri)
+DEFAULT_CONTENT_TYPES = {
+    "existing_upload": "document",
+    "web_scraping": "web_page",
+    "web_scraping_v2": "web_page",
+    "wiki": "wiki",
+}
+
+
+def normalize_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Campi filtrabili a primo livello del payload: source/filename/company_id/content_type
+    ripresi dai metadata se mancanti, document_id sempre stringa (indice keyword)
+    """
+    metadata = payload.get("metadata") or {}
+    normalized = dict(payload)
+    for key in ("source", "filename", "content_type", "company_id"):
+        if normalized.get(key) is None and metadata.get(key) is not None:
+            normalized[key] = metadata[key]
+    if normalized.get("document_id") is not None:
+        normalized["document_id"] = str(normalized["document_id"])
+    if normalized.get("company_id") is not None:
+        try:
+            normalized["company_id"] = int(normalized["company_id"])
+        except (TypeError, ValueError):
+            normalized.pop("company_id")
+    if normalized.get("content_type") is None and normalized.get("source") in DEFAULT_CONTENT_TYPES:
+        normalized["content_type"] = DEFAULT_CONTENT_TYPES[normalized["source"]]
+    for key in ("source", "filename", "content_type", "company_id"):
+        if key in normalized and normalized[key] is None:
+            del normalized[key]
+    return normalized
+
+
+def payload_text(payload: Dict[str, Any]) -> str:
+    """Testo del chunk nel payload (content; text / chunk_text nei punti di altri percorsi)"""
+    return payload.get("content") or payload.get("text") or payload.get("chunk_text") or ""
+
+
+def filter_values(filters: Optional[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    Filtri normalizzati {campo: [valori]} (lista = uno qualsiasi), tipi come negli indici.
+    Solo i campi in PAYLOAD_INDEXES, valori None ignorati.
+    """
+    values: Dict[str, List[Any]] = {}
+    for key, value in (filters or {}).items():
+        if key not in PAYLOAD_INDEXES:
+            raise ValueError(f"Filtro non supportato: {key}")
+        if value is None:
+            continue
+        cast = int if PAYLOAD_INDEXES[key] == PayloadSchemaType.INTEGER else str
+        items = value if isinstance(value, (list, tuple, set)) else [value]
+        values[key] = [cast(v) for v in items]
+    return values
+
+
+def build_filter(filters: Optional[Dict[str, Any]]) -> Optional[Filter]:
+    """Filter Qdrant da {campo: valore | [valori]}"""
+    conditions = [
+        FieldCondition(key=key, match=MatchValue(value=values[0]) if len(values) == 1 else MatchAny(any=values))
+        for key, values in filter_values(filters).items()
+    ]
+    return Filter(must=conditions) if conditions else None
+
+
+def resolve_collection(qdrant_client, name: str) -> str:
+    """Collection fisica dietro un alias (il nome stesso se non è un alias)"""
+    for alias in qdrant_client.get_aliases().aliases:
+        if alias.alias_name == name:
+            return alias.collection_name
+    return name
+
+
+def collection_exists(qdrant_client, name: str) -> bool:
+    """True se `name` è una collection o un alias"""
+    if any(c.name == name for c in qdrant_client.get_collections().collections):
+        return True
+    return resolve_collection(qdrant_client, name) != name
+
+
+def ensure_payload_indexes(qdrant_client, collection_name: str) -> List[str]:
+    """
+    Crea gli indici payload mancanti (company_id, source, content_type, ...)
+    Ritorna i campi indicizzati ora
+    """
+    collection_name = resolve_collection(qdrant_client, collection_name)
+    info = qdrant_client.get_collection(collection_name)
+    existing = set((info.payload_schema or {}).keys())
+    created = []
+    for field_name, schema in PAYLOAD_INDEXES.items():
+        if field_name in existing:
+            continue
+        qdrant_client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=schema
+        )
+        created.append(field_name)
+    if created:
+        logger.info(f"✅ Payload indexes created on {collection_name}: {', '.join(created)}")
+    return created
+
+
+def make_point_id(document_id: str, chunk_index: int) -> str:
+    """
+    ID deterministico del punto Qdrant per (documento, chunk).
+    Qdrant accetta solo interi o UUID: re-ingestion dello stesso documento
+    sovrascrive i punti invece di duplicarli.
+    """
+    return str(uuid5(NAMESPACE_URL, f"{document_id}_{chunk_index}"))
+
+
+_layouts: Dict[Tuple[str, str], Tuple[float, CollectionConfig]] = {}
+_legacy_counts: Dict[Tuple[str, str], Tuple[float, int]] = {}
+
+
+def collection_layout(qdrant_client, collection_name: str, model: str, refresh: bool = False) -> CollectionConfig:
+    """CollectionConfig della collection esistente (named vectors, dimensioni), cache di LAYOUT_TTL_SECONDS"""
+    key = (collection_name, model)
+    cached = _layouts.get(key)
+    if cached and not refresh and time.monotonic() - cached[0] < LAYOUT_TTL_SECONDS:
+        return cached[1]
+    info = qdrant_client.get_collection(resolve_collection(qdrant_client, collection_name))
+    layout = CollectionConfig.from_collection_info(info, model)
+    _layouts[key] = (time.monotonic(), layout)
+    return layout
+
+
+def legacy_points(qdrant_client, collection_name: str, model: str) -> int:
+    """Punti il cui vettore principale è ancora di `model` (cache di LAYOUT_TTL_SECONDS)"""
+    key = (collection_name, model)
+    cached = _legacy_counts.get(key)
+    if cached and time.monotonic() - cached[0] < LAYOUT_TTL_SECONDS:
+        return cached[1]
+    count = qdrant_client.count(
+        collection_name=collection_name,
+        count_filter=Filter(must=[FieldCondition(key="embedding_model", match=MatchValue(value=model))]),
+        exact=False
+    ).count
+    _legacy_counts[key] = (time.monotonic(), count)
+    return count
+
+
+def chunk_result(hit) -> Dict[str, Any]:
+    """ScoredPoint → risultato nel formato di search_similar_chunks"""
+    metadata = hit.payload.get("metadata", {})
+    return {
+        "id": hit.id,
+        "score": hit.score,
+        "content": payload_text(hit.payload),
+        "document_id": hit.payload.get("document_id"),
+        "chunk_index": hit.payload.get("chunk_index", 0),
+        "filename": hit.payload.get("filename") or metadata.get("filename", ""),
+        "source": hit.payload.get("source") or metadata.get("source", ""),
+        "company_id": hit.payload.get("company_id"),
+        "content_type": hit.payload.get("content_type"),
+        "embedding_model": hit.payload.get("embedding_model"),
+        "metadata": metadata
+    }
+
+
+def _fuse_rankings(rankings: List[List[Any]], limit: int, k: int = 60) -> List[Any]:
+    """RRF di ricerche su spazi di embedding diversi (punteggi non confrontabili tra modelli)"""
+    if len(rankings) == 1:
+        return rankings[0][:limit]
+    scores: Dict[Any, float] = {}
+    hits: Dict[Any, Any] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            scores[hit.id] = scores.get(hit.id, 0.0) + 1.0 / (k + rank)
+            hits.setdefault(hit.id, hit)
+    return [hits[point_id] for point_id in sorted(scores, key=scores.get, reverse=True)[:limit]]
+
+
+# Collection già verificate in questo processo (una sola get_collections per collection)
+_ready_collections = set()
+_ready_lock = threading.Lock()
+
+
+def ensure_collection_once(collection_name: str, ensure: Callable[[], None]):
+    """Esegue `ensure` la prima volta che la collection viene usata nel processo"""
+    if collection_name in _ready_collections:
+        return
+    with _ready_lock:
+        if collection_name not in _ready_collections:
+            ensure()
+            _ready_collections.add(collection_name)
+
+
 class VectorRAGService:
     """
     Enterprise RAG Service con Vector Database
@@ -28,16 +248,18 @@ class VectorRAGService:
     - Graceful degradation
     """
     
-    def __init__(self):
-        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.qdrant_client = QdrantClient(
-            host="localhost",
-            port=6333,
-            timeout=30
+    def __init__(self, collection_config: Optional[CollectionConfig] = None, collection_name: str = COLLECTION_ALIAS):
+        # Client dal registro condiviso: nessuna connessione finché non servono
+        # collection_name è l'alias letto da tutti (re-index blue/green, app/scripts/reindex.py)
+        self.collection_name = collection_name
+        self.collection_config = collection_config or CollectionConfig()
+        self.embedding_model = self.collection_config.model
+        self.embedding_pipeline = EmbeddingPipeline(
+            model=self.embedding_model,
+            dimensions=self.collection_config.dimensions
         )
-        self.collection_name = "intelligence_knowledge"
-        self.chunk_size = 1000
-        self.chunk_overlap = 200
+        self._legacy_pipelines: Dict[str, EmbeddingPipeline] = {}
+        self.last_ingestion_metrics: Optional[Dict[str, Any]] = None
         
         # Database connection
         # Database config from environment
@@ -50,32 +272,54 @@ class VectorRAGService:
             'password': os.getenv("DB_PASSWORD", "intelligence_pass"),
             'port': int(os.getenv("DB_PORT", "5432"))
         }
-        
-        # Initialize collection
-        self._ensure_collection_exists()
+    
+    @property
+    def qdrant_client(self):
+        """Client Qdrant condiviso; la collection viene verificata al primo uso"""
+        client = get_clients().qdrant()
+        ensure_collection_once(self.collection_name, self._ensure_collection_exists)
+        return client
+    
+    def layout(self, refresh: bool = False) -> CollectionConfig:
+        """Layout reale della collection (può differire da collection_config fino al re-index)"""
+        return collection_layout(self.qdrant_client, self.collection_name, self.embedding_model, refresh)
+    
+    async def _legacy_points(self, model: str) -> int:
+        """legacy_points fuori dall'event loop: alla scadenza della cache è un count Qdrant"""
+        return await asyncio.to_thread(legacy_points, self.qdrant_client, self.collection_name, model)
+    
+    def _legacy_pipeline(self, model: str) -> EmbeddingPipeline:
+        if model not in self._legacy_pipelines:
+            self._legacy_pipelines[model] = EmbeddingPipeline(model=model)
+        return self._legacy_pipelines[model]
     
     def _ensure_collection_exists(self):
         """
-        Assicura che la collection Qdrant esista
+        Assicura che la collection Qdrant esista, creata secondo collection_config
+        (quantizzazione, on-disk, dimensioni)
         """
         try:
-            collections = self.qdrant_client.get_collections()
-            collection_exists = any(
-                c.name == self.collection_name 
-                for c in collections.collections
-            )
+            qdrant_client = get_clients().qdrant()
             
-            if not collection_exists:
-                self.qdrant_client.create_collection(
+            if not collection_exists(qdrant_client, self.collection_name):
+                qdrant_client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=1536,  # OpenAI text-embedding-3-small
-                        distance=Distance.COSINE
-                    )
+                    **self.collection_config.create_kwargs()
                 )
-                logger.info(f"✅ Created Qdrant collection: {self.collection_name}")
+                logger.info(f"✅ Created Qdrant collection: {self.collection_name} ({self.collection_config.describe()})")
             else:
                 logger.info(f"✅ Collection {self.collection_name} already exists")
+                # Una collection esistente non viene modificata: serve la ricostruzione
+                diffs = self.collection_config.differences(
+                    qdrant_client.get_collection(resolve_collection(qdrant_client, self.collection_name))
+                )
+                if diffs:
+                    logger.warning(
+                        f"⚠️ Collection {self.collection_name} differs from config ({'; '.join(diffs)}): "
+                        f"run app/scripts/reindex.py build"
+                    )
+            
+            ensure_payload_indexes(qdrant_client, self.collection_name)
                 
         except Exception as e:
             logger.error(f"❌ Error with Qdrant collection: {e}")
@@ -98,12 +342,8 @@ class VectorRAGService:
             'overall': False
         }
         
-        try:
-            # Test Qdrant
-            self.qdrant_client.get_collections()
-            health_status['qdrant'] = True
-        except:
-            pass
+        # Test Qdrant (client ricreato se non risponde)
+        health_status['qdrant'] = bool(get_clients().check_health()['qdrant'])
         
         try:
             # Test OpenAI (solo se hai una chiave valida)
@@ -130,12 +370,25 @@ class VectorRAGService:
         Statistiche del sistema
         """
         try:
-            info = self.qdrant_client.get_collection(self.collection_name)
+            physical_name = resolve_collection(self.qdrant_client, self.collection_name)
+            info = self.qdrant_client.get_collection(physical_name)
             return {
                 'total_points': info.points_count,
                 'vectors_count': info.vectors_count,
                 'status': info.status,
-                'collection_name': self.collection_name
+                'collection_name': self.collection_name,
+                'physical_collection': physical_name,
+                'collection_config': self.collection_config.describe(),
+                'estimated_vector_memory': self.collection_config.estimate_memory(info.points_count or 0),
+                'embedding_model': self.embedding_model,
+                'legacy_points': {
+                    model: legacy_points(self.qdrant_client, self.collection_name, model)
+                    for model in self.layout().legacy_models
+                },
+                'clients': get_clients().get_stats(),
+                'last_ingestion': self.last_ingestion_metrics,
+                'embedding_cache': self.embedding_pipeline.cache.get_stats() if self.embedding_pipeline.cache else None,
+                'answer_cache': get_answer_cache().get_stats() if get_answer_cache() else None
             }
         except Exception as e:
             return {'error': str(e)}
@@ -145,82 +398,297 @@ class VectorRAGService:
         Genera embeddings per il testo usando OpenAI
         """
         try:
-            response = self.openai_client.embeddings.create(
-                model="text-embedding-3-small",
-                input=text
-            )
-            return response.data[0].embedding
+            embeddings = await self.embedding_pipeline.embed_texts([text])
+            if embeddings[0] is None:
+                raise ValueError("Embedding non generato per il testo fornito")
+            return embeddings[0]
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
             raise
     
-    async def add_document_chunks(self, chunks: List[Dict[str, Any]], document_id: str) -> bool:
+    async def upsert_texts(
+        self,
+        items: Iterable[Tuple[Any, str, Dict[str, Any]]],
+        on_progress: Optional[Callable[[PipelineMetrics], None]] = None
+    ) -> PipelineMetrics:
+        """
+        Embedding + upsert di tuple (point_id, testo, payload) tramite la pipeline batch
+        """
+        metrics = await self.embedding_pipeline.embed_and_upsert(
+            self.qdrant_client,
+            self.collection_name,
+            items,
+            on_progress=on_progress,
+            vector_name=self.layout().vector_name(self.embedding_model)
+        )
+        self.last_ingestion_metrics = metrics.to_dict()
+        return metrics
+    
+    def _invalidate_answers(self, document_ids: List[Any]):
+        """Risposte in cache costruite su documenti cambiati non sono più valide"""
+        answer_cache = get_answer_cache()
+        if answer_cache is not None:
+            answer_cache.invalidate_documents(document_ids)
+    
+    async def delete_document(self, document_id: str) -> int:
+        """Cancella tutti i punti di un documento (filtro indicizzato su document_id); ritorna i punti rimossi"""
+        document_filter = Filter(must=[FieldCondition(key="document_id", match=MatchValue(value=document_id))])
+        client = self.qdrant_client
+        count = await asyncio.to_thread(
+            client.count, collection_name=self.collection_name, count_filter=document_filter, exact=True
+        )
+        if count.count:
+            await asyncio.to_thread(
+                client.delete,
+                collection_name=self.collection_name,
+                points_selector=FilterSelector(filter=document_filter)
+            )
+        self._invalidate_answers([document_id])
+        return count.count
+    
+    async def add_document_chunks(
+        self,
+        chunks: List[Dict[str, Any]],
+        document_id: str,
+        on_progress: Optional[Callable[[PipelineMetrics], None]] = None
+    ) -> bool:
         """
         Aggiunge chunks di documento al vector database
         """
         try:
-            points = []
+            items = []
             for i, chunk in enumerate(chunks):
-                # Genera embeddings per il chunk
-                embedding = await self.generate_embeddings(chunk.get("content", chunk.get("text", "")))
-                
-                # Crea punto per Qdrant
-                point = PointStruct(
-                    id=f"{document_id}_{i}",
-                    vector=embedding,
-                    payload={
-                        "document_id": document_id,
-                        "chunk_index": i,
-                        "content": chunk.get("content", chunk.get("text", "")),
-                        "metadata": chunk.get('metadata', {})
-                    }
-                )
-                points.append(point)
+                content = chunk.get("content", chunk.get("text", ""))
+                metadata = chunk.get('metadata', {})
+                # filename/source/company_id/content_type a primo livello: filtri e delete
+                payload = normalize_payload({
+                    "document_id": document_id,
+                    "chunk_index": i,
+                    "content": content,
+                    "metadata": metadata
+                })
+                items.append((make_point_id(document_id, i), content, payload))
             
-            # Inserisci in Qdrant
-            self.qdrant_client.upsert(
-                collection_name=self.collection_name,
-                points=points
-            )
+            metrics = await self.upsert_texts(items, on_progress=on_progress)
+            self._invalidate_answers([document_id])
             
-            logger.info(f"✅ Added {len(points)} chunks for document {document_id}")
-            return True
+            logger.info(f"✅ Added {metrics.upserted_points}/{len(chunks)} chunks for document {document_id}")
+            return metrics.failed_chunks == 0
             
         except Exception as e:
             logger.error(f"Error adding document chunks: {e}")
             return False
     
-    async def search_similar_chunks(self, query: str, limit: int = 5, score_threshold: float = 0.3) -> List[Dict[str, Any]]:
+    async def _search_model(
+        self,
+        layout: CollectionConfig,
+        model: str,
+        query_vector: List[float],
+        query_filter: Optional[Filter],
+        limit: int,
+        score_threshold: float
+    ) -> List[Any]:
+        if model != self.embedding_model:
+            # Solo i punti non ancora migrati: gli altri sono già nel vettore del modello corrente
+            legacy = FieldCondition(key="embedding_model", match=MatchValue(value=model))
+            query_filter = Filter(must=[*(query_filter.must if query_filter else []), legacy])
+        name = layout.vector_name(model)
+        return await asyncio.to_thread(
+            self.qdrant_client.search,
+            collection_name=self.collection_name,
+            query_vector=(name, query_vector) if name else query_vector,
+            query_filter=query_filter,
+            search_params=layout.search_params(),
+            limit=limit,
+            score_threshold=score_threshold
+        )
+    
+    async def search_points(
+        self,
+        query: str,
+        limit: int = 5,
+        score_threshold: Optional[float] = None,
+        query_vector: Optional[List[float]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        """
+        Ricerca per modello di embedding: la query è confrontata solo con vettori dello
+        stesso modello. Finché esistono punti legacy (es. ada-002 non ancora migrati) anche
+        il loro vettore viene interrogato, con un embedding della query dello stesso modello;
+        le classifiche sono fuse con RRF. Ritorna i punti Qdrant (ScoredPoint).
+        `score_threshold` vale per il modello corrente, i legacy usano DEFAULT_SCORE_THRESHOLDS.
+        """
+        query_filter = build_filter(filters)
+        query_vector = query_vector or await self.generate_embeddings(query)
+        if score_threshold is None:
+            score_threshold = DEFAULT_SCORE_THRESHOLDS.get(self.embedding_model, 0.3)
+        
+        for attempt in range(2):
+            # Layout riletto e ricerca ripetuta una volta se la collection dietro l'alias è cambiata
+            layout = self.layout(refresh=attempt > 0)
+            try:
+                rankings = [await self._search_model(
+                    layout, self.embedding_model, query_vector, query_filter, limit, score_threshold
+                )]
+                for model in layout.legacy_models:
+                    if not await self._legacy_points(model):
+                        continue
+                    legacy_vector = (await self._legacy_pipeline(model).embed_texts([query]))[0]
+                    if legacy_vector is None:
+                        continue
+                    rankings.append(await self._search_model(
+                        layout, model, legacy_vector, query_filter, limit,
+                        DEFAULT_SCORE_THRESHOLDS.get(model, score_threshold)
+                    ))
+                return _fuse_rankings(rankings, limit)
+            except Exception as e:
+                if attempt:
+                    raise
+                logger.warning(f"Search failed, reloading collection layout: {e}")
+        return []
+    
+    async def search_similar_chunks(
+        self,
+        query: str,
+        limit: int = 5,
+        score_threshold: float = 0.3,
+        query_vector: Optional[List[float]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Ricerca chunks simili alla query
+        `query_vector` evita di ricalcolare l'embedding se il chiamante lo ha già
+        `filters` restringe la ricerca, es. {"company_id": 3, "source": ["wiki", "existing_upload"]}
         """
+        # Filtro non valido: errore del chiamante, non "nessun risultato"
+        build_filter(filters)
         try:
-            # Genera embedding per la query
-            query_embedding = await self.generate_embeddings(query)
-            
-            # Ricerca in Qdrant
-            search_result = self.qdrant_client.search(
-                collection_name=self.collection_name,
-                query_vector=query_embedding,
-                limit=limit,
-                score_threshold=score_threshold
-            )
-            
-            # Formatta risultati
-            results = []
-            for hit in search_result:
-                results.append({
-                    "id": hit.id,
-                    "score": hit.score,
-                    "content": hit.payload.get("content", hit.payload.get("text", "")),
-                    "document_id": hit.payload["document_id"],
-                    "chunk_index": hit.payload["chunk_index"],
-                    "filename": hit.payload.get("filename", ""),
-                    "metadata": hit.payload.get("metadata", {})
-                })
-            
-            return results
+            search_result = await self.search_points(query, limit, score_threshold, query_vector, filters)
+            return [chunk_result(hit) for hit in search_result]
             
         except Exception as e:
             logger.error(f"Error searching similar chunks: {e}")
             return []
+    
+    def _search_request(
+        self,
+        layout: CollectionConfig,
+        model: str,
+        query_vector: List[float],
+        query_filter: Optional[Filter],
+        limit: int,
+        score_threshold: float
+    ) -> SearchRequest:
+        """Equivalente di _search_model come SearchRequest per search_batch"""
+        if model != self.embedding_model:
+            legacy = FieldCondition(key="embedding_model", match=MatchValue(value=model))
+            query_filter = Filter(must=[*(query_filter.must if query_filter else []), legacy])
+        name = layout.vector_name(model)
+        return SearchRequest(
+            vector=NamedVector(name=name, vector=query_vector) if name else query_vector,
+            filter=query_filter,
+            params=layout.search_params(),
+            limit=limit,
+            score_threshold=score_threshold,
+            with_payload=True
+        )
+    
+    async def _batch_vectors(self, pipeline: EmbeddingPipeline, texts: List[str]) -> Dict[str, List[float]]:
+        """Embedding dei testi distinti in una sola chiamata della pipeline"""
+        unique = list(dict.fromkeys(t for t in texts if t))
+        if not unique:
+            return {}
+        vectors = await pipeline.embed_texts(unique)
+        return {text: vector for text, vector in zip(unique, vectors) if vector is not None}
+    
+    async def search_batch(self, queries: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Più ricerche in una volta: embedding di tutte le query in una sola richiesta e un
+        solo round-trip Qdrant (search_batch), compresi i vettori dei modelli legacy.
+        `queries`: [{"id", "query", "limit", "score_threshold", "filters", "query_vector"}]
+        (solo "query" o "query_vector" obbligatorio; id di default = posizione).
+        Ritorna {id: risultati nel formato di search_similar_chunks};
+        ValueError per filtri non validi o id duplicati.
+        """
+        specs = []
+        for position, item in enumerate(queries):
+            specs.append({
+                "id": str(item.get("id", position)),
+                "query": item.get("query") or "",
+                "vector": item.get("query_vector"),
+                "limit": int(item.get("limit") or 5),
+                "score_threshold": item.get("score_threshold"),
+                "filter": build_filter(item.get("filters")),
+            })
+        ids = [spec["id"] for spec in specs]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Id delle query duplicati")
+        
+        vectors = await self._batch_vectors(
+            self.embedding_pipeline, [spec["query"] for spec in specs if spec["vector"] is None]
+        )
+        for spec in specs:
+            if spec["vector"] is None:
+                spec["vector"] = vectors.get(spec["query"])
+        default_threshold = DEFAULT_SCORE_THRESHOLDS.get(self.embedding_model, 0.3)
+        
+        for attempt in range(2):
+            layout = self.layout(refresh=attempt > 0)
+            try:
+                # (posizione della query, richiesta): più richieste per query con modelli legacy
+                requests: List[Tuple[int, SearchRequest]] = []
+                for i, spec in enumerate(specs):
+                    if spec["vector"] is None:
+                        continue
+                    threshold = spec["score_threshold"]
+                    requests.append((i, self._search_request(
+                        layout, self.embedding_model, spec["vector"], spec["filter"], spec["limit"],
+                        default_threshold if threshold is None else threshold
+                    )))
+                for model in layout.legacy_models:
+                    if not await self._legacy_points(model):
+                        continue
+                    legacy_vectors = await self._batch_vectors(
+                        self._legacy_pipeline(model), [spec["query"] for spec in specs]
+                    )
+                    for i, spec in enumerate(specs):
+                        if spec["query"] in legacy_vectors:
+                            requests.append((i, self._search_request(
+                                layout, model, legacy_vectors[spec["query"]], spec["filter"], spec["limit"],
+                                DEFAULT_SCORE_THRESHOLDS.get(model, default_threshold)
+                            )))
+                
+                found = await asyncio.to_thread(
+                    self.qdrant_client.search_batch,
+                    collection_name=self.collection_name,
+                    requests=[request for _, request in requests]
+                ) if requests else []
+                
+                rankings: Dict[int, List[List[Any]]] = {}
+                for (i, _), hits in zip(requests, found):
+                    rankings.setdefault(i, []).append(hits)
+                return {
+                    spec["id"]: [
+                        chunk_result(hit) for hit in _fuse_rankings(rankings[i], spec["limit"])
+                    ] if i in rankings else []
+                    for i, spec in enumerate(specs)
+                }
+            except Exception as e:
+                if attempt:
+                    raise
+                logger.warning(f"Batch search failed, reloading collection layout: {e}")
+        return {}
+
+
+_vector_service: Optional[VectorRAGService] = None
+_vector_service_lock = threading.Lock()
+
+
+def get_vector_service() -> VectorRAGService:
+    """VectorRAGService condiviso da route, knowledge manager, wiki e processori"""
+    global _vector_service
+    if _vector_service is None:
+        with _vector_service_lock:
+            if _vector_service is None:
+                _vector_service = VectorRAGService()
+    return _vector_service
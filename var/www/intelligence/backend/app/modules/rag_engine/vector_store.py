@@ -0,0 +1,940 @@
+"""
+Vector Store locale per RAG Engine
+Backend NumPy in-process con il sottoinsieme dell'API QdrantClient usato dal progetto
+(search, search_batch, scroll, retrieve, upsert, delete, count, payload, named vector,
+alias): sviluppo, test, tenant piccoli e baseline esatta per misurare il recall HNSW.
+Selezionato da get_clients().qdrant() con VECTOR_STORE=numpy.
+
+- vettori in matrici float32 per nome di vettore, normalizzati (distanza Cosine)
+- top-k esatto per prodotto matrice × query con argpartition, anche a batch
+- filtri payload (must / should / must_not, match, range, has_id, is_empty) e indice
+  invertito sui campi di create_payload_index
+- persistenza in LOCAL_VECTOR_STORE_PATH: .npy caricati in memory-map e copiati in RAM
+  alla prima scrittura, payload e metadati JSON, scritture atomiche con flush differito
+  (LOCAL_VECTOR_STORE_FLUSH_SECONDS); path vuoto = solo in memoria
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+from qdrant_client.models import (
+    AliasDescription, BinaryQuantization, BinaryQuantizationConfig, CollectionDescription,
+    CollectionsAliasesResponse, CollectionsResponse, CountResult, Record, ScalarQuantization,
+    ScalarQuantizationConfig, ScalarType, ScoredPoint, UpdateResult, UpdateStatus, VectorParams
+)
+
+from .collection_config import quantization_mode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = "/var/www/intelligence/data/vector_store"
+SUPPORTED_DISTANCES = ("Cosine", "Dot")
+INITIAL_CAPACITY = 1024
+
+# Chiave del vettore senza nome (layout storico a vettore unico)
+DEFAULT_VECTOR = ""
+
+PointId = Union[int, str]
+
+
+# ===== CALCOLO =====
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Righe a norma 1 (le righe nulle restano nulle)"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indici dei `k` punteggi più alti per riga di `scores` (query × punti), in ordine
+    decrescente; argpartition evita l'ordinamento completo. I punti esclusi hanno -inf
+    e vanno scartati dal chiamante.
+    """
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+# ===== ID E PAYLOAD =====
+
+def normalize_id(point_id) -> PointId:
+    """Id Qdrant: intero non negativo o UUID (forma canonica)"""
+    if isinstance(point_id, bool):
+        raise ValueError(f"Id punto non valido: {point_id!r}")
+    if isinstance(point_id, (int, np.integer)):
+        if point_id < 0:
+            raise ValueError(f"Id punto non valido: {point_id!r}")
+        return int(point_id)
+    try:
+        return str(uuid.UUID(str(point_id)))
+    except ValueError:
+        raise ValueError(f"Id punto non valido: {point_id!r}")
+
+
+def id_key(point_id: PointId) -> Tuple[int, Any]:
+    """Ordinamento dello scroll: prima gli interi, poi gli UUID"""
+    return (0, point_id) if isinstance(point_id, int) else (1, point_id)
+
+
+def payload_values(payload: Optional[Dict[str, Any]], key: str) -> List[Any]:
+    """Valori di `key` nel payload ("a.b", "a[].b"); le liste vengono appiattite"""
+    values = [payload or {}]
+    for part in key.replace("[]", "").split("."):
+        found = []
+        for value in values:
+            for item in (value if isinstance(value, list) else [value]):
+                if isinstance(item, dict) and part in item:
+                    found.append(item[part])
+        values = found
+    flat = []
+    for value in values:
+        flat.extend(value if isinstance(value, list) else [value])
+    return flat
+
+
+def filter_conditions(value) -> List[Any]:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def is_filter(condition) -> bool:
+    return any(hasattr(condition, name) for name in ("must", "should", "must_not"))
+
+
+def _match(match, values: List[Any]) -> bool:
+    if hasattr(match, "value"):
+        return match.value in values
+    if hasattr(match, "any"):
+        return any(value in match.any for value in values)
+    if hasattr(match, "except_"):
+        return not any(value in match.except_ for value in values)
+    if hasattr(match, "text"):
+        return any(isinstance(value, str) and match.text in value for value in values)
+    raise ValueError(f"Match non supportato: {match}")
+
+
+def _in_range(range_, values: List[Any]) -> bool:
+    bounds = [
+        (getattr(range_, "gt", None), lambda v, b: v > b),
+        (getattr(range_, "gte", None), lambda v, b: v >= b),
+        (getattr(range_, "lt", None), lambda v, b: v < b),
+        (getattr(range_, "lte", None), lambda v, b: v <= b),
+    ]
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if all(bound is None or check(value, bound) for bound, check in bounds):
+            return True
+    return False
+
+
+def _condition(condition, point_id: PointId, payload: Optional[Dict[str, Any]]) -> bool:
+    if is_filter(condition):
+        return matches(condition, point_id, payload)
+    has_id = getattr(condition, "has_id", None)
+    if has_id is not None:
+        return point_id in {normalize_id(i) for i in has_id}
+    for name, empty in (("is_empty", True), ("is_null", False)):
+        # IsEmptyCondition(is_empty=PayloadField) o FieldCondition(key, is_empty=True)
+        nested = getattr(condition, name, None)
+        if nested is not None and nested is not False:
+            values = payload_values(payload, condition.key if nested is True else nested.key)
+            return not values if empty else None in values
+    key = getattr(condition, "key", None)
+    if key is None:
+        raise ValueError(f"Condizione di filtro non supportata: {condition}")
+    values = payload_values(payload, key)
+    if getattr(condition, "match", None) is not None:
+        return _match(condition.match, values)
+    if getattr(condition, "range", None) is not None:
+        return _in_range(condition.range, values)
+    raise ValueError(f"Condizione di filtro non supportata: {condition}")
+
+
+def matches(filter_, point_id: PointId, payload: Optional[Dict[str, Any]]) -> bool:
+    """Valutazione di un Filter Qdrant su un punto"""
+    if filter_ is None:
+        return True
+    if not all(_condition(c, point_id, payload) for c in filter_conditions(getattr(filter_, "must", None))):
+        return False
+    should = filter_conditions(getattr(filter_, "should", None))
+    if should and not any(_condition(c, point_id, payload) for c in should):
+        return False
+    return not any(_condition(c, point_id, payload) for c in filter_conditions(getattr(filter_, "must_not", None)))
+
+
+def select_payload(payload: Optional[Dict[str, Any]], with_payload) -> Optional[Dict[str, Any]]:
+    """with_payload: bool, lista di chiavi o PayloadSelectorInclude / Exclude"""
+    if not with_payload or payload is None:
+        return None
+    if with_payload is True:
+        return dict(payload)
+    include = getattr(with_payload, "include", None)
+    exclude = getattr(with_payload, "exclude", None)
+    if exclude is not None:
+        return {k: v for k, v in payload.items() if k not in exclude}
+    keys = include if include is not None else with_payload
+    return {k: payload[k] for k in keys if k in payload}
+
+
+def _hashable(value) -> bool:
+    return isinstance(value, (str, int, float, bool))
+
+
+# ===== COLLECTION =====
+
+@dataclass
+class LocalCollectionParams:
+    vectors: Any
+    on_disk_payload: bool = False
+
+
+@dataclass
+class LocalCollectionConfig:
+    params: LocalCollectionParams
+    quantization_config: Any = None
+
+
+@dataclass
+class LocalCollectionInfo:
+    """Sottoinsieme di CollectionInfo letto dal progetto"""
+    config: LocalCollectionConfig
+    points_count: int
+    vectors_count: int
+    indexed_vectors_count: int
+    payload_schema: Dict[str, Any] = field(default_factory=dict)
+    status: str = "green"
+
+
+class _Collection:
+    """Punti di una collection: righe di matrici float32, payload e indice invertito"""
+
+    def __init__(self, vectors: Dict[str, Dict[str, Any]], named: bool, on_disk_payload: bool = False,
+                 quantization: str = "none", payload_schema: Optional[Dict[str, str]] = None):
+        self.vectors = vectors
+        self.named = named
+        self.on_disk_payload = on_disk_payload
+        self.quantization = quantization
+        self.payload_schema = dict(payload_schema or {})
+        self.ids: List[Optional[PointId]] = []
+        self.payloads: List[Optional[Dict[str, Any]]] = []
+        self.rows: Dict[PointId, int] = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.matrices = {name: np.zeros((0, spec["size"]), dtype=np.float32) for name, spec in vectors.items()}
+        self.present = {name: np.zeros(0, dtype=bool) for name in vectors}
+        self.index: Dict[str, Dict[Any, Set[int]]] = {key: {} for key in self.payload_schema}
+        self.deleted = 0
+        self.dirty = False
+        self._order: Optional[Tuple[List[Tuple[int, Any]], List[int]]] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @property
+    def points_count(self) -> int:
+        return len(self.rows)
+
+    # ----- righe -----
+
+    def _reserve(self, rows: int):
+        """Capacità per `rows` righe; le matrici in memory-map vengono copiate in RAM"""
+        capacity = len(self.alive)
+        writable = all(isinstance(m, np.ndarray) and not isinstance(m, np.memmap) for m in self.matrices.values())
+        if rows <= capacity and writable:
+            return
+        capacity = max(capacity, INITIAL_CAPACITY)
+        while capacity < rows:
+            capacity *= 2
+        size = self.size
+        for name, matrix in self.matrices.items():
+            grown = np.zeros((capacity, matrix.shape[1]), dtype=np.float32)
+            grown[:size] = matrix[:size]
+            self.matrices[name] = grown
+            present = np.zeros(capacity, dtype=bool)
+            present[:size] = self.present[name][:size]
+            self.present[name] = present
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:size] = self.alive[:size]
+        self.alive = alive
+
+    def _vector(self, name: str, vector) -> np.ndarray:
+        spec = self.vectors.get(name)
+        if spec is None:
+            raise ValueError(f"Vettore {name or '(default)'} inesistente nella collection")
+        array = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if array.shape[0] != spec["size"]:
+            raise ValueError(f"Dimensione vettore {name or '(default)'}: attesa {spec['size']}, ricevuta {array.shape[0]}")
+        return normalize_rows(array) if spec["distance"] == "Cosine" else array
+
+    def _named(self, vector) -> Dict[str, Any]:
+        if vector is None:
+            return {}
+        if isinstance(vector, dict):
+            return vector
+        return {DEFAULT_VECTOR: vector}
+
+    def _index_add(self, row: int):
+        for key, values in self.index.items():
+            for value in payload_values(self.payloads[row], key):
+                if _hashable(value):
+                    values.setdefault(value, set()).add(row)
+
+    def _index_remove(self, row: int):
+        for key, values in self.index.items():
+            for value in payload_values(self.payloads[row], key):
+                if _hashable(value) and value in values:
+                    values[value].discard(row)
+
+    def build_index(self, key: str):
+        self.index[key] = {}
+        for row in self.rows.values():
+            for value in payload_values(self.payloads[row], key):
+                if _hashable(value):
+                    self.index[key].setdefault(value, set()).add(row)
+
+    def upsert(self, point_id: PointId, vector, payload: Optional[Dict[str, Any]]):
+        """Inserisce o sostituisce il punto (vettori e payload)"""
+        vectors = {name: self._vector(name, v) for name, v in self._named(vector).items()}
+        row = self.rows.get(point_id)
+        if row is None:
+            self._reserve(self.size + 1)
+            row = self.size
+            self.ids.append(point_id)
+            self.payloads.append(None)
+            self.rows[point_id] = row
+            self.alive[row] = True
+            self._order = None
+        else:
+            self._reserve(self.size)
+            self._index_remove(row)
+        for name in self.matrices:
+            self.present[name][row] = name in vectors
+            self.matrices[name][row] = vectors.get(name, 0)
+        self.payloads[row] = dict(payload or {})
+        self._index_add(row)
+
+    def update_vectors(self, row: int, vector):
+        vectors = {name: self._vector(name, v) for name, v in self._named(vector).items()}
+        self._reserve(self.size)
+        for name, array in vectors.items():
+            self.matrices[name][row] = array
+            self.present[name][row] = True
+
+    def delete_vectors(self, row: int, names: Iterable[str]):
+        self._reserve(self.size)
+        for name in names:
+            if name not in self.present:
+                raise ValueError(f"Vettore {name} inesistente nella collection")
+            self.present[name][row] = False
+            self.matrices[name][row] = 0
+
+    def set_payload(self, row: int, payload: Dict[str, Any], replace: bool = False):
+        self._index_remove(row)
+        self.payloads[row] = dict(payload) if replace else {**(self.payloads[row] or {}), **payload}
+        self._index_add(row)
+
+    def delete(self, row: int):
+        self._index_remove(row)
+        self._reserve(self.size)
+        del self.rows[self.ids[row]]
+        self.ids[row] = None
+        self.payloads[row] = None
+        self.alive[row] = False
+        for name in self.present:
+            self.present[name][row] = False
+        self.deleted += 1
+        self._order = None
+        if self.deleted > max(INITIAL_CAPACITY, self.size // 2):
+            self.compact()
+
+    def compact(self):
+        """Elimina le righe cancellate (renumerazione di righe e indice)"""
+        if not self.deleted:
+            return
+        keep = np.flatnonzero(self.alive[:self.size])
+        self.ids = [self.ids[r] for r in keep]
+        self.payloads = [self.payloads[r] for r in keep]
+        self.rows = {point_id: row for row, point_id in enumerate(self.ids)}
+        self.matrices = {name: np.array(m[keep], dtype=np.float32) for name, m in self.matrices.items()}
+        self.present = {name: np.array(p[keep]) for name, p in self.present.items()}
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.deleted = 0
+        self._order = None
+        for key in list(self.index):
+            self.build_index(key)
+
+    # ----- lettura -----
+
+    def vector_of(self, row: int, with_vectors):
+        if not with_vectors:
+            return None
+        names = [n for n in self.matrices if self.present[n][row]]
+        if isinstance(with_vectors, (list, tuple)):
+            names = [n for n in names if n in with_vectors]
+        vectors = {name: self.matrices[name][row].tolist() for name in names}
+        if not self.named:
+            return vectors.get(DEFAULT_VECTOR)
+        return vectors
+
+    def sorted_rows(self) -> Tuple[List[Tuple[int, Any]], List[int]]:
+        """Righe vive ordinate per id (cache invalidata da inserimenti e cancellazioni)"""
+        if self._order is None:
+            rows = sorted(self.rows.values(), key=lambda r: id_key(self.ids[r]))
+            self._order = ([id_key(self.ids[r]) for r in rows], rows)
+        return self._order
+
+    def _candidates(self, filter_) -> Optional[Set[int]]:
+        """Righe candidate dall'indice invertito (condizioni must su campi indicizzati)"""
+        candidates = None
+        for condition in filter_conditions(getattr(filter_, "must", None)):
+            key = getattr(condition, "key", None)
+            match = getattr(condition, "match", None)
+            if key not in self.index or match is None:
+                continue
+            if hasattr(match, "value"):
+                wanted = [match.value]
+            elif hasattr(match, "any"):
+                wanted = list(match.any)
+            else:
+                continue
+            rows = set().union(*(self.index[key].get(v, set()) for v in wanted if _hashable(v)))
+            candidates = rows if candidates is None else candidates & rows
+        return candidates
+
+    def filter_mask(self, filter_) -> np.ndarray:
+        """Maschera booleana (size) dei punti vivi che soddisfano il filtro"""
+        mask = self.alive[:self.size].copy()
+        if filter_ is None:
+            return mask
+        candidates = self._candidates(filter_)
+        rows = np.flatnonzero(mask) if candidates is None else [r for r in candidates if mask[r]]
+        result = np.zeros(self.size, dtype=bool)
+        for row in rows:
+            result[row] = matches(filter_, self.ids[row], self.payloads[row])
+        return result
+
+    def scores(self, name: str, queries: np.ndarray) -> np.ndarray:
+        """Punteggi query × righe (righe senza il vettore a -inf)"""
+        spec = self.vectors.get(name)
+        if spec is None:
+            raise ValueError(f"Vettore {name or '(default)'} inesistente nella collection")
+        if queries.shape[1] != spec["size"]:
+            raise ValueError(f"Dimensione query {name or '(default)'}: attesa {spec['size']}, ricevuta {queries.shape[1]}")
+        if spec["distance"] == "Cosine":
+            queries = normalize_rows(queries)
+        scores = queries @ self.matrices[name][:self.size].T
+        scores[:, ~self.present[name][:self.size]] = -np.inf
+        return scores
+
+    # ----- metadati -----
+
+    def info(self) -> LocalCollectionInfo:
+        vectors = sum(int(p[:self.size].sum()) for p in self.present.values())
+        return collection_info(self.meta(), self.points_count, vectors)
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "named": self.named,
+            "vectors": self.vectors,
+            "on_disk_payload": self.on_disk_payload,
+            "quantization": self.quantization,
+            "payload_schema": self.payload_schema,
+            "points": self.points_count,
+        }
+
+
+def collection_info(meta: Dict[str, Any], points: int, vectors: int) -> LocalCollectionInfo:
+    """CollectionInfo dai metadati di una collection (vedi _Collection.meta)"""
+    params = {
+        name: VectorParams(size=spec["size"], distance=spec["distance"], on_disk=spec.get("on_disk", False))
+        for name, spec in meta["vectors"].items()
+    }
+    quantization = {
+        "scalar": lambda: ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)),
+        "binary": lambda: BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True)),
+    }.get(meta.get("quantization", "none"), lambda: None)()
+    return LocalCollectionInfo(
+        config=LocalCollectionConfig(
+            params=LocalCollectionParams(
+                vectors=params if meta["named"] else params[DEFAULT_VECTOR],
+                on_disk_payload=meta.get("on_disk_payload", False)
+            ),
+            quantization_config=quantization
+        ),
+        points_count=points,
+        vectors_count=vectors,
+        indexed_vectors_count=vectors,
+        payload_schema=dict(meta.get("payload_schema") or {}),
+    )
+
+
+def vectors_spec(vectors_config) -> Tuple[Dict[str, Dict[str, Any]], bool]:
+    """VectorParams o {nome: VectorParams} → ({nome: spec}, named)"""
+    named = isinstance(vectors_config, dict)
+    configs = vectors_config if named else {DEFAULT_VECTOR: vectors_config}
+    spec = {}
+    for name, params in configs.items():
+        distance = getattr(params.distance, "value", params.distance)
+        if distance not in SUPPORTED_DISTANCES:
+            raise ValueError(f"Distanza non supportata: {distance} ({', '.join(SUPPORTED_DISTANCES)})")
+        spec[name] = {"size": int(params.size), "distance": distance, "on_disk": bool(getattr(params, "on_disk", False))}
+    return spec, named
+
+
+def point_selector(selector) -> Tuple[List[PointId], Any]:
+    """(id, None) o ([], Filter) da lista di id, PointIdsList, FilterSelector o Filter"""
+    if selector is None:
+        return [], None
+    points = getattr(selector, "points", None)
+    if points is not None:
+        selector = points
+    if getattr(selector, "filter", None) is not None:
+        selector = selector.filter
+    if is_filter(selector):
+        return [], selector
+    return [normalize_id(i) for i in selector], None
+
+
+def _save_npy(path: Path, array: np.ndarray):
+    # File aperto esplicitamente: np.save aggiungerebbe .npy al nome temporaneo
+    with open(path, "wb") as f:
+        np.save(f, array)
+
+
+def update_completed() -> UpdateResult:
+    return UpdateResult(operation_id=0, status=UpdateStatus.COMPLETED)
+
+
+# ===== STORE =====
+
+class NumpyVectorStore:
+    """
+    Sostituto in-process di QdrantClient per sviluppo, test e tenant piccoli
+
+    - ricerca esatta (nessun indice approssimato): il recall è quello del brute force,
+      riferimento per scripts/benchmark_vector_store.py
+    - thread-safe: i servizi lo chiamano da asyncio.to_thread come il client Qdrant
+    - quantizzazione e on_disk vengono registrati ma non cambiano la ricerca
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = os.getenv("LOCAL_VECTOR_STORE_PATH", DEFAULT_STORE_PATH),
+        flush_seconds: float = float(os.getenv("LOCAL_VECTOR_STORE_FLUSH_SECONDS", "2")),
+    ):
+        self.path = Path(path) if path else None
+        self.flush_seconds = flush_seconds
+        self._lock = threading.RLock()
+        self._collections: Dict[str, _Collection] = {}
+        self._aliases: Dict[str, str] = {}
+        self._timer: Optional[threading.Timer] = None
+        if self.path is not None:
+            self._load()
+            atexit.register(self.flush)
+
+    # ===== PERSISTENZA =====
+
+    def _collection_dir(self, name: str) -> Path:
+        return self.path / "collections" / name
+
+    @staticmethod
+    def _write_atomic(path: Path, write):
+        tmp = path.with_name(f".{path.name}.tmp")
+        write(tmp)
+        os.replace(tmp, path)
+
+    def _load(self):
+        aliases = self.path / "aliases.json"
+        if aliases.exists():
+            self._aliases = json.loads(aliases.read_text())
+        root = self.path / "collections"
+        if not root.exists():
+            return
+        for directory in sorted(root.iterdir()):
+            meta_path = directory / "meta.json"
+            if not meta_path.exists():
+                continue
+            try:
+                self._collections[directory.name] = self._load_collection(directory, json.loads(meta_path.read_text()))
+            except Exception as e:
+                logger.error(f"❌ Local vector store: collection {directory.name} non caricata: {e}")
+        logger.info(f"✅ Local vector store {self.path}: {len(self._collections)} collection")
+
+    @staticmethod
+    def _load_collection(directory: Path, meta: Dict[str, Any]) -> _Collection:
+        collection = _Collection(
+            meta["vectors"], meta["named"], meta.get("on_disk_payload", False),
+            meta.get("quantization", "none"), meta.get("payload_schema")
+        )
+        points = meta["points"]
+        collection.ids = [normalize_id(i) for i in json.loads((directory / "ids.json").read_text())][:points]
+        collection.payloads = json.loads((directory / "payloads.json").read_text())[:points]
+        collection.rows = {point_id: row for row, point_id in enumerate(collection.ids)}
+        collection.alive = np.ones(points, dtype=bool)
+        for i, name in enumerate(collection.vectors):
+            # Memory-map in sola lettura: copiato in RAM solo alla prima scrittura
+            collection.matrices[name] = np.load(directory / f"vectors_{i}.npy", mmap_mode="r")[:points]
+            collection.present[name] = np.load(directory / f"present_{i}.npy")[:points]
+        for key in collection.index:
+            collection.build_index(key)
+        return collection
+
+    def _save_collection(self, name: str, collection: _Collection):
+        collection.compact()
+        directory = self._collection_dir(name)
+        directory.mkdir(parents=True, exist_ok=True)
+        size = collection.size
+        for i, vector_name in enumerate(collection.vectors):
+            matrix = np.ascontiguousarray(collection.matrices[vector_name][:size])
+            present = np.ascontiguousarray(collection.present[vector_name][:size])
+            self._write_atomic(directory / f"vectors_{i}.npy", lambda p: _save_npy(p, matrix))
+            self._write_atomic(directory / f"present_{i}.npy", lambda p: _save_npy(p, present))
+        self._write_atomic(directory / "ids.json", lambda p: p.write_text(json.dumps(collection.ids)))
+        self._write_atomic(
+            directory / "payloads.json", lambda p: p.write_text(json.dumps(collection.payloads, default=str))
+        )
+        # meta.json per ultimo: `points` limita le righe lette da un salvataggio interrotto
+        self._write_atomic(directory / "meta.json", lambda p: p.write_text(json.dumps(collection.meta())))
+        collection.dirty = False
+
+    def _save_aliases(self):
+        if self.path is None:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._write_atomic(self.path / "aliases.json", lambda p: p.write_text(json.dumps(self._aliases)))
+
+    def flush(self):
+        """Scrive su disco le collection modificate"""
+        if self.path is None:
+            return
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            for name, collection in self._collections.items():
+                if collection.dirty:
+                    self._save_collection(name, collection)
+
+    def _touch(self, collection: _Collection):
+        collection.dirty = True
+        if self.path is None:
+            return
+        if self.flush_seconds <= 0:
+            self.flush()
+        elif self._timer is None:
+            # Flush differito: un solo salvataggio per una raffica di upsert
+            self._timer = threading.Timer(self.flush_seconds, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def close(self):
+        self.flush()
+
+    # ===== COLLECTION =====
+
+    def _resolve(self, collection_name: str) -> str:
+        return self._aliases.get(collection_name, collection_name)
+
+    def _get(self, collection_name: str) -> _Collection:
+        collection = self._collections.get(self._resolve(collection_name))
+        if collection is None:
+            raise ValueError(f"Collection {collection_name} non trovata")
+        return collection
+
+    def get_collections(self) -> CollectionsResponse:
+        with self._lock:
+            return CollectionsResponse(collections=[CollectionDescription(name=n) for n in self._collections])
+
+    def collection_exists(self, collection_name: str) -> bool:
+        with self._lock:
+            return self._resolve(collection_name) in self._collections
+
+    def get_collection(self, collection_name: str) -> LocalCollectionInfo:
+        with self._lock:
+            return self._get(collection_name).info()
+
+    def create_collection(self, collection_name: str, vectors_config, quantization_config=None,
+                          on_disk_payload: Optional[bool] = None, **kwargs) -> bool:
+        with self._lock:
+            if collection_name in self._collections or collection_name in self._aliases:
+                raise ValueError(f"Collection {collection_name} già esistente")
+            vectors, named = vectors_spec(vectors_config)
+            collection = _Collection(vectors, named, bool(on_disk_payload), quantization_mode(quantization_config))
+            self._collections[collection_name] = collection
+            self._touch(collection)
+            return True
+
+    def recreate_collection(self, collection_name: str, vectors_config, **kwargs) -> bool:
+        with self._lock:
+            self.delete_collection(collection_name)
+            return self.create_collection(collection_name, vectors_config, **kwargs)
+
+    def delete_collection(self, collection_name: str, **kwargs) -> bool:
+        with self._lock:
+            if self._collections.pop(collection_name, None) is None:
+                return False
+            aliases = {a: c for a, c in self._aliases.items() if c != collection_name}
+            if aliases != self._aliases:
+                self._aliases = aliases
+                self._save_aliases()
+            if self.path is not None:
+                shutil.rmtree(self._collection_dir(collection_name), ignore_errors=True)
+            return True
+
+    def update_collection(self, collection_name: str, quantization_config=None, **kwargs) -> bool:
+        """Solo la quantizzazione viene registrata (la ricerca resta esatta)"""
+        with self._lock:
+            collection = self._get(collection_name)
+            if quantization_config is not None:
+                collection.quantization = quantization_mode(quantization_config)
+                self._touch(collection)
+            return True
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema=None, **kwargs) -> UpdateResult:
+        with self._lock:
+            collection = self._get(collection_name)
+            collection.payload_schema[field_name] = str(getattr(field_schema, "value", field_schema))
+            collection.build_index(field_name)
+            self._touch(collection)
+            return update_completed()
+
+    # ===== ALIAS =====
+
+    def get_aliases(self) -> CollectionsAliasesResponse:
+        with self._lock:
+            return CollectionsAliasesResponse(aliases=[
+                AliasDescription(alias_name=a, collection_name=c) for a, c in self._aliases.items()
+            ])
+
+    def update_collection_aliases(self, change_aliases_operations: Sequence[Any], **kwargs) -> bool:
+        """Operazioni applicate insieme: lo switch di un alias è atomico"""
+        with self._lock:
+            aliases = dict(self._aliases)
+            for operation in change_aliases_operations:
+                if getattr(operation, "delete_alias", None) is not None:
+                    aliases.pop(operation.delete_alias.alias_name, None)
+                elif getattr(operation, "create_alias", None) is not None:
+                    create = operation.create_alias
+                    if create.collection_name not in self._collections:
+                        raise ValueError(f"Collection {create.collection_name} non trovata")
+                    if create.alias_name in self._collections:
+                        raise ValueError(f"Alias {create.alias_name} in conflitto con una collection")
+                    aliases[create.alias_name] = create.collection_name
+                elif getattr(operation, "rename_alias", None) is not None:
+                    rename = operation.rename_alias
+                    aliases[rename.new_alias_name] = aliases.pop(rename.old_alias_name)
+                else:
+                    raise ValueError(f"Operazione alias non supportata: {operation}")
+            self._aliases = aliases
+            self._save_aliases()
+            return True
+
+    # ===== PUNTI =====
+
+    def _rows(self, collection: _Collection, selector) -> List[int]:
+        ids, filter_ = point_selector(selector)
+        if filter_ is not None:
+            return np.flatnonzero(collection.filter_mask(filter_)).tolist()
+        rows = (collection.rows.get(point_id) for point_id in ids)
+        return [row for row in rows if row is not None]
+
+    def upsert(self, collection_name: str, points: Sequence[Any], wait: bool = True, **kwargs) -> UpdateResult:
+        with self._lock:
+            collection = self._get(collection_name)
+            for point in points:
+                collection.upsert(normalize_id(point.id), point.vector, point.payload)
+            self._touch(collection)
+            return update_completed()
+
+    def update_vectors(self, collection_name: str, points: Sequence[Any], wait: bool = True, **kwargs) -> UpdateResult:
+        with self._lock:
+            collection = self._get(collection_name)
+            for point in points:
+                row = collection.rows.get(normalize_id(point.id))
+                if row is None:
+                    raise ValueError(f"Punto {point.id} non trovato")
+                collection.update_vectors(row, point.vector)
+            self._touch(collection)
+            return update_completed()
+
+    def delete_vectors(self, collection_name: str, vectors: Sequence[str], points, wait: bool = True,
+                       **kwargs) -> UpdateResult:
+        with self._lock:
+            collection = self._get(collection_name)
+            for row in self._rows(collection, points):
+                collection.delete_vectors(row, vectors)
+            self._touch(collection)
+            return update_completed()
+
+    def set_payload(self, collection_name: str, payload: Dict[str, Any], points=None, wait: bool = True,
+                    **kwargs) -> UpdateResult:
+        with self._lock:
+            collection = self._get(collection_name)
+            for row in self._rows(collection, points if points is not None else kwargs.get("points_selector")):
+                collection.set_payload(row, payload)
+            self._touch(collection)
+            return update_completed()
+
+    def overwrite_payload(self, collection_name: str, payload: Dict[str, Any], points=None, wait: bool = True,
+                          **kwargs) -> UpdateResult:
+        with self._lock:
+            collection = self._get(collection_name)
+            for row in self._rows(collection, points):
+                collection.set_payload(row, payload, replace=True)
+            self._touch(collection)
+            return update_completed()
+
+    def delete(self, collection_name: str, points_selector, wait: bool = True, **kwargs) -> UpdateResult:
+        with self._lock:
+            collection = self._get(collection_name)
+            for row in self._rows(collection, points_selector):
+                collection.delete(row)
+            self._touch(collection)
+            return update_completed()
+
+    def count(self, collection_name: str, count_filter=None, exact: bool = True, **kwargs) -> CountResult:
+        with self._lock:
+            collection = self._get(collection_name)
+            if count_filter is None:
+                return CountResult(count=collection.points_count)
+            return CountResult(count=int(collection.filter_mask(count_filter).sum()))
+
+    def retrieve(self, collection_name: str, ids: Sequence[PointId], with_payload=True, with_vectors=False,
+                 **kwargs) -> List[Record]:
+        with self._lock:
+            collection = self._get(collection_name)
+            records = []
+            for point_id in ids:
+                row = collection.rows.get(normalize_id(point_id))
+                if row is not None:
+                    records.append(Record(
+                        id=collection.ids[row],
+                        payload=select_payload(collection.payloads[row], with_payload),
+                        vector=collection.vector_of(row, with_vectors)
+                    ))
+            return records
+
+    def scroll(self, collection_name: str, scroll_filter=None, limit: int = 10, offset: Optional[PointId] = None,
+               with_payload=True, with_vectors=False, **kwargs) -> Tuple[List[Record], Optional[PointId]]:
+        """Punti in ordine di id da `offset` (incluso); ritorna anche l'offset della pagina successiva"""
+        with self._lock:
+            collection = self._get(collection_name)
+            keys, rows = collection.sorted_rows()
+            start = 0 if offset is None else bisect.bisect_left(keys, id_key(normalize_id(offset)))
+            mask = collection.filter_mask(scroll_filter) if scroll_filter is not None else None
+            records, next_offset = [], None
+            for row in rows[start:]:
+                if mask is not None and not mask[row]:
+                    continue
+                if len(records) == limit:
+                    next_offset = collection.ids[row]
+                    break
+                records.append(Record(
+                    id=collection.ids[row],
+                    payload=select_payload(collection.payloads[row], with_payload),
+                    vector=collection.vector_of(row, with_vectors)
+                ))
+            return records, next_offset
+
+    # ===== RICERCA =====
+
+    @staticmethod
+    def _query(query_vector) -> Tuple[str, np.ndarray]:
+        """query_vector: lista, (nome, vettore) o NamedVector"""
+        if isinstance(query_vector, tuple):
+            name, vector = query_vector
+        elif hasattr(query_vector, "name") and hasattr(query_vector, "vector"):
+            name, vector = query_vector.name, query_vector.vector
+        else:
+            name, vector = DEFAULT_VECTOR, query_vector
+        return name or DEFAULT_VECTOR, np.asarray(vector, dtype=np.float32).reshape(1, -1)
+
+    @staticmethod
+    def _scored(collection: _Collection, rows: np.ndarray, scores: np.ndarray, limit: int, offset: int,
+                score_threshold: Optional[float], with_payload, with_vectors) -> List[ScoredPoint]:
+        results = []
+        for row in rows:
+            score = float(scores[row])
+            if score == -np.inf or (score_threshold is not None and score < score_threshold):
+                break
+            results.append((row, score))
+        return [
+            ScoredPoint(
+                id=collection.ids[row],
+                version=0,
+                score=score,
+                payload=select_payload(collection.payloads[row], with_payload),
+                vector=collection.vector_of(row, with_vectors)
+            )
+            for row, score in results[offset:offset + limit]
+        ]
+
+    def _search_many(self, collection: _Collection, name: str, queries: np.ndarray,
+                     requests: List[Dict[str, Any]]) -> List[List[ScoredPoint]]:
+        """Una moltiplicazione matrice × query per tutte le richieste sullo stesso vettore"""
+        scores = collection.scores(name, queries)
+        for i, request in enumerate(requests):
+            if request["filter"] is not None:
+                scores[i, ~collection.filter_mask(request["filter"])] = -np.inf
+        k = max((r["limit"] + r["offset"] for r in requests), default=0)
+        best = top_k(scores, k)
+        return [
+            self._scored(collection, best[i], scores[i], r["limit"], r["offset"], r["score_threshold"],
+                         r["with_payload"], r["with_vectors"])
+            for i, r in enumerate(requests)
+        ]
+
+    def search(self, collection_name: str, query_vector, query_filter=None, search_params=None, limit: int = 10,
+               offset: int = 0, with_payload=True, with_vectors=False, score_threshold: Optional[float] = None,
+               **kwargs) -> List[ScoredPoint]:
+        name, query = self._query(query_vector)
+        with self._lock:
+            collection = self._get(collection_name)
+            return self._search_many(collection, name, query, [{
+                "filter": query_filter, "limit": limit, "offset": offset or 0, "score_threshold": score_threshold,
+                "with_payload": with_payload, "with_vectors": with_vectors,
+            }])[0]
+
+    def search_batch(self, collection_name: str, requests: Sequence[Any], **kwargs) -> List[List[ScoredPoint]]:
+        """SearchRequest raggruppate per nome di vettore"""
+        groups: Dict[str, List[int]] = {}
+        parsed = []
+        for i, request in enumerate(requests):
+            name, query = self._query(request.vector)
+            groups.setdefault(name, []).append(i)
+            parsed.append((query, {
+                "filter": getattr(request, "filter", None),
+                "limit": request.limit,
+                "offset": getattr(request, "offset", None) or 0,
+                "score_threshold": getattr(request, "score_threshold", None),
+                "with_payload": getattr(request, "with_payload", None),
+                "with_vectors": getattr(request, "with_vector", None),
+            }))
+        results: List[List[ScoredPoint]] = [[] for _ in requests]
+        with self._lock:
+            collection = self._get(collection_name)
+            for name, indices in groups.items():
+                queries = np.vstack([parsed[i][0] for i in indices])
+                found = self._search_many(collection, name, queries, [parsed[i][1] for i in indices])
+                for i, points in zip(indices, found):
+                    results[i] = points
+        return results
@@ -0,0 +1,79 @@
+"""
+Telemetria LLM - endpoint admin e scrape Prometheus
+- GET  /api/v1/admin/llm-usage?window=1h&group_by=route   aggregati per route / model / kind / user
+- GET  /api/v1/admin/llm-usage/pricing                     listino in uso
+- POST /api/v1/admin/llm-usage/pricing/reload              rilegge LLM_PRICING_FILE
+- GET  /metrics                                            formato Prometheus (token opzionale METRICS_TOKEN)
+"""
+import os
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+
+from app.core.llm_gateway import get_llm_gateway
+from app.core.llm_pricing import get_pricing
+from app.core.llm_telemetry import GROUP_BY, get_llm_telemetry, parse_window
+from app.routes.auth import get_current_user_from_jwt
+
+router = APIRouter(tags=["LLM Usage"])
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def require_admin(current_user=Depends(get_current_user_from_jwt)):
+    if current_user.role not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return current_user
+
+
+@router.get("/api/v1/admin/llm-usage")
+async def get_llm_usage(
+    window: str = Query("1h", description="Finestra: 15m, 1h, 24h o secondi"),
+    group_by: str = Query("route", description=f"Uno tra: {', '.join(GROUP_BY)}"),
+    current_user=Depends(require_admin)
+):
+    """Token, costo, latenza, retry ed errori delle chiamate LLM nell'ultima finestra"""
+    telemetry = get_llm_telemetry()
+    try:
+        window_seconds = parse_window(window)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Finestra non valida: {window}")
+    if window_seconds <= 0 or window_seconds > telemetry.retention_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"La finestra deve essere tra 1s e {telemetry.retention_seconds}s (retention)"
+        )
+    try:
+        usage = telemetry.aggregate(window_seconds, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    gateway = get_llm_gateway()
+    return {
+        **usage,
+        "gateway": {"in_flight": gateway.in_flight, "queued": gateway.queued},
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@router.get("/api/v1/admin/llm-usage/pricing")
+async def get_llm_pricing(current_user=Depends(require_admin)):
+    return get_pricing().to_dict()
+
+
+@router.post("/api/v1/admin/llm-usage/pricing/reload")
+async def reload_llm_pricing(current_user=Depends(require_admin)):
+    pricing = get_pricing()
+    pricing.reload()
+    return pricing.to_dict()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(authorization: str = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    rendered = get_llm_telemetry().render_prometheus()
+    if rendered is None:
+        raise HTTPException(status_code=503, detail="prometheus_client non installato")
+    payload, content_type = rendered
+    return Response(content=payload, media_type=content_type)
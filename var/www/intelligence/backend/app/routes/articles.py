@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.core.database import get_db
 from app.models.articles import Articolo
+from app.services.keyword_matcher import get_keyword_matcher
 
 router = APIRouter(prefix="/articles", tags=["Articles Management"])
 
@@ -224,6 +225,7 @@ async def update_article(article_id: int, article_data: dict, db: Session = Depe
         
         db.execute(update_query, params)
         db.commit()
+        get_keyword_matcher().invalidate()  # codice/nome usati come alias dei kit
         
         return {
             "success": True,
@@ -12,6 +12,7 @@ import re
 from datetime import datetime
 
 from app.db.session import get_db
+from app.services.keyword_matcher import get_keyword_matcher
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/intellichat", tags=["intellichat"])
@@ -63,38 +64,14 @@ async def chat_with_rag(
 def analyze_message_intent(message: str) -> Dict[str, Any]:
     """Analyze message to understand user intent"""
     
-    message_lower = message.lower()
-    
-    # Partner search keywords
-    partner_keywords = ["partner", "partner che", "qualcuno che", "azienda che", "chi si occupa", "fornitori", "cerco"]
-    company_keywords = ["azienda", "aziende", "ditta", "società", "impresa"]
-    
-    # Service/technology keywords
-    tech_keywords = {
-        "ai": ["ai", "artificial intelligence", "intelligenza artificiale", "machine learning", "ml"],
-        "cloud": ["cloud", "aws", "azure", "google cloud", "infrastruttura"],
-        "security": ["security", "sicurezza", "cybersecurity", "protezione"],
-        "software": ["software", "sviluppo", "programmazione", "app", "applicazioni"],
-        "web": ["web", "sito", "website", "frontend", "backend"],
-        "marketing": ["marketing", "pubblicità", "social", "seo"],
-        "design": ["design", "grafica", "ui", "ux", "creativi"]
-    }
-    
-    # Detect intent
-    is_partner_search = any(kw in message_lower for kw in partner_keywords)
-    is_company_search = any(kw in message_lower for kw in company_keywords)
-    
-    # Detect technology/service category
-    detected_categories = []
-    for category, keywords in tech_keywords.items():
-        if any(kw in message_lower for kw in keywords):
-            detected_categories.append(category)
+    # Partner/company keywords and service categories in a single word-boundary scan
+    intent = get_keyword_matcher().analyze_intent(message)
     
     return {
-        "is_partner_search": is_partner_search,
-        "is_company_search": is_company_search,
+        "is_partner_search": intent["is_partner_search"],
+        "is_company_search": intent["is_company_search"],
         "needs_rag": True,  # Always try RAG for additional context
-        "detected_categories": detected_categories,
+        "detected_categories": intent["detected_categories"],
         "original_query": message
     }
 
@@ -8,10 +8,11 @@ from sqlalchemy import text
 from typing import List, Dict, Any
 import logging
 import json
-import re
 from datetime import datetime
 
 from app.db.session import get_db
+from app.services.keyword_matcher import get_keyword_matcher
+from app.modules.rag_engine.vector_service import get_vector_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/intellichat", tags=["intellichat"])
@@ -42,7 +43,7 @@ async def chat_with_rag(
     
     # 2. RAG Knowledge Base Search
     if intent["needs_rag"]:
-        rag_result = await search_knowledge_base(message, db)
+        rag_result = await search_knowledge_base(message, request.get("company_id"))
         if rag_result:
             response_parts.append(rag_result)
     
@@ -66,43 +67,15 @@ async def chat_with_rag(
 def analyze_message_intent(message: str) -> Dict[str, Any]:
     """Analyze message to understand user intent"""
     
-    message_lower = message.lower()
-    
-    # Partner search keywords
-    partner_keywords = ["partner", "partner che", "qualcuno che", "azienda che", "chi si occupa", "fornitori"]
-    company_keywords = ["azienda", "aziende", "ditta", "società", "impresa"]
-    
-    # Service/technology keywords
-    tech_keywords = {
-        "ai": ["ai", "artificial intelligence", "intelligenza artificiale", "machine learning", "ml"],
-        "cloud": ["cloud", "aws", "azure", "google cloud", "infrastruttura"],
-        "security": ["security", "sicurezza", "cybersecurity", "protezione"],
-        "software": ["software", "sviluppo", "programmazione", "app", "applicazioni"],
-        "web": ["web", "sito", "website", "frontend", "backend"],
-        "marketing": ["marketing", "pubblicità", "social", "seo"],
-        "design": ["design", "grafica", "ui", "ux", "creativi"]
-    }
-    
-    # Detect intent
-    is_partner_search = any(kw in message_lower for kw in partner_keywords)
-    is_company_search = any(kw in message_lower for kw in company_keywords)
-    
-    # Detect technology/service category
-    detected_categories = []
-    for category, keywords in tech_keywords.items():
-        if any(kw in message_lower for kw in keywords):
-            detected_categories.append(category)
-    
-    # Location detection
-    location_match = re.search(r'\b(milano|roma|torino|napoli|bologna|firenze|venezia|lombardia|lazio|piemonte)\b', message_lower)
-    detected_location = location_match.group(1) if location_match else None
+    # Partner/company keywords, service categories and locations in a single word-boundary scan
+    intent = get_keyword_matcher().analyze_intent(message)
     
     return {
-        "is_partner_search": is_partner_search,
-        "is_company_search": is_company_search,
-        "needs_rag": not (is_partner_search or is_company_search),
-        "detected_categories": detected_categories,
-        "detected_location": detected_location,
+        "is_partner_search": intent["is_partner_search"],
+        "is_company_search": intent["is_company_search"],
+        "needs_rag": not (intent["is_partner_search"] or intent["is_company_search"]),
+        "detected_categories": intent["detected_categories"],
+        "detected_location": intent["detected_location"],
         "original_query": message
     }
 
@@ -216,27 +189,43 @@ async def search_companies_for_query(message: str, intent: Dict, db: Session) ->
         logger.error(f"Error searching companies: {e}")
         return f"❌ Errore durante la ricerca aziende: {str(e)}"
 
-async def search_knowledge_base(message: str, db: Session) -> str:
-    """Search in RAG knowledge base"""
+# Knowledge base scopes searched for every RAG question (payload content_type)
+KNOWLEDGE_SCOPES = {
+    "documents": ("📄 Documenti", {"content_type": "document"}),
+    "wiki": ("📝 Wiki", {"content_type": "wiki"}),
+    "web": ("🌐 Contenuti web", {"content_type": "web_page"}),
+}
+KNOWLEDGE_RESULTS_PER_SCOPE = 3
+
+async def search_knowledge_base(message: str, company_id: Any = None) -> str:
+    """Search in RAG knowledge base: all scopes in one embedding call and one Qdrant round-trip"""
     
     try:
-        # Check if we have knowledge documents
-        query = """
-        SELECT COUNT(*) as doc_count
-        FROM knowledge_documents 
-        WHERE content IS NOT NULL
-        """
-        
-        with db.connection() as conn:
-            result = conn.execute(text(query))
-            doc_count = result.scalar()
+        company_filter = {"company_id": company_id} if company_id is not None else {}
+        results = await get_vector_service().search_batch([
+            {
+                "id": scope,
+                "query": message,
+                "limit": KNOWLEDGE_RESULTS_PER_SCOPE,
+                "filters": {**company_filter, **filters}
+            }
+            for scope, (_, filters) in KNOWLEDGE_SCOPES.items()
+        ])
         
-        if doc_count == 0:
-            return "📚 La knowledge base è attualmente vuota. Carica alcuni documenti per abilitare la ricerca RAG."
+        sections = []
+        for scope, (label, _) in KNOWLEDGE_SCOPES.items():
+            hits = results.get(scope) or []
+            if not hits:
+                continue
+            lines = [f"**{label}**"]
+            for hit in hits:
+                snippet = " ".join(hit["content"].split())[:300]
+                lines.append(f"• {hit['filename'] or 'senza nome'} ({hit['score']:.2f}): {snippet}")
+            sections.append("\n".join(lines))
         
-        # TODO: Implement actual RAG search with vector similarity
-        # For now, simulate RAG response
-        return f"📖 **Ricerca nella Knowledge Base** (simulazione con {doc_count} documenti):\n\nLa ricerca RAG per '{message}' è in fase di implementazione. Il sistema ha accesso a {doc_count} documenti caricati."
+        if not sections:
+            return f"📚 Nessun risultato nella knowledge base per '{message}'."
+        return "📖 **Ricerca nella Knowledge Base**\n\n" + "\n\n".join(sections)
         
     except Exception as e:
         logger.error(f"Error in RAG search: {e}")
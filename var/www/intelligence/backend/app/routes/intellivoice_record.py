@@ -1,7 +1,6 @@
 # IntelliVoice 2.0 - Endpoint /record migliorato
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from pydantic import BaseModel
-from openai import OpenAI
 import os
 import tempfile
 import shutil
@@ -10,14 +9,17 @@ import mimetypes
 import subprocess
 from datetime import datetime
 from sqlalchemy.orm import Session
+from app.core.llm_cache import cached_completion
+from app.core.llm_gateway import get_llm_gateway
 from app.core.database import get_db
 from app.routes.auth import get_current_user_dep as get_current_user
 from app.models.kit_commerciali import KitCommerciale
 
 router = APIRouter(prefix="/api/v1/intellivoice", tags=["IntelliVoice 2.0"])
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4-turbo")
+# Stesso transcript + stessi kit attivi = stessa analisi (retry, ri-invii)
+ANALYSIS_CACHE_TTL = float(os.getenv("INTELLIVOICE_ANALYSIS_CACHE_TTL", "86400"))
 
 class RecordResponse(BaseModel):
     success: bool
@@ -54,7 +56,8 @@ async def record_voice(
             
             # 3. TRASCRIZIONE WHISPER
             with open(output_path, "rb") as f:
-                transcript = client.audio.transcriptions.create(
+                transcript = await get_llm_gateway().transcribe(
+                    route="intellivoice",
                     model="whisper-1",
                     file=f
                 )
@@ -107,7 +110,9 @@ Rispondi in JSON:
 }}
 """
 
-        response = client.chat.completions.create(
+        content = await cached_completion(
+            route="intellivoice",
+            ttl=ANALYSIS_CACHE_TTL,
             model=MODEL,
             messages=[
                 {"role": "system", "content": "Rispondi sempre in JSON valido."},
@@ -115,8 +120,7 @@ Rispondi in JSON:
             ],
             temperature=0.2
         )
-        
-        content = response.choices[0].message.content.strip()
+        content = content.strip()
         
         # Parse JSON
         if content.startswith("```"):
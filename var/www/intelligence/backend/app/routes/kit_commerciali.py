@@ -7,6 +7,7 @@ from sqlalchemy import text
 from typing import List, Optional
 from pydantic import BaseModel
 from app.core.database import get_db
+from app.services.keyword_matcher import get_keyword_matcher
 
 router = APIRouter(prefix="/kit-commerciali", tags=["Kit Commerciali"])
 
@@ -167,6 +168,7 @@ async def create_kit(kit_data: KitCreate, db: Session = Depends(get_db)):
         
         kit_id = result.scalar()
         db.commit()
+        get_keyword_matcher().invalidate()
         
         return {
             "success": True,
@@ -192,6 +194,7 @@ async def delete_kit(kit_id: int, db: Session = Depends(get_db)):
         delete_query = text("DELETE FROM kit_commerciali WHERE id = :kit_id")
         db.execute(delete_query, {"kit_id": kit_id})
         db.commit()
+        get_keyword_matcher().invalidate()
         
         return {
             "success": True,
@@ -228,6 +231,7 @@ async def update_kit(kit_id: int, kit_data: KitCreate, db: Session = Depends(get
             "attivo": kit_data.attivo
         })
         db.commit()
+        get_keyword_matcher().invalidate()
         
         return {
             "success": True,
@@ -8,17 +8,18 @@ import shutil
 import uuid
 from datetime import datetime
 
+from app.core.llm_gateway import get_llm_gateway
 from app.core.database import get_db
 from app.modules.rag_engine.knowledge_manager import KnowledgeManager
 from app.modules.rag_engine.document_processor import DocumentProcessor
-from app.modules.rag_engine.vector_service import VectorRAGService
+from app.modules.rag_engine.vector_service import get_vector_service
 
 router = APIRouter(prefix="/rag", tags=["RAG Knowledge Management"])
 
 # Initialize services
 km = KnowledgeManager()
 doc_processor = DocumentProcessor()
-vector_service = VectorRAGService()
+vector_service = get_vector_service()
 
 UPLOAD_DIR = Path("/var/www/intelligence/backend/uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
@@ -171,12 +172,10 @@ async def semantic_search(
         context = "\n\n".join(context_parts)
         
         # GPT-4 call
-        import openai
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
         system_prompt = f"""Sei un assistente AI esperto. Rispondi basandoti sui documenti forniti.\nDOCUMENTI:\n{context}\nRispondi precisamente alla domanda usando i documenti."""
         
-        response = client.chat.completions.create(
+        response = await get_llm_gateway().chat(
+            route="rag-legacy",
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -276,10 +275,8 @@ DOCUMENTI:
 ISTRUZIONI: Rispondi precisamente alla domanda usando i documenti. Se l'info non c'è, dillo brevemente."""
 
         # Chiama OpenAI
-        import openai
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        response = client.chat.completions.create(
+        response = await get_llm_gateway().chat(
+            route="rag-legacy",
             model=os.getenv("OPENAI_MODEL", "gpt-4o"),
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -424,15 +421,13 @@ async def vector_rag_chat(request: dict):
             }
         
         # GPT-4 call
-        import openai
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
         system_prompt = f"""Sei un assistente AI esperto. Rispondi basandoti sui documenti forniti.
 DOCUMENTI:
 {context}
 ISTRUZIONI: Rispondi precisamente alla domanda usando i documenti."""
         
-        response = client.chat.completions.create(
+        response = await get_llm_gateway().chat(
+            route="rag-legacy",
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": system_prompt},
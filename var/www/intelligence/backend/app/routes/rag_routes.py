@@ -1,28 +1,70 @@
-from fastapi import APIRouter, File, UploadFile, Depends, HTTPException, Form
+from fastapi import APIRouter, File, UploadFile, Depends, HTTPException, Form, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
-import asyncio
 import os
 from pathlib import Path
-import shutil
 import uuid
 from datetime import datetime
 
+from app.core.llm_cache import get_llm_cache
+from app.core.llm_gateway import LLMDeadlineExceeded, get_llm_gateway
 from app.core.database import get_db
+from app.core.streaming import stream_format, stream_chat_completion, streaming_response
 from app.modules.rag_engine.knowledge_manager import KnowledgeManager
 from app.modules.rag_engine.document_processor import DocumentProcessor
-from app.modules.rag_engine.vector_service import VectorRAGService
+from app.modules.rag_engine.vector_service import get_vector_service, PAYLOAD_INDEXES, filter_values
+from app.modules.rag_engine.extraction_pool import get_extraction_pool
+from app.modules.rag_engine.upload_index import UploadIndex
+from app.modules.rag_engine.ingestion_jobs import IngestionJobManager
+from app.modules.rag_engine.document_registry import DocumentRegistry
+from app.modules.rag_engine.hybrid_retriever import HybridRetriever
+from app.modules.rag_engine.answer_cache import chunk_keys, get_answer_cache
+from app.modules.rag_engine.context_packer import get_context_packer
 
 router = APIRouter(prefix="/rag", tags=["RAG Knowledge Management"])
 
 # Initialize services
 km = KnowledgeManager()
 doc_processor = DocumentProcessor()
-vector_service = VectorRAGService()
+vector_service = get_vector_service()
 
 UPLOAD_DIR = Path("/var/www/intelligence/backend/uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Estrazioni persistite + chunk indicizzati dei documenti caricati
+upload_index = UploadIndex(vector_service)
+
+# Registro documenti + store content-addressed (elenco/lookup/delete per indice)
+document_registry = DocumentRegistry(vector_service._get_db_connection)
+
+# Job di ingestion persistiti (avviati/fermati nel lifespan di main.py)
+ingestion_jobs = IngestionJobManager(
+    upload_index, vector_service._get_db_connection, get_extraction_pool(), registry=document_registry
+)
+
+# Qdrant + full-text PostgreSQL (codici, P.IVA, TCK-...) fusi con RRF
+hybrid_retriever = HybridRetriever(vector_service)
+
+def _request_filters(request: dict) -> Dict[str, Any]:
+    """
+    Filtri di ricerca dalla richiesta: company_id, source, content_type, document_id,
+    filename (a primo livello o in "filters"); 400 se non validi
+    """
+    filters = dict(request.get("filters") or {})
+    for key in PAYLOAD_INDEXES:
+        if request.get(key) is not None:
+            filters[key] = request[key]
+    try:
+        return filter_values(filters)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Filtri non validi: {e}")
+
+def _filters_scope(scope: str, filters: Dict[str, Any]) -> str:
+    """Scope della answer cache: risposte con filtri diversi non si mescolano"""
+    if not filters:
+        return scope
+    return scope + ":" + ",".join(f"{key}={'|'.join(map(str, sorted(values)))}" for key, values in sorted(filters.items()))
+
 @router.get("/health")
 async def rag_health_check():
     """Health check completo del sistema RAG"""
@@ -51,6 +93,10 @@ async def get_rag_stats():
         
         return {
             "vector_database": vector_stats,
+            "documents": await document_registry.get_stats(),
+            "context_packing": get_context_packer().get_stats(),
+            "llm_gateway": get_llm_gateway().get_stats(),
+            "llm_cache": llm_cache.get_stats() if (llm_cache := get_llm_cache()) else {"enabled": False},
             "supported_formats": doc_processor.get_supported_formats(),
             "upload_directory": str(UPLOAD_DIR),
             "upload_dir_exists": UPLOAD_DIR.exists(),
@@ -86,7 +132,10 @@ async def upload_document(
     company_id: int = Form(1),
     description: Optional[str] = Form(None)
 ):
-    """Upload e processamento documento"""
+    """
+    Upload documento: salvataggio content-addressed (sha256 calcolato in streaming)
+    e job di ingestion; lo stesso contenuto per la stessa azienda non viene rielaborato
+    """
     try:
         # Verifica formato supportato
         file_extension = Path(file.filename).suffix.lower()
@@ -96,42 +145,87 @@ async def upload_document(
                 detail=f"Formato {file_extension} non supportato. Formati supportati: {doc_processor.get_supported_formats()}"
             )
         
-        # Genera ID univoco per il documento
-        document_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        safe_filename = f"{timestamp}_{document_id}_{file.filename}"
-        file_path = UPLOAD_DIR / safe_filename
+        sha256, file_size, file_path = await document_registry.store_upload(file, file_extension)
         
-        # Salva file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        duplicate = await document_registry.find_duplicate(sha256, company_id)
+        if duplicate:
+            return {
+                "success": True,
+                "message": "Documento già presente, nessuna nuova indicizzazione",
+                "duplicate": True,
+                "document_id": duplicate["id"],
+                "job_id": duplicate["id"],
+                "filename": duplicate["filename"],
+                "sha256": sha256,
+                "size": file_size,
+                "company_id": company_id,
+                "format": file_extension,
+                "status": duplicate["status"],
+                "status_url": f"/api/v1/rag/jobs/{duplicate['id']}",
+                "timestamp": datetime.utcnow().isoformat()
+            }
         
-        file_size = file_path.stat().st_size
+        # Genera ID univoco per il documento (usato anche come job id)
+        document_id = str(uuid.uuid4())
+        await document_registry.register(
+            document_id, sha256, file_path, file.filename, file_size,
+            mime=file.content_type, company_id=company_id, description=description
+        )
         
-        # Estrai testo dal documento
-        extraction_result = await doc_processor.extract_text(file_path)
+        # Extract → chunk → embed → upsert in background
+        job = await ingestion_jobs.submit(
+            file_path,
+            file.filename,
+            company_id=company_id,
+            description=description,
+            job_id=document_id
+        )
         
         return {
             "success": True,
-            "message": "Documento caricato e processato con successo",
+            "message": "Documento caricato, indicizzazione in coda",
+            "duplicate": False,
             "document_id": document_id,
+            "job_id": job["id"],
             "filename": file.filename,
-            "safe_filename": safe_filename,
+            "sha256": sha256,
             "size": file_size,
             "company_id": company_id,
             "description": description,
             "format": file_extension,
-            "extraction": extraction_result,
-            "status": "processed",
+            "status": job["status"],
+            "status_url": f"/api/v1/rag/jobs/{job['id']}",
             "timestamp": datetime.utcnow().isoformat()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        # Cleanup file if error
-        if 'file_path' in locals() and file_path.exists():
-            file_path.unlink()
+        # Documento registrato ma job non accodato: resta visibile come 'failed'
+        if 'document_id' in locals():
+            await document_registry.mark(document_id, 'failed', error=str(e))
         raise HTTPException(status_code=500, detail=f"Errore upload: {str(e)}")
 
+@router.get("/jobs")
+async def list_ingestion_jobs(status: Optional[str] = None, limit: int = 50):
+    """Elenco job di ingestion (più recenti per primi)"""
+    try:
+        jobs = await ingestion_jobs.list_jobs(status=status, limit=min(max(limit, 1), 500))
+        return {"success": True, "jobs": jobs, "total": len(jobs)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Errore jobs: {str(e)}")
+
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Stato e avanzamento per stage (extract, chunk, embed, upsert) di un job"""
+    try:
+        job = await ingestion_jobs.get_job(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Errore jobs: {str(e)}")
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job non trovato")
+    return {"success": True, "job": job}
+
 @router.post("/search")
 async def semantic_search(
     request: dict
@@ -141,6 +235,7 @@ async def semantic_search(
         query = request.get("query", "") or request.get("message", "")
         limit = request.get("limit", 5)
         score_threshold = request.get("score_threshold", 0.7)
+        filters = _request_filters(request)
         
         if not query:
             raise HTTPException(status_code=400, detail="Query richiesta")
@@ -148,35 +243,23 @@ async def semantic_search(
         # Genera embedding per la query
         query_embedding = await vector_service.generate_embeddings(query)
         
-        # Ricerca chunks in Qdrant
-        search_results = await vector_service.search_similar_chunks(
-            query=query,
-            limit=limit
+        # Ricerca ibrida: chunks Qdrant + full-text (document_chunks, wiki)
+        search_results = await hybrid_retriever.search(
+            query,
+            limit=limit,
+            query_vector=query_embedding,
+            filters=filters
         )
         
-        # Processa risultati
-        relevant_docs = []
-        for result in search_results:
-            relevant_docs.append({
-                "filename": result.get("filename", "unknown"),
-                "content": result.get("content", ""),
-                "score": result.get("score", 0.0),
-                "source": result.get("source", "unknown")
-            })
-        
-        # Costruisci context
-        context_parts = []
-        for doc in relevant_docs:
-            context_parts.append(f"Documento: {doc["filename"]}\nContenuto: {doc["content"]}")
-        context = "\n\n".join(context_parts)
+        # Costruisci context: dedup, merge dei chunk adiacenti, budget di token del modello
+        packed = get_context_packer().pack(search_results, model="gpt-4o")
+        context = packed.context
         
         # GPT-4 call
-        import openai
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
         system_prompt = f"""Sei un assistente AI esperto. Rispondi basandoti sui documenti forniti.\nDOCUMENTI:\n{context}\nRispondi precisamente alla domanda usando i documenti."""
         
-        response = client.chat.completions.create(
+        response = await get_llm_gateway().chat(
+            route="rag-search",
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -195,35 +278,106 @@ async def semantic_search(
             "total_results": 0,
             "search_params": {
                 "limit": limit,
-                "score_threshold": score_threshold
+                "score_threshold": score_threshold,
+                "filters": filters
             },
+            "context": packed.stats,
             "status": "search_ready_pending_indexed_documents",
             "timestamp": datetime.utcnow().isoformat()
         }
         
+    except HTTPException:
+        raise
+    except LLMDeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Timeout LLM: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Errore ricerca: {str(e)}")
 
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("RAG_SEARCH_BATCH_MAX_QUERIES", "32"))
+
+def _batch_limit(value, position: int) -> int:
+    try:
+        return min(max(int(value), 1), 100)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"limit non valido (queries[{position}])")
+
+@router.post("/search/batch")
+async def semantic_search_batch(request: dict):
+    """
+    Più ricerche semantiche in una richiesta: un solo embedding batch e un solo
+    round-trip Qdrant. `queries`: [{"id", "query", "limit", "score_threshold", "filters"}];
+    i filtri a primo livello valgono per tutte le query. Risultati per id della query.
+    """
+    queries = request.get("queries") or []
+    if not isinstance(queries, list) or not queries:
+        raise HTTPException(status_code=400, detail="Lista queries richiesta")
+    if len(queries) > SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Massimo {SEARCH_BATCH_MAX_QUERIES} query per richiesta")
+    
+    shared_filters = _request_filters(request)
+    items = []
+    for position, item in enumerate(queries):
+        if not isinstance(item, dict):
+            raise HTTPException(status_code=400, detail=f"queries[{position}] non valida")
+        query = item.get("query", "") or item.get("message", "")
+        if not query:
+            raise HTTPException(status_code=400, detail=f"Query richiesta (queries[{position}])")
+        items.append({
+            "id": item.get("id", position),
+            "query": query,
+            "limit": _batch_limit(item.get("limit", 5), position),
+            "score_threshold": item.get("score_threshold", request.get("score_threshold")),
+            "filters": {**shared_filters, **_request_filters(item)}
+        })
+    
+    try:
+        results = await vector_service.search_batch(items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Errore ricerca batch: {str(e)}")
+    
+    return {
+        "success": True,
+        "results": results,
+        "total_queries": len(items),
+        "total_results": sum(len(hits) for hits in results.values()),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
 @router.get("/documents")
-async def list_documents():
-    """Lista documenti caricati"""
+async def list_documents(
+    company_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0
+):
+    """Lista documenti caricati (dal registro, più recenti per primi)"""
     try:
-        files = list(UPLOAD_DIR.glob("*"))
-        documents = []
-        
-        for file_path in files:
-            if file_path.is_file():
-                documents.append({
-                    "filename": file_path.name,
-                    "size": file_path.stat().st_size,
-                    "modified": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat(),
-                    "format": file_path.suffix.lower()
-                })
+        rows, total = await document_registry.list_documents(
+            company_id=company_id, status=status, limit=min(max(limit, 1), 1000), offset=max(offset, 0)
+        )
+        documents = [
+            {
+                "document_id": row["id"],
+                "filename": row["filename"],
+                "size": row["size"],
+                "modified": row["updated_at"],
+                "format": row["format"],
+                "mime": row["mime"],
+                "company_id": row["company_id"],
+                "status": row["status"],
+                "chunks": row["chunks"],
+                "sha256": row["sha256"],
+                "created_at": row["created_at"]
+            }
+            for row in rows
+        ]
         
         return {
             "documents": documents,
-            "total": len(documents),
-            "upload_directory": str(UPLOAD_DIR),
+            "total": total,
+            "upload_directory": str(document_registry.store_dir),
             "timestamp": datetime.utcnow().isoformat()
         }
         
@@ -231,75 +385,142 @@ async def list_documents():
         raise HTTPException(status_code=500, detail=f"Errore lista documenti: {str(e)}")
 
 
-@router.post("/chat")
-async def rag_chat(request: dict):
-    print(f"=== RAG CHAT REQUEST ===")
-    print(f"Request: {request}")
-    print(f"========================")
-    """Chat con RAG - Interroga documenti usando AI"""
-    try:
-        query = request.get("query", "") or request.get("message", "")
-        if not query:
-            raise HTTPException(status_code=400, detail="Query richiesta")
-        
-        # Prendi TUTTI i documenti
-        documents = list(UPLOAD_DIR.glob("*.txt")) + list(UPLOAD_DIR.glob("*.pdf")) + list(UPLOAD_DIR.glob("*.docx"))
-        relevant_docs = []
-        
-        # Processa TUTTI i documenti
-        for doc_path in documents:
-            try:
-                extraction_result = await doc_processor.extract_text(doc_path)
-                if extraction_result['success'] and extraction_result['text']:
-                    content_text = extraction_result['text'][:10000]
-                    if len(content_text.strip()) > 50:
-                        relevant_docs.append({
-                            "filename": doc_path.name,
-                            "content": content_text
-                        })
-            except Exception as e:
-                print(f"Errore processing {doc_path}: {e}")
-                continue
-        
-        # Costruisci context da TUTTI i documenti
-        context_parts = []
-        for doc in relevant_docs:
-            context_parts.append(f"Documento: {doc['filename']}\nContenuto: {doc['content']}")
-        context = "\n\n".join(context_parts)
-        
-        # Prompt semplice
-        system_prompt = f"""Sei un assistente AI esperto. Rispondi concisamente basandoti sui documenti forniti.
+def _cached_answer_frames(answer: Dict[str, Any], sources: List[Any], extra: Dict[str, Any]):
+    """Frame di streaming per una risposta servita dalla answer cache"""
+    async def frames():
+        yield {"type": "sources", "sources": sources}
+        yield {"type": "token", "content": answer["response"]}
+        yield {
+            "type": "done",
+            "response": answer["response"],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            "cost": 0.0,
+            "cached": True,
+            "cache_similarity": answer.get("cache_similarity"),
+            **extra
+        }
+    return frames()
+
+async def _stream_and_cache(frames, scope: str, query_vector, results: List[Dict[str, Any]]):
+    """Inoltra i frame e salva la risposta completa nella answer cache"""
+    answer_cache = get_answer_cache()
+    async for frame in frames:
+        if frame["type"] == "done" and answer_cache is not None and frame.get("response"):
+            answer_cache.store(
+                scope, query_vector, chunk_keys(results),
+                [r.get("document_id") for r in results],
+                {"response": frame["response"]}
+            )
+        yield frame
+
+async def _build_rag_chat_prompt(
+    query: str,
+    model: str,
+    query_vector: Optional[List[float]] = None,
+    filters: Optional[Dict[str, Any]] = None
+):
+    """Retrieval sui documenti caricati: ritorna (system_prompt, sources, chunks, context_stats)"""
+    # Documenti indicizzati dai job di ingestion: nessuna scansione di UPLOAD_DIR per richiesta
+    # Solo i chunk più rilevanti, entro il budget di token del contesto
+    relevant_chunks = await upload_index.retrieve(query, query_vector=query_vector, filters=filters)
+    packed = get_context_packer().pack(relevant_chunks, model=model)
+    context = packed.context
+    
+    # Prompt semplice
+    system_prompt = f"""Sei un assistente AI esperto. Rispondi concisamente basandoti sui documenti forniti.
 
 DOCUMENTI:
 {context}
 
 ISTRUZIONI: Rispondi precisamente alla domanda usando i documenti. Se l'info non c'è, dillo brevemente."""
+    
+    return system_prompt, packed.sources, packed.results, packed.stats
 
-        # Chiama OpenAI
-        import openai
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        response = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-4o"),
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ],
-            temperature=0.7,
-            max_tokens=600
-        )
+@router.post("/chat")
+async def rag_chat(request: dict, http_request: Request):
+    """Chat con RAG - Interroga documenti usando AI (streaming opzionale: `stream`)"""
+    try:
+        query = request.get("query", "") or request.get("message", "")
+        if not query:
+            raise HTTPException(status_code=400, detail="Query richiesta")
         
-        ai_response = response.choices[0].message.content
+        model = os.getenv("OPENAI_MODEL", "gpt-4o")
+        filters = _request_filters(request)
+        scope = _filters_scope(f"rag-chat:{model}", filters)
+        answer_cache = get_answer_cache()
+        fmt = stream_format(http_request, request.get("stream"))
+        if fmt:
+            async def frames():
+                # Header inviati subito: retrieval e sorgenti come primo frame
+                query_vector = await vector_service.generate_embeddings(query)
+                system_prompt, sources, chunks, context_stats = await _build_rag_chat_prompt(query, model, query_vector, filters)
+                extra = {"query": query, "total_docs": len(sources), "context": context_stats}
+                
+                cached = answer_cache.lookup(scope, query_vector, chunk_keys(chunks)) if answer_cache else None
+                if cached:
+                    async for frame in _cached_answer_frames(cached, sources, extra):
+                        yield frame
+                    return
+                
+                completion = stream_chat_completion(
+                    "rag-chat",
+                    http_request,
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": query}
+                    ],
+                    sources=sources,
+                    extra=extra,
+                    temperature=0.7,
+                    max_tokens=600
+                )
+                async for frame in _stream_and_cache(completion, scope, query_vector, chunks):
+                    yield frame
+            return streaming_response(frames(), fmt)
+        
+        query_vector = await vector_service.generate_embeddings(query)
+        system_prompt, sources, chunks, context_stats = await _build_rag_chat_prompt(query, model, query_vector, filters)
+        
+        cached = answer_cache.lookup(scope, query_vector, chunk_keys(chunks)) if answer_cache else None
+        if cached:
+            ai_response = cached["response"]
+        else:
+            # Chiama OpenAI
+            response = await get_llm_gateway().chat(
+                route="rag-chat",
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": query}
+                ],
+                temperature=0.7,
+                max_tokens=600
+            )
+            
+            ai_response = response.choices[0].message.content
+            if answer_cache and ai_response:
+                answer_cache.store(
+                    scope, query_vector, chunk_keys(chunks),
+                    [c.get("document_id") for c in chunks],
+                    {"response": ai_response}
+                )
         
         return {
             "success": True,
             "query": query,
             "response": ai_response,
-            "sources": [doc["filename"] for doc in relevant_docs],
-            "total_docs": len(relevant_docs),
+            "sources": sources,
+            "total_docs": len(sources),
+            "context": context_stats,
+            "cached": bool(cached),
             "timestamp": datetime.utcnow().isoformat()
         }
         
+    except HTTPException:
+        raise
+    except LLMDeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Timeout LLM: {str(e)}")
     except Exception as e:
         import traceback
         print(f"=== RAG ERROR ===")
@@ -307,151 +528,195 @@ ISTRUZIONI: Rispondi precisamente alla domanda usando i documenti. Se l'info non
         print(f"Traceback: {traceback.format_exc()}")
         print(f"==================")
         raise HTTPException(status_code=500, detail=f"Errore chat RAG: {str(e)}")
-# Cache per documenti processati
-document_cache = {}
-
-def get_cached_document(file_path):
-    """Ottieni documento dalla cache se disponibile"""
-    cache_key = f"{file_path.name}_{file_path.stat().st_mtime}"
-    return document_cache.get(cache_key)
-
-def cache_document(file_path, content):
-    """Salva documento in cache"""
-    cache_key = f"{file_path.name}_{file_path.stat().st_mtime}"
-    document_cache[cache_key] = content
-    
-    # Mantieni cache sotto 100 documenti
-    if len(document_cache) > 100:
-        oldest_key = min(document_cache.keys())
-        del document_cache[oldest_key]
 
 @router.delete("/documents/{document_id}")
 async def delete_document_intelligent(document_id: str):
-    """INTELLIGENT DELETE - Cancella File + Qdrant + Database"""
+    """INTELLIGENT DELETE - Cancella File + Qdrant + Database (id del registro o filename)"""
     try:
-        # Find document file
-        document_path = None
-        for file_path in UPLOAD_DIR.glob("*"):
-            if document_id in file_path.name:
-                document_path = file_path
-                break
-        
-        if not document_path:
+        document = await document_registry.resolve(document_id)
+        if not document:
             raise HTTPException(status_code=404, detail="Documento non trovato")
         
-        # Delete chunks from Qdrant
+        # Delete chunks from Qdrant (filtro indicizzato su document_id)
         deleted_chunks = 0
         try:
-            from qdrant_client.models import Filter, FieldCondition, MatchValue
-            search_result = vector_service.qdrant_client.scroll(
-                collection_name=vector_service.collection_name,
-                scroll_filter=Filter(
-                    must=[FieldCondition(key="filename", match=MatchValue(value=document_path.name))]
-                ),
-                limit=1000
-            )
-            
-            chunk_ids = [point.id for point in search_result[0]]
-            if chunk_ids:
-                vector_service.qdrant_client.delete(
-                    collection_name=vector_service.collection_name,
-                    points_selector=chunk_ids
-                )
-                deleted_chunks = len(chunk_ids)
+            deleted_chunks = await vector_service.delete_document(document["id"])
         except Exception as e:
             print(f"Warning: Qdrant cleanup failed: {e}")
         
-        # Delete physical file
-        document_path.unlink()
+        # Delete from upload index (estrazione persistita + chunk FTS)
+        try:
+            deleted_chunks = max(deleted_chunks, await upload_index.remove_document(document["id"]))
+        except Exception as e:
+            print(f"Warning: upload index cleanup failed: {e}")
+        
+        # Registro + file (se non condiviso con altri documenti)
+        deleted_file = await document_registry.delete(document["id"])
         
         return {
             "success": True,
             "message": "Documento eliminato intelligentemente", 
             "details": {
-                "file_deleted": str(document_path.name),
+                "document_id": document["id"],
+                "file_deleted": document["filename"],
+                "blob_deleted": deleted_file is not None,
                 "qdrant_chunks_deleted": deleted_chunks
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Errore: {str(e)}")
 
+async def _build_vector_chat_prompt(
+    query: str,
+    query_vector: Optional[List[float]] = None,
+    filters: Optional[Dict[str, Any]] = None
+):
+    """
+    Ricerca ibrida sulla knowledge base (tutta, o ristretta da `filters`), contesto
+    impacchettato per VECTOR_CHAT_MODEL.
+    Ritorna (system_prompt|None, sources, total_docs, results, context_stats)
+    """
+    # Vector service + full-text, fusi con RRF
+    search_results = await hybrid_retriever.search(
+        query, 
+        limit=5, 
+        score_threshold=0.3,
+        query_vector=query_vector,
+        filters=filters
+    )
+    
+    # Costruisci context dai risultati: dedup, merge dei chunk adiacenti, budget di token
+    packed = get_context_packer().pack(search_results, model=VECTOR_CHAT_MODEL)
+    context = packed.context
+    
+    # Se non trova niente nella knowledge base
+    if not context.strip():
+        return None, [], 0, [], packed.stats
+    
+    system_prompt = f"""Sei un assistente AI esperto. Rispondi basandoti sui documenti forniti.
+DOCUMENTI:
+{context}
+ISTRUZIONI: Rispondi precisamente alla domanda usando i documenti."""
+    return system_prompt, packed.sources, len(search_results), packed.results, packed.stats
+
+VECTOR_CHAT_NO_RESULTS = "Non ho trovato informazioni rilevanti nel vector database per questa query."
+VECTOR_CHAT_MODEL = "gpt-4o"
+
 @router.post("/vector-chat")
-async def vector_rag_chat(request: dict):
-    """Chat con RAG usando Vector Service - Nuovo endpoint sicuro"""
+async def vector_rag_chat(request: dict, http_request: Request):
+    """Chat con RAG usando Vector Service - Nuovo endpoint sicuro (streaming opzionale: `stream`)"""
     try:
         query = request.get("query", "") or request.get("message", "")
         if not query:
             raise HTTPException(status_code=400, detail="Query richiesta")
         
-        # USA VECTOR SERVICE
-        search_results = await vector_service.search_similar_chunks(
-            query, 
-            limit=5, 
-            score_threshold=0.3
-        )
+        filters = _request_filters(request)
+        scope = _filters_scope(f"vector-chat:{VECTOR_CHAT_MODEL}", filters)
+        answer_cache = get_answer_cache()
+        fmt = stream_format(http_request, request.get("stream"))
+        if fmt:
+            async def frames():
+                query_vector = await vector_service.generate_embeddings(query)
+                system_prompt, sources, total_docs, results, context_stats = await _build_vector_chat_prompt(query, query_vector, filters)
+                if system_prompt is None:
+                    yield {"type": "sources", "sources": []}
+                    yield {"type": "token", "content": VECTOR_CHAT_NO_RESULTS}
+                    yield {
+                        "type": "done",
+                        "response": VECTOR_CHAT_NO_RESULTS,
+                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                        "cost": 0.0,
+                        "query": query,
+                        "total_docs": 0
+                    }
+                    return
+                
+                extra = {"query": query, "total_docs": total_docs, "context": context_stats}
+                cached = answer_cache.lookup(scope, query_vector, chunk_keys(results)) if answer_cache else None
+                if cached:
+                    async for frame in _cached_answer_frames(cached, sources, extra):
+                        yield frame
+                    return
+                
+                completion = stream_chat_completion(
+                    "rag-vector-chat",
+                    http_request,
+                    model=VECTOR_CHAT_MODEL,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": query}
+                    ],
+                    sources=sources,
+                    extra=extra,
+                    temperature=0.7,
+                    max_tokens=600
+                )
+                async for frame in _stream_and_cache(completion, scope, query_vector, results):
+                    yield frame
+            return streaming_response(frames(), fmt)
         
-        # DEBUG: Print search results
-        print(f"🔍 DEBUG Vector Search Results: {len(search_results)}")
-        for i, result in enumerate(search_results):
-            print(f"🔍 Result {i}: {result}")
-        
-        # Costruisci context dai risultati vector
-        context_parts = []
-        sources = []
-        for result in search_results:
-            content = result.get("content", "")
-            filename = result.get("filename", "unknown")
-            print(f"🔍 Processing result: filename={filename}, content_length={len(content)}, content_preview={content[:50]}")
-            if content.strip():
-                context_parts.append(f"Documento: {filename}\nContenuto: {content}")
-                sources.append(filename)
-                print(f"✅ Added to context: {filename}")
-            else:
-                print(f"❌ Skipped (no content): {filename}")
-        
-        context = "\n\n".join(context_parts)
-        
-        # Se non trova niente nel vector DB
-        if not context.strip():
+        query_vector = await vector_service.generate_embeddings(query)
+        system_prompt, sources, total_docs, results, context_stats = await _build_vector_chat_prompt(query, query_vector, filters)
+        if system_prompt is None:
             return {
                 "success": True,
                 "query": query,
-                "response": "Non ho trovato informazioni rilevanti nel vector database per questa query.",
+                "response": VECTOR_CHAT_NO_RESULTS,
                 "sources": [],
                 "total_docs": 0,
                 "timestamp": datetime.utcnow().isoformat()
             }
         
-        # GPT-4 call
-        import openai
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        system_prompt = f"""Sei un assistente AI esperto. Rispondi basandoti sui documenti forniti.
-DOCUMENTI:
-{context}
-ISTRUZIONI: Rispondi precisamente alla domanda usando i documenti."""
-        
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ],
-            temperature=0.7,
-            max_tokens=600
-        )
-        
-        ai_response = response.choices[0].message.content
+        # Domanda quasi identica con lo stesso contesto: nessuna chiamata GPT
+        cached = answer_cache.lookup(scope, query_vector, chunk_keys(results)) if answer_cache else None
+        if cached:
+            ai_response = cached["response"]
+        else:
+            # GPT-4 call
+            response = await get_llm_gateway().chat(
+                route="rag-vector-chat",
+                model=VECTOR_CHAT_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": query}
+                ],
+                temperature=0.7,
+                max_tokens=600
+            )
+            
+            ai_response = response.choices[0].message.content
+            if answer_cache and ai_response:
+                answer_cache.store(
+                    scope, query_vector, chunk_keys(results),
+                    [r.get("document_id") for r in results],
+                    {"response": ai_response}
+                )
         
         return {
             "success": True,
             "query": query,
             "response": ai_response,
             "sources": sources,
-            "total_docs": len(search_results),
+            "total_docs": total_docs,
+            "context": context_stats,
+            "cached": bool(cached),
             "timestamp": datetime.utcnow().isoformat()
         }
         
+    except HTTPException:
+        raise
+    except LLMDeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Timeout LLM: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Errore RAG: {str(e)}")
+
+@router.get("/answer-cache/stats")
+async def get_answer_cache_stats():
+    """Contatori hit/miss della answer cache (per calibrare ANSWER_CACHE_THRESHOLD)"""
+    answer_cache = get_answer_cache()
+    if answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **answer_cache.get_stats()}
@@ -4,8 +4,9 @@ import asyncio
 from datetime import datetime
 
 # Import esistenti RAG
-from ..modules.rag_engine.vector_service import VectorRAGService
+from ..modules.rag_engine.vector_service import get_vector_service
 from ..modules.rag_engine.document_processor import DocumentProcessor
+from ..modules.rag_engine.chunker import chunk_text
 
 # Import Web Scraping
 import sys
@@ -19,7 +20,7 @@ from rag_integration_simple import SimpleRAGIntegration
 router = APIRouter(prefix="/api/rag", tags=["rag"])
 
 # Istanze servizi
-vector_service = VectorRAGService()
+vector_service = get_vector_service()
 document_processor = DocumentProcessor()
 scraping_rag = SimpleRAGIntegration()
 
@@ -177,7 +178,7 @@ async def _process_for_vector_store(knowledge_doc: Dict[str, Any], content_dict:
         text = content_dict.get('cleaned_text', '')
         if len(text) > 100:
             # Simula chunking e embedding
-            chunks = [text[i:i+1000] for i in range(0, len(text), 800)]
+            chunks = chunk_text(text)
             
             for i, chunk in enumerate(chunks):
                 # Simula creazione embedding
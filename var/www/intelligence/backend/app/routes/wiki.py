@@ -1,7 +1,7 @@
 """
 Wiki API Routes for Intelligence HUB v5.0
 """
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 import os
@@ -10,6 +10,7 @@ from pathlib import Path
 
 from app.core.database import get_db
 from app.services.wiki_service import WikiService
+from app.core.streaming import stream_format, stream_chat_completion, streaming_response
 from app.schemas.wiki import (
     WikiPageResponse, WikiPageCreate, WikiPageUpdate,
     WikiCategoryResponse, WikiCategoryCreate,
@@ -210,15 +211,82 @@ async def search_wiki(
     }
 
 # ===== CHAT ENDPOINTS =====
+async def _stream_wiki_chat(chat_query: WikiChatQuery, db: Session, request: Request):
+    """Streaming: sources first, then the LLM answer grounded on the top wiki pages"""
+    import time
+    start_time = time.time()
+    session_id = chat_query.session_id or f"wiki_session_{int(time.time())}"
+    
+    search_results = await wiki_service.search_wiki(chat_query.query, db, limit=5)
+    top_results = search_results[:3]
+    sources = [
+        {
+            'page_title': result['page']['title'],
+            'page_slug': result['page']['slug'],
+            'score': result['score']
+        }
+        for result in top_results
+    ]
+    extra = {
+        "session_id": session_id,
+        "wiki_pages_referenced": list({result['page']['id'] for result in top_results}),
+        "confidence_score": 0.8 if search_results else 0.1
+    }
+    
+    if not top_results:
+        response_text = "Non ho trovato informazioni rilevanti nella wiki per rispondere alla tua domanda."
+        yield {"type": "sources", "sources": []}
+        yield {"type": "token", "content": response_text}
+        yield {
+            "type": "done",
+            "response": response_text,
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            "cost": 0.0,
+            "response_time_ms": int((time.time() - start_time) * 1000),
+            **extra
+        }
+        return
+    
+    context = "\n\n".join(
+        f"Pagina: {result['page']['title']}\n{result['text']}" for result in top_results
+    )
+    async for frame in stream_chat_completion(
+        "wiki-chat",
+        request,
+        model=os.getenv("OPENAI_MODEL", "gpt-4o"),
+        messages=[
+            {
+                "role": "system",
+                "content": (
+                    "Sei l'assistente della wiki aziendale. Rispondi in italiano usando solo "
+                    f"la documentazione seguente; se l'informazione non c'è, dillo.\n\n{context}"
+                )
+            },
+            {"role": "user", "content": chat_query.query}
+        ],
+        sources=sources if chat_query.include_sources else [],
+        extra=extra,
+        temperature=0.3,
+        max_tokens=600
+    ):
+        if frame["type"] == "done":
+            frame["response_time_ms"] = int((time.time() - start_time) * 1000)
+        yield frame
+
 @router.post("/chat", response_model=WikiChatResponse)
 async def wiki_chat(
     chat_query: WikiChatQuery,
+    request: Request,
     db: Session = Depends(get_db)
 ):
-    """Chat with wiki content using RAG"""
+    """Chat with wiki content using RAG (opt-in streaming via `stream`)"""
     import time
     start_time = time.time()
     
+    fmt = stream_format(request, chat_query.stream)
+    if fmt:
+        return streaming_response(_stream_wiki_chat(chat_query, db, request), fmt)
+    
     try:
         # Use search to get relevant content
         search_results = await wiki_service.search_wiki(
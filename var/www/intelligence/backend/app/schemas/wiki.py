@@ -3,7 +3,7 @@ Wiki Schemas for Intelligence HUB v5.0
 Pydantic schemas for wiki API validation
 """
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 from datetime import datetime
 from enum import Enum
 
@@ -175,6 +175,7 @@ class WikiChatQuery(BaseModel):
     session_id: Optional[str] = None
     wiki_only: bool = Field(default=False)
     include_sources: bool = Field(default=True)
+    stream: Optional[Union[bool, str]] = None  # true/"sse" o "ndjson"
 
 class WikiChatResponse(BaseModel):
     response: str
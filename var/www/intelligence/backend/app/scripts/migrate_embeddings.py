@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Migrazione in background dei vettori legacy (es. text-embedding-ada-002) al modello corrente
+
+La collection (layout named vector, app/scripts/reindex.py build) conserva per ogni punto
+il vettore del suo modello e il payload embedding_model. La ricerca interroga ogni modello
+con il proprio embedding della query finché restano punti legacy; questo job li
+ri-vettorizza con il modello corrente:
+- testi dei chunk dal payload (content / text / chunk_text), nessuna ri-estrazione
+- velocità limitata (--rate punti/s) per non saturare OpenAI e Qdrant
+- vettore del modello corrente scritto, embedding_model aggiornato, vettore legacy
+  rimosso (--keep-legacy per conservarlo)
+- avanzamento salvato in EMBEDDING_MIGRATION_STATUS dopo ogni batch: un job interrotto
+  riprende dall'ultimo punto; --status mostra l'avanzamento
+
+Uso:
+    python migrate_embeddings.py [--model text-embedding-ada-002] [--rate 50] [--batch-size 64] [--keep-legacy]
+    python migrate_embeddings.py --status
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+# Add backend to path
+sys.path.append('/var/www/intelligence/backend')
+
+from qdrant_client.models import FieldCondition, Filter, MatchValue, PointVectors
+
+from app.modules.rag_engine.vector_service import get_vector_service, payload_text, resolve_collection
+from app.scripts.reindex import RateLimiter
+
+STATUS_PATH = os.getenv("EMBEDDING_MIGRATION_STATUS", "/var/www/intelligence/data/embedding_migration.json")
+
+
+def model_filter(model: str) -> Filter:
+    return Filter(must=[FieldCondition(key="embedding_model", match=MatchValue(value=model))])
+
+
+def load_status() -> Dict[str, Any]:
+    path = Path(STATUS_PATH)
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def save_status(status: Dict[str, Any]):
+    """Scrittura atomica: un job interrotto non lascia un file a metà"""
+    path = Path(STATUS_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(status, indent=2, default=str))
+    os.replace(tmp, path)
+
+
+def format_eta(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def show_status(client, collection: str):
+    status = load_status()
+    print(f"📋 {collection} ({STATUS_PATH})")
+    for model, state in status.items():
+        remaining = client.count(collection_name=collection, count_filter=model_filter(model), exact=True).count
+        print(f"📊 {model}: {state.get('migrated', 0)} migrati, {state.get('failed', 0)} falliti, "
+              f"{remaining} rimanenti (aggiornato {state.get('updated_at', '-')})")
+    if not status:
+        print("📋 Nessuna migrazione avviata")
+    return True
+
+
+async def migrate_model(vector_service, client, collection: str, model: str, args) -> bool:
+    primary = vector_service.embedding_model
+    status = load_status()
+    state = status.setdefault(model, {
+        "offset": None, "migrated": 0, "failed": 0, "started_at": time.strftime("%Y-%m-%d %H:%M:%S")
+    })
+    total = await asyncio.to_thread(
+        client.count, collection_name=collection, count_filter=model_filter(model), exact=True
+    )
+    total = total.count
+    print(f"🔄 {model} → {primary}: {total} punti da migrare"
+          f"{' (ripresa)' if state['offset'] is not None else ''}")
+
+    limiter = RateLimiter(args.rate)
+    started = time.monotonic()
+    done = 0
+    offset = state["offset"]
+    while total:
+        points, next_offset = await asyncio.to_thread(
+            client.scroll,
+            collection_name=collection,
+            scroll_filter=model_filter(model),
+            limit=args.batch_size,
+            offset=offset,
+            with_payload=["content", "text", "chunk_text"],
+            with_vectors=False
+        )
+        items = [(point.id, payload_text(point.payload or {})) for point in points]
+        texts = [text for _, text in items if text]
+        await limiter.wait(len(texts))
+        vectors = iter(await vector_service.embedding_pipeline.embed_texts(texts))
+
+        migrated = []
+        for point_id, text in items:
+            vector = next(vectors) if text else None
+            if vector is None:
+                state["failed"] += 1
+                continue
+            migrated.append(PointVectors(id=point_id, vector={primary: vector}))
+
+        if migrated:
+            ids = [p.id for p in migrated]
+            await asyncio.to_thread(client.update_vectors, collection_name=collection, points=migrated, wait=True)
+            await asyncio.to_thread(
+                client.set_payload, collection_name=collection, payload={"embedding_model": primary},
+                points=ids, wait=True
+            )
+            if not args.keep_legacy:
+                await asyncio.to_thread(
+                    client.delete_vectors, collection_name=collection, vectors=[model], points=ids, wait=True
+                )
+        state["migrated"] += len(migrated)
+        done += len(items)
+
+        # Avanzamento salvato dopo ogni batch: la ripresa parte dal punto successivo
+        offset = state["offset"] = next_offset
+        state["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        save_status(status)
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0.0
+        eta = format_eta((total - done) / rate) if rate else "-"
+        print(f"✅ {model}: {min(done, total)}/{total} ({rate:.1f} punti/s, ETA {eta})")
+        if next_offset is None:
+            break
+
+    remaining = (await asyncio.to_thread(
+        client.count, collection_name=collection, count_filter=model_filter(model), exact=True
+    )).count
+    state["offset"] = None
+    state["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    save_status(status)
+    if remaining:
+        # Punti senza testo o con embedding fallito: un nuovo passaggio riparte dall'inizio
+        print(f"⚠️ {model}: {remaining} punti non migrati, rieseguire lo script")
+        return False
+    print(f"✅ {model}: migrazione completata")
+    return True
+
+
+async def run(args) -> bool:
+    vector_service = get_vector_service()
+    client = vector_service.qdrant_client
+    collection = resolve_collection(client, vector_service.collection_name)
+    if args.status:
+        return show_status(client, collection)
+
+    layout = vector_service.layout(refresh=True)
+    if not layout.named_vectors or layout.model != vector_service.embedding_model:
+        print(f"❌ {collection} non ha il vettore {vector_service.embedding_model}: "
+              f"eseguire prima app/scripts/reindex.py build")
+        return False
+    if layout.dimensions != vector_service.collection_config.dimensions:
+        print(f"❌ Dimensioni {layout.dimensions} in {collection}, "
+              f"{vector_service.collection_config.dimensions} in EMBEDDING_DIMENSIONS")
+        return False
+
+    models = [args.model] if args.model else list(layout.legacy_models)
+    unknown = [m for m in models if m not in layout.legacy_models]
+    if unknown:
+        print(f"❌ Modelli senza vettore legacy in {collection}: {', '.join(unknown)}")
+        return False
+    if not models:
+        print("✅ Nessun modello legacy da migrare")
+        return True
+
+    success = True
+    for model in models:
+        success = await migrate_model(vector_service, client, collection, model, args) and success
+    print("🎉 Embedding migration completed!" if success else "⚠️ Embedding migration incompleta")
+    return success
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed legacy vectors with the current embedding model")
+    parser.add_argument("--model", help="Legacy model to migrate (default: all)")
+    parser.add_argument("--rate", type=float, default=50, help="Points per second (0 = unlimited)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--keep-legacy", action="store_true", help="Keep the legacy vector after migration")
+    parser.add_argument("--status", action="store_true", help="Show progress and exit")
+    success = asyncio.run(run(parser.parse_args()))
+    sys.exit(0 if success else 1)
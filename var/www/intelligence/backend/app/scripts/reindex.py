@@ -0,0 +1,679 @@
+#!/usr/bin/env python3
+"""
+Re-index blue/green della knowledge base Qdrant
+
+Lettori e scrittori usano sempre l'alias intelligence_knowledge. Il re-index costruisce
+in background una collection versionata (intelligence_knowledge_v<timestamp>) e sposta
+l'alias in modo atomico solo dopo le verifiche; la collection precedente resta
+disponibile per il rollback istantaneo.
+
+build:
+    --mode copy      vettori copiati (quantizzazione, on-disk, dimensioni ridotte per troncamento)
+    --mode reembed   testi dei chunk ri-vettorizzati con la pipeline di embedding corrente
+    --mode rechunk   upload e pagine scraping ri-estratti e ri-chunkati (vectorize), resto copiato
+    - velocità limitata (--rate punti/s), dimezzata se la latenza delle ricerche live sale
+    - indicizzazione HNSW rimandata a fine caricamento
+    - scritture arrivate sulla collection live durante il build riallineate prima del flip
+    - verifica conteggi per sorgente e recall su query campione, poi flip dell'alias
+flip / rollback / status / cleanup: gestione delle versioni
+
+La prima esecuzione trova la collection storica (non alias): al flip viene copiata
+in intelligence_knowledge_v0 (versione di rollback) e sostituita dall'alias.
+
+Uso:
+    python reindex.py build [--mode copy|reembed|rechunk] [--rate 500] [--no-flip]
+        [--quantization scalar] [--dimensions 768] [--on-disk-vectors] [--on-disk-payload]
+    CHUNK_MAX_TOKENS=400 python reindex.py build --mode rechunk
+    python reindex.py flip intelligence_knowledge_v20261016120000
+    python reindex.py rollback [--to intelligence_knowledge_v20261001090000]
+    python reindex.py status
+    python reindex.py cleanup [--keep 2]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Add backend to path
+sys.path.append('/var/www/intelligence/backend')
+
+from qdrant_client.models import (
+    CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation,
+    FieldCondition, Filter, MatchAny, MatchValue, OptimizersConfigDiff, PointStruct
+)
+
+from app.core.clients import get_clients
+from app.modules.rag_engine.collection_config import (
+    QUANTIZATION_MODES, CollectionConfig, point_model, point_vectors
+)
+from app.modules.rag_engine.embedding_cache import text_hash
+from app.modules.rag_engine.extraction_pool import ExtractionPool
+from app.modules.rag_engine.upload_index import UPLOAD_SOURCE, UploadIndex
+from app.modules.rag_engine.vector_service import (
+    COLLECTION_ALIAS, VectorRAGService, collection_exists, ensure_payload_indexes, payload_text, resolve_collection
+)
+from app.scripts.vectorize import (
+    DEFAULT_MANIFEST_PATH, SCRAPED_SOURCE, Manifest, Vectorizer, collect_sources, sync_sources
+)
+
+VERSION_PREFIX = f"{COLLECTION_ALIAS}_v"
+LEGACY_VERSION = f"{VERSION_PREFIX}0"
+
+# Sorgenti ricostruite da vectorize in --mode rechunk (le altre vengono copiate)
+REBUILT_SOURCES = [UPLOAD_SOURCE, SCRAPED_SOURCE]
+
+# Soglia di indicizzazione Qdrant di default, ripristinata a fine caricamento
+INDEXING_THRESHOLD = 20000
+
+
+def qdrant():
+    return get_clients().qdrant()
+
+
+# ===== VERSIONI =====
+
+def version_number(name: str) -> int:
+    suffix = name[len(VERSION_PREFIX):] if name.startswith(VERSION_PREFIX) else ""
+    return int(suffix) if suffix.isdigit() else -1
+
+
+def list_versions(client) -> List[str]:
+    names = [c.name for c in client.get_collections().collections if version_number(c.name) >= 0]
+    return sorted(names, key=version_number)
+
+
+def manifest_path(collection: Optional[str] = None) -> str:
+    """Manifest vectorize attivo, o quello associato a una versione"""
+    base = Path(os.getenv("VECTORIZE_MANIFEST_PATH", DEFAULT_MANIFEST_PATH))
+    if collection is None:
+        return str(base)
+    return str(base.with_name(f"{base.stem}.{collection}{base.suffix}"))
+
+
+def copy_sqlite(source: str, target: str):
+    Path(target).parent.mkdir(parents=True, exist_ok=True)
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+def swap_manifest(previous: str, current: str):
+    """
+    Il manifest attivo descrive i punti della collection dietro l'alias: al flip
+    viene salvato per la versione precedente e sostituito da quello della nuova
+    (se la nuova è stata ri-chunkata; copy/reembed mantengono gli stessi punti)
+    """
+    active = manifest_path()
+    if os.path.exists(active):
+        copy_sqlite(active, manifest_path(previous))
+    if os.path.exists(manifest_path(current)):
+        copy_sqlite(manifest_path(current), active)
+        print(f"📒 Manifest vectorize di {current} attivato")
+
+
+# ===== VELOCITÀ / LATENZA =====
+
+class RateLimiter:
+    """Punti/s verso la nuova collection; rallentato se la latenza live peggiora"""
+
+    def __init__(self, rate: float):
+        self.base_rate = rate
+        self.rate = rate
+        self._next = time.monotonic()
+
+    async def wait(self, points: int):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            await asyncio.sleep(self._next - now)
+        self._next = max(self._next, now) + points / self.rate
+
+    def slow_down(self):
+        self.rate = max(self.base_rate / 8, self.rate / 2)
+
+    def recover(self):
+        self.rate = min(self.base_rate, self.rate * 2)
+
+
+class LatencyGuard:
+    """
+    Ricerche campione sulla collection live durante il build: se la latenza supera
+    `factor` × il p99 misurato prima del build, il caricamento rallenta
+    """
+
+    def __init__(self, client, live: str, limiter: RateLimiter, factor: float = 2.0, interval: float = 5.0):
+        self.client = client
+        self.live = live
+        self.limiter = limiter
+        self.factor = factor
+        self.interval = interval
+        self.probes: List[Any] = []
+        self.baseline: List[float] = []
+        self.during: List[float] = []
+        self._last = 0.0
+
+    async def _probe(self) -> float:
+        vector = random.choice(self.probes)
+        start = time.perf_counter()
+        await asyncio.to_thread(self.client.search, collection_name=self.live, query_vector=vector, limit=10)
+        return (time.perf_counter() - start) * 1000
+
+    async def measure_baseline(self, samples: int = 20):
+        points, _ = await asyncio.to_thread(
+            self.client.scroll, collection_name=self.live, limit=samples,
+            with_payload=["source", "embedding_model"], with_vectors=True
+        )
+        layout = CollectionConfig.from_collection_info(await asyncio.to_thread(self.client.get_collection, self.live))
+        self.probes = [
+            query for query in (layout.query_vector(point_vectors(p.vector, p.payload)) for p in points)
+            if query is not None
+        ]
+        for _ in range(samples if self.probes else 0):
+            self.baseline.append(await self._probe())
+
+    async def check(self):
+        if not self.baseline or time.monotonic() - self._last < self.interval:
+            return
+        self._last = time.monotonic()
+        latency = await self._probe()
+        self.during.append(latency)
+        if latency > self.factor * percentile(self.baseline, 0.99):
+            self.limiter.slow_down()
+            print(f"🐢 Latenza live {latency:.1f} ms: velocità ridotta a {self.limiter.rate:.0f} punti/s")
+        else:
+            self.limiter.recover()
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "baseline_p50_ms": round(statistics.median(self.baseline), 2) if self.baseline else None,
+            "baseline_p99_ms": round(percentile(self.baseline, 0.99), 2) if self.baseline else None,
+            "during_p50_ms": round(statistics.median(self.during), 2) if self.during else None,
+            "during_p99_ms": round(percentile(self.during, 0.99), 2) if self.during else None,
+            "final_rate": self.limiter.rate,
+        }
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+# ===== COPIA =====
+
+def source_filter(include: Optional[List[str]] = None, exclude: Optional[List[str]] = None) -> Optional[Filter]:
+    if include:
+        return Filter(must=[FieldCondition(key="source", match=MatchAny(any=include))])
+    if exclude:
+        return Filter(must_not=[FieldCondition(key="source", match=MatchAny(any=exclude))])
+    return None
+
+
+class Builder:
+    """Caricamento della nuova collection a partire da quella live"""
+
+    def __init__(self, client, live: str, target: str, config: CollectionConfig, mode: str,
+                 limiter: RateLimiter, guard: LatencyGuard, batch_size: int):
+        self.client = client
+        self.live = live
+        self.target = target
+        self.config = config
+        self.mode = mode
+        self.limiter = limiter
+        self.guard = guard
+        self.batch_size = batch_size
+        self.vector_service = VectorRAGService(collection_config=config, collection_name=target)
+        self.written: Dict[str, Set[Any]] = defaultdict(set)  # sorgente → point id scritti
+        self.skipped: Dict[str, Set[Any]] = defaultdict(set)  # vettori non riducibili
+        self.stats = Counter()
+
+    async def throttle(self, points: int):
+        await self.limiter.wait(points)
+        await self.guard.check()
+
+    async def write(self, points):
+        """Scrive punti letti dalla live (con vettori e payload) nella nuova collection"""
+        structs, items, sources = [], [], {}
+        for point in points:
+            payload = point.payload or {}
+            source = sources[point.id] = payload.get("source", "")
+            vectors = point_vectors(point.vector, payload)
+            # Modello registrato anche sui punti scritti prima di embedding_model
+            payload = {**payload, "embedding_model": point_model(payload)}
+            if self.mode == "reembed" and payload_text(payload):
+                items.append((point.id, payload_text(payload), payload))
+                continue
+            vector = self.config.point_vector(vectors)
+            if vector is None:
+                self.skipped[source].add(point.id)
+                continue
+            structs.append(PointStruct(id=point.id, vector=vector, payload=payload))
+
+        await self.throttle(len(structs) + len(items))
+        written = [struct.id for struct in structs]
+        if structs:
+            await asyncio.to_thread(self.client.upsert, collection_name=self.target, points=structs, wait=True)
+        if items:
+            metrics = await self.vector_service.upsert_texts(items)
+            self.stats["tokens"] += metrics.tokens
+            failed = set(metrics.failed_point_ids)
+            self.stats["failed"] += len(failed)
+            written += [point_id for point_id, _, _ in items if point_id not in failed]
+        for point_id in written:
+            self.written[sources[point_id]].add(point_id)
+        self.stats["written"] = sum(len(ids) for ids in self.written.values())
+
+    async def copy_all(self, scope: Optional[Filter]):
+        offset = None
+        while True:
+            points, offset = await asyncio.to_thread(
+                self.client.scroll,
+                collection_name=self.live,
+                scroll_filter=scope,
+                limit=self.batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if points:
+                await self.write(points)
+            print(f"✅ {self.live} → {self.target}: {self.stats['written']} punti")
+            if offset is None:
+                break
+
+    async def snapshot(self, collection: str, scope: Optional[Filter]) -> Dict[Any, Tuple[str, str]]:
+        """point id → (sorgente, hash del contenuto)"""
+        state = {}
+        offset = None
+        while True:
+            points, offset = await asyncio.to_thread(
+                self.client.scroll,
+                collection_name=collection,
+                scroll_filter=scope,
+                limit=1000,
+                offset=offset,
+                with_payload=["source", "content", "text", "chunk_text"],
+                with_vectors=False
+            )
+            for point in points:
+                payload = point.payload or {}
+                state[point.id] = (payload.get("source", ""), text_hash(payload_text(payload)))
+            if offset is None:
+                break
+        return state
+
+    async def catch_up(self, scope: Optional[Filter]) -> Dict[str, int]:
+        """Riallinea la nuova collection alle scritture arrivate sulla live durante il build"""
+        live = await self.snapshot(self.live, scope)
+        built = await self.snapshot(self.target, scope)
+        changed = [
+            point_id for point_id, state in live.items()
+            if built.get(point_id) != state and point_id not in self.skipped[state[0]]
+        ]
+        removed = [point_id for point_id in built if point_id not in live]
+
+        for start in range(0, len(changed), self.batch_size):
+            points = await asyncio.to_thread(
+                self.client.retrieve,
+                collection_name=self.live,
+                ids=changed[start:start + self.batch_size],
+                with_payload=True,
+                with_vectors=True
+            )
+            await self.write(points)
+        if removed:
+            await asyncio.to_thread(self.client.delete, collection_name=self.target, points_selector=removed)
+            for point_id in removed:
+                self.written[built[point_id][0]].discard(point_id)
+        print(f"🔁 Riallineamento: {len(changed)} punti copiati, {len(removed)} rimossi")
+        return {"copied": len(changed), "removed": len(removed)}
+
+    async def rechunk(self, workers: int) -> Dict[str, Any]:
+        """Upload e scraping ri-estratti e ri-chunkati nella nuova collection (manifest dedicato)"""
+        manifest = Manifest(manifest_path(self.target))
+        extraction_pool = ExtractionPool(max_workers=workers)
+        upload_index = UploadIndex(self.vector_service)
+        vectorizer = Vectorizer(
+            self.vector_service, manifest, upload_index, workers,
+            dry_run=False, force=False, throttle=self.throttle
+        )
+        try:
+            await sync_sources(vectorizer, collect_sources(self.vector_service, extraction_pool))
+        finally:
+            extraction_pool.shutdown()
+
+        for source in REBUILT_SOURCES:
+            rows = manifest.conn.execute(
+                "SELECT c.point_id FROM chunks c JOIN documents d ON d.document_key = c.document_key "
+                "WHERE d.source = ?", (source,)
+            ).fetchall()
+            self.written[source] = {row[0] for row in rows}
+        return vectorizer.report.to_dict()
+
+
+# ===== VERIFICA =====
+
+async def count(client, collection: str, source: Optional[str] = None) -> int:
+    scope = Filter(must=[FieldCondition(key="source", match=MatchValue(value=source))]) if source else None
+    result = await asyncio.to_thread(client.count, collection_name=collection, count_filter=scope, exact=True)
+    return result.count
+
+
+async def search_documents(client, collection: str, vector, search_params, k: int):
+    results = await asyncio.to_thread(
+        client.search,
+        collection_name=collection,
+        query_vector=vector,
+        search_params=search_params,
+        limit=k,
+        with_payload=["document_id"]
+    )
+    return results
+
+
+async def verify(builder: Builder, args) -> Tuple[bool, Dict[str, Any]]:
+    client, live, target = builder.client, builder.live, builder.target
+    checks: Dict[str, Any] = {"sources": {}}
+    ok = True
+
+    # Conteggi: ogni punto scritto presente una sola volta, nessuna perdita rispetto alla live
+    expected_total = sum(len(ids) for ids in builder.written.values())
+    total = await count(client, target)
+    checks["points"] = {"expected": expected_total, "found": total}
+    if total != expected_total:
+        ok = False
+        print(f"❌ {target}: {total} punti, attesi {expected_total}")
+
+    for source, ids in sorted(builder.written.items()):
+        if not source:
+            continue
+        found = await count(client, target, source)
+        live_count = await count(client, live, source)
+        skipped = len(builder.skipped[source])
+        entry = {"live": live_count, "expected": len(ids), "found": found, "skipped": skipped}
+        checks["sources"][source] = entry
+        if found != len(ids):
+            ok = False
+            print(f"❌ {source}: {found} punti, attesi {len(ids)}")
+        rebuilt = args.mode == "rechunk" and source in REBUILT_SOURCES
+        if not rebuilt and live_count and (live_count - found - skipped) / live_count > args.max_count_drop:
+            ok = False
+            print(f"❌ {source}: {found} punti contro {live_count} nella live")
+        if skipped:
+            print(f"⚠️ {source}: {skipped} punti non riducibili saltati (ri-vettorizzare)")
+    if builder.stats["failed"]:
+        ok = False
+        print(f"❌ {builder.stats['failed']} punti non vettorizzati")
+
+    # Recall: ogni punto campione deve ritrovarsi tra i primi k cercando col suo vettore;
+    # i documenti trovati devono coincidere in buona parte con quelli della live
+    all_ids = [point_id for ids in builder.written.values() for point_id in ids]
+    sample = random.sample(all_ids, min(args.sample, len(all_ids)))
+    config = builder.config
+    live_layout = CollectionConfig.from_collection_info(await asyncio.to_thread(client.get_collection, live), config.model)
+    built_points = await asyncio.to_thread(client.retrieve, collection_name=target, ids=sample, with_vectors=True)
+    live_points = {
+        p.id: p for p in await asyncio.to_thread(
+            client.retrieve, collection_name=live, ids=sample, with_vectors=True
+        )
+    }
+    hits, overlaps = 0, []
+    for point in built_points:
+        vectors = point_vectors(point.vector, point.payload)
+        results = await search_documents(client, target, config.query_vector(vectors), config.search_params(), args.k)
+        hits += any(r.id == point.id for r in results)
+        # Overlap solo per il modello corrente: nella live storica i vettori legacy erano mescolati
+        old = live_points.get(point.id)
+        old_query = live_layout.query_vector(point_vectors(old.vector, old.payload)) if old else None
+        if old_query is None or config.model not in vectors or point_model(old.payload or {}) != config.model:
+            continue
+        old_results = await search_documents(client, live, old_query, live_layout.search_params(), args.k)
+        old_docs = {(r.payload or {}).get("document_id") for r in old_results}
+        new_docs = {(r.payload or {}).get("document_id") for r in results}
+        if old_docs:
+            overlaps.append(len(old_docs & new_docs) / len(old_docs))
+
+    recall = hits / len(built_points) if built_points else 1.0
+    overlap = statistics.mean(overlaps) if overlaps else None
+    checks["recall"] = {
+        "sample": len(built_points),
+        "self_recall_at_k": round(recall, 4),
+        "document_overlap_at_k": round(overlap, 4) if overlap is not None else None,
+    }
+    if recall < args.min_recall:
+        ok = False
+        print(f"❌ Recall@{args.k} {recall:.3f} < {args.min_recall}")
+    if overlap is not None and overlap < args.min_overlap:
+        ok = False
+        print(f"❌ Overlap documenti@{args.k} con la live {overlap:.3f} < {args.min_overlap}")
+    return ok, checks
+
+
+# ===== ALIAS =====
+
+async def wait_indexed(client, collection: str, timeout: float = 3600):
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        info = await asyncio.to_thread(client.get_collection, collection)
+        if info.status == "green":
+            return True
+        await asyncio.sleep(2)
+    return False
+
+
+async def adopt_legacy(client) -> str:
+    """La collection storica (stesso nome dell'alias) viene copiata in _v0 ed eliminata"""
+    print(f"📦 {COLLECTION_ALIAS} non è ancora un alias: copia in {LEGACY_VERSION}")
+    info = await asyncio.to_thread(client.get_collection, COLLECTION_ALIAS)
+    config = CollectionConfig.from_collection_info(info)
+    await asyncio.to_thread(client.create_collection, collection_name=LEGACY_VERSION, **config.create_kwargs())
+    await asyncio.to_thread(ensure_payload_indexes, client, LEGACY_VERSION)
+
+    builder = Builder(client, COLLECTION_ALIAS, LEGACY_VERSION, config, "copy",
+                      RateLimiter(0), LatencyGuard(client, COLLECTION_ALIAS, RateLimiter(0)), 256)
+    await builder.copy_all(None)
+    await builder.catch_up(None)
+    if await count(client, LEGACY_VERSION) != await count(client, COLLECTION_ALIAS):
+        raise RuntimeError(f"Copia {LEGACY_VERSION} incompleta: collection storica non modificata")
+    # Unica finestra senza collection (pochi ms): tra delete e creazione dell'alias
+    await asyncio.to_thread(client.delete_collection, collection_name=COLLECTION_ALIAS)
+    return LEGACY_VERSION
+
+
+async def flip(client, target: str) -> bool:
+    """Sposta l'alias su `target` in un'unica operazione atomica"""
+    if not any(c.name == target for c in client.get_collections().collections):
+        print(f"❌ Collection {target} inesistente")
+        return False
+    current = resolve_collection(client, COLLECTION_ALIAS)
+    if current == target:
+        print(f"✅ {COLLECTION_ALIAS} punta già a {target}")
+        return True
+
+    operations = []
+    if current == COLLECTION_ALIAS:
+        if collection_exists(client, COLLECTION_ALIAS):
+            current = await adopt_legacy(client)
+    else:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=COLLECTION_ALIAS)))
+    operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=COLLECTION_ALIAS)))
+
+    await asyncio.to_thread(client.update_collection_aliases, change_aliases_operations=operations)
+    if current != COLLECTION_ALIAS:
+        swap_manifest(current, target)
+    print(f"🔀 {COLLECTION_ALIAS}: {current} → {target}")
+
+    # I servizi leggono la configurazione dall'ambiente (dimensioni della query, search_params)
+    info = await asyncio.to_thread(client.get_collection, target)
+    diffs = CollectionConfig().differences(info)
+    if diffs:
+        print(f"⚠️ Ambiente diverso da {target} ({'; '.join(diffs)}): aggiornare EMBEDDING_DIMENSIONS / "
+              f"QDRANT_QUANTIZATION / QDRANT_*_ON_DISK e riavviare i servizi")
+    return True
+
+
+# ===== COMANDI =====
+
+async def cmd_build(args) -> bool:
+    client = qdrant()
+    if not collection_exists(client, COLLECTION_ALIAS):
+        print(f"❌ {COLLECTION_ALIAS} inesistente: niente da re-indicizzare")
+        return False
+    live = resolve_collection(client, COLLECTION_ALIAS)
+    target = f"{VERSION_PREFIX}{time.strftime('%Y%m%d%H%M%S')}"
+    config = CollectionConfig(
+        dimensions=args.dimensions,
+        quantization=args.quantization,
+        on_disk_vectors=args.on_disk_vectors,
+        on_disk_payload=args.on_disk_payload,
+    )
+    print(f"🚀 Re-index {args.mode}: {live} → {target} ({args.rate:g} punti/s)")
+    print(f"📋 Configurazione: {config.describe()}")
+
+    # Indicizzazione HNSW disattivata durante il caricamento: meno CPU sottratta alle ricerche
+    await asyncio.to_thread(
+        client.create_collection,
+        collection_name=target,
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=0),
+        **config.create_kwargs()
+    )
+    await asyncio.to_thread(ensure_payload_indexes, client, target)
+
+    limiter = RateLimiter(args.rate)
+    guard = LatencyGuard(client, live, limiter, factor=args.latency_factor)
+    await guard.measure_baseline()
+    builder = Builder(client, live, target, config, args.mode, limiter, guard, args.batch_size)
+
+    started = time.perf_counter()
+    report: Dict[str, Any] = {"live": live, "collection": target, "mode": args.mode, "config": config.describe()}
+    if args.mode == "rechunk":
+        report["vectorize"] = await builder.rechunk(args.workers)
+        copy_scope = source_filter(exclude=REBUILT_SOURCES)
+    else:
+        copy_scope = None
+    await builder.copy_all(copy_scope)
+
+    await asyncio.to_thread(
+        client.update_collection,
+        collection_name=target,
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=INDEXING_THRESHOLD)
+    )
+    print("⏳ Indicizzazione HNSW...")
+    if not await wait_indexed(client, target):
+        print(f"❌ {target} non indicizzata entro il timeout")
+        return False
+
+    # Scritture arrivate nel frattempo (upload, wiki, scraping) prima delle verifiche
+    report["catch_up"] = await builder.catch_up(copy_scope)
+    if args.mode == "rechunk":
+        await builder.rechunk(args.workers)
+
+    ok, report["checks"] = await verify(builder, args)
+    report["live_latency"] = guard.report()
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    report["tokens"] = builder.stats["tokens"]
+
+    if ok and not args.no_flip:
+        report["catch_up_final"] = await builder.catch_up(copy_scope)
+        ok = await flip(client, target)
+    elif ok:
+        print(f"✅ {target} pronta: python reindex.py flip {target}")
+    else:
+        print(f"❌ Verifiche fallite: alias non modificato, {target} conservata per l'analisi")
+
+    print("\n📊 RISULTATI:")
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return ok
+
+
+async def cmd_flip(args) -> bool:
+    return await flip(qdrant(), args.collection)
+
+
+async def cmd_rollback(args) -> bool:
+    client = qdrant()
+    current = resolve_collection(client, COLLECTION_ALIAS)
+    target = args.to
+    if target is None:
+        previous = [name for name in list_versions(client) if version_number(name) < version_number(current)]
+        if not previous:
+            print(f"❌ Nessuna versione precedente a {current}")
+            return False
+        target = previous[-1]
+    return await flip(client, target)
+
+
+async def cmd_status(args) -> bool:
+    client = qdrant()
+    current = resolve_collection(client, COLLECTION_ALIAS)
+    print(f"🔗 {COLLECTION_ALIAS} → {current}")
+    for name in list_versions(client):
+        info = await asyncio.to_thread(client.get_collection, name)
+        marker = "➡️" if name == current else "  "
+        print(f"{marker} {name}: {info.points_count} punti, {info.status}, "
+              f"{CollectionConfig.from_collection_info(info).describe()}")
+    return True
+
+
+async def cmd_cleanup(args) -> bool:
+    client = qdrant()
+    current = resolve_collection(client, COLLECTION_ALIAS)
+    others = [name for name in list_versions(client) if name != current]
+    for name in others[:max(0, len(others) - args.keep)]:
+        await asyncio.to_thread(client.delete_collection, collection_name=name)
+        if os.path.exists(manifest_path(name)):
+            os.remove(manifest_path(name))
+        print(f"🗑️ {name} eliminata")
+    return True
+
+
+if __name__ == "__main__":
+    defaults = CollectionConfig()
+    parser = argparse.ArgumentParser(description="Re-index blue/green della knowledge base Qdrant")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="costruisce una nuova versione e sposta l'alias")
+    build.add_argument("--mode", choices=["copy", "reembed", "rechunk"], default="copy")
+    build.add_argument("--quantization", choices=QUANTIZATION_MODES, default=defaults.quantization)
+    build.add_argument("--dimensions", type=int, default=defaults.dimensions)
+    build.add_argument("--on-disk-vectors", action="store_true", default=defaults.on_disk_vectors)
+    build.add_argument("--on-disk-payload", action="store_true", default=defaults.on_disk_payload)
+    build.add_argument("--rate", type=float, default=float(os.getenv("REINDEX_RATE", "500")),
+                       help="punti/s verso la nuova collection (0 = senza limite)")
+    build.add_argument("--latency-factor", type=float, default=2.0,
+                       help="rallenta se la latenza live supera N × p99 iniziale")
+    build.add_argument("--batch-size", type=int, default=128)
+    build.add_argument("--workers", type=int, default=int(os.getenv("VECTORIZE_WORKERS", "4")))
+    build.add_argument("--sample", type=int, default=50, help="punti campione per la verifica di recall")
+    build.add_argument("--k", type=int, default=10)
+    build.add_argument("--min-recall", type=float, default=0.9)
+    build.add_argument("--min-overlap", type=float, default=0.5)
+    build.add_argument("--max-count-drop", type=float, default=0.0,
+                       help="frazione massima di punti persi rispetto alla live (sorgenti copiate)")
+    build.add_argument("--no-flip", action="store_true", help="costruisce e verifica senza spostare l'alias")
+
+    flip_parser = commands.add_parser("flip", help="sposta l'alias su una versione")
+    flip_parser.add_argument("collection")
+
+    rollback = commands.add_parser("rollback", help="alias sulla versione precedente")
+    rollback.add_argument("--to", default=None)
+
+    commands.add_parser("status", help="alias e versioni")
+
+    cleanup = commands.add_parser("cleanup", help="elimina le versioni vecchie")
+    cleanup.add_argument("--keep", type=int, default=2, help="versioni non attive da conservare")
+
+    args = parser.parse_args()
+    handler = {
+        "build": cmd_build, "flip": cmd_flip, "rollback": cmd_rollback,
+        "status": cmd_status, "cleanup": cmd_cleanup,
+    }[args.command]
+    success = asyncio.run(handler(args))
+    sys.exit(0 if success else 1)
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Vettorizzazione incrementale della knowledge base in Qdrant
+Sostituisce vectorize_existing_docs*.py e vectorize_html_*.py
+
+- manifest (documento, chunk, hash, point id): embedding solo per chunk nuovi/cambiati
+- punti orfani (chunk spariti, documenti rimossi) cancellati da Qdrant
+- N documenti in parallelo, checkpoint per documento: dopo un crash si riparte da lì
+- --dry-run mostra il delta senza scrivere nulla
+
+Uso:
+    python vectorize.py [--source uploads|scraped|all] [--workers 4] [--dry-run] [--force] [--gc]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Add backend to path
+sys.path.append('/var/www/intelligence/backend')
+
+from app.modules.rag_engine.vector_service import VectorRAGService, make_point_id, normalize_payload
+from app.modules.rag_engine.extraction_pool import ExtractionPool
+from app.modules.rag_engine.embedding_cache import text_hash
+from app.modules.rag_engine.document_registry import DocumentRegistry
+from app.modules.rag_engine.ingestion_jobs import upload_company_ids
+from app.modules.rag_engine.upload_index import (
+    INDEXED_EXTENSIONS, UPLOAD_SOURCE, UploadIndex, file_sha256
+)
+
+UPLOAD_DIR = Path("/var/www/intelligence/backend/uploads")
+SCRAPED_SOURCE = "web_scraping"
+DEFAULT_MANIFEST_PATH = "/var/www/intelligence/data/vectorize_manifest.sqlite3"
+
+
+# ===== MANIFEST =====
+
+class Manifest:
+    """Stato della vettorizzazione su SQLite; ogni documento è un checkpoint atomico"""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                document_key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                chunks INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                document_key TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                point_id TEXT NOT NULL,
+                PRIMARY KEY (document_key, chunk_index)
+            );
+        """)
+        self.conn.commit()
+
+    def fingerprint(self, document_key: str) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT fingerprint FROM documents WHERE document_key = ?", (document_key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def chunks(self, document_key: str) -> Dict[int, Tuple[str, str]]:
+        rows = self.conn.execute(
+            "SELECT chunk_index, chunk_hash, point_id FROM chunks WHERE document_key = ?", (document_key,)
+        ).fetchall()
+        return {index: (chunk_hash, point_id) for index, chunk_hash, point_id in rows}
+
+    def documents(self, source: str) -> Dict[str, str]:
+        rows = self.conn.execute(
+            "SELECT document_key, document_id FROM documents WHERE source = ?", (source,)
+        ).fetchall()
+        return dict(rows)
+
+    def all_point_ids(self) -> set:
+        return {row[0] for row in self.conn.execute("SELECT point_id FROM chunks")}
+
+    def commit_document(self, document_key: str, source: str, document_id: str,
+                        fingerprint: str, rows: List[Tuple[int, str, str]]):
+        with self.conn:
+            self.conn.execute("DELETE FROM chunks WHERE document_key = ?", (document_key,))
+            self.conn.executemany(
+                "INSERT INTO chunks (document_key, chunk_index, chunk_hash, point_id) VALUES (?, ?, ?, ?)",
+                [(document_key, index, chunk_hash, point_id) for index, chunk_hash, point_id in rows]
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(document_key, source, document_id, fingerprint, chunks, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (document_key, source, document_id, fingerprint, len(rows), time.time())
+            )
+
+    def remove_document(self, document_key: str):
+        with self.conn:
+            self.conn.execute("DELETE FROM chunks WHERE document_key = ?", (document_key,))
+            self.conn.execute("DELETE FROM documents WHERE document_key = ?", (document_key,))
+
+
+# ===== SOURCES =====
+
+@dataclass
+class SourceDocument:
+    source: str
+    document_id: str
+    filename: str
+    fingerprint: str
+    load_text: Callable[[], Awaitable[Optional[str]]]
+    path: Optional[Path] = None
+    company_id: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.source}:{self.document_id}"
+
+
+def clean_html(content: str) -> str:
+    content = re.sub(r'<[^>]+>', '', content)  # Remove HTML tags
+    return re.sub(r'\s+', ' ', content).strip()
+
+
+def _upload_loader(extraction_pool: ExtractionPool, path: Path):
+    async def load():
+        result = await extraction_pool.extract(path)
+        return result['text'] if result['success'] else None
+    return load
+
+
+def list_uploads(extraction_pool: ExtractionPool, companies: Dict[str, int],
+                 registry: Optional[DocumentRegistry] = None) -> List[SourceDocument]:
+    """Documenti del registro + file di UPLOAD_DIR non ancora registrati"""
+    documents = []
+    registered = set()
+    for row in (registry.all_documents() if registry is not None else []):
+        path = Path(row['path'])
+        registered.add(str(path))
+        if row['format'] not in INDEXED_EXTENSIONS or not path.is_file():
+            continue
+        documents.append(SourceDocument(
+            source=UPLOAD_SOURCE,
+            document_id=row['id'],
+            filename=row['filename'],
+            fingerprint=row['sha256'],
+            load_text=_upload_loader(extraction_pool, path),
+            path=path,
+            company_id=row['company_id'],
+        ))
+
+    for path in sorted(UPLOAD_DIR.glob("*")):
+        if path.suffix.lower() not in INDEXED_EXTENSIONS or not path.is_file() or str(path) in registered:
+            continue
+        stat = path.stat()
+        documents.append(SourceDocument(
+            source=UPLOAD_SOURCE,
+            document_id=path.stem,
+            filename=path.name,
+            fingerprint=f"{stat.st_size}:{stat.st_mtime_ns}",
+            load_text=_upload_loader(extraction_pool, path),
+            path=path,
+            company_id=companies.get(str(path)),
+        ))
+    return documents
+
+
+def list_scraped(vector_service: VectorRAGService) -> List[SourceDocument]:
+    conn = vector_service._get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT filename, md5(COALESCE(extracted_text, '')), company_id
+        FROM knowledge_documents
+        WHERE filename LIKE 'scraped_%'
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+
+    documents = []
+    for filename, content_md5, company_id in rows:
+
+        async def load(filename=filename):
+            def fetch():
+                conn = vector_service._get_db_connection()
+                try:
+                    cur = conn.cursor()
+                    cur.execute("SELECT extracted_text FROM knowledge_documents WHERE filename = %s", (filename,))
+                    row = cur.fetchone()
+                    return clean_html(row[0]) if row and row[0] else None
+                finally:
+                    conn.close()
+            return await asyncio.to_thread(fetch)
+
+        documents.append(SourceDocument(
+            source=SCRAPED_SOURCE,
+            document_id=filename.replace('.html', ''),
+            filename=filename,
+            fingerprint=content_md5,
+            load_text=load,
+            company_id=company_id,
+        ))
+    return documents
+
+
+# ===== SYNC =====
+
+@dataclass
+class Report:
+    dry_run: bool
+    documents_total: int = 0
+    documents_unchanged: int = 0
+    documents_new: int = 0
+    documents_changed: int = 0
+    documents_removed: int = 0
+    documents_failed: int = 0
+    chunks_embedded: int = 0
+    chunks_reused: int = 0
+    points_deleted: int = 0
+    tokens: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    failures: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        data = {k: v for k, v in self.__dict__.items() if k not in ('started_at', 'failures')}
+        data.update({
+            "elapsed_seconds": round(elapsed, 2),
+            "documents_per_second": round(
+                (self.documents_new + self.documents_changed) / elapsed, 2),
+            "chunks_per_second": round(self.chunks_embedded / elapsed, 2),
+            "failures": self.failures[:20],
+        })
+        return data
+
+
+class Vectorizer:
+    def __init__(self, vector_service: VectorRAGService, manifest: Manifest, upload_index: UploadIndex,
+                 workers: int, dry_run: bool, force: bool,
+                 throttle: Optional[Callable[[int], Awaitable[None]]] = None):
+        self.vector_service = vector_service
+        self.manifest = manifest
+        self.upload_index = upload_index
+        self.semaphore = asyncio.Semaphore(max(1, workers))
+        self.dry_run = dry_run
+        self.force = force
+        self.throttle = throttle  # attesa prima di ogni upsert (re-index a velocità limitata)
+        self.report = Report(dry_run=dry_run)
+
+    async def _delete_points(self, point_ids: List[str]):
+        if point_ids and not self.dry_run:
+            await asyncio.to_thread(
+                self.vector_service.qdrant_client.delete,
+                collection_name=self.vector_service.collection_name,
+                points_selector=point_ids
+            )
+        self.report.points_deleted += len(point_ids)
+
+    async def sync_document(self, doc: SourceDocument):
+        previous = self.manifest.fingerprint(doc.key)
+        if previous == doc.fingerprint and not self.force:
+            self.report.documents_unchanged += 1
+            return
+
+        async with self.semaphore:
+            try:
+                text = await doc.load_text()
+                if not text or len(text.strip()) < 50:
+                    raise ValueError("no extractable text")
+
+                chunks = self.upload_index.chunker.chunk(text)
+                hashes = [text_hash(chunk) for chunk in chunks]
+                old = self.manifest.chunks(doc.key)
+
+                changed = [i for i, h in enumerate(hashes) if i not in old or old[i][0] != h]
+                orphans = [point_id for index, (_, point_id) in old.items() if index >= len(chunks)]
+                self.report.chunks_reused += len(chunks) - len(changed)
+
+                if previous is None:
+                    self.report.documents_new += 1
+                else:
+                    self.report.documents_changed += 1
+
+                if self.dry_run:
+                    self.report.chunks_embedded += len(changed)
+                    self.report.points_deleted += len(orphans)
+                    print(f"🔎 {doc.key}: {len(changed)}/{len(chunks)} chunks da vettorizzare, {len(orphans)} orfani")
+                    return
+
+                items = []
+                for i in changed:
+                    items.append((
+                        make_point_id(doc.document_id, i),
+                        chunks[i],
+                        normalize_payload({
+                            "document_id": doc.document_id,
+                            "chunk_index": i,
+                            "content": chunks[i],
+                            "metadata": {"filename": doc.filename, "source": doc.source},
+                            "company_id": doc.company_id,
+                        })
+                    ))
+                if self.throttle is not None:
+                    await self.throttle(len(items))
+                metrics = await self.vector_service.upsert_texts(items)
+                self.report.chunks_embedded += metrics.upserted_points
+                self.report.tokens += metrics.tokens
+                failed = set(metrics.failed_point_ids)
+
+                await self._delete_points(orphans)
+
+                # Checkpoint: i chunk falliti restano col vecchio hash e verranno ritentati
+                rows = []
+                for i, h in enumerate(hashes):
+                    point_id = make_point_id(doc.document_id, i)
+                    if point_id in failed:
+                        if i in old:
+                            rows.append((i, old[i][0], point_id))
+                        continue
+                    rows.append((i, h, point_id))
+                fingerprint = doc.fingerprint if not failed else f"partial:{doc.fingerprint}"
+                self.manifest.commit_document(doc.key, doc.source, doc.document_id, fingerprint, rows)
+
+                if doc.path is not None and not failed:
+                    await self.upload_index.record_extraction(
+                        doc.path, doc.document_id, await asyncio.to_thread(file_sha256, doc.path), chunks,
+                        filename=doc.filename
+                    )
+
+                status = "⚠️" if failed else "✅"
+                print(f"{status} {doc.key}: {len(changed) - len(failed)}/{len(chunks)} chunks vettorizzati, "
+                      f"{len(orphans)} orfani rimossi")
+                if failed:
+                    raise RuntimeError(f"{len(failed)} chunks failed")
+
+            except Exception as e:
+                self.report.documents_failed += 1
+                self.report.failures.append(f"{doc.key}: {e}")
+                print(f"❌ {doc.key}: {e}")
+
+    async def remove_missing(self, source: str, present: set):
+        for document_key, document_id in self.manifest.documents(source).items():
+            if document_key in present:
+                continue
+            point_ids = [point_id for _, point_id in self.manifest.chunks(document_key).values()]
+            await self._delete_points(point_ids)
+            if not self.dry_run:
+                self.manifest.remove_document(document_key)
+            self.report.documents_removed += 1
+            print(f"🗑️ {document_key}: documento rimosso ({len(point_ids)} punti)")
+
+    async def collect_garbage(self, sources: List[str]):
+        """Punti Qdrant delle sorgenti gestite ma assenti dal manifest (es. ID legacy)"""
+        from qdrant_client.models import Filter, FieldCondition, MatchAny
+
+        known = self.manifest.all_point_ids()
+        offset = None
+        orphans = []
+        while True:
+            points, offset = await asyncio.to_thread(
+                self.vector_service.qdrant_client.scroll,
+                collection_name=self.vector_service.collection_name,
+                scroll_filter=Filter(must=[FieldCondition(key="source", match=MatchAny(any=sources))]),
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False
+            )
+            orphans.extend(p.id for p in points if str(p.id) not in known)
+            if offset is None:
+                break
+        print(f"🧹 {len(orphans)} punti orfani fuori manifest")
+        for start in range(0, len(orphans), 1000):
+            await self._delete_points(orphans[start:start + 1000])
+
+
+def collect_sources(vector_service: VectorRAGService, extraction_pool: ExtractionPool,
+                    source: str = "all") -> Dict[str, List[SourceDocument]]:
+    sources: Dict[str, List[SourceDocument]] = {}
+    if source in ("uploads", "all"):
+        sources[UPLOAD_SOURCE] = list_uploads(
+            extraction_pool, upload_company_ids(vector_service._get_db_connection),
+            DocumentRegistry(vector_service._get_db_connection)
+        )
+    if source in ("scraped", "all"):
+        sources[SCRAPED_SOURCE] = list_scraped(vector_service)
+    return sources
+
+
+async def sync_sources(vectorizer: Vectorizer, sources: Dict[str, List[SourceDocument]]):
+    for source, documents in sources.items():
+        print(f"📁 {source}: {len(documents)} documenti")
+        vectorizer.report.documents_total += len(documents)
+        await asyncio.gather(*(vectorizer.sync_document(doc) for doc in documents))
+        await vectorizer.remove_missing(source, {doc.key for doc in documents})
+
+
+async def run(args) -> bool:
+    vector_service = VectorRAGService()
+    manifest = Manifest(args.manifest)
+    extraction_pool = ExtractionPool(max_workers=args.workers)
+    upload_index = UploadIndex(vector_service)
+    vectorizer = Vectorizer(vector_service, manifest, upload_index, args.workers, args.dry_run, args.force)
+
+    print(f"🚀 Vettorizzazione incrementale ({'dry-run' if args.dry_run else 'scrittura'}, "
+          f"{args.workers} worker)...")
+
+    try:
+        sources = collect_sources(vector_service, extraction_pool, args.source)
+        await sync_sources(vectorizer, sources)
+    finally:
+        extraction_pool.shutdown()
+
+    if args.gc:
+        await vectorizer.collect_garbage(list(sources))
+
+    report = vectorizer.report.to_dict()
+    print("\n📊 RISULTATI:")
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report["documents_failed"] == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vettorizzazione incrementale knowledge base → Qdrant")
+    parser.add_argument("--source", choices=["uploads", "scraped", "all"], default="all")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("VECTORIZE_WORKERS", "4")))
+    parser.add_argument("--manifest", default=os.getenv("VECTORIZE_MANIFEST_PATH", DEFAULT_MANIFEST_PATH))
+    parser.add_argument("--dry-run", action="store_true", help="mostra il delta senza scrivere")
+    parser.add_argument("--force", action="store_true", help="ricontrolla i chunk anche dei documenti invariati")
+    parser.add_argument("--gc", action="store_true", help="rimuove punti delle sorgenti gestite assenti dal manifest")
+    success = asyncio.run(run(parser.parse_args()))
+    sys.exit(0 if success else 1)
@@ -1,7 +1,6 @@
 # services/ai_service.py
 # AI Service per IntelliChat con database integration - IntelligenceHUB
 
-import openai
 import os
 import asyncio
 from typing import Dict, Any, Optional
@@ -9,15 +8,16 @@ import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from app.core.llm_gateway import get_llm_gateway
+
 logger = logging.getLogger(__name__)
 
 class AIService:
     """Service per integrazione AI/OpenAI con database context"""
     
     def __init__(self):
-        # Configura OpenAI
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        self.has_openai = bool(openai.api_key)
+        # Chiamate OpenAI tramite il gateway LLM condiviso (app/core/llm_gateway.py)
+        self.has_openai = bool(os.getenv("OPENAI_API_KEY"))
         if not self.has_openai:
             logger.warning("OPENAI_API_KEY non configurata - usando fallback intelligente")
     
@@ -49,7 +49,8 @@ class AIService:
             messages.append({"role": "user", "content": prompt})
             
             # Chiamata OpenAI
-            response = await openai.ChatCompletion.acreate(
+            response = await get_llm_gateway().chat(
+                route="ai-service",
                 model=model,
                 messages=messages,
                 max_tokens=max_tokens,
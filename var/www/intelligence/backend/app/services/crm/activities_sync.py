@@ -16,6 +16,7 @@ from sqlalchemy import text
 
 # Import dai modelli esistenti
 from backend.app.core.database import SessionLocal
+from backend.app.services.keyword_matcher import get_keyword_matcher
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -133,28 +134,12 @@ class CRMSyncService:
         """
         if not description:
             return None
-            
-        description_upper = description.upper()
-        
-        for kit_name in self.kit_names:
-            # Cerca il nome del kit (case insensitive)
-            if kit_name.upper() in description_upper:
-                logger.info(f"🎯 Found kit '{kit_name}' in description")
-                return kit_name
-                
-        # Cerca anche versioni parziali (es: "Start Office" se description contiene "start office")
-        for kit_name in self.kit_names:
-            # Dividi il nome del kit in parole e cerca corrispondenze parziali
-            kit_words = kit_name.upper().split()
-            if len(kit_words) >= 2:
-                # Cerca almeno 2 parole consecutive del kit name
-                for i in range(len(kit_words) - 1):
-                    partial = " ".join(kit_words[i:i+2])
-                    if partial in description_upper:
-                        logger.info(f"🎯 Found partial kit match '{kit_name}' via '{partial}'")
-                        return kit_name
         
-        return None
+        # Nome completo, alias/articolo o 2 parole consecutive del nome: un solo passaggio sul testo
+        kit_name = get_keyword_matcher().find_kit(description, db=self.db, candidates=self.kit_names)
+        if kit_name:
+            logger.info(f"🎯 Found kit '{kit_name}' in description")
+        return kit_name
     
     def find_company_by_crm_id(self, crm_company_id: int) -> Optional[int]:
         """
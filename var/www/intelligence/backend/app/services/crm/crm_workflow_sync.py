@@ -19,6 +19,7 @@ from sqlalchemy import text
 from uuid import uuid4
 
 from backend.app.core.database import SessionLocal
+from backend.app.services.keyword_matcher import get_keyword_matcher
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("crm_sync")
@@ -94,23 +95,8 @@ class CRMWorkflowSync:
         """Cerca kit nella descrizione"""
         if not description:
             return None
-            
-        desc_upper = description.upper()
-        
-        # Match esatto
-        for kit_name in self.kit_names:
-            if kit_name.upper() in desc_upper:
-                return kit_name
-                
-        # Match parziale (2+ parole consecutive)
-        for kit_name in self.kit_names:
-            words = kit_name.upper().split()
-            if len(words) >= 2:
-                for i in range(len(words) - 1):
-                    partial = " ".join(words[i:i+2])
-                    if partial in desc_upper:
-                        return kit_name
-        return None
+        # Match esatto o parziale (2 parole consecutive) con l'automa condiviso
+        return get_keyword_matcher().find_kit(description, db=self.db, candidates=self.kit_names)
     
     def activity_already_processed(self, activity_id: int) -> bool:
         """Verifica se attività già processata usando metadata"""
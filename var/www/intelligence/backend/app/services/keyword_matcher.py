@@ -0,0 +1,302 @@
+"""
+Keyword Matcher - IntelligenceHUB
+Un solo motore per riconoscere kit commerciali e intent della chat in un testo:
+automa Aho-Corasick costruito una volta da kit_commerciali, articoli (articolo
+principale del kit) e tabelle di keyword, ricostruito quando le tabelle cambiano.
+
+- normalizzazione: minuscole, accenti rimossi, punteggiatura = separatore
+  ("Economico- Finanziari" == "economico finanziari", "Società" == "societa")
+- l'automa lavora su sequenze di parole, quindi i match rispettano sempre i confini
+  di parola ("sof" non trova "software") e un testo si scandisce in un solo passaggio
+- refresh: al massimo ogni KEYWORD_MATCHER_REFRESH_SECONDS si rilegge il catalogo
+  e si ricostruisce l'automa solo se è cambiato; invalidate() forza il controllo
+
+    from app.services.keyword_matcher import get_keyword_matcher
+    kit = get_keyword_matcher().find_kit(description, db=db)
+    intent = get_keyword_matcher().analyze_intent(message)
+"""
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import deque
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Peso dei match di kit: nome completo > alias/articolo principale > due parole consecutive del nome
+KIT_NAME, KIT_ALIAS, KIT_PARTIAL = 3, 2, 1
+
+# Abbreviazioni usate nelle attività CRM (prima in WorkflowGenerator)
+KIT_ALIASES: Dict[str, List[str]] = {
+    "Kit Start Office Finance": ["start office finance", "startoffice finance", "sof", "start office fin"],
+    "Kit Start Office Digital": ["start office digital", "startoffice digital", "sod"],
+    "Kit Start Office Training": ["start office training", "startoffice training", "sot"],
+    "Kit Start Office Sustainability": ["start office sustainability", "startoffice sustainability", "sos"],
+    "Kit Incarico 24 Mesi": ["incarico 24 mesi", "i24", "24 mesi"],
+    "Kit Incarico Consulenza Strumenti Economico- Finanziari": ["consulenza strumenti", "ics", "strumenti economico"],
+}
+
+# Intent della chat (prima in routes/intellichat*.analyze_message_intent)
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "partner": ["partner", "partner che", "qualcuno che", "azienda che", "chi si occupa", "fornitori", "cerco"],
+    "company": ["azienda", "aziende", "ditta", "società", "impresa"],
+}
+
+CATEGORY_KEYWORDS: Dict[str, List[str]] = {
+    "ai": ["ai", "artificial intelligence", "intelligenza artificiale", "machine learning", "ml"],
+    "cloud": ["cloud", "aws", "azure", "google cloud", "infrastruttura"],
+    "security": ["security", "sicurezza", "cybersecurity", "protezione"],
+    "software": ["software", "sviluppo", "programmazione", "app", "applicazioni"],
+    "web": ["web", "sito", "website", "frontend", "backend"],
+    "marketing": ["marketing", "pubblicità", "social", "seo"],
+    "design": ["design", "grafica", "ui", "ux", "creativi"],
+}
+
+LOCATIONS = ["milano", "roma", "torino", "napoli", "bologna", "firenze", "venezia", "lombardia", "lazio", "piemonte"]
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def fold(value: str) -> str:
+    """Minuscole senza accenti (NFKD, segni combinanti rimossi)"""
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def words(value: str) -> List[str]:
+    return _WORD_RE.findall(fold(value or ""))
+
+
+class AhoCorasick:
+    """
+    Automa Aho-Corasick su sequenze di parole
+
+    - `phrases`: coppie (frase, payload); più payload per la stessa frase sono ammessi
+    - `scan(tokens)` restituisce (inizio, fine, payload) per ogni occorrenza, anche sovrapposta,
+      in tempo lineare nel numero di parole più il numero di match
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]  # (lunghezza in parole, payload)
+        self.size = 0
+
+        for phrase, payload in phrases:
+            tokens = words(phrase)
+            if not tokens:
+                continue
+            node = 0
+            for token in tokens:
+                child = self._goto[node].get(token)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][token] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = child
+            self._out[node].append((len(tokens), payload))
+            self.size += 1
+
+        # Failure link in ampiezza; le uscite del suffisso più lungo vengono ereditate
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def scan(self, tokens: Sequence[str]) -> Iterator[Tuple[int, int, Any]]:
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for position, token in enumerate(tokens):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for length, payload in out[node]:
+                yield position - length + 1, position + 1, payload
+
+
+class KeywordMatcher:
+    """
+    Catalogo kit + keyword della chat in un solo automa
+
+    Payload: ("kit", nome, peso), ("intent", nome), ("category", nome), ("location", nome).
+    Le keyword statiche sono sempre presenti; i kit arrivano dal database (più gli alias).
+    """
+
+    def __init__(self, refresh_seconds: float = float(os.getenv("KEYWORD_MATCHER_REFRESH_SECONDS", "60"))):
+        self.refresh_seconds = refresh_seconds
+        self._checked_at = float("-inf")
+        self._fingerprint: Optional[int] = None
+        self._lock = threading.Lock()
+        self.kit_names: List[str] = []
+        self.automaton = self._build([])
+        self.stats = {"builds": 0, "refresh_checks": 0, "refresh_errors": 0}
+
+    # ===== BUILD =====
+
+    @staticmethod
+    def _static_phrases() -> Iterator[Tuple[str, Any]]:
+        for intent, keywords in INTENT_KEYWORDS.items():
+            for keyword in keywords:
+                yield keyword, ("intent", intent)
+        for category, keywords in CATEGORY_KEYWORDS.items():
+            for keyword in keywords:
+                yield keyword, ("category", category)
+        for location in LOCATIONS:
+            yield location, ("location", location)
+        for kit_name, aliases in KIT_ALIASES.items():
+            for alias in aliases:
+                yield alias, ("kit", kit_name, KIT_ALIAS)
+
+    def _build(self, rows: Sequence[Tuple[str, Optional[str], Optional[str]]]) -> AhoCorasick:
+        """rows: (nome kit, codice articolo principale, nome articolo principale)"""
+        def phrases():
+            yield from self._static_phrases()
+            for kit_name, article_code, article_name in rows:
+                yield kit_name, ("kit", kit_name, KIT_NAME)
+                for alias in (article_code, article_name):
+                    if alias:
+                        yield alias, ("kit", kit_name, KIT_ALIAS)
+                kit_words = words(kit_name)
+                for i in range(len(kit_words) - 1):
+                    yield " ".join(kit_words[i:i + 2]), ("kit", kit_name, KIT_PARTIAL)
+
+        automaton = AhoCorasick(phrases())
+        self.kit_names = [row[0] for row in rows]
+        return automaton
+
+    def load_rows(self, rows: Sequence[Tuple[str, Optional[str], Optional[str]]]) -> bool:
+        """Ricostruisce l'automa se il catalogo è cambiato; True se ricostruito"""
+        rows = [tuple(row) for row in rows]
+        fingerprint = hash(tuple(rows))
+        self._checked_at = time.monotonic()
+        if fingerprint == self._fingerprint:
+            return False
+        started = time.perf_counter()
+        self.automaton = self._build(rows)
+        self._fingerprint = fingerprint
+        self.stats["builds"] += 1
+        logger.info(
+            f"🔤 Keyword matcher built: {len(rows)} kit, {self.automaton.size} patterns "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+        return True
+
+    @staticmethod
+    def _query_rows(db) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        result = db.execute(text("""
+            SELECT kc.nome, a.codice, a.nome AS articolo_nome
+            FROM kit_commerciali kc
+            LEFT JOIN articoli a ON kc.articolo_principale_id = a.id
+            WHERE kc.attivo = true
+            ORDER BY kc.id
+        """)).fetchall()
+        return [(row.nome, row.codice, row.articolo_nome) for row in result]
+
+    def refresh(self, db=None, force: bool = False) -> bool:
+        """Rilegge il catalogo (al massimo ogni refresh_seconds); `db` = sessione SQLAlchemy opzionale"""
+        if not force and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return False
+        with self._lock:
+            if not force and time.monotonic() - self._checked_at < self.refresh_seconds:
+                return False
+            self._checked_at = time.monotonic()
+            self.stats["refresh_checks"] += 1
+            session = db
+            try:
+                if session is None:
+                    # Import relativo: il modulo è importato sia come app.* sia come backend.app.* (sync CRM)
+                    from ..core.database import SessionLocal
+                    session = SessionLocal()
+                return self.load_rows(self._query_rows(session))
+            except Exception as e:
+                # Resta in uso l'automa precedente; la sessione del chiamante (es. sync CRM)
+                # non deve restare in una transazione abortita
+                if session is not None:
+                    try:
+                        session.rollback()
+                    except Exception:
+                        pass
+                self.stats["refresh_errors"] += 1
+                logger.warning(f"Keyword matcher refresh failed: {e}")
+                return False
+            finally:
+                if db is None and session is not None:
+                    session.close()
+
+    def invalidate(self):
+        """Il prossimo uso ricontrolla il catalogo (dopo modifiche a kit o articoli)"""
+        self._checked_at = float("-inf")
+
+    # ===== MATCH =====
+
+    def matches(self, value: str) -> List[Tuple[int, int, Any]]:
+        return list(self.automaton.scan(words(value)))
+
+    def find_kit(self, value: str, db=None, candidates: Optional[Collection[str]] = None) -> Optional[str]:
+        """
+        Kit citato nel testo: peso del match più forte, poi numero di match, poi prima occorrenza
+        (due parole consecutive del nome identificano il kit che ne condivide di più).
+        `candidates` limita il risultato ai kit indicati (es. quelli caricati dal chiamante).
+        """
+        if not value:
+            return None
+        self.refresh(db)
+        best: Dict[str, List[int]] = {}
+        for start, _, payload in self.automaton.scan(words(value)):
+            if payload[0] != "kit" or (candidates is not None and payload[1] not in candidates):
+                continue
+            score = best.setdefault(payload[1], [0, 0, -start])
+            score[0] = max(score[0], payload[2])
+            score[1] += 1
+        if not best:
+            return None
+        return max(best, key=lambda name: best[name])
+
+    def analyze_intent(self, value: str) -> Dict[str, Any]:
+        """Intent partner/azienda, categorie di servizio (ordine della tabella) e località"""
+        intents, categories, locations = set(), set(), []
+        for _, _, payload in self.automaton.scan(words(value)):
+            kind = payload[0]
+            if kind == "intent":
+                intents.add(payload[1])
+            elif kind == "category":
+                categories.add(payload[1])
+            elif kind == "location":
+                locations.append(payload[1])
+        return {
+            "is_partner_search": "partner" in intents,
+            "is_company_search": "company" in intents,
+            "detected_categories": [c for c in CATEGORY_KEYWORDS if c in categories],
+            "detected_location": locations[0] if locations else None,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "kits": len(self.kit_names), "patterns": self.automaton.size}
+
+
+_matcher: Optional[KeywordMatcher] = None
+_matcher_lock = threading.Lock()
+
+
+def get_keyword_matcher() -> KeywordMatcher:
+    """Matcher di processo (automa condiviso tra richieste e sync CRM)"""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = KeywordMatcher()
+    return _matcher
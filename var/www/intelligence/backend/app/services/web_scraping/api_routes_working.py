@@ -208,7 +208,7 @@ async def scrape_url(request: ScrapeUrlRequest):
         try:
             import subprocess
             subprocess.run([
-                "python", "/var/www/intelligence/backend/app/scripts/vectorize_html_from_db.py"
+                "python", "/var/www/intelligence/backend/app/scripts/vectorize.py", "--source", "scraped"
             ], cwd="/var/www/intelligence/backend", timeout=60)
         except Exception as e:
             logger.warning(f"Vectorization failed: {e}")
@@ -8,6 +8,7 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 
 from models.scraped_data import ScrapedContentModel, ScrapedWebsiteModel
+from app.modules.rag_engine.chunker import get_chunker
 
 logger = logging.getLogger(__name__)
 
@@ -115,55 +116,43 @@ class KnowledgeBaseIntegration:
     async def create_document_chunks(
         self, 
         document_id: str, 
-        content: str,
-        chunk_size: int = 1000,
-        chunk_overlap: int = 200
+        content: str
     ) -> List[str]:
-        """Crea chunks per documento"""
+        """Crea chunks per documento (chunker condiviso del RAG engine)"""
         try:
             chunk_ids = []
             
-            # Chunking
-            start = 0
-            chunk_index = 0
-            
-            while start < len(content):
-                end = min(start + chunk_size, len(content))
-                chunk_text = content[start:end].strip()
+            for chunk_index, chunk in enumerate(get_chunker().iter_chunks(content)):
+                # Metadata chunk
+                chunk_metadata = {
+                    "chunk_index": chunk_index,
+                    "start_pos": chunk.start,
+                    "end_pos": chunk.end,
+                    "length": len(chunk.text),
+                    "tokens": chunk.tokens,
+                    "created_at": datetime.now().isoformat()
+                }
                 
-                if len(chunk_text) > 50:
-                    # Metadata chunk
-                    chunk_metadata = {
-                        "chunk_index": chunk_index,
-                        "start_pos": start,
-                        "end_pos": end,
-                        "length": len(chunk_text),
-                        "created_at": datetime.now().isoformat()
-                    }
+                # Insert chunk
+                with self.connection.cursor() as cursor:
+                    query = """
+                    INSERT INTO document_chunks (
+                        document_id, chunk_index, content_chunk, metadata
+                    ) VALUES (
+                        %s::uuid, %s, %s, %s
+                    ) RETURNING id;
+                    """
                     
-                    # Insert chunk
-                    with self.connection.cursor() as cursor:
-                        query = """
-                        INSERT INTO document_chunks (
-                            document_id, chunk_index, content_chunk, metadata
-                        ) VALUES (
-                            %s::uuid, %s, %s, %s
-                        ) RETURNING id;
-                        """
-                        
-                        cursor.execute(query, (
-                            document_id,
-                            chunk_index,
-                            chunk_text,
-                            json.dumps(chunk_metadata)
-                        ))
-                        
-                        chunk_id = cursor.fetchone()[0]
-                        chunk_ids.append(str(chunk_id))
-                        chunk_index += 1
-                
-                start = end - chunk_overlap
-                self.connection.commit()
+                    cursor.execute(query, (
+                        document_id,
+                        chunk_index,
+                        chunk.text,
+                        json.dumps(chunk_metadata)
+                    ))
+                    
+                    chunk_ids.append(str(cursor.fetchone()[0]))
+            
+            self.connection.commit()
             
             logger.info(f"Created {len(chunk_ids)} chunks for document {document_id}")
             return chunk_ids
@@ -13,6 +13,8 @@ import asyncpg
 import os
 from dotenv import load_dotenv
 
+from app.modules.rag_engine.chunker import get_chunker
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -101,20 +103,12 @@ class KnowledgeBaseIntegrationChunksFixed:
         """Crea chunks con nome colonna corretto: content_chunk"""
         try:
             chunks = []
-            chunk_size = 1000
-            overlap = 200
-            
-            for i in range(0, len(content_text), chunk_size - overlap):
-                chunk_text = content_text[i:i + chunk_size]
-                if len(chunk_text.strip()) < 50:
-                    continue
-                    
-                chunk_id = uuid.uuid4()
+            for chunk in get_chunker().iter_chunks(content_text):
                 chunks.append({
-                    "id": chunk_id,
+                    "id": uuid.uuid4(),
                     "document_id": document_id,
                     "chunk_index": len(chunks),
-                    "content_chunk": chunk_text.strip()  # Nome corretto della colonna
+                    "content_chunk": chunk.text  # Nome corretto della colonna
                 })
             
             # Insert chunks con schema corretto
@@ -11,6 +11,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from models.scraped_data import ScrapedContentModel, RAGProcessingStatus
+from app.modules.rag_engine.chunker import get_chunker
 
 logger = logging.getLogger(__name__)
 
@@ -26,9 +27,7 @@ class WebScrapingRAGIntegration:
     """
     
     def __init__(self):
-        # Configurazione processamento
-        self.chunk_size = 1000
-        self.chunk_overlap = 200
+        # Configurazione processamento (dimensione chunk: chunker condiviso)
         self.min_content_length = 100
         
         # Statistiche
@@ -210,32 +209,19 @@ class WebScrapingRAGIntegration:
         if not content.cleaned_text:
             return chunks
         
-        text = content.cleaned_text
-        
-        # Chunking semplice
-        chunk_start = 0
-        chunk_id = 0
-        
-        while chunk_start < len(text):
-            chunk_end = min(chunk_start + self.chunk_size, len(text))
-            chunk_text = text[chunk_start:chunk_end]
-            
-            if len(chunk_text.strip()) > 50:  # Minimo 50 caratteri
-                chunks.append({
-                    'chunk_id': chunk_id,
-                    'text': chunk_text,
-                    'start_index': chunk_start,
-                    'end_index': chunk_end,
-                    'metadata': {
-                        'source_url': str(content.page_url),  # FIX: Converte in stringa
-                        'content_type': content.content_type,
-                        'page_title': content.page_title,
-                        'chunk_index': chunk_id
-                    }
-                })
-                chunk_id += 1
-            
-            chunk_start = chunk_end - self.chunk_overlap
+        for chunk_id, chunk in enumerate(get_chunker().iter_chunks(content.cleaned_text)):
+            chunks.append({
+                'chunk_id': chunk_id,
+                'text': chunk.text,
+                'start_index': chunk.start,
+                'end_index': chunk.end,
+                'metadata': {
+                    'source_url': str(content.page_url),  # FIX: Converte in stringa
+                    'content_type': content.content_type,
+                    'page_title': content.page_title,
+                    'chunk_index': chunk_id
+                }
+            })
         
         return chunks
     
@@ -58,7 +58,7 @@ async def scrape_url(request: ScrapeRequest, db: Session = Depends(get_db)):
     """
     try:
         orchestrator = WebScrapingOrchestrator(db)
-        result = orchestrator.scrape_and_process(str(request.url))
+        result = await orchestrator.scrape_and_process(str(request.url))
         
         if result["success"]:
             return ScrapeResponse(
@@ -187,7 +187,7 @@ async def test_vectorization(document_id: int, db: Session = Depends(get_db)):
     try:
         from .vector_service import VectorService
         vector_service = VectorService(db)
-        result = vector_service.vectorize_document(document_id)
+        result = await vector_service.vectorize_document(document_id)
         return result
     except Exception as e:
         return {"success": False, "error": str(e)}
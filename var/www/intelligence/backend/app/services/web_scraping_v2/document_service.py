@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from typing import Dict, List, Optional
 import logging
 from .models import ScrapedDocument, DocumentChunk
+from app.modules.rag_engine.chunker import get_chunker
 import hashlib
 
 logger = logging.getLogger(__name__)
@@ -61,26 +62,21 @@ class DocumentService:
             logger.error(f"Failed to save document: {e}")
             return {"success": False, "error": str(e)}
     
-    def create_chunks(self, document_id: int, content: str, chunk_size: int = 1000) -> Dict:
+    def create_chunks(self, document_id: int, content: str) -> Dict:
         """
-        Crea chunks del documento per vettorizzazione
+        Crea chunks del documento per vettorizzazione (chunker condiviso del RAG engine)
         Returns: {success: bool, chunks_count: int, chunks: List[dict]}
         """
         try:
-            # Split content into chunks
             chunks = []
-            words = content.split()
-            
-            for i in range(0, len(words), chunk_size):
-                chunk_text = ' '.join(words[i:i + chunk_size])
-                if len(chunk_text.strip()) > 50:  # Skip very small chunks
-                    chunk = DocumentChunk(
-                        document_id=document_id,
-                        chunk_index=len(chunks),
-                        chunk_text=chunk_text
-                    )
-                    chunks.append(chunk)
-                    self.db.add(chunk)
+            for piece in get_chunker().iter_chunks(content):
+                chunk = DocumentChunk(
+                    document_id=document_id,
+                    chunk_index=len(chunks),
+                    chunk_text=piece.text
+                )
+                chunks.append(chunk)
+                self.db.add(chunk)
             
             self.db.commit()
             
@@ -16,7 +16,7 @@ class WebScrapingOrchestrator:
         self.document_service = DocumentService(db_session)
         self.vector_service = VectorService(db_session)
     
-    def scrape_and_process(self, url: str) -> Dict:
+    async def scrape_and_process(self, url: str) -> Dict:
         """
         Processo completo: scraping + database + vettorizzazione
         ATOMICO: tutto o niente
@@ -79,7 +79,7 @@ class WebScrapingOrchestrator:
             logger.info(f"Created {chunks_count} chunks")
             
             # STEP 4: Vectorization
-            vector_result = self.vector_service.vectorize_document(document_id)
+            vector_result = await self.vector_service.vectorize_document(document_id)
             if not vector_result["success"]:
                 # Rollback document and chunks
                 self.document_service.delete_document(document_id)
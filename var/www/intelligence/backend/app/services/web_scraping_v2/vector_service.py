@@ -1,12 +1,13 @@
 import uuid
-import asyncio
-from typing import Dict, List
+from typing import Any, Dict, List, Optional
 import logging
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-import openai
-import os
 from sqlalchemy.orm import Session
+from app.core.clients import get_clients
+from app.modules.rag_engine.collection_config import CollectionConfig
+from app.modules.rag_engine.vector_service import (
+    COLLECTION_ALIAS, build_filter, collection_exists, ensure_collection_once, ensure_payload_indexes,
+    get_vector_service, resolve_collection
+)
 from .models import ScrapedDocument, DocumentChunk
 
 logger = logging.getLogger(__name__)
@@ -15,33 +16,39 @@ class VectorService:
     """Servizio dedicato alla vettorizzazione e storage in Qdrant"""
     
     def __init__(self, db_session: Session):
+        # Istanziato per richiesta: client Qdrant/OpenAI dal registro condiviso
         self.db = db_session
-        self.qdrant_client = QdrantClient(
-            host=os.getenv("QDRANT_HOST", "localhost"),
-            port=int(os.getenv("QDRANT_PORT", "6333"))
-        )
-        self.collection_name = "intelligence_knowledge"
-        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self._ensure_collection()
+        self.collection_name = COLLECTION_ALIAS
+        self.collection_config = CollectionConfig()
+        # Embedding e ricerca con il modello corrente del RAG engine (named vector per modello):
+        # i punti ada-002 scritti in passato sono migrati da app/scripts/migrate_embeddings.py
+        self.vector_service = get_vector_service()
+    
+    @property
+    def qdrant_client(self):
+        client = get_clients().qdrant()
+        ensure_collection_once(self.collection_name, self._ensure_collection)
+        return client
     
     def _ensure_collection(self):
-        """Assicura che la collection Qdrant esista"""
+        """Assicura che la collection Qdrant esista (una volta per processo)"""
         try:
-            collections = self.qdrant_client.get_collections()
-            collection_names = [c.name for c in collections.collections]
+            qdrant_client = get_clients().qdrant()
             
-            if self.collection_name not in collection_names:
-                self.qdrant_client.create_collection(
+            if not collection_exists(qdrant_client, self.collection_name):
+                qdrant_client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(size=1536, distance=Distance.COSINE)
+                    **self.collection_config.create_kwargs()
                 )
                 logger.info(f"Created Qdrant collection: {self.collection_name}")
+            
+            ensure_payload_indexes(qdrant_client, self.collection_name)
                 
         except Exception as e:
             logger.error(f"Failed to ensure Qdrant collection: {e}")
             raise
     
-    def vectorize_document(self, document_id: int) -> Dict:
+    async def vectorize_document(self, document_id: int) -> Dict:
         """
         Vettorizza tutti i chunks di un documento
         Returns: {success: bool, vectorized_chunks: int, error: str}
@@ -62,51 +69,40 @@ class VectorService:
             if not chunks:
                 return {"success": False, "error": "No chunks found"}
             
-            # Generate embeddings for all chunks
-            vectorized_count = 0
-            points = []
-            
+            # Embedding batch + upsert a blocchi tramite la pipeline condivisa
+            items = []
+            point_ids = {}
             for chunk in chunks:
-                try:
-                    # Generate embedding
-                    embedding_response = self.openai_client.embeddings.create(
-                        model="text-embedding-ada-002",
-                        input=chunk.chunk_text
-                    )
-                    embedding = embedding_response.data[0].embedding
-                    
-                    # Create Qdrant point
-                    import uuid
-                    point_id = str(uuid.uuid4())
-                    point = PointStruct(
-                        id=point_id,
-                        vector=embedding,
-                        payload={
-                            "document_id": document_id,
-                            "chunk_index": chunk.chunk_index,
-                            "chunk_text": chunk.chunk_text,
-                            "url": document.url,
-                            "domain": document.domain,
-                            "title": document.title,
-                            "source": "web_scraping_v2"
-                        }
-                    )
-                    points.append(point)
-                    
-                    # Update chunk with vector ID
-                    chunk.vector_id = point_id
-                    vectorized_count += 1
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to vectorize chunk {chunk.id}: {e}")
-                    continue
-            
-            # Upload to Qdrant in batch
-            if points:
-                self.qdrant_client.upsert(
-                    collection_name=self.collection_name,
-                    points=points
-                )
+                point_id = str(uuid.uuid4())
+                point_ids[chunk.id] = point_id
+                items.append((
+                    point_id,
+                    chunk.chunk_text,
+                    {
+                        # document_id stringa: indice keyword condiviso con le altre sorgenti
+                        "document_id": str(document_id),
+                        "chunk_index": chunk.chunk_index,
+                        "chunk_text": chunk.chunk_text,
+                        "url": document.url,
+                        "domain": document.domain,
+                        "title": document.title,
+                        "filename": document.title or document.url,
+                        "source": "web_scraping_v2",
+                        "content_type": "web_page"
+                    }
+                ))
+            
+            metrics = await self.vector_service.upsert_texts(items)
+            vectorized_count = metrics.upserted_points
+            
+            if vectorized_count:
+                # I chunk di batch falliti restano senza vector_id
+                failed_ids = set(metrics.failed_point_ids)
+                if failed_ids:
+                    logger.warning(f"{len(failed_ids)} chunks not vectorized for document {document_id}")
+                for chunk in chunks:
+                    if point_ids[chunk.id] not in failed_ids:
+                        chunk.vector_id = point_ids[chunk.id]
                 
                 # Mark document as vectorized
                 document.vectorized = True
@@ -116,7 +112,8 @@ class VectorService:
                 logger.info(f"Vectorized {vectorized_count} chunks for document {document_id}")
                 return {
                     "success": True,
-                    "vectorized_chunks": vectorized_count
+                    "vectorized_chunks": vectorized_count,
+                    "metrics": metrics.to_dict()
                 }
             else:
                 return {"success": False, "error": "No chunks could be vectorized"}
@@ -155,26 +152,22 @@ class VectorService:
             logger.error(f"Failed to delete vectors for document {document_id}: {e}")
             return {"success": False, "error": str(e)}
     
-    def search_similar(self, query: str, limit: int = 10) -> Dict:
+    async def search_similar(
+        self,
+        query: str,
+        limit: int = 10,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Dict:
         """
         Cerca contenuti simili nella collection
+        `filters`: campi payload indicizzati, es. {"source": "web_scraping_v2", "company_id": 3}
         Returns: {success: bool, results: List[dict], error: str}
         """
         try:
-            # Generate query embedding
-            embedding_response = self.openai_client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=query
-            )
-            query_embedding = embedding_response.data[0].embedding
-            
-            # Search in Qdrant
-            search_results = self.qdrant_client.search(
-                collection_name=self.collection_name,
-                query_vector=query_embedding,
-                limit=limit,
-                score_threshold=0.7
-            )
+            build_filter(filters)
+            
+            # Ricerca per modello (soglia di default del modello corrente)
+            search_results = await self.vector_service.search_points(query, limit, filters=filters)
             
             results = []
             for result in search_results:
@@ -183,6 +176,7 @@ class VectorService:
                     "content": result.payload.get("chunk_text", ""),
                     "url": result.payload.get("url", ""),
                     "title": result.payload.get("title", ""),
+                    "source": result.payload.get("source", ""),
                     "document_id": result.payload.get("document_id")
                 })
             
@@ -198,7 +192,9 @@ class VectorService:
     def get_collection_stats(self) -> Dict:
         """Statistiche collection Qdrant"""
         try:
-            info = self.qdrant_client.get_collection(self.collection_name)
+            info = self.qdrant_client.get_collection(
+                resolve_collection(self.qdrant_client, self.collection_name)
+            )
             return {
                 "success": True,
                 "points_count": info.points_count,
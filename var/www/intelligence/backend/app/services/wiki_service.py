@@ -16,8 +16,9 @@ from app.schemas.wiki import (
     WikiSectionCreate, WikiSectionResponse,
     WikiCategoryCreate, WikiCategoryResponse
 )
-from app.modules.rag_engine.vector_service import VectorRAGService
+from app.modules.rag_engine.vector_service import get_vector_service
 from app.modules.rag_engine.document_processor import DocumentProcessor
+from app.modules.rag_engine.chunker import chunk_text
 
 class WikiService:
     """
@@ -25,10 +26,8 @@ class WikiService:
     """
     
     def __init__(self):
-        self.vector_service = VectorRAGService()
+        self.vector_service = get_vector_service()
         self.doc_processor = DocumentProcessor()
-        self.chunk_size = 1000
-        self.chunk_overlap = 200
     
     # ===== CATEGORY METHODS =====
     def get_categories(self, db: Session) -> List[WikiCategoryResponse]:
@@ -222,15 +221,19 @@ class WikiService:
         self, 
         query: str, 
         db: Session,
-        limit: int = 10
+        limit: int = 10,
+        filters: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
-        """Search wiki content using vector similarity"""
+        """
+        Search wiki content using vector similarity.
+        `filters` narrows the search further (payload-indexed fields, e.g. document_id);
+        content_type is always 'wiki'.
+        """
         try:
-            # Use existing RAG service for semantic search
-            search_results = await self.vector_service.semantic_search(
-                query=query,
-                top_k=limit,
-                filter_metadata={'content_type': 'wiki'}
+            search_results = await self.vector_service.search_similar_chunks(
+                query,
+                limit=limit,
+                filters={**(filters or {}), 'content_type': 'wiki'}
             )
             
             # Enrich with page information
@@ -244,7 +247,7 @@ class WikiService:
                     if page:
                         enriched_results.append({
                             'score': result.get('score', 0),
-                            'text': result.get('text', ''),
+                            'text': result.get('content', ''),
                             'page': {
                                 'id': page.id,
                                 'slug': page.slug,
@@ -357,7 +360,9 @@ class WikiService:
         # Create chunks
         chunks = self._create_chunks(content)
         
-        # Add to Qdrant with wiki metadata
+        # Add to Qdrant with wiki metadata (embedding batch tramite la pipeline)
+        created_at = datetime.utcnow().isoformat()
+        items = []
         for i, chunk in enumerate(chunks):
             chunk_id = self._generate_chunk_id(page.id, i)
             metadata = {
@@ -367,10 +372,20 @@ class WikiService:
                 'page_title': page.title,
                 'category': page.category,
                 'chunk_index': i,
-                'created_at': datetime.utcnow().isoformat()
+                'created_at': created_at
             }
-            
-            await self.vector_service.add_point(chunk_id, chunk, metadata)
+            # Top-level fields shared with the other sources (payload indexes / filters)
+            payload = {
+                **metadata,
+                'source': 'wiki',
+                'document_id': f"wiki:{page.id}",
+                'filename': page.title,
+                'content': chunk,
+                'metadata': metadata
+            }
+            items.append((chunk_id, chunk, payload))
+        
+        await self.vector_service.upsert_texts(items)
     
     def _remove_page_from_vector_db(self, page_id: int):
         """Remove wiki page from vector database"""
@@ -379,13 +394,8 @@ class WikiService:
         pass
     
     def _create_chunks(self, content: str) -> List[str]:
-        """Create chunks from content"""
-        chunks = []
-        for i in range(0, len(content), self.chunk_size - self.chunk_overlap):
-            chunk = content[i:i + self.chunk_size]
-            if chunk.strip():
-                chunks.append(chunk)
-        return chunks
+        """Create chunks from content (markdown headings start a new chunk)"""
+        return chunk_text(content)
     
     def _generate_chunk_id(self, page_id: int, chunk_index: int) -> int:
         """Generate unique chunk ID for Qdrant"""
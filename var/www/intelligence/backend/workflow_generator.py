@@ -13,6 +13,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from uuid import uuid4
 
+from app.services.keyword_matcher import get_keyword_matcher
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("workflow_generator")
@@ -29,40 +31,15 @@ class WorkflowGenerator:
         """
         Estrae il kit commerciale dalla descrizione dell'attività
         """
-        full_text = f"{title} {description}".lower()
-        
-        kit_patterns = {
-            "Kit Start Office Finance": [
-                "start office finance", "startoffice finance", 
-                "sof", "start office fin"
-            ],
-            "Kit Start Office Digital": [
-                "start office digital", "startoffice digital", 
-                "sod"
-            ],
-            "Kit Start Office Training": [
-                "start office training", "startoffice training", 
-                "sot"
-            ],
-            "Kit Start Office Sustainability": [
-                "start office sustainability", "startoffice sustainability", 
-                "sos"
-            ],
-            "Kit Incarico 24 Mesi": [
-                "incarico 24 mesi", "i24", "24 mesi"
-            ],
-            "Kit Incarico Consulenza Strumenti Economico- Finanziari": [
-                "consulenza strumenti", "ics", "strumenti economico"
-            ]
-        }
+        full_text = f"{title} {description}"
         
         logger.info(f"🔍 Analizzando: '{full_text[:100]}'")
         
-        for kit_name, patterns in kit_patterns.items():
-            for pattern in patterns:
-                if pattern in full_text:
-                    logger.info(f"🎯 Kit identificato: {kit_name} via pattern '{pattern}'")
-                    return kit_name
+        # Nomi dei kit attivi, articoli principali e abbreviazioni (KIT_ALIASES) in un solo automa
+        kit_name = get_keyword_matcher().find_kit(full_text, db=self.db)
+        if kit_name:
+            logger.info(f"🎯 Kit identificato: {kit_name}")
+            return kit_name
         
         logger.warning(f"⚠️ Nessun kit identificato da: '{full_text[:100]}'")
         return None
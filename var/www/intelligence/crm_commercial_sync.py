@@ -17,6 +17,7 @@ sys.path.append('/var/www/intelligence/backend')
 
 from backend.app.services.crm.activities_sync import CRMSyncService as CRMBaseService
 from backend.app.core.database import SessionLocal
+from backend.app.services.keyword_matcher import get_keyword_matcher
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("crm_commercial_sync")
@@ -81,26 +82,12 @@ class CRMCommercialSync(CRMBaseService):
         """
         if not description:
             return None
-            
-        description_upper = description.upper()
-        
-        # Match esatto
-        for kit_name in self.kit_commerciali.keys():
-            if kit_name.upper() in description_upper:
-                logger.info(f"🎯 Found exact kit: {kit_name}")
-                return kit_name
-        
-        # Match parziale (2 parole consecutive)
-        for kit_name in self.kit_commerciali.keys():
-            kit_words = kit_name.upper().split()
-            if len(kit_words) >= 2:
-                for i in range(len(kit_words) - 1):
-                    partial = " ".join(kit_words[i:i+2])
-                    if partial in description_upper:
-                        logger.info(f"🎯 Found partial kit: {kit_name} via '{partial}'")
-                        return kit_name
         
-        return None
+        # Match esatto o parziale (2 parole consecutive), solo tra i kit con codice articolo
+        kit_name = get_keyword_matcher().find_kit(description, db=self.db, candidates=self.kit_commerciali)
+        if kit_name:
+            logger.info(f"🎯 Found kit: {kit_name}")
+        return kit_name
     
     def activity_already_processed(self, crm_activity_id: int) -> bool:
         """Verifica se l'attività è già stata processata"""
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark chunking: finestre fisse 1000/200 caratteri (vecchi chunker) vs
+TextChunker (frasi/titoli, budget di token).
+Misura throughput (MB/s) e qualità dei chunk: token medi/massimi, chunk oltre il
+limite, chunk tagliati a metà frase, chunk quasi vuoti.
+
+Uso:
+    python benchmark_chunker.py [--corpus DIR] [--limit 200] [--repeat 3]
+
+Senza --corpus il testo viene da knowledge_documents.extracted_text.
+"""
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+sys.path.append('/var/www/intelligence/backend')
+
+from app.modules.rag_engine.chunker import TextChunker, count_tokens
+from app.modules.rag_engine.document_processor import extract_text_sync
+from app.modules.rag_engine.extraction_pool import SUPPORTED_EXTENSIONS
+from app.modules.rag_engine.vector_service import VectorRAGService
+
+_SENTENCE_END_RE = re.compile(r'[.!?…:;]["\'»”)\]]*\s*$')
+
+
+def legacy_split(text: str, size: int = 1000, overlap: int = 200):
+    """Chunker precedente (scripts, wiki, scraping): finestre fisse di caratteri"""
+    chunks = []
+    for i in range(0, len(text), size - overlap):
+        chunk = text[i:i + size]
+        if len(chunk.strip()) > 50:
+            chunks.append(chunk)
+    return chunks
+
+
+def load_corpus(corpus: str = None, limit: int = 200):
+    if corpus:
+        texts = []
+        for path in sorted(Path(corpus).rglob("*")):
+            if path.suffix.lower() in SUPPORTED_EXTENSIONS and path.is_file():
+                result = extract_text_sync(path)
+                if result['success'] and result['text'].strip():
+                    texts.append(result['text'])
+            if len(texts) >= limit:
+                break
+        return texts
+
+    conn = VectorRAGService()._get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT extracted_text FROM knowledge_documents "
+            "WHERE length(COALESCE(extracted_text, '')) > 500 ORDER BY id LIMIT %s",
+            (limit,)
+        )
+        return [row[0] for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def chunk_quality(chunks, max_tokens: int, min_tokens: int):
+    tokens = [count_tokens(c) for c in chunks]
+    if not tokens:
+        return {}
+    return {
+        "chunks": len(chunks),
+        "avg_tokens": round(statistics.mean(tokens), 1),
+        "max_tokens": max(tokens),
+        "over_max": sum(t > max_tokens for t in tokens),
+        "cut_mid_sentence": round(sum(not _SENTENCE_END_RE.search(c) for c in chunks) / len(chunks), 3),
+        "near_empty": sum(t < min_tokens for t in tokens),
+    }
+
+
+def check_edge_cases() -> bool:
+    """Casi limite che in passato hanno rotto il chunker (titolo iniziale con min_tokens=0, testi vuoti)"""
+    cases = [
+        (TextChunker(min_tokens=0), "# Titolo\nTesto della sezione."),
+        (TextChunker(min_tokens=0), "# Uno\n# Due\nTesto.\n# Tre\nAltro testo."),
+        (TextChunker(), ""),
+        (TextChunker(), "# Solo titolo"),
+    ]
+    ok = True
+    for chunker, text in cases:
+        try:
+            chunks = list(chunker.iter_chunks(text))
+        except Exception as e:
+            print(f"❌ Caso limite {text!r} (min_tokens={chunker.min_tokens}): {type(e).__name__}: {e}")
+            ok = False
+            continue
+        if text.strip() and not chunks:
+            print(f"❌ Caso limite {text!r}: nessun chunk prodotto")
+            ok = False
+    if ok:
+        print(f"✅ {len(cases)} casi limite superati")
+    return ok
+
+
+def run_benchmark(args):
+    print("🧪 Benchmark chunker...")
+    if not check_edge_cases():
+        return False
+    texts = load_corpus(args.corpus, args.limit)
+    if not texts:
+        print("❌ Corpus vuoto")
+        return False
+    megabytes = sum(len(t.encode("utf-8")) for t in texts) / (1024 * 1024)
+    print(f"📋 {len(texts)} documenti, {megabytes:.2f}MB")
+
+    chunker = TextChunker()
+    modes = {
+        "legacy": legacy_split,
+        "text_chunker": lambda text: [c.text for c in chunker.iter_chunks(text)],
+    }
+    report = {}
+    for mode, split in modes.items():
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            chunks = [chunk for text in texts for chunk in split(text)]
+            timings.append(time.perf_counter() - start)
+        report[mode] = {
+            "mb_per_s": round(megabytes / min(timings), 2),
+            **chunk_quality(chunks, chunker.max_tokens, chunker.min_tokens),
+        }
+        print(f"✅ {mode:12s} {report[mode]}")
+
+    print(json.dumps(report, indent=2))
+    print("🎉 Benchmark completed!")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunking throughput and chunk quality")
+    parser.add_argument("--corpus", help="directory di documenti (default: knowledge_documents)")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    success = run_benchmark(parser.parse_args())
+    sys.exit(0 if success else 1)
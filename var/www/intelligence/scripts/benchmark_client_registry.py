@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark client condivisi (app/core/clients.py)
+- import di app.routes.rag_routes in un processo pulito: tempo e file descriptor aperti
+- pattern "un servizio per richiesta" (VectorService v2): client Qdrant nuovo a ogni
+  richiesta (comportamento precedente) vs client dal registro condiviso
+
+Uso:
+    python benchmark_client_registry.py [--requests 200] [--imports 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+sys.path.append('/var/www/intelligence/backend')
+
+from app.core.clients import get_clients
+from app.services.web_scraping_v2.vector_service import VectorService
+
+BACKEND_DIR = '/var/www/intelligence/backend'
+
+IMPORT_PROBE = """
+import os, sys, time
+sys.path.append('%s')
+start = time.perf_counter()
+import app.routes.rag_routes
+print(time.perf_counter() - start, len(os.listdir('/proc/self/fd')))
+""" % BACKEND_DIR
+
+
+def open_fds() -> int:
+    return len(os.listdir('/proc/self/fd'))
+
+
+def measure_import(runs: int):
+    timings, fds = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_PROBE], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        seconds, fd_count = output.split()
+        timings.append(float(seconds))
+        fds.append(int(fd_count))
+    return {"import_s": round(statistics.median(timings), 3), "fds": max(fds)}
+
+
+def measure_requests(name: str, requests: int, make_client):
+    collection_name = VectorService(None).collection_name
+    latencies = []
+    fds_before = open_fds()
+    clients = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client = make_client()
+        client.get_collection(collection_name)
+        latencies.append((time.perf_counter() - start) * 1000)
+        clients.append(client)  # come un servizio ancora referenziato dalla richiesta
+    result = {
+        "requests": requests,
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(sorted(latencies)[int(0.99 * (len(latencies) - 1))], 2),
+        "fd_delta": open_fds() - fds_before,
+    }
+    print(f"✅ {name:18s} {result}")
+    return result
+
+
+def per_request_client():
+    from qdrant_client import QdrantClient
+    return QdrantClient(
+        host=os.getenv("QDRANT_HOST", "localhost"),
+        port=int(os.getenv("QDRANT_PORT", "6333"))
+    )
+
+
+def run_benchmark(args):
+    print("🧪 Benchmark client condivisi...")
+    report = {"import": measure_import(args.imports)}
+    print(f"✅ import rag_routes   {report['import']}")
+
+    try:
+        get_clients().qdrant().get_collections()
+    except Exception as e:
+        print(f"❌ Qdrant non raggiungibile: {e}")
+        return False
+
+    report["per_request_client"] = measure_requests("per_request_client", args.requests, per_request_client)
+    report["registry"] = measure_requests("registry", args.requests, lambda: get_clients().qdrant())
+    report["clients"] = get_clients().get_stats()
+
+    print(json.dumps(report, indent=2))
+    print("🎉 Benchmark completed!")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time, FDs and per-request setup: shared client registry")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--imports", type=int, default=3)
+    success = run_benchmark(parser.parse_args())
+    sys.exit(0 if success else 1)
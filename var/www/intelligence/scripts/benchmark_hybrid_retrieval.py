@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark retrieval: vector-only vs ibrido (vector + full-text, RRF)
+Misura recall@k e latenza p50/p95 sugli stessi query vector (embedding calcolato una volta).
+
+Uso:
+    python benchmark_hybrid_retrieval.py [--k 5] [--samples 100] [--queries queries.jsonl]
+
+Senza --queries il set viene generato da document_chunks:
+- query "codice": un identificativo presente nel chunk (P.IVA, TCK-..., codici articolo)
+- query "frase": 6 parole consecutive del chunk
+Un risultato è rilevante se contiene il codice / la frase attesa.
+File --queries: una riga JSON per query {"query": "...", "expected": ["testo atteso", ...]}
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import sys
+import time
+sys.path.append('/var/www/intelligence/backend')
+
+from app.modules.rag_engine.vector_service import VectorRAGService
+from app.modules.rag_engine.hybrid_retriever import HybridRetriever
+
+CODE_RE = re.compile(r"\b(?:TCK-[\w-]+|\d{11}|[A-Z]{2,}[-_]?\d{2,}[\w-]*)\b")
+
+
+def build_queries(vector_service, samples: int):
+    conn = vector_service._get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT content FROM document_chunks WHERE length(content) > 200 ORDER BY random() LIMIT %s",
+        (samples * 3,)
+    )
+    rows = [r[0] for r in cur.fetchall()]
+    conn.close()
+
+    queries = []
+    for content in rows:
+        codes = CODE_RE.findall(content)
+        if codes and sum(q["kind"] == "codice" for q in queries) < samples // 2:
+            code = random.choice(codes)
+            queries.append({"query": f"informazioni su {code}", "expected": [code], "kind": "codice"})
+        else:
+            words = content.split()
+            if len(words) < 12:
+                continue
+            start = random.randrange(0, len(words) - 6)
+            phrase = " ".join(words[start:start + 6])
+            queries.append({"query": phrase, "expected": [phrase], "kind": "frase"})
+        if len(queries) >= samples:
+            break
+    return queries
+
+
+def is_relevant(result, expected):
+    content = " ".join(result.get("content", "").split()).lower()
+    return any(" ".join(e.split()).lower() in content for e in expected)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_benchmark(args):
+    print("🧪 Benchmark hybrid retrieval...")
+    vector_service = VectorRAGService()
+    retriever = HybridRetriever(vector_service)
+
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [dict(json.loads(line), kind="file") for line in f if line.strip()]
+    else:
+        queries = build_queries(vector_service, args.samples)
+    if not queries:
+        print("❌ Nessuna query disponibile (document_chunks vuota?)")
+        return False
+    print(f"📋 {len(queries)} query, k={args.k}")
+
+    # Embedding una sola volta: si confronta solo il costo di retrieval
+    vectors = await vector_service.embedding_pipeline.embed_texts([q["query"] for q in queries])
+
+    modes = {
+        "vector": lambda q, v: retriever.vector_search(q, args.k, args.score_threshold, v),
+        "hybrid": lambda q, v: retriever.search(q, args.k, args.score_threshold, v),
+    }
+    report = {}
+    for mode, search in modes.items():
+        hits = {"all": [], "codice": [], "frase": [], "file": []}
+        latencies = []
+        for query, vector in zip(queries, vectors):
+            start = time.perf_counter()
+            results = await search(query["query"], vector)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found = any(is_relevant(r, query["expected"]) for r in results[:args.k])
+            hits["all"].append(found)
+            hits[query["kind"]].append(found)
+
+        report[mode] = {
+            f"recall@{args.k}": round(sum(hits["all"]) / len(hits["all"]), 3),
+            **{
+                f"recall@{args.k}_{kind}": round(sum(values) / len(values), 3)
+                for kind, values in hits.items() if kind != "all" and values
+            },
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+        }
+        print(f"✅ {mode:7s} {report[mode]}")
+
+    print(json.dumps(report, indent=2))
+    print("🎉 Benchmark completed!")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vector-only vs hybrid retrieval")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--score-threshold", type=float, default=0.3)
+    parser.add_argument("--queries", help="JSONL con {query, expected}")
+    success = asyncio.run(run_benchmark(parser.parse_args()))
+    sys.exit(0 if success else 1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark latenza API durante l'ingestion di PDF grandi
+Confronta l'estrazione nel processo dell'API (comportamento precedente: parsing
+dentro async def) con l'ExtractionPool (process pool + streaming di pagine).
+
+Un'app FastAPI minimale gira nello stesso event loop dell'estrazione e viene
+interrogata di continuo via ASGI: se il parsing blocca il loop, la p99 esplode.
+
+Uso:
+    python benchmark_ingestion_latency.py [--corpus /var/www/intelligence/backend/uploads]
+        [--min-size-mb 5] [--files 8] [--rps 50] [--workers 2]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+sys.path.append('/var/www/intelligence/backend')
+
+import httpx
+from fastapi import FastAPI
+
+from app.modules.rag_engine.chunker import StreamingChunker
+from app.modules.rag_engine.document_processor import extract_text_sync
+from app.modules.rag_engine.extraction_pool import ExtractionBudget, ExtractionPool
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def find_corpus(corpus: Path, min_size_mb: float, limit: int):
+    files = [
+        path for path in corpus.glob("*.pdf")
+        if path.is_file() and path.stat().st_size >= min_size_mb * 1024 * 1024
+    ]
+    return sorted(files, key=lambda p: p.stat().st_size, reverse=True)[:limit]
+
+
+async def probe(client: httpx.AsyncClient, rps: float, stop: asyncio.Event, latencies):
+    interval = 1.0 / rps
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/ping")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+
+
+async def ingest_inline(files):
+    """Vecchio percorso: parsing sincrono dentro la coroutine"""
+    chunks = 0
+    for path in files:
+        result = extract_text_sync(path, ExtractionBudget(max_seconds=3600, max_memory_mb=1e9))
+        chunker = StreamingChunker()
+        chunks += len(chunker.feed(result['text'])) + len(chunker.flush())
+    return chunks
+
+
+async def ingest_pool(pool: ExtractionPool, files):
+    async def one(path):
+        chunker = StreamingChunker()
+        count = 0
+        async for segment in pool.stream(path):
+            count += len(chunker.feed(segment))
+        return count + len(chunker.flush())
+
+    return sum(await asyncio.gather(*(one(path) for path in files)))
+
+
+async def measure(name, client, rps, ingest=None):
+    latencies = []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(client, rps, stop, latencies))
+    start = time.perf_counter()
+    if ingest is None:
+        await asyncio.sleep(5)
+        chunks = 0
+    else:
+        chunks = await ingest
+    duration = time.perf_counter() - start
+    stop.set()
+    await prober
+
+    result = {
+        "requests": len(latencies),
+        "chunks": chunks,
+        "duration_s": round(duration, 2),
+        "p50_ms": round(statistics.median(latencies), 2) if latencies else 0.0,
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2) if latencies else 0.0,
+    }
+    print(f"✅ {name:9s} {result}")
+    return result
+
+
+async def run_benchmark(args):
+    print("🧪 Benchmark latenza API durante l'ingestion...")
+    files = find_corpus(Path(args.corpus), args.min_size_mb, args.files)
+    if not files:
+        print(f"❌ Nessun PDF >= {args.min_size_mb}MB in {args.corpus}")
+        return False
+    total_mb = sum(p.stat().st_size for p in files) / (1024 * 1024)
+    print(f"📋 {len(files)} PDF ({total_mb:.1f}MB), probe {args.rps} req/s")
+
+    pool = ExtractionPool(
+        max_workers=args.workers,
+        budget=ExtractionBudget(max_seconds=3600, max_memory_mb=1e9)
+    )
+    report = {}
+    transport = httpx.ASGITransport(app=build_app())
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            report["idle"] = await measure("idle", client, args.rps)
+            report["inline"] = await measure(
+                "inline", client, args.rps, ingest_inline(files)
+            )
+            report["pool"] = await measure(
+                "pool", client, args.rps, ingest_pool(pool, files)
+            )
+    finally:
+        pool.shutdown()
+
+    if report["inline"]["chunks"] != report["pool"]["chunks"]:
+        print(f"⚠️ Chunk diversi: inline={report['inline']['chunks']} pool={report['pool']['chunks']}")
+
+    print(json.dumps(report, indent=2))
+    print("🎉 Benchmark completed!")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API p99 during large-PDF ingestion: inline vs process pool")
+    parser.add_argument("--corpus", default="/var/www/intelligence/backend/uploads")
+    parser.add_argument("--min-size-mb", type=float, default=5.0)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--rps", type=float, default=50.0)
+    parser.add_argument("--workers", type=int, default=2)
+    success = asyncio.run(run_benchmark(parser.parse_args()))
+    sys.exit(0 if success else 1)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Benchmark riconoscimento kit e intent (app/services/keyword_matcher.py)
+- backlog sintetico di attività CRM (deterministico): nome completo del kit con
+  maiuscole/accenti/punteggiatura variati, due parole del nome, abbreviazione
+  (KIT_ALIASES) o nessun kit; catalogo di --kits kit (o quello reale con --from-db)
+- confronto con i loop annidati precedenti (`kit_name.upper() in description_upper`
+  + scansione delle coppie di parole) e con analyze_message_intent precedente:
+  tempo di costruzione dell'automa, attività/s, speedup, accordo e accuratezza
+  rispetto al kit atteso
+
+Uso:
+    python benchmark_keyword_matcher.py [--activities 100000] [--kits 200] [--messages 20000]
+    python benchmark_keyword_matcher.py --from-db --activities 50000
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+sys.path.append('/var/www/intelligence/backend')
+
+from app.services.keyword_matcher import CATEGORY_KEYWORDS, KIT_ALIASES, LOCATIONS, KeywordMatcher
+
+SEED = 42
+AREAS = ["Office", "Digital", "Finance", "Training", "Export", "Welfare", "Energy", "Security",
+         "Marketing", "Sostenibilità", "Qualità", "Logistica", "Innovazione", "Crescita", "Privacy"]
+FILLER = ("cliente richiede attivazione servizio dopo incontro commerciale, inviare preventivo e "
+          "pianificare la call di avvio con il referente amministrativo entro fine mese").split()
+MESSAGES = [
+    "cerco un partner che si occupa di {category} a {location}",
+    "quali aziende fanno {category}?",
+    "chi si occupa di {category} in {location}",
+    "riassumi le attività aperte della settimana",
+    "mostrami i ticket del cliente con email in ritardo",
+    "servono fornitori per {category}",
+]
+
+
+# ===== IMPLEMENTAZIONI PRECEDENTI (riferimento) =====
+
+def legacy_find_kit(description: str, kit_names):
+    if not description:
+        return None
+    description_upper = description.upper()
+    for kit_name in kit_names:
+        if kit_name.upper() in description_upper:
+            return kit_name
+    for kit_name in kit_names:
+        kit_words = kit_name.upper().split()
+        if len(kit_words) >= 2:
+            for i in range(len(kit_words) - 1):
+                partial = " ".join(kit_words[i:i+2])
+                if partial in description_upper:
+                    return kit_name
+    return None
+
+
+def legacy_analyze_intent(message: str):
+    message_lower = message.lower()
+    partner_keywords = ["partner", "partner che", "qualcuno che", "azienda che", "chi si occupa", "fornitori"]
+    company_keywords = ["azienda", "aziende", "ditta", "società", "impresa"]
+    is_partner_search = any(kw in message_lower for kw in partner_keywords)
+    is_company_search = any(kw in message_lower for kw in company_keywords)
+    detected_categories = []
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(kw in message_lower for kw in keywords):
+            detected_categories.append(category)
+    location_match = re.search(r'\b(milano|roma|torino|napoli|bologna|firenze|venezia|lombardia|lazio|piemonte)\b', message_lower)
+    return {
+        "is_partner_search": is_partner_search,
+        "is_company_search": is_company_search,
+        "detected_categories": detected_categories,
+        "detected_location": location_match.group(1) if location_match else None,
+    }
+
+
+# ===== DATASET =====
+
+def synthetic_catalog(count: int, rng: random.Random):
+    """Kit reali di KIT_ALIASES + kit generati "Kit <area> <area> <n>" (nomi univoci)"""
+    rows = [(name, None, None) for name in KIT_ALIASES]
+    while len(rows) < count:
+        name = f"Kit {rng.choice(AREAS)} {rng.choice(AREAS)} {len(rows)}"
+        rows.append((name, f"K{len(rows):04d}", None))
+    return rows[:count]
+
+
+def variant(name: str, rng: random.Random) -> str:
+    """Stesso kit scritto come in una nota CRM: maiuscole, accenti, trattini"""
+    choice = rng.random()
+    if choice < 0.3:
+        return name.upper()
+    if choice < 0.5:
+        return name.lower().replace("à", "a").replace("- ", " ")
+    return name
+
+
+def synthetic_activities(count: int, kit_names, rng: random.Random):
+    """(descrizione, kit atteso): 50% nome completo, 15% alias, 35% nessun kit"""
+    aliases = [(alias, kit) for kit, values in KIT_ALIASES.items() if kit in kit_names for alias in values]
+    activities = []
+    for _ in range(count):
+        words = rng.sample(FILLER, rng.randint(8, 16))
+        expected = None
+        roll = rng.random()
+        if roll < 0.5:
+            expected = rng.choice(kit_names)
+            words.insert(rng.randint(0, len(words)), variant(expected, rng))
+        elif roll < 0.65 and aliases:
+            alias, expected = rng.choice(aliases)
+            words.insert(rng.randint(0, len(words)), alias.upper())
+        activities.append((" ".join(words), expected))
+    return activities
+
+
+def synthetic_messages(count: int, rng: random.Random):
+    categories = [keyword for keywords in CATEGORY_KEYWORDS.values() for keyword in keywords]
+    return [
+        rng.choice(MESSAGES).format(category=rng.choice(categories), location=rng.choice(LOCATIONS))
+        for _ in range(count)
+    ]
+
+
+# ===== MISURE =====
+
+def timed(fn, items):
+    started = time.perf_counter()
+    results = [fn(item) for item in items]
+    return results, time.perf_counter() - started
+
+
+def bench_kits(matcher: KeywordMatcher, activities, kit_names):
+    descriptions = [description for description, _ in activities]
+    expected = [kit for _, kit in activities]
+
+    legacy, legacy_s = timed(lambda d: legacy_find_kit(d, kit_names), descriptions)
+    matched, matcher_s = timed(lambda d: matcher.find_kit(d), descriptions)
+
+    def accuracy(results):
+        return round(sum(r == e for r, e in zip(results, expected)) / len(expected), 4)
+
+    return {
+        "activities": len(activities),
+        "legacy_s": round(legacy_s, 3),
+        "matcher_s": round(matcher_s, 3),
+        "legacy_per_s": round(len(activities) / legacy_s),
+        "matcher_per_s": round(len(activities) / matcher_s),
+        "speedup": round(legacy_s / matcher_s, 1),
+        "agreement": round(sum(a == b for a, b in zip(legacy, matched)) / len(activities), 4),
+        "legacy_accuracy": accuracy(legacy),
+        "matcher_accuracy": accuracy(matched),
+    }
+
+
+def bench_intent(matcher: KeywordMatcher, messages):
+    legacy, legacy_s = timed(legacy_analyze_intent, messages)
+    matched, matcher_s = timed(matcher.analyze_intent, messages)
+    # "cerco" ora è una keyword partner e i confini di parola evitano falsi positivi
+    # ("ai" in "email", "app" in "appuntamento"): le differenze sono attese
+    differences = [
+        {"message": message, "legacy": old, "matcher": new}
+        for message, old, new in zip(messages, legacy, matched) if old != new
+    ]
+    samples = list({d["message"]: d for d in differences}.values())[:3]
+    return {
+        "messages": len(messages),
+        "legacy_s": round(legacy_s, 3),
+        "matcher_s": round(matcher_s, 3),
+        "speedup": round(legacy_s / matcher_s, 1),
+        "agreement": round(1 - len(differences) / len(messages), 4),
+        "sample_differences": samples,
+    }
+
+
+def run_benchmark(args):
+    print("🧪 Benchmark keyword matcher...")
+    rng = random.Random(SEED)
+    # refresh automatico disattivato: il catalogo è quello caricato qui
+    matcher = KeywordMatcher(refresh_seconds=float("inf"))
+
+    started = time.perf_counter()
+    if args.from_db:
+        if not matcher.refresh(force=True):
+            print("❌ Catalogo kit non caricato dal database")
+            return False
+    else:
+        matcher.load_rows(synthetic_catalog(args.kits, rng))
+    build_ms = (time.perf_counter() - started) * 1000
+    kit_names = matcher.kit_names
+    if not kit_names:
+        print("❌ Nessun kit attivo")
+        return False
+    print(f"📋 {len(kit_names)} kit, {matcher.automaton.size} pattern: automa in {build_ms:.1f}ms")
+
+    activities = synthetic_activities(args.activities, kit_names, rng)
+    report = {
+        "kits": len(kit_names),
+        "patterns": matcher.automaton.size,
+        "build_ms": round(build_ms, 1),
+        "source": "database" if args.from_db else "synthetic",
+        "kit_detection": bench_kits(matcher, activities, kit_names),
+        "intent": bench_intent(matcher, synthetic_messages(args.messages, rng)),
+    }
+    kits = report["kit_detection"]
+    print(f"✅ kit: {kits['matcher_per_s']} attività/s vs {kits['legacy_per_s']} (speedup {kits['speedup']}x)")
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    print("🎉 Benchmark completed!")
+    return kits["matcher_accuracy"] >= kits["legacy_accuracy"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keyword matcher vs legacy substring loops: kit detection and chat intent")
+    parser.add_argument("--activities", type=int, default=100_000)
+    parser.add_argument("--kits", type=int, default=200, help="Synthetic catalog size (ignored with --from-db)")
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--from-db", action="store_true", help="Use the active kit_commerciali catalog")
+    success = run_benchmark(parser.parse_args())
+    sys.exit(0 if success else 1)
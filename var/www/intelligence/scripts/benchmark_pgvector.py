@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Benchmark pgvector vs Qdrant (app/modules/rag_engine/pgvector_store.py)
+- dataset sintetico a cluster (deterministico, generato a blocchi: 1M × 1536 non
+  viene mai tenuto in memoria), payload company_id su --tenants aziende
+- ground truth esatta con NumPy a blocchi, anche per la ricerca filtrata per azienda
+- per ogni dimensione (--sizes) e backend: tempo di caricamento e di costruzione
+  dell'indice, recall@k e latenza p50/p99 senza filtro e con filtro company_id,
+  dimensione dell'indice pgvector; collection temporanee eliminate al termine
+
+Uso:
+    python benchmark_pgvector.py [--sizes 100000 1000000] [--dimensions 1536] [--queries 200] [--k 10]
+    python benchmark_pgvector.py --sizes 100000 --backends pgvector --ef 40 100 200
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+sys.path.append('/var/www/intelligence/backend')
+
+import numpy as np
+from qdrant_client.models import (
+    Distance, FieldCondition, Filter, MatchValue, PayloadSchemaType, PointStruct, SearchParams, VectorParams
+)
+
+from app.core.clients import ClientRegistry
+from app.modules.rag_engine.pgvector_store import PgVectorStore
+from app.modules.rag_engine.vector_store import DEFAULT_VECTOR
+
+BENCH_PREFIX = "bench_pgvector_"
+BLOCK_SIZE = 10_000
+SEED = 42
+
+
+def percentile(values, q: float) -> float:
+    return sorted(values)[int(q * (len(values) - 1))]
+
+
+class Dataset:
+    """Vettori a cluster generati per blocchi con seme fisso: stesso blocco, stessi vettori"""
+
+    def __init__(self, size: int, dimensions: int, clusters: int, tenants: int):
+        self.size = size
+        self.dimensions = dimensions
+        self.tenants = tenants
+        rng = np.random.default_rng(SEED)
+        self.centers = rng.normal(size=(clusters, dimensions)).astype(np.float32)
+
+    def block(self, start: int) -> np.ndarray:
+        count = min(BLOCK_SIZE, self.size - start)
+        rng = np.random.default_rng(SEED + 1 + start // BLOCK_SIZE)
+        assignment = rng.integers(0, len(self.centers), size=count)
+        vectors = self.centers[assignment] + 0.5 * rng.normal(size=(count, self.dimensions)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def blocks(self):
+        for start in range(0, self.size, BLOCK_SIZE):
+            yield start, self.block(start)
+
+    def tenant(self, point_id: int) -> int:
+        return point_id % self.tenants
+
+    def queries(self, count: int) -> np.ndarray:
+        rng = np.random.default_rng(SEED - 1)
+        vectors = self.centers[rng.integers(0, len(self.centers), size=count)]
+        vectors = vectors + 0.5 * rng.normal(size=vectors.shape).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_neighbours(dataset: Dataset, queries: np.ndarray, tenants, k: int):
+    """Top-k esatti (coseno) senza filtro e con filtro tenant, scansione a blocchi"""
+    best = {name: (np.full((len(queries), k), -np.inf), np.full((len(queries), k), -1))
+            for name in ("all", "tenant")}
+    for start, block in dataset.blocks():
+        scores = queries @ block.T
+        ids = np.arange(start, start + len(block))
+        filtered = np.where((ids % dataset.tenants)[None, :] == np.asarray(tenants)[:, None], scores, -np.inf)
+        for name, block_scores in (("all", scores), ("tenant", filtered)):
+            top_scores, top_ids = best[name]
+            merged_scores = np.hstack([top_scores, block_scores])
+            merged_ids = np.hstack([top_ids, np.broadcast_to(ids, block_scores.shape)])
+            order = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best[name] = (np.take_along_axis(merged_scores, order, axis=1), np.take_along_axis(merged_ids, order, axis=1))
+    return {name: [set(row.tolist()) for row in ids] for name, (_, ids) in best.items()}
+
+
+def tenant_filter(company_id: int) -> Filter:
+    return Filter(must=[FieldCondition(key="company_id", match=MatchValue(value=company_id))])
+
+
+def load(client, collection: str, dataset: Dataset, batch_size: int) -> float:
+    started = time.perf_counter()
+    for start, block in dataset.blocks():
+        for offset in range(0, len(block), batch_size):
+            rows = block[offset:offset + batch_size]
+            client.upsert(
+                collection_name=collection,
+                points=[
+                    PointStruct(id=start + offset + i, vector=vector.tolist(),
+                                payload={"company_id": dataset.tenant(start + offset + i)})
+                    for i, vector in enumerate(rows)
+                ],
+                wait=True
+            )
+        print(f"📦 {min(start + BLOCK_SIZE, dataset.size)}/{dataset.size}")
+    return time.perf_counter() - started
+
+
+def measure_queries(search, queries: np.ndarray, tenants, truth, k: int) -> dict:
+    result = {}
+    for name in ("all", "tenant"):
+        latencies, hits = [], 0
+        for query, company_id, expected in zip(queries, tenants, truth[name]):
+            start = time.perf_counter()
+            found = search(query.tolist(), tenant_filter(company_id) if name == "tenant" else None)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len({point.id for point in found} & expected)
+        result[name] = {
+            "recall_at_k": round(hits / (len(queries) * k), 4),
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+        }
+    return result
+
+
+def bench_pgvector(store: PgVectorStore, dataset: Dataset, queries, tenants, truth, args) -> dict:
+    collection = f"{BENCH_PREFIX}{dataset.size}"
+    store.recreate_collection(
+        collection_name=collection, vectors_config=VectorParams(size=dataset.dimensions, distance=Distance.COSINE)
+    )
+    try:
+        store.drop_vector_indexes(collection)
+        load_seconds = load(store, collection, dataset, args.batch_size)
+        started = time.perf_counter()
+        store.create_vector_indexes(collection)
+        index_seconds = time.perf_counter() - started
+        with store._transaction() as cur:
+            cur.execute("SELECT pg_relation_size(%s)", (store._index_name(collection, DEFAULT_VECTOR),))
+            index_bytes = cur.fetchone()[0]
+
+        report = {
+            "load_s": round(load_seconds, 1),
+            "index_s": round(index_seconds, 1),
+            "index_mb": round(index_bytes / 1024 ** 2, 1),
+            "ef": {},
+        }
+        for ef in args.ef:
+            store.ef_search = ef
+            report["ef"][ef] = measure_queries(
+                lambda vector, query_filter: store.search(
+                    collection_name=collection, query_vector=vector, query_filter=query_filter,
+                    limit=args.k, with_payload=False
+                ),
+                queries, tenants, truth, args.k
+            )
+            print(f"✅ pgvector {dataset.size} ef={ef}: {report['ef'][ef]}")
+        return report
+    finally:
+        if not args.keep:
+            store.delete_collection(collection_name=collection)
+
+
+def bench_qdrant(qdrant, dataset: Dataset, queries, tenants, truth, args) -> dict:
+    collection = f"{BENCH_PREFIX}{dataset.size}"
+    qdrant.recreate_collection(
+        collection_name=collection, vectors_config=VectorParams(size=dataset.dimensions, distance=Distance.COSINE)
+    )
+    try:
+        qdrant.create_payload_index(
+            collection_name=collection, field_name="company_id", field_schema=PayloadSchemaType.INTEGER
+        )
+        load_seconds = load(qdrant, collection, dataset, args.batch_size)
+        started = time.perf_counter()
+        while qdrant.get_collection(collection).status != "green":
+            time.sleep(1)
+        index_seconds = time.perf_counter() - started
+
+        report = {"load_s": round(load_seconds, 1), "index_s": round(index_seconds, 1), "ef": {}}
+        for ef in args.ef:
+            report["ef"][ef] = measure_queries(
+                lambda vector, query_filter: qdrant.search(
+                    collection_name=collection, query_vector=vector, query_filter=query_filter,
+                    search_params=SearchParams(hnsw_ef=ef), limit=args.k, with_payload=False
+                ),
+                queries, tenants, truth, args.k
+            )
+            print(f"✅ qdrant {dataset.size} ef={ef}: {report['ef'][ef]}")
+        return report
+    finally:
+        if not args.keep:
+            qdrant.delete_collection(collection_name=collection)
+
+
+def run_benchmark(args):
+    print("🧪 Benchmark pgvector vs Qdrant...")
+    report = {"dimensions": args.dimensions, "queries": args.queries, "k": args.k,
+              "tenants": args.tenants, "sizes": {}}
+    store = PgVectorStore() if "pgvector" in args.backends else None
+    qdrant = ClientRegistry(vector_store="qdrant").qdrant() if "qdrant" in args.backends else None
+
+    for size in args.sizes:
+        dataset = Dataset(size, args.dimensions, args.clusters, args.tenants)
+        queries = dataset.queries(args.queries)
+        tenants = [i % args.tenants for i in range(args.queries)]
+        started = time.perf_counter()
+        truth = exact_neighbours(dataset, queries, tenants, args.k)
+        print(f"📋 {size} punti × {args.dimensions}: ground truth in {time.perf_counter() - started:.1f}s")
+
+        results = report["sizes"][size] = {}
+        for backend, client, bench in (("pgvector", store, bench_pgvector), ("qdrant", qdrant, bench_qdrant)):
+            if client is None:
+                continue
+            try:
+                results[backend] = bench(client, dataset, queries, tenants, truth, args)
+            except Exception as e:
+                print(f"❌ {backend} {size}: {e}")
+                results[backend] = {"error": str(e)}
+
+    if store is not None:
+        store.close()
+    print(json.dumps(report, indent=2))
+    print("🎉 Benchmark completed!")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pgvector vs Qdrant: load time, recall@k and latency with tenant filters")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef", type=int, nargs="+", default=[40, 100], help="hnsw ef_search values")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--backends", nargs="+", choices=["pgvector", "qdrant"], default=["pgvector", "qdrant"])
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark collections")
+    success = run_benchmark(parser.parse_args())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark quantizzazione / dimensioni ridotte (app/modules/rag_engine/collection_config.py)
+- campione di punti reali da intelligence_knowledge (vettori text-embedding-3-small,
+  layout storico o named vector)
+- ground truth: ricerca esatta (coseno) con NumPy sul campione
+- per ogni configurazione: collection temporanea, recall@k, latenza p50/p99,
+  memoria vettori stimata; collection temporanee eliminate al termine
+
+Uso:
+    python benchmark_quantization.py [--points 5000] [--queries 100] [--k 10]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+sys.path.append('/var/www/intelligence/backend')
+
+import numpy as np
+from qdrant_client.models import PointStruct
+
+from app.core.clients import get_clients
+from app.modules.rag_engine.collection_config import CollectionConfig, point_vectors, truncate_vector
+
+COLLECTION_NAME = "intelligence_knowledge"
+BENCH_PREFIX = "bench_quantization_"
+BENCH_MODEL = "text-embedding-3-small"
+
+
+def bench_config(**kwargs) -> CollectionConfig:
+    """Collection temporanea a vettore unico (solo il modello del campione)"""
+    return CollectionConfig(model=BENCH_MODEL, named_vectors=False, legacy_models=(), **kwargs)
+
+
+CONFIGS = {
+    "full_1536": bench_config(dimensions=1536, quantization="none"),
+    "scalar_1536": bench_config(dimensions=1536, quantization="scalar"),
+    "binary_1536": bench_config(dimensions=1536, quantization="binary"),
+    "binary_1536_no_rescore": bench_config(dimensions=1536, quantization="binary", rescore=False),
+    "scalar_1536_on_disk": bench_config(dimensions=1536, quantization="scalar", on_disk_vectors=True),
+    "full_768": bench_config(dimensions=768, quantization="none"),
+    "scalar_512": bench_config(dimensions=512, quantization="scalar"),
+}
+
+
+def load_sample(client, points: int, batch_size: int = 256):
+    """(id, vettore) dei punti con un vettore text-embedding-3-small completo (ada-002 esclusi)"""
+    ids, vectors = [], []
+    offset = None
+    while len(ids) < points:
+        batch, offset = client.scroll(
+            collection_name=COLLECTION_NAME,
+            limit=batch_size,
+            offset=offset,
+            with_payload=["source", "embedding_model"],
+            with_vectors=True
+        )
+        for point in batch:
+            vector = point_vectors(point.vector, point.payload).get(BENCH_MODEL)
+            if vector is None or len(vector) != 1536:
+                continue
+            ids.append(point.id)
+            vectors.append(vector)
+        if offset is None:
+            break
+    return ids[:points], vectors[:points]
+
+
+def exact_neighbours(matrix: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Indici dei k vicini esatti per coseno (vettori normalizzati)"""
+    scores = queries @ matrix.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def measure_config(client, name: str, config: CollectionConfig, ids, vectors, query_rows, truth, k: int):
+    collection = f"{BENCH_PREFIX}{name}"
+    reduced = [truncate_vector(v, config.dimensions) if config.dimensions < len(v) else v for v in vectors]
+    client.recreate_collection(collection_name=collection, **config.create_kwargs())
+    try:
+        for start in range(0, len(ids), 256):
+            client.upsert(
+                collection_name=collection,
+                points=[
+                    PointStruct(id=point_id, vector=vector, payload={})
+                    for point_id, vector in zip(ids[start:start + 256], reduced[start:start + 256])
+                ],
+                wait=True
+            )
+        # Indicizzazione (e quantizzazione) completata prima di misurare
+        while client.get_collection(collection).status != "green":
+            time.sleep(0.5)
+
+        latencies, hits = [], 0
+        for row, expected in zip(query_rows, truth):
+            start = time.perf_counter()
+            results = client.search(
+                collection_name=collection,
+                query_vector=reduced[row],
+                search_params=config.search_params(),
+                limit=k
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            found = {result.id for result in results}
+            hits += len(found & {ids[i] for i in expected})
+
+        memory = config.estimate_memory(len(ids))
+        result = {
+            "recall_at_k": round(hits / (len(truth) * k), 4),
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p99_ms": round(sorted(latencies)[int(0.99 * (len(latencies) - 1))], 2),
+            "ram_mb": round(memory["ram_bytes"] / 1024 ** 2, 2),
+            "disk_mb": round(memory["disk_bytes"] / 1024 ** 2, 2),
+        }
+        print(f"✅ {name:24s} {result}")
+        return result
+    finally:
+        client.delete_collection(collection_name=collection)
+
+
+def run_benchmark(args):
+    print("🧪 Benchmark quantizzazione Qdrant...")
+    client = get_clients().qdrant()
+    try:
+        ids, vectors = load_sample(client, args.points)
+    except Exception as e:
+        print(f"❌ Qdrant non raggiungibile: {e}")
+        return False
+    if len(ids) < args.k + 1:
+        print(f"❌ Punti insufficienti in {COLLECTION_NAME}: {len(ids)}")
+        return False
+    print(f"📋 Campione: {len(ids)} punti")
+
+    rng = np.random.default_rng(42)
+    query_rows = rng.choice(len(ids), size=min(args.queries, len(ids)), replace=False)
+
+    # Unica ground truth sui vettori originali: la recall delle configurazioni ridotte
+    # include anche la perdita dovuta al troncamento delle dimensioni
+    full = np.asarray(vectors, dtype=np.float32)
+    full /= np.linalg.norm(full, axis=1, keepdims=True)
+    truth = exact_neighbours(full, full[query_rows], args.k)
+
+    report = {"points": len(ids), "queries": len(query_rows), "k": args.k, "configs": {}}
+    for name, config in CONFIGS.items():
+        if args.only and name not in args.only:
+            continue
+        report["configs"][name] = measure_config(client, name, config, ids, vectors, query_rows, truth, args.k)
+
+    print(json.dumps(report, indent=2))
+    print("🎉 Benchmark completed!")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall, latency and memory of Qdrant quantization / reduced dimensions")
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--only", nargs="*", choices=list(CONFIGS), help="Subset of configurations")
+    success = run_benchmark(parser.parse_args())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Benchmark vector store NumPy locale (app/modules/rag_engine/vector_store.py)
+- campione di punti reali da intelligence_knowledge (vettori text-embedding-3-small)
+  oppure, con --synthetic, testi generati ed embedding locali (nessun servizio esterno)
+- NumPy: tempo di caricamento, latenza p50/p99 della ricerca singola, throughput
+  di search_batch, memoria delle matrici
+- la ricerca NumPy è esatta: fa da ground truth per il recall@k HNSW di Qdrant
+  (collection temporanea con lo stesso campione, per ogni hnsw_ef richiesto);
+  senza Qdrant raggiungibile viene misurato solo lo store locale
+
+Uso:
+    python benchmark_vector_store.py [--points 5000] [--queries 100] [--k 10] [--ef 32 64 128]
+    python benchmark_vector_store.py --synthetic --points 20000 --dimensions 384
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+sys.path.append('/var/www/intelligence/backend')
+
+import numpy as np
+from qdrant_client.models import Distance, PointStruct, SearchParams, SearchRequest, VectorParams
+
+from app.core.clients import ClientRegistry
+from app.modules.rag_engine.collection_config import point_vectors
+from app.modules.rag_engine.local_embeddings import embed_text
+from app.modules.rag_engine.vector_store import NumpyVectorStore
+
+COLLECTION_NAME = "intelligence_knowledge"
+BENCH_COLLECTION = "bench_vector_store"
+BENCH_MODEL = "text-embedding-3-small"
+SOURCES = ("existing_upload", "wiki", "web_scraping_v2")
+
+VOCABULARY = (
+    "contratto fattura consulenza progetto commessa cliente fornitore ordine offerta servizio "
+    "scadenza pagamento iva bilancio budget milestone attività ticket partner kit articolo "
+    "formazione digitale processo qualità sicurezza privacy documento report analisi strategia"
+).split()
+
+
+def percentile(values, q: float) -> float:
+    return sorted(values)[int(q * (len(values) - 1))]
+
+
+def load_sample(client, points: int, batch_size: int = 256):
+    """(id, vettore, source) dei punti con un vettore text-embedding-3-small"""
+    ids, vectors, sources = [], [], []
+    offset = None
+    while len(ids) < points:
+        batch, offset = client.scroll(
+            collection_name=COLLECTION_NAME,
+            limit=batch_size,
+            offset=offset,
+            with_payload=["source", "embedding_model"],
+            with_vectors=True
+        )
+        for point in batch:
+            vector = point_vectors(point.vector, point.payload).get(BENCH_MODEL)
+            if vector is None:
+                continue
+            ids.append(point.id)
+            vectors.append(vector)
+            sources.append((point.payload or {}).get("source", "unknown"))
+        if offset is None:
+            break
+    return ids[:points], vectors[:points], sources[:points]
+
+
+def synthetic_sample(points: int, dimensions: int):
+    """Testi casuali dal vocabolario, vettorizzati con gli embedding locali"""
+    rng = np.random.default_rng(42)
+    ids, vectors, sources = [], [], []
+    for i in range(points):
+        words = rng.choice(VOCABULARY, size=int(rng.integers(8, 40)))
+        ids.append(i)
+        vectors.append(embed_text(" ".join(words), dimensions))
+        sources.append(SOURCES[i % len(SOURCES)])
+    return ids, vectors, sources
+
+
+def load_points(client, collection: str, ids, vectors, sources, batch_size: int = 256) -> float:
+    started = time.perf_counter()
+    for start in range(0, len(ids), batch_size):
+        client.upsert(
+            collection_name=collection,
+            points=[
+                PointStruct(id=point_id, vector=vector, payload={"source": source})
+                for point_id, vector, source in zip(
+                    ids[start:start + batch_size], vectors[start:start + batch_size], sources[start:start + batch_size]
+                )
+            ],
+            wait=True
+        )
+    return time.perf_counter() - started
+
+
+def measure_numpy(ids, vectors, sources, query_rows, k: int, batch_size: int):
+    """Store NumPy in memoria: risultati esatti (ground truth) e latenze"""
+    store = NumpyVectorStore(path=None)
+    dimensions = len(vectors[0])
+    store.create_collection(BENCH_COLLECTION, vectors_config=VectorParams(size=dimensions, distance=Distance.COSINE))
+    load_seconds = load_points(store, BENCH_COLLECTION, ids, vectors, sources)
+
+    truth, latencies = [], []
+    for row in query_rows:
+        start = time.perf_counter()
+        results = store.search(collection_name=BENCH_COLLECTION, query_vector=vectors[row], limit=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        truth.append([result.id for result in results])
+
+    # search_batch: una moltiplicazione matrice × blocco di query
+    started = time.perf_counter()
+    for start in range(0, len(query_rows), batch_size):
+        store.search_batch(
+            collection_name=BENCH_COLLECTION,
+            requests=[
+                SearchRequest(vector=vectors[row], limit=k, with_payload=False)
+                for row in query_rows[start:start + batch_size]
+            ]
+        )
+    batch_seconds = time.perf_counter() - started
+
+    # Sanity check contro il prodotto scalare diretto
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    expected = np.argsort(-(matrix[query_rows] @ matrix.T), axis=1)[:, :k]
+    agreement = np.mean([
+        len({ids[i] for i in exact} & set(found)) / k for exact, found in zip(expected, truth)
+    ])
+
+    result = {
+        "load_s": round(load_seconds, 2),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "batch_qps": round(len(query_rows) / batch_seconds, 1) if batch_seconds else None,
+        "matrix_mb": round(len(ids) * dimensions * 4 / 1024 ** 2, 2),
+        "exact_agreement": round(float(agreement), 4),
+    }
+    print(f"✅ numpy {result}")
+    return truth, result
+
+
+def measure_hnsw(qdrant, ids, vectors, sources, query_rows, truth, k: int, ef_values):
+    """Recall@k HNSW di Qdrant rispetto alla ricerca esatta NumPy"""
+    collection = f"{BENCH_COLLECTION}_hnsw"
+    qdrant.recreate_collection(
+        collection_name=collection, vectors_config=VectorParams(size=len(vectors[0]), distance=Distance.COSINE)
+    )
+    try:
+        load_points(qdrant, collection, ids, vectors, sources)
+        while qdrant.get_collection(collection).status != "green":
+            time.sleep(0.5)
+
+        results = {}
+        for ef in ef_values:
+            latencies, hits = [], 0
+            for row, expected in zip(query_rows, truth):
+                start = time.perf_counter()
+                found = qdrant.search(
+                    collection_name=collection,
+                    query_vector=vectors[row],
+                    search_params=SearchParams(hnsw_ef=ef, exact=False),
+                    limit=k
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += len({point.id for point in found} & set(expected))
+            results[f"ef_{ef}"] = {
+                "recall_at_k": round(hits / (len(truth) * k), 4),
+                "p50_ms": round(statistics.median(latencies), 3),
+                "p99_ms": round(percentile(latencies, 0.99), 3),
+            }
+            print(f"✅ hnsw ef={ef:<4d} {results[f'ef_{ef}']}")
+        return results
+    finally:
+        qdrant.delete_collection(collection_name=collection)
+
+
+def run_benchmark(args):
+    print("🧪 Benchmark vector store NumPy...")
+    # Qdrant esplicito: il benchmark confronta i due backend qualunque sia VECTOR_STORE
+    registry = ClientRegistry(vector_store="qdrant")
+    if args.synthetic:
+        ids, vectors, sources = synthetic_sample(args.points, args.dimensions)
+    else:
+        try:
+            ids, vectors, sources = load_sample(registry.qdrant(), args.points)
+        except Exception as e:
+            print(f"❌ Qdrant non raggiungibile: {e} (usare --synthetic)")
+            return False
+    if len(ids) < args.k + 1:
+        print(f"❌ Punti insufficienti: {len(ids)}")
+        return False
+    print(f"📋 Campione: {len(ids)} punti × {len(vectors[0])} dimensioni"
+          f"{' (sintetico)' if args.synthetic else ''}")
+
+    rng = np.random.default_rng(42)
+    query_rows = rng.choice(len(ids), size=min(args.queries, len(ids)), replace=False).tolist()
+
+    truth, numpy_result = measure_numpy(ids, vectors, sources, query_rows, args.k, args.batch_size)
+    report = {
+        "points": len(ids), "dimensions": len(vectors[0]), "queries": len(query_rows), "k": args.k,
+        "synthetic": args.synthetic, "numpy": numpy_result, "hnsw": None,
+    }
+    if not args.skip_qdrant:
+        try:
+            qdrant = registry.qdrant()
+            qdrant.get_collections()
+        except Exception as e:
+            print(f"⚠️ Qdrant non raggiungibile, recall HNSW non misurato: {e}")
+        else:
+            report["hnsw"] = measure_hnsw(qdrant, ids, vectors, sources, query_rows, truth, args.k, args.ef)
+
+    print(json.dumps(report, indent=2))
+    print("🎉 Benchmark completed!")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local NumPy vector store latency and exact-search baseline for HNSW recall")
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32, help="Queries per search_batch call")
+    parser.add_argument("--ef", type=int, nargs="+", default=[32, 64, 128], help="hnsw_ef values to compare")
+    parser.add_argument("--synthetic", action="store_true", help="Generated texts with local embeddings")
+    parser.add_argument("--dimensions", type=int, default=384, help="Local embedding size with --synthetic")
+    parser.add_argument("--skip-qdrant", action="store_true", help="Measure only the NumPy store")
+    success = run_benchmark(parser.parse_args())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Regression test qualità di retrieval del chunking
+Query = frasi prese dal corpus; un chunk è rilevante se contiene la frase intera.
+Confronta recall@k dei vecchi chunk a finestra fissa con TextChunker, con ranking
+TF-IDF (offline, deterministico) o con gli embedding reali (--embeddings).
+
+Fallisce se TextChunker ha recall@k inferiore al chunking precedente (oltre --tolerance)
+o sotto --min-recall.
+
+Uso:
+    python test_chunker_retrieval.py [--corpus DIR] [--samples 200] [--k 5] [--embeddings]
+"""
+import argparse
+import asyncio
+import math
+import random
+import re
+import sys
+from collections import Counter
+sys.path.append('/var/www/intelligence/backend')
+
+from benchmark_chunker import legacy_split, load_corpus
+
+from app.modules.rag_engine.chunker import TextChunker
+from app.modules.rag_engine.vector_service import VectorRAGService
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_RE = re.compile(r"[^.!?\n]{40,300}[.!?]")
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def build_queries(texts, samples: int, seed: int):
+    rng = random.Random(seed)
+    candidates = []
+    for doc_index, text in enumerate(texts):
+        for sentence in _SENTENCE_RE.findall(text):
+            if len(sentence.split()) >= 8:
+                candidates.append((doc_index, sentence.strip()))
+    rng.shuffle(candidates)
+    return candidates[:samples]
+
+
+class TfIdfIndex:
+    def __init__(self, chunks):
+        self.vectors = []
+        document_frequency = Counter()
+        counts = [Counter(w.lower() for w in _WORD_RE.findall(c)) for c in chunks]
+        for count in counts:
+            document_frequency.update(count.keys())
+        self.idf = {w: math.log(len(chunks) / df) + 1 for w, df in document_frequency.items()}
+        for count in counts:
+            vector = {w: tf * self.idf[w] for w, tf in count.items()}
+            norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+            self.vectors.append({w: v / norm for w, v in vector.items()})
+
+    def search(self, query: str, k: int):
+        count = Counter(w.lower() for w in _WORD_RE.findall(query))
+        query_vector = {w: tf * self.idf.get(w, 0.0) for w, tf in count.items()}
+        scores = [
+            (sum(v * vector.get(w, 0.0) for w, v in query_vector.items()), i)
+            for i, vector in enumerate(self.vectors)
+        ]
+        return [i for _, i in sorted(scores, reverse=True)[:k]]
+
+
+async def embedding_search(chunks, queries, k: int):
+    import numpy as np
+    pipeline = VectorRAGService().embedding_pipeline
+    chunk_vectors = np.asarray(await pipeline.embed_texts(chunks), dtype=np.float32)
+    query_vectors = np.asarray(await pipeline.embed_texts(queries), dtype=np.float32)
+    chunk_vectors /= np.linalg.norm(chunk_vectors, axis=1, keepdims=True)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    scores = query_vectors @ chunk_vectors.T
+    return [list(np.argsort(-row)[:k]) for row in scores]
+
+
+async def recall_at_k(texts, queries, split, k: int, embeddings: bool):
+    chunks, owners = [], []
+    for doc_index, text in enumerate(texts):
+        for chunk in split(text):
+            chunks.append(chunk)
+            owners.append(doc_index)
+    normalized = [normalize(c) for c in chunks]
+
+    if embeddings:
+        rankings = await embedding_search(chunks, [q for _, q in queries], k)
+    else:
+        index = TfIdfIndex(chunks)
+        rankings = [index.search(q, k) for _, q in queries]
+
+    hits = 0
+    for (doc_index, sentence), ranking in zip(queries, rankings):
+        target = normalize(sentence)
+        if any(owners[i] == doc_index and target in normalized[i] for i in ranking):
+            hits += 1
+    return hits / len(queries), len(chunks)
+
+
+async def test_chunker_retrieval(args):
+    print("🧪 Testing chunker retrieval quality...")
+    texts = load_corpus(args.corpus, args.limit)
+    queries = build_queries(texts, args.samples, args.seed)
+    if not queries:
+        print("❌ Nessuna query generabile dal corpus")
+        return False
+    print(f"📋 {len(texts)} documenti, {len(queries)} query, k={args.k}, "
+          f"ranking={'embedding' if args.embeddings else 'tf-idf'}")
+
+    chunker = TextChunker()
+    legacy_recall, legacy_chunks = await recall_at_k(texts, queries, legacy_split, args.k, args.embeddings)
+    print(f"✅ legacy        recall@{args.k}={legacy_recall:.3f} ({legacy_chunks} chunk)")
+    new_recall, new_chunks = await recall_at_k(texts, queries, chunker.chunk, args.k, args.embeddings)
+    print(f"✅ text_chunker  recall@{args.k}={new_recall:.3f} ({new_chunks} chunk)")
+
+    if new_recall + args.tolerance < legacy_recall:
+        print(f"❌ Regressione: recall {new_recall:.3f} < {legacy_recall:.3f} (tolleranza {args.tolerance})")
+        return False
+    if new_recall < args.min_recall:
+        print(f"❌ Recall {new_recall:.3f} sotto la soglia {args.min_recall}")
+        return False
+
+    print("🎉 Chunker retrieval test passed!")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval-quality regression test for the chunker")
+    parser.add_argument("--corpus", help="directory di documenti (default: knowledge_documents)")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    parser.add_argument("--min-recall", type=float, default=0.5)
+    parser.add_argument("--embeddings", action="store_true", help="ranking con embedding OpenAI")
+    success = asyncio.run(test_chunker_retrieval(parser.parse_args()))
+    sys.exit(0 if success else 1)